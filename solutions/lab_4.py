@@ -1,11 +1,11 @@
 import os
 from agent_framework import HostedMCPTool, ToolMode
-from agent_framework.azure import AzureAIAgentClient
 from azure.identity.aio import AzureCliCredential
 from dotenv import load_dotenv
-from agent_framework.devui import serve
+from agent_framework_devui import register_cleanup, serve
 from models.issue_analyzer import IssueAnalyzer
 from tools.time_per_issue_tools import TimePerIssueTools
+from utils.client_factory import AgentClientFactory
 import logging
 
 load_dotenv()
@@ -18,8 +18,10 @@ def main():
         "model_deployment_name": os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
         "credential": AzureCliCredential(),
     }
+    # All agents share one keep-alive connection pool to the project endpoint
+    client_factory = AgentClientFactory(**settings)
     timePerIssueTools = TimePerIssueTools()
-    issue_analyzer_agent = AzureAIAgentClient(**settings).create_agent(
+    issue_analyzer_agent = client_factory.create_agent(
         instructions="""
             You are analyzing issues. 
             If the ask is a feature request the complexity should be 'NA'.
@@ -40,7 +42,7 @@ def main():
         ],
     )
 
-    github_agent = AzureAIAgentClient(**settings).create_agent(
+    github_agent = client_factory.create_agent(
         name="GitHubAgent",
         instructions=f"""
             You are a helpful assistant that can create an issue on the user's GitHub repository based on the input provided.
@@ -59,6 +61,7 @@ def main():
         ),
     )
 
+    register_cleanup(issue_analyzer_agent, client_factory.close)
     serve(entities=[issue_analyzer_agent, github_agent], port=8090, auto_open=True, tracing_enabled=True)
 
 
@@ -1,11 +1,11 @@
 import os
 from agent_framework import GroupChatBuilder, HostedMCPTool, ToolMode
-from agent_framework.azure import AzureAIAgentClient
 from azure.identity.aio import AzureCliCredential
 from dotenv import load_dotenv
-from agent_framework.devui import serve
+from agent_framework_devui import register_cleanup, serve
 from models.issue_analyzer import IssueAnalyzer
 from tools.time_per_issue_tools import TimePerIssueTools
+from utils.client_factory import AgentClientFactory
 import logging
 
 load_dotenv()
@@ -18,8 +18,10 @@ def main():
         "model_deployment_name": os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
         "credential": AzureCliCredential(),
     }
+    # All agents share one keep-alive connection pool to the project endpoint
+    client_factory = AgentClientFactory(**settings)
     timePerIssueTools = TimePerIssueTools()
-    issue_analyzer_agent = AzureAIAgentClient(**settings).create_agent(
+    issue_analyzer_agent = client_factory.create_agent(
         instructions="""
             You are analyzing issues. 
             If the ask is a feature request the complexity should be 'NA'.
@@ -40,7 +42,7 @@ def main():
         ],
     )
 
-    github_agent = AzureAIAgentClient(**settings).create_agent(
+    github_agent = client_factory.create_agent(
         name="GitHubAgent",
         instructions=f"""
             You are a helpful assistant that can create an issue on the user's GitHub repository based on the input provided.
@@ -62,7 +64,9 @@ def main():
     group_workflow = (
         GroupChatBuilder()
         .set_manager(
-            manager=AzureAIAgentClient(**settings).create_agent(
+            # Kept a ChatAgent, so GroupChatBuilder can enforce its selection response format
+            manager=client_factory.create_agent(
+                hedge=False,
                 name="Issue Creation Group Chat Workflow",
                 instructions="""
                     You are a workflow manager that helps create GitHub issues based on user input.
@@ -78,6 +82,7 @@ def main():
         .build()
     )
 
+    register_cleanup(issue_analyzer_agent, client_factory.close)
     serve(entities=[issue_analyzer_agent, github_agent, group_workflow], port=8090, auto_open=True, tracing_enabled=True)
 
 
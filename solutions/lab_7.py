@@ -1,11 +1,13 @@
 import os
-from agent_framework import GroupChatBuilder, HostedMCPTool, HostedVectorStoreContent, SequentialBuilder, ToolMode, HostedFileSearchTool
-from agent_framework.azure import AzureAIAgentClient
+from agent_framework import GroupChatBuilder, HostedMCPTool, ToolMode
 from azure.identity.aio import AzureCliCredential
 from dotenv import load_dotenv
-from agent_framework.devui import serve
+from agent_framework_devui import register_cleanup, serve
 from models.issue_analyzer import IssueAnalyzer
+from tools.guidelines_tools import GuidelinesTools
 from tools.time_per_issue_tools import TimePerIssueTools
+from executors.dag_executor import DagBuilder
+from utils.client_factory import AgentClientFactory
 import logging
 
 load_dotenv()
@@ -18,8 +20,12 @@ def main():
         "model_deployment_name": os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
         "credential": AzureCliCredential(),
     }
+    # All agents share one keep-alive connection pool to the project endpoint
+    client_factory = AgentClientFactory(**settings)
     timePerIssueTools = TimePerIssueTools()
-    issue_analyzer_agent = AzureAIAgentClient(**settings).create_agent(
+    # Sections of files/contoso-github-issues-guidelines.md, indexed locally and re-read when the file changes
+    guidelinesTools = GuidelinesTools()
+    issue_analyzer_agent = client_factory.create_agent(
         instructions="""
             You are analyzing issues. 
             If the ask is a feature request the complexity should be 'NA'.
@@ -40,15 +46,15 @@ def main():
         ],
     )
 
-    github_agent = AzureAIAgentClient(**settings).create_agent(
+    github_agent = client_factory.create_agent(
         name="GitHubAgent",
         instructions=f"""
             You are a helpful assistant that can create GitHub issues following Contoso's guidelines.
             You work on this repository: {os.environ["GITHUB_PROJECT_REPO"]}
             
             CRITICAL WORKFLOW:
-            1. ALWAYS use the File Search tool FIRST to search for "github issues guidelines" or "issue template" to find the proper formatting and structure
-            2. Follow the Contoso GitHub Issues Guidelines found in the vector store
+            1. ALWAYS use the search_guidelines tool FIRST, in a single call, to look up the issue template, the title format and the labels (e.g. "bug report template title format mandatory labels")
+            2. Follow the Contoso GitHub Issues Guidelines returned by the tool
             3. Use the retrieved guidelines to format the issue properly with correct structure, labels, and format
             4. Then use the GitHub MCP tool to create the issue with the properly formatted content
             
@@ -56,10 +62,7 @@ def main():
         """,
         tool_choice=ToolMode.AUTO,
         tools=[
-            HostedFileSearchTool(
-                description="Search for Contoso GitHub issues guidelines and templates in the vector store",
-                inputs=HostedVectorStoreContent(vector_store_id=os.environ["VECTOR_STORE_ID"])
-            ),
+            guidelinesTools.search_guidelines,
             HostedMCPTool(
                 name="GitHub MCP",
                 url="https://api.githubcopilot.com/mcp",
@@ -74,7 +77,7 @@ def main():
 
     )
 
-    ms_learn_agent = AzureAIAgentClient(**settings).create_agent(
+    ms_learn_agent = client_factory.create_agent(
         name="DocsAgent",
         instructions="""
             You are a helpful assistant that can help with Microsoft documentation questions.
@@ -91,7 +94,9 @@ def main():
     group_workflow = (
         GroupChatBuilder()
         .set_manager(
-            manager=AzureAIAgentClient(**settings).create_agent(
+            # Kept a ChatAgent, so GroupChatBuilder can enforce its selection response format
+            manager=client_factory.create_agent(
+                hedge=False,
                 name="Issue Creation Group Chat Workflow",
                 instructions="""
                     You are a workflow manager that helps create GitHub issues based on user input following Contoso's standards.
@@ -99,7 +104,7 @@ def main():
                     WORKFLOW STEPS:
                     1. First, analyze the input using the Issue Analyzer Agent to determine the issue type, likely cause, and complexity
                     2. For GitHub issue creation, ALWAYS instruct the GitHub Agent to:
-                       - Search for guidelines FIRST using the File Search tool
+                       - Search for guidelines FIRST using the search_guidelines tool
                        - Follow the retrieved Contoso guidelines for proper formatting
                        - Create the issue using the GitHub MCP tool with the proper structure
                     3. If additional documentation is needed, consult other specialized agents
@@ -117,12 +122,15 @@ def main():
     group_workflow_agent = group_workflow.as_agent(
         name="IssueCreationAgentGroup"
     )
+    # Both only need the request, so the docs lookup runs alongside the issue creation
     workflow = (
-        SequentialBuilder()
-        .participants([ms_learn_agent, group_workflow_agent])
+        DagBuilder()
+        .add(ms_learn_agent)
+        .add(group_workflow_agent)
         .build()
     )
 
+    register_cleanup(issue_analyzer_agent, client_factory.close)
     serve(entities=[issue_analyzer_agent, github_agent, ms_learn_agent, group_workflow_agent, workflow], port=8090, auto_open=True, tracing_enabled=True)
 
 
@@ -1,9 +1,13 @@
 """Browser Agent - Step 6: Open HTML visualization in browser"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
+
 from agent_framework import ToolMode
 from pydantic import BaseModel, Field
 from tools.browser_tools import BrowserTools
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
 
 class BrowserAction(BaseModel):
     """Action to open HTML in browser"""
@@ -12,7 +16,7 @@ class BrowserAction(BaseModel):
     message: str = Field(description="Confirmation or error message")
 
 
-def create_browser_agent(client: AzureAIAgentClient):
+def create_browser_agent(client: "AzureAIAgentClient"):
     """Create the Browser Agent"""
     browser_tools = BrowserTools()
     
@@ -1,9 +1,13 @@
 """Decision Tree Agent - Step 4: Create decision tree structure"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
+
 from models.workflow_schemas import DecisionTree
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
 
-def create_decision_tree_agent(client: AzureAIAgentClient):
+def create_decision_tree_agent(client: "AzureAIAgentClient", middleware: list | None = None):
     """Create the Decision Tree Agent"""
     return client.create_agent(
         instructions="""
@@ -43,4 +47,5 @@ The tree should be logical, clinically sound, and use the most significant risk
         """,
         name="DecisionTreeAgent",
         output_schema=DecisionTree,
+        middleware=middleware,
     )
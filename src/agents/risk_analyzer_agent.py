@@ -1,9 +1,13 @@
 """Risk Analyzer Agent - Step 3: Extract risk-relevant attributes"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
+
 from models.workflow_schemas import RiskAttributes
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
 
-def create_risk_analyzer_agent(client: AzureAIAgentClient):
+def create_risk_analyzer_agent(client: "AzureAIAgentClient", middleware: list | None = None):
     """Create the Risk Analyzer Agent"""
     return client.create_agent(
         instructions="""
@@ -26,4 +30,5 @@ These attributes will be used to build a clinical decision tree.
         """,
         name="RiskAnalyzerAgent",
         output_schema=RiskAttributes,
+        middleware=middleware,
     )
@@ -1,11 +1,20 @@
 """Search Agent - Step 2: Retrieve and filter medical documents"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
 
 from models.workflow_schemas import RetrievedDocuments
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
 
-def create_search_agent(client: AzureAIAgentClient):
-    """Create the Search Agent"""
+SEARCH_TOOL_INSTRUCTIONS = """
+**RETRIEVAL TOOL:** You have a search_documents tool over a local corpus of medical documents.
+Call it with each search query you receive (and refine the query if results are poor) BEFORE filtering.
+Only return documents that the tool returned; never invent URLs.
+"""
+
+
+def create_search_agent(client: "AzureAIAgentClient", middleware: list | None = None, tools: list | None = None):
+    """Create the Search Agent, optionally with a retrieval tool such as SearchTools.search_documents"""
     return client.create_agent(
         instructions="""
                 You are a medical document retrieval specialist.
@@ -45,7 +54,9 @@ def create_search_agent(client: AzureAIAgentClient):
 - total_documents_found: Integer count of documents returned
 
 These documents will be used to build a risk assessment decision tree. Be strict - only return highly relevant documents.
-        """,
+        """ + (SEARCH_TOOL_INSTRUCTIONS if tools else ""),
         name="SearchAgent",
-        output_schema=RetrievedDocuments
+        output_schema=RetrievedDocuments,
+        middleware=middleware,
+        tools=tools,
     )
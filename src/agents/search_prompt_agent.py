@@ -1,9 +1,13 @@
 """Search Prompt Agent - Step 1: Generate optimized search queries"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
+
 from models.workflow_schemas import SearchQueries
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
 
-def create_search_prompt_agent(client: AzureAIAgentClient):
+def create_search_prompt_agent(client: "AzureAIAgentClient", middleware: list | None = None):
     """Create the Search Prompt Agent"""
     return client.create_agent(
         instructions="""
@@ -22,4 +26,5 @@ Focus on medical terminology, reliable sources, and actionable information for b
         """,
         name="SearchPromptAgent",
         output_schema=SearchQueries,
+        middleware=middleware,
     )
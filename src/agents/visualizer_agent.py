@@ -1,9 +1,13 @@
 """Visualizer Agent - Step 5: Create HTML visualization"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
+
 from models.workflow_schemas import HTMLVisualization
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
 
-def create_visualizer_agent(client: AzureAIAgentClient):
+def create_visualizer_agent(client: "AzureAIAgentClient", middleware: list | None = None):
     """Create the Visualizer Agent"""
     return client.create_agent(
         instructions="""
@@ -80,4 +84,5 @@ Return the complete HTML as a single string in html_content field.
         """,
         name="VisualizerAgent",
         output_schema=HTMLVisualization,
+        middleware=middleware,
     )
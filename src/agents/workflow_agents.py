@@ -1,5 +1,6 @@
 """Agent creation functions for the impairment risk assessment workflow"""
-from agent_framework.azure import AzureAIAgentClient
+from typing import TYPE_CHECKING
+
 from models.workflow_schemas import (
     SearchQueries,
     RetrievedDocuments,
@@ -8,8 +9,11 @@ from models.workflow_schemas import (
     HTMLVisualization,
 )
 
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
 
-def create_search_prompt_agent(client: AzureAIAgentClient):
+def create_search_prompt_agent(client: "AzureAIAgentClient"):
     """Create the Search Prompt Agent"""
     return client.create_agent(
         instructions="""
@@ -31,7 +35,7 @@ Focus on medical terminology, reliable sources, and actionable information for b
     )
 
 
-def create_search_agent(client: AzureAIAgentClient):
+def create_search_agent(client: "AzureAIAgentClient"):
     """Create the Search Agent"""
     return client.create_agent(
         instructions="""
@@ -56,7 +60,7 @@ Keep only documents directly relevant to the impairment's risk assessment.
     )
 
 
-def create_risk_analyzer_agent(client: AzureAIAgentClient):
+def create_risk_analyzer_agent(client: "AzureAIAgentClient"):
     """Create the Risk Analyzer Agent"""
     return client.create_agent(
         instructions="""
@@ -80,7 +84,7 @@ Focus on measurable, actionable attributes that can inform a decision tree.
     )
 
 
-def create_decision_tree_agent(client: AzureAIAgentClient):
+def create_decision_tree_agent(client: "AzureAIAgentClient"):
     """Create the Decision Tree Agent"""
     return client.create_agent(
         instructions="""
@@ -103,7 +107,7 @@ User will provide format example.
     )
 
 
-def create_visualizer_agent(client: AzureAIAgentClient):
+def create_visualizer_agent(client: "AzureAIAgentClient"):
     """Create the Visualizer Agent"""
     return client.create_agent(
         instructions="""
@@ -0,0 +1,213 @@
+"""Headless batch mode: run the impairment workflow for many impairments concurrently
+
+Usage (from src/):
+    uv run python batch.py impairments.txt --output results.jsonl --concurrency 8
+
+The input file contains one impairment name per line; blank lines and lines
+starting with "#" are ignored. Every finished result is appended to the JSONL
+output as soon as it is ready, and a throughput/latency summary is printed at the end.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+
+from agent_framework import ChatClientProtocol
+from azure.identity.aio import AzureCliCredential
+from dotenv import load_dotenv
+
+from pipeline import build_stage_setup, build_workflow, get_settings
+from utils.client_factory import AgentClientFactory
+from utils.impairment_names import DEFAULT_SYNONYMS_FILE
+from utils.conversation import parse_stage_output
+from utils.metrics import MetricsCollector
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def read_impairments(path: str) -> list[str]:
+    """Read impairment names from a text file, one per line."""
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+
+async def run_impairment(
+    client: ChatClientProtocol,
+    impairment_name: str,
+    middleware: list | None = None,
+    search_tools: list | None = None,
+) -> dict:
+    """
+    Run the workflow for a single impairment.
+
+    Args:
+        client: The chat client shared by all agents
+        impairment_name: The impairment to assess
+        middleware: Agent middleware passed on to build_workflow
+        search_tools: SearchAgent retrieval tools passed on to build_workflow
+
+    Returns:
+        Dict with the DecisionTree and the rendered HTML
+    """
+    workflow = build_workflow(client, open_browser=False, middleware=middleware, search_tools=search_tools)
+    result = await workflow.run(impairment_name)
+    outputs = result.get_outputs()
+    if not outputs:
+        raise RuntimeError(f"Workflow finished in state {result.get_final_state()} without output")
+
+    conversation = outputs[-1]
+    visualization = parse_stage_output(conversation, "VisualizerAgent") or {}
+    return {
+        "decision_tree": parse_stage_output(conversation, "DecisionTreeAgent"),
+        "html_content": visualization.get("html_content"),
+    }
+
+
+async def run_batch(
+    client: ChatClientProtocol,
+    impairment_names: list[str],
+    output_path: str,
+    concurrency: int = 4,
+    middleware: list | None = None,
+    search_tools: list | None = None,
+    metrics: MetricsCollector | None = None,
+) -> dict:
+    """
+    Run the workflow for every impairment with bounded concurrency.
+
+    Each result is written to the JSONL output as soon as it finishes, so a
+    crash halfway through a large batch keeps everything completed so far.
+
+    Args:
+        client: The chat client shared by all agents
+        impairment_names: The impairments to assess
+        output_path: Path of the JSONL file to append results to
+        concurrency: Maximum number of workflows running at the same time
+        middleware: Agent middleware passed on to build_workflow
+        search_tools: SearchAgent retrieval tools passed on to build_workflow
+        metrics: Collector fed by a MetricsMiddleware in ``middleware``; each
+            record gets the per-stage metrics of its run
+
+    Returns:
+        Summary with counts, throughput and per-impairment latency percentiles
+    """
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for name in impairment_names:
+        queue.put_nowait(name)
+
+    latencies: list[float] = []
+    costs: list[float] = []
+    failures = 0
+    write_lock = asyncio.Lock()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        async def write_record(record: dict) -> None:
+            async with write_lock:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+        async def worker() -> None:
+            nonlocal failures
+            while True:
+                try:
+                    name = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                start = time.perf_counter()
+                try:
+                    result = await run_impairment(client, name, middleware, search_tools)
+                except Exception as e:
+                    failures += 1
+                    logger.warning("Impairment %r failed: %s", name, e)
+                    record = {"impairment_name": name, "status": "error", "error": str(e)}
+                    if metrics:
+                        record["metrics"] = metrics.pop_run(name)
+                    await write_record(record)
+                    continue
+                if metrics:
+                    result["metrics"] = await metrics.finish_run(name)
+                    costs.append(result["metrics"]["totals"]["cost_usd"])
+
+                latency = time.perf_counter() - start
+                latencies.append(latency)
+                logger.info("Impairment %r finished in %.1fs", name, latency)
+                await write_record({
+                    "impairment_name": name,
+                    "status": "ok",
+                    "latency_seconds": round(latency, 3),
+                    **result,
+                })
+
+        batch_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(impairment_names))))))
+        elapsed = time.perf_counter() - batch_start
+
+    latency = summarize_latencies(latencies)
+    return {
+        "impairments": len(impairment_names),
+        "succeeded": len(latencies),
+        "failed": failures,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_minute": round(len(latencies) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "latency_p50_seconds": round(latency["p50"], 3),
+        "latency_p95_seconds": round(latency["p95"], 3),
+        "estimated_cost_usd": round(sum(costs), 4),
+    }
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = argparse.ArgumentParser(description="Run the impairment workflow headless for a file of impairments")
+    parser.add_argument("input", help="Text file with one impairment name per line")
+    parser.add_argument("--output", default="output/batch_results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of concurrent workflows")
+    parser.add_argument("--cache-dir", default="cache/stages", help="Directory of the stage output cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the stage output cache")
+    parser.add_argument("--search-index", help="Directory of a local BM25 index for the SearchAgent")
+    parser.add_argument("--context-policy", help="JSON file with per-stage context policies")
+    parser.add_argument("--no-context-pruning", action="store_true", help="Give every stage the full conversation")
+    parser.add_argument("--synonyms", default=DEFAULT_SYNONYMS_FILE, help="Impairment synonym table (JSON)")
+    parser.add_argument("--no-canonicalization", action="store_true", help="Pass impairment names on as typed")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+
+    impairment_names = read_impairments(args.input)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    metrics = MetricsCollector()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    setup = build_stage_setup(
+        metrics,
+        canonicalization=not args.no_canonicalization,
+        synonyms_file=args.synonyms,
+        context_pruning=not args.no_context_pruning,
+        context_policy_file=args.context_policy,
+        stage_cache_dir=None if args.no_cache else args.cache_dir,
+        search_index_dir=args.search_index,
+    )
+
+    async with (
+        AzureCliCredential() as credential,
+        AgentClientFactory(**get_settings(credential), trace_configs=[metrics.trace_config()]) as client_factory,
+    ):
+        client = client_factory.create_client()
+        summary = await run_batch(
+            client, impairment_names, args.output, args.concurrency, setup.middleware, setup.search_tools, metrics
+        )
+    summary.update(setup.summary())
+
+    metrics.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,214 @@
+"""Benchmark: first-request vs. steady-state latency after a restart, with and without the agent registry
+
+Usage (from src/):
+    uv run python -m benchmarks.agent_registry_benchmark [--latency 0.08] [--requests 5] [--warm-threads 2]
+
+Runs an agent through AgentClientFactory against LocalAgentsClient, an
+in-memory stand-in for the agent, thread, message and run operations of
+``AgentsClient``. Every service call takes --latency seconds. The agent is
+run by two factories in a row, standing in for the process before and after a
+deploy, and the latency and service calls of every request of the second one
+are reported. Three setups are compared:
+- plain: no registry and no warm threads
+- registry: the agent is reused by its definition
+- registry_warm_threads: the registry plus pre-created threads
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+from agent_framework import ChatMessage, Role
+from azure.ai.agents.models import (
+    Agent,
+    AgentStreamEvent,
+    MessageDelta,
+    MessageDeltaChunk,
+    MessageDeltaTextContent,
+    MessageDeltaTextContentObject,
+    MessageRole,
+    ThreadRun,
+)
+from azure.identity.aio import AzureCliCredential
+
+from benchmarks.sample_outputs import SAMPLE_RETRIEVED_DOCUMENTS, SAMPLE_RISK_ATTRIBUTES
+from models.workflow_schemas import RiskAttributes
+from utils.client_factory import AgentClientFactory
+from utils.stats import summarize_latencies
+
+ENDPOINT = "https://example.services.ai.azure.com/api/projects/registry-benchmark"
+INSTRUCTIONS = "You are a clinical risk assessment specialist. Extract risk-relevant attributes."
+
+
+class _Operations:
+    def __init__(self, client: "LocalAgentsClient", prefix: str):
+        self._client = client
+        self._prefix = prefix
+
+    async def _call(self, name: str) -> None:
+        self._client.calls[f"{self._prefix}.{name}"] += 1
+        await asyncio.sleep(self._client.latency)
+
+
+class _LocalThreads(_Operations):
+    async def create(self, **kwargs):
+        await self._call("create")
+        thread_id = f"thread_{next(self._client.ids)}"
+        self._client.thread_messages[thread_id] = []
+        return SimpleNamespace(id=thread_id)
+
+    async def delete(self, thread_id: str):
+        await self._call("delete")
+        self._client.thread_messages.pop(thread_id, None)
+
+
+class _LocalMessages(_Operations):
+    async def create(self, thread_id: str, role, content, metadata=None):
+        await self._call("create")
+        self._client.thread_messages[thread_id].append((role, content))
+
+
+class _LocalRuns(_Operations):
+    def list(self, thread_id: str, **kwargs):
+        async def runs():
+            await self._call("list")
+            return
+            yield
+
+        return runs()
+
+    async def cancel(self, thread_id: str, run_id: str):
+        await self._call("cancel")
+
+    async def stream(self, thread_id: str, agent_id: str, **run_options):
+        await self._call("stream")
+        if agent_id not in self._client.agents:
+            raise ValueError(f"No agent {agent_id}")
+        self._client.thread_messages[thread_id].extend(run_options.get("additional_messages") or [])
+        text = json.dumps(SAMPLE_RISK_ATTRIBUTES)
+
+        async def events():
+            # Generation time of the model, the same with and without the registry
+            await asyncio.sleep(self._client.latency)
+            delta = MessageDelta(
+                role=MessageRole.AGENT,
+                content=[MessageDeltaTextContent(index=0, text=MessageDeltaTextContentObject(value=text))],
+            )
+            yield AgentStreamEvent.THREAD_MESSAGE_DELTA, MessageDeltaChunk(id="msg", delta=delta), None
+            run = ThreadRun(id="run", thread_id=thread_id, agent_id=agent_id, status="completed", model="gpt-4o")
+            yield AgentStreamEvent.THREAD_RUN_COMPLETED, run, None
+
+        return events()
+
+
+class LocalAgentsClient:
+    """In-memory stand-in for the agent, thread, message and run operations of ``AgentsClient``"""
+
+    def __init__(self, latency: float = 0.08):
+        self.latency = latency
+        self.ids = itertools.count(1)
+        self.agents: dict[str, Agent] = {}
+        self.thread_messages: dict[str, list] = {}
+        self.calls: Counter = Counter()
+        self.threads = _LocalThreads(self, "threads")
+        self.messages = _LocalMessages(self, "messages")
+        self.runs = _LocalRuns(self, "runs")
+
+    async def _call(self, name: str) -> None:
+        self.calls[name] += 1
+        await asyncio.sleep(self.latency)
+
+    async def create_agent(self, model: str, name: str, **kwargs) -> Agent:
+        await self._call("create_agent")
+        agent = Agent(
+            id=f"asst_{next(self.ids)}", name=name, model=model, instructions=kwargs.get("instructions"),
+            tools=kwargs.get("tools") or [], response_format=kwargs.get("response_format"),
+        )
+        self.agents[agent.id] = agent
+        return agent
+
+    async def get_agent(self, agent_id: str) -> Agent:
+        await self._call("get_agent")
+        return self.agents[agent_id]
+
+    async def delete_agent(self, agent_id: str) -> None:
+        await self._call("delete_agent")
+        self.agents.pop(agent_id, None)
+
+    async def close(self) -> None:
+        pass
+
+
+def conversation() -> list[ChatMessage]:
+    return [
+        ChatMessage(role=Role.USER, text=SAMPLE_RETRIEVED_DOCUMENTS["impairment_name"]),
+        ChatMessage(role=Role.ASSISTANT, text=json.dumps(SAMPLE_RETRIEVED_DOCUMENTS), author_name="SearchAgent"),
+    ]
+
+
+async def run_process(service: LocalAgentsClient, credential, requests: int, **factory_kwargs) -> list[dict]:
+    """Run the agent ``requests`` times in one factory, as one process would, and close it."""
+    results = []
+    async with AgentClientFactory(ENDPOINT, "gpt-4o", credential, **factory_kwargs) as factory:
+        factory._agents_clients[ENDPOINT] = service
+        agent = factory.create_agent(
+            name="RiskAnalyzerAgent", instructions=INSTRUCTIONS, output_schema=RiskAttributes
+        )
+        for _ in range(requests):
+            before = Counter(service.calls)
+            start = time.perf_counter()
+            async for _ in agent.run_stream(conversation()):
+                pass
+            latency = time.perf_counter() - start
+            results.append({"latency": latency, "calls": dict(service.calls - before)})
+            # Leave the warm thread pool time to refill between requests, like idle time between users
+            await asyncio.sleep(service.latency * 2)
+    return results
+
+
+async def benchmark(setup: str, latency: float, requests: int, warm_threads: int, registry_dir: Path, credential):
+    service = LocalAgentsClient(latency)
+    kwargs = {"registry": None, "warm_threads": 0}
+    if setup != "plain":
+        kwargs["registry"] = str(registry_dir / f"{setup}.json")
+    if setup == "registry_warm_threads":
+        kwargs["warm_threads"] = warm_threads
+    await run_process(service, credential, requests, **kwargs)  # the process before the deploy
+    after = await run_process(service, credential, requests, **kwargs)
+    steady = [request["latency"] for request in after[1:]]
+    return {
+        "first_request_seconds": round(after[0]["latency"], 4),
+        "first_request_calls": after[0]["calls"],
+        "steady_state": summarize_latencies(steady),
+        "steady_state_calls": after[-1]["calls"],
+        "first_over_steady_p50": round(after[0]["latency"] / max(summarize_latencies(steady)["p50"], 1e-9), 2),
+        "agents_on_service": len(service.agents),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.08, help="Simulated seconds per service call")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per process")
+    parser.add_argument("--warm-threads", type=int, default=2, help="Threads kept ready")
+    args = parser.parse_args()
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    results = {}
+    async with AzureCliCredential() as credential:
+        with tempfile.TemporaryDirectory() as registry_dir:
+            for setup in ("plain", "registry", "registry_warm_threads"):
+                results[setup] = await benchmark(
+                    setup, args.latency, args.requests, args.warm_threads, Path(registry_dir), credential
+                )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+"""Benchmark: query latency of the memory-mapped BM25 index at 10K and 1M documents
+
+Usage (from src/):
+    uv run python -m benchmarks.bm25_benchmark [--sizes 10000 1000000] [--queries 200]
+
+Builds a synthetic corpus per size directly as index segments (Zipf-distributed
+terms, so common terms have long posting lists like real text), then reports
+the build time, the index size on disk, open time, query latency percentiles
+for 2-4 term queries and the latency of incremental adds and deletes.
+Indexes are written to a temporary directory unless --directory is given.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from utils.bm25_index import BM25Index, write_segment
+from utils.stats import summarize_latencies
+
+VOCABULARY_SIZE = 50_000
+TERMS_PER_DOCUMENT = 120
+
+
+def term_name(term_id: int) -> str:
+    # Zero padded, so the sorted vocabulary keeps the id order
+    return f"t{term_id:06d}"
+
+
+def build_synthetic_index(directory: Path, num_docs: int, seed: int = 0, chunk: int = 100_000) -> None:
+    """Write a one-segment index of ``num_docs`` synthetic documents."""
+    rng = np.random.default_rng(seed)
+    term_ids, doc_ids, frequencies = [], [], []
+    for first in range(0, num_docs, chunk):
+        count = min(chunk, num_docs - first)
+        tokens = (rng.zipf(1.2, size=(count, TERMS_PER_DOCUMENT)) - 1) % VOCABULARY_SIZE
+        docs = np.repeat(np.arange(first, first + count, dtype=np.int64), TERMS_PER_DOCUMENT)
+        pairs, tfs = np.unique(docs * VOCABULARY_SIZE + tokens.ravel(), return_counts=True)
+        term_ids.append(pairs % VOCABULARY_SIZE)
+        doc_ids.append(pairs // VOCABULARY_SIZE)
+        frequencies.append(tfs)
+
+    term_ids = np.concatenate(term_ids)
+    # Only keep terms that occur, as add_documents would
+    used, term_ids = np.unique(term_ids, return_inverse=True)
+    urls = [f"https://example.org/doc/{i}" for i in range(num_docs)]
+    records = [
+        json.dumps({"url": url, "title": f"Document {i}", "summary": ""}).encode() for i, url in enumerate(urls)
+    ]
+    write_segment(
+        directory / "segment_000001",
+        [term_name(int(term_id)) for term_id in used],
+        term_ids,
+        np.concatenate(doc_ids).astype(np.int32),
+        np.concatenate(frequencies).astype(np.float32),
+        np.full(num_docs, TERMS_PER_DOCUMENT, dtype=np.float32),
+        records,
+        urls,
+    )
+    manifest = {"version": 1, "next_segment": 1, "segments": ["segment_000001"]}
+    (directory / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+
+
+def directory_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.rglob("*") if path.is_file())
+
+
+def benchmark_size(directory: Path, num_docs: int, num_queries: int, updates: int) -> dict:
+    start = time.perf_counter()
+    build_synthetic_index(directory, num_docs)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = BM25Index(directory)
+    open_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    queries = [
+        " ".join(term_name(int(t)) for t in (rng.zipf(1.2, size=rng.integers(2, 5)) - 1) % VOCABULARY_SIZE)
+        for _ in range(num_queries)
+    ]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=10)
+        latencies.append(time.perf_counter() - start)
+
+    add_latencies, delete_latencies = [], []
+    for i in range(updates):
+        document = {
+            "url": f"https://example.org/new/{i}",
+            "title": f"New document {i}",
+            "summary": " ".join(queries[i % len(queries)].split()[:2]),
+        }
+        start = time.perf_counter()
+        index.add_documents([document])
+        add_latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        index.delete_documents([f"https://example.org/doc/{i}"])
+        delete_latencies.append(time.perf_counter() - start)
+
+    updated_latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=10)
+        updated_latencies.append(time.perf_counter() - start)
+    index.close()
+
+    return {
+        "documents": num_docs,
+        "build_seconds": round(build_seconds, 3),
+        "index_bytes": directory_size(directory),
+        "open_seconds": round(open_seconds, 4),
+        "query_latency": summarize_latencies(latencies),
+        "add_latency": summarize_latencies(add_latencies),
+        "delete_latency": summarize_latencies(delete_latencies),
+        "query_latency_after_updates": summarize_latencies(updated_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000], help="Corpus sizes")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per corpus size")
+    parser.add_argument("--updates", type=int, default=20, help="Incremental adds/deletes per corpus size")
+    parser.add_argument("--directory", help="Keep the indexes in this directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.directory or tmp)
+        results = [
+            benchmark_size(root / f"bm25_{size}", size, args.queries, args.updates)
+            for size in args.sizes
+        ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark: BrowserAgent model call vs. native BrowserExecutor for saving the visualization
+
+Usage (from src/):
+    uv run python -m benchmarks.browser_benchmark [--tree tree.json] [--iterations 50] [--agent-runs 3]
+
+Runs the BrowserExecutor headless in a one-step workflow on the rendered
+sample tree and reports its per-run latency when the file is written and
+when identical content is already on disk (write skipped), plus the tokens
+the BrowserAgent would have spent. The BrowserAgent is only called when --agent-runs > 0, which
+requires AZURE_AI_PROJECT_ENDPOINT and an Azure CLI login; its measured token
+usage is reported next to the estimate. Files go to a temporary directory.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from agent_framework import ChatMessage, Role, SequentialBuilder
+from dotenv import load_dotenv
+
+from benchmarks.sample_outputs import SAMPLE_DECISION_TREE
+from executors.browser_executor import BrowserExecutor
+from executors.streaming_agent_executor import StageTimingEvent
+from models.workflow_schemas import HTMLVisualization
+from utils.diagram_renderer import render_decision_tree_html
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+
+def visualization_message(tree: dict) -> ChatMessage:
+    visualization = HTMLVisualization(
+        impairment_name=tree["impairment_name"], html_content=render_decision_tree_html(tree)
+    )
+    return ChatMessage(role=Role.ASSISTANT, text=visualization.model_dump_json(), author_name="VisualizerAgent")
+
+
+async def run_executor(executor: BrowserExecutor, message: ChatMessage) -> dict:
+    """Run the executor in a one-step workflow and return its timing event data."""
+    result = await SequentialBuilder().participants([executor]).build().run([message])
+    return next(event.data for event in result if isinstance(event, StageTimingEvent))
+
+
+async def benchmark_native(message: ChatMessage, iterations: int, output_dir: str) -> dict:
+    """Run the BrowserExecutor headless: into empty directories, then repeatedly into the same one."""
+    written, skipped = [], []
+    for i in range(iterations):
+        executor = BrowserExecutor(output_dir=os.path.join(output_dir, str(i)), headless=True)
+        timing = await run_executor(executor, message)
+        written.append(timing["time_to_output_seconds"])
+    for _ in range(iterations):
+        timing = await run_executor(BrowserExecutor(output_dir=output_dir, headless=True), message)
+        skipped.append(timing["time_to_output_seconds"])
+    return {
+        "write": summarize_latencies(written),
+        "unchanged_skipped": summarize_latencies(skipped),
+        "estimated_input_tokens_saved": timing["estimated_input_tokens_saved"],
+        "estimated_output_tokens_saved": timing["estimated_output_tokens_saved"],
+    }
+
+
+async def benchmark_agent(message: ChatMessage, runs: int) -> dict:
+    """Time the BrowserAgent model round trip on the same visualization."""
+    from agent_framework.azure import AzureAIAgentClient
+    from azure.identity.aio import AzureCliCredential
+
+    from agents.browser_agent import create_browser_agent
+
+    latencies = []
+    input_tokens = []
+    output_tokens = []
+    async with (
+        AzureCliCredential() as credential,
+        AzureAIAgentClient(
+            project_endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+            model_deployment_name=os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
+            credential=credential,
+        ) as client,
+    ):
+        agent = create_browser_agent(client)
+        for _ in range(runs):
+            start = time.perf_counter()
+            response = await agent.run([message])
+            latencies.append(time.perf_counter() - start)
+            if response.usage_details:
+                input_tokens.append(response.usage_details.input_token_count or 0)
+                output_tokens.append(response.usage_details.output_token_count or 0)
+    return {
+        "latency": summarize_latencies(latencies),
+        "mean_input_tokens": sum(input_tokens) / len(input_tokens) if input_tokens else None,
+        "mean_output_tokens": sum(output_tokens) / len(output_tokens) if output_tokens else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tree", help="Path to a DecisionTree JSON file (defaults to a built-in sample)")
+    parser.add_argument("--iterations", type=int, default=50, help="BrowserExecutor runs")
+    parser.add_argument("--agent-runs", type=int, default=0, help="BrowserAgent runs (needs Azure)")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    tree = SAMPLE_DECISION_TREE
+    if args.tree:
+        with open(args.tree, encoding="utf-8") as f:
+            tree = json.load(f)
+    message = visualization_message(tree)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = {"native": await benchmark_native(message, args.iterations, output_dir)}
+    if args.agent_runs > 0:
+        results["agent"] = await benchmark_agent(message, args.agent_runs)
+        results["speedup_p50"] = results["agent"]["latency"]["p50"] / max(
+            results["native"]["write"]["p50"], 1e-9
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""Benchmark: hit rate, accuracy and lookup latency of impairment name canonicalization
+
+Usage (from src/):
+    uv run python -m benchmarks.canonicalization_benchmark [--typos 2] [--seed 7]
+
+Generates the spellings users type from the synonym table: every name and
+synonym in several casings and punctuations, with reordered words and with
+--typos random one-letter typos each, plus impairments that are not in the
+table. Every input is canonicalized with the trigram index and, for
+comparison, with a difflib scan over all aliases. Reported per method:
+- hit rate and accuracy (the right canonical name) on the known spellings
+- false matches on the unknown impairments
+- lookup latency without the memo of recent lookups
+- the stage cache hit rate of one workflow run per input, as typed and canonicalized
+"""
+import argparse
+import difflib
+import json
+import random
+import time
+
+from utils.impairment_names import DEFAULT_SYNONYMS_FILE, ImpairmentCanonicalizer, normalize
+from utils.stats import summarize_latencies
+
+UNKNOWN_IMPAIRMENTS = [
+    "Gilbert syndrome",
+    "Marfan syndrome",
+    "Sarcoidosis",
+    "Celiac disease",
+    "Hemochromatosis",
+    "Ehlers-Danlos syndrome",
+    "Myasthenia gravis",
+    "Polycystic kidney disease",
+    "Sickle cell anemia",
+    "Type 3 diabetes",
+]
+
+
+def typo(text: str, rng: random.Random) -> str:
+    """Delete, duplicate or swap one letter."""
+    positions = [i for i, char in enumerate(text[:-1]) if char.isalpha() and text[i + 1].isalpha()]
+    i = rng.choice(positions)
+    kind = rng.choice(("delete", "duplicate", "swap"))
+    if kind == "delete":
+        return text[:i] + text[i + 1:]
+    if kind == "duplicate":
+        return text[:i] + text[i] + text[i:]
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def variants(table: list[dict], typos: int, rng: random.Random) -> list[tuple[str, str | None]]:
+    """(input, expected canonical name) pairs; unknown impairments expect None."""
+    cases = []
+    for entry in table:
+        for alias in [entry["name"], *entry["synonyms"]]:
+            spellings = {alias, alias.lower(), alias.upper(), alias.replace(" ", "-"), f" {alias}. "}
+            words = alias.split()
+            if len(words) > 1:
+                spellings.add(" ".join([*words[1:], words[0]]))
+            if len(alias) >= 8:
+                spellings.update(typo(alias, rng) for _ in range(typos))
+            cases.extend((spelling, entry["name"]) for spelling in sorted(spellings))
+    cases.extend((name, None) for name in UNKNOWN_IMPAIRMENTS)
+    return cases
+
+
+class DifflibCanonicalizer:
+    """Baseline: the closest alias of a linear difflib scan"""
+
+    def __init__(self, table: list[dict], cutoff: float = 0.8):
+        self.cutoff = cutoff
+        self.aliases = {normalize(alias): entry["name"] for entry in table for alias in [entry["name"], *entry["synonyms"]]}
+
+    def canonicalize(self, name: str) -> str | None:
+        matches = difflib.get_close_matches(normalize(name), self.aliases, n=1, cutoff=self.cutoff)
+        return self.aliases[matches[0]] if matches else None
+
+
+def evaluate(canonicalize, cases: list[tuple[str, str | None]]) -> dict:
+    """Run every case through ``canonicalize`` (input -> canonical name or None) and score it."""
+    latencies = []
+    hits = correct = false_matches = 0
+    known = sum(expected is not None for _, expected in cases)
+    for text, expected in cases:
+        start = time.perf_counter()
+        result = canonicalize(text)
+        latencies.append(time.perf_counter() - start)
+        if expected is None:
+            false_matches += result is not None
+        elif result is not None:
+            hits += 1
+            correct += result == expected
+    return {
+        "known_inputs": known,
+        "hit_rate": round(hits / known, 4),
+        "accuracy": round(correct / known, 4),
+        "false_matches": false_matches,
+        "lookup": summarize_latencies(latencies),
+    }
+
+
+def stage_cache_hit_rate(names: list[str]) -> float:
+    """Share of workflow runs whose stage inputs were already cached by an earlier run with the same name."""
+    return round(1 - len(set(names)) / len(names), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--typos", type=int, default=2, help="Random typos per alias of 8+ characters")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the typo generator")
+    args = parser.parse_args()
+
+    table = json.loads(DEFAULT_SYNONYMS_FILE.read_text(encoding="utf-8"))["impairments"]
+    cases = variants(table, args.typos, random.Random(args.seed))
+
+    start = time.perf_counter()
+    canonicalizer = ImpairmentCanonicalizer(memo_size=0)
+    build = time.perf_counter() - start
+
+    def trigram_lookup(text: str) -> str | None:
+        match = canonicalizer.canonicalize(text)
+        return match.name if match.matched else None
+
+    difflib_canonicalizer = DifflibCanonicalizer(table)
+    results = {
+        "inputs": len(cases),
+        "aliases": sum(1 + len(entry["synonyms"]) for entry in table),
+        "build_seconds": round(build, 4),
+        "trigram_index": {**evaluate(trigram_lookup, cases), "methods": canonicalizer.stats},
+        "difflib_scan": evaluate(difflib_canonicalizer.canonicalize, cases),
+        "stage_cache_hit_rate": {
+            "as_typed": stage_cache_hit_rate([text for text, _ in cases]),
+            "canonicalized": stage_cache_hit_rate([canonicalizer.canonicalize(text).name for text, _ in cases]),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: connection setup cost of per-agent clients vs. the shared ConnectionPool
+
+Usage (from src/):
+    uv run python -m benchmarks.connection_pool_benchmark [--url URL] [--requests 20]
+
+Sends the same GET request repeatedly, once with a fresh HTTP session per request
+(what a separate client per agent pays on a cold start) and once through the
+shared ConnectionPool. The request does not need to succeed: an unauthenticated
+call to the project endpoint still pays the full DNS + TCP + TLS setup.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+from utils.client_factory import ConnectionPool
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+
+class ConnectionTimer:
+    """Collects connection setup durations through aiohttp tracing"""
+
+    def __init__(self):
+        self.setup_seconds: list[float] = []
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_connection_create_start.append(self._on_start)
+        self.trace_config.on_connection_create_end.append(self._on_end)
+
+    async def _on_start(self, session, context, params):
+        context.connection_start = time.perf_counter()
+
+    async def _on_end(self, session, context, params):
+        self.setup_seconds.append(time.perf_counter() - context.connection_start)
+
+
+async def _timed_get(session: aiohttp.ClientSession, url: str) -> float:
+    start = time.perf_counter()
+    async with session.get(url) as response:
+        await response.read()
+    return time.perf_counter() - start
+
+
+def _report(latencies: list[float], timer: ConnectionTimer) -> dict:
+    return {
+        "cold_request_seconds": latencies[0],
+        "warm_requests": summarize_latencies(latencies[1:]),
+        "connections_created": len(timer.setup_seconds),
+        "connection_setup_seconds_total": sum(timer.setup_seconds),
+    }
+
+
+async def benchmark_fresh_sessions(url: str, requests: int) -> dict:
+    """One new session (and therefore one new connection) per request."""
+    timer = ConnectionTimer()
+    latencies = []
+    for _ in range(requests):
+        async with aiohttp.ClientSession(trace_configs=[timer.trace_config]) as session:
+            latencies.append(await _timed_get(session, url))
+    return _report(latencies, timer)
+
+
+async def benchmark_pooled(url: str, requests: int, pool_size: int) -> dict:
+    """All requests share the keep-alive pool used by AgentClientFactory."""
+    timer = ConnectionTimer()
+    pool = ConnectionPool(size=pool_size, trace_configs=[timer.trace_config])
+    latencies = []
+    try:
+        for _ in range(requests):
+            latencies.append(await _timed_get(pool.get_session(), url))
+    finally:
+        await pool.close()
+    return _report(latencies, timer)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.environ.get("AZURE_AI_PROJECT_ENDPOINT"), help="URL to request")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per mode")
+    parser.add_argument("--pool-size", type=int, default=20, help="Size of the shared connection pool")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url is required when AZURE_AI_PROJECT_ENDPOINT is not set")
+
+    fresh = await benchmark_fresh_sessions(args.url, args.requests)
+    pooled = await benchmark_pooled(args.url, args.requests, args.pool_size)
+    results = {
+        "url": args.url,
+        "fresh_session_per_request": fresh,
+        "shared_pool": pooled,
+        "connection_setup_seconds_saved": fresh["connection_setup_seconds_total"]
+        - pooled["connection_setup_seconds_total"],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""Benchmark: input tokens and latency per stage with and without context pruning
+
+Usage (from src/):
+    uv run python -m benchmarks.context_pruning_benchmark [--live] [--impairments "Asthma" "Hypertension"]
+
+Without --live, the canned stage outputs of benchmarks.sample_outputs are
+assembled into the conversation every stage receives and the estimated
+input tokens of the four model stages are compared offline under the full
+conversation and under the default context policies (or --context-policy). With --live, the workflow runs
+headless for a fixed set of impairments, once with the full conversation and
+once pruned, and reports the input/output tokens and latency the model
+actually used per stage. This requires AZURE_AI_PROJECT_ENDPOINT and an
+Azure CLI login.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from agent_framework import AgentMiddleware, ChatMessage, Role
+from dotenv import load_dotenv
+
+from benchmarks.sample_outputs import (
+    SAMPLE_RETRIEVED_DOCUMENTS,
+    SAMPLE_RISK_ATTRIBUTES,
+    SAMPLE_SEARCH_QUERIES,
+)
+from utils.context_pruning import (
+    DEFAULT_CONTEXT_POLICIES,
+    ContextPruningMiddleware,
+    load_context_policies,
+    prune_conversation,
+)
+from utils.conversation import estimate_tokens
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+DEFAULT_IMPAIRMENTS = ["Type 2 Diabetes", "Hypertension", "Asthma", "Epilepsy", "Coronary Artery Disease"]
+
+# The stages that call a model; the visualizer and browser stages are native executors
+SAMPLE_STAGES = [
+    ("SearchPromptAgent", SAMPLE_SEARCH_QUERIES),
+    ("SearchAgent", SAMPLE_RETRIEVED_DOCUMENTS),
+    ("RiskAnalyzerAgent", SAMPLE_RISK_ATTRIBUTES),
+    ("DecisionTreeAgent", None),
+]
+
+
+def benchmark_offline(policies) -> dict:
+    """Estimate the input tokens of every model stage on the canned conversation, and their total."""
+    conversation = [ChatMessage(role=Role.USER, text=SAMPLE_SEARCH_QUERIES["impairment_name"])]
+    results = {}
+    for stage, output in SAMPLE_STAGES:
+        full = sum(estimate_tokens(m.text or "") for m in conversation)
+        policy = policies.get(stage)
+        pruned_messages = prune_conversation(conversation, policy) if policy else conversation
+        pruned = sum(estimate_tokens(m.text or "") for m in pruned_messages)
+        results[stage] = {"full": full, "pruned": pruned, "saved_ratio": round(1 - pruned / full, 3)}
+        if output is not None:
+            conversation.append(ChatMessage(role=Role.ASSISTANT, text=json.dumps(output), author_name=stage))
+    full = sum(stage["full"] for stage in results.values())
+    pruned = sum(stage["pruned"] for stage in results.values())
+    results["total"] = {"full": full, "pruned": pruned, "saved_ratio": round(1 - pruned / full, 3)}
+    return results
+
+
+class UsageRecorder(AgentMiddleware):
+    """Records the model usage and latency of every (non-streaming) agent run"""
+
+    def __init__(self):
+        self.runs: dict[str, list[dict]] = defaultdict(list)
+
+    async def process(self, context, next):
+        start = time.perf_counter()
+        await next(context)
+        usage = context.result.usage_details if context.result is not None else None
+        self.runs[context.agent.name].append({
+            "latency": time.perf_counter() - start,
+            "input_tokens": (usage.input_token_count or 0) if usage else 0,
+            "output_tokens": (usage.output_token_count or 0) if usage else 0,
+        })
+
+
+def summarize_runs(recorder: UsageRecorder) -> dict:
+    return {
+        stage: {
+            "runs": len(runs),
+            "mean_input_tokens": round(sum(r["input_tokens"] for r in runs) / len(runs)),
+            "mean_output_tokens": round(sum(r["output_tokens"] for r in runs) / len(runs)),
+            "latency": summarize_latencies([r["latency"] for r in runs]),
+        }
+        for stage, runs in recorder.runs.items()
+    }
+
+
+async def benchmark_live(impairments: list[str], policies) -> dict:
+    """Run the workflow for every impairment with the full and with the pruned conversation."""
+    from azure.identity.aio import AzureCliCredential
+
+    from pipeline import build_workflow, get_settings
+    from utils.client_factory import AgentClientFactory
+
+    results = {}
+    async with (
+        AzureCliCredential() as credential,
+        AgentClientFactory(**get_settings(credential)) as client_factory,
+    ):
+        client = client_factory.create_client()
+        for mode in ("full", "pruned"):
+            recorder = UsageRecorder()
+            middleware = [ContextPruningMiddleware(policies), recorder] if mode == "pruned" else [recorder]
+            for impairment in impairments:
+                workflow = build_workflow(client, open_browser=False, middleware=middleware)
+                await workflow.run(impairment)
+            results[mode] = summarize_runs(recorder)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="Run the workflow against Azure")
+    parser.add_argument("--impairments", nargs="+", default=DEFAULT_IMPAIRMENTS, help="Impairments for --live")
+    parser.add_argument("--context-policy", help="JSON file with per-stage context policies")
+    args = parser.parse_args()
+
+    policies = load_context_policies(args.context_policy) if args.context_policy else DEFAULT_CONTEXT_POLICIES
+
+    results = {"estimated_input_tokens": benchmark_offline(policies)}
+    if args.live:
+        results["live"] = await benchmark_live(args.impairments, policies)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""Benchmark: latency of sequential workflows against DagBuilder workflows of the same stages
+
+Usage (from src/):
+    uv run python -m benchmarks.dag_benchmark [--runs 5] [--latency 0.2]
+
+"pipeline" runs the impairment workflow of pipeline.build_workflow, whose
+stages form a chain, once as built (DagBuilder) and once with the same
+stages in a SequentialBuilder; the difference is the superstep overhead the
+DAG saves. "labs" runs the two participants of labs 6-8, a DocsAgent and an
+issue creation agent that both only read the request, on
+benchmarks.stub_client.StubChatClient with different latencies: the
+sequential workflow takes the sum of the two, the DAG the slower one. Every
+DAG round reports the critical path of its last run.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+from agent_framework import SequentialBuilder, WorkflowOutputEvent
+
+from benchmarks.stub_client import StubChatClient
+from executors.dag_executor import CriticalPathEvent, DagBuilder
+from models.workflow_schemas import RetrievedDocuments, RiskAttributes
+from pipeline import build_workflow
+from utils.stats import summarize_latencies
+
+
+async def timed_runs(build, runs: int) -> dict:
+    """Run a freshly built workflow ``runs`` times; latencies and the last critical path, if any."""
+    latencies, path = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        outputs = 0
+        async for event in build().run_stream("Type 2 Diabetes Mellitus"):
+            outputs += isinstance(event, WorkflowOutputEvent)
+            if isinstance(event, CriticalPathEvent):
+                path = event.data
+        if not outputs:
+            raise RuntimeError("Workflow finished without output")
+        latencies.append(time.perf_counter() - start)
+    result = {"latency": summarize_latencies(latencies)}
+    if path is not None:
+        result["critical_path"] = path
+    return result
+
+
+def sequential(dag_workflow):
+    """The stages of a DagBuilder workflow, in a SequentialBuilder workflow."""
+    return SequentialBuilder().participants([node.executor for node in dag_workflow.executors["dag"].nodes]).build()
+
+
+async def round_pipeline(runs: int, latency: float, output_dir: str) -> dict:
+    client = StubChatClient(latency=latency)
+
+    def build():
+        return build_workflow(client, open_browser=False, output_dir=output_dir)
+
+    return {
+        "sequential": await timed_runs(lambda: sequential(build()), runs),
+        "dag": await timed_runs(build, runs),
+    }
+
+
+async def round_labs(runs: int, latency: float) -> dict:
+    docs_client, issue_client = StubChatClient(latency=latency), StubChatClient(latency=latency * 2)
+
+    def build():
+        docs = docs_client.create_agent(name="DocsAgent", output_schema=RetrievedDocuments)
+        issue = issue_client.create_agent(name="IssueCreationAgentGroup", output_schema=RiskAttributes)
+        return DagBuilder().add(docs).add(issue).build()
+
+    return {
+        "stage_latencies": {"DocsAgent": latency, "IssueCreationAgentGroup": latency * 2},
+        "sequential": await timed_runs(lambda: sequential(build()), runs),
+        "dag": await timed_runs(build, runs),
+    }
+
+
+def speedup(result: dict) -> float:
+    return round(result["sequential"]["latency"]["mean"] / result["dag"]["latency"]["mean"], 2)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per workflow")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds every stub model call takes")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = {
+            "runs": args.runs,
+            "pipeline": await round_pipeline(args.runs, args.latency, output_dir),
+            "labs": await round_labs(args.runs, args.latency),
+        }
+    for name in ("pipeline", "labs"):
+        results[name]["speedup"] = speedup(results[name])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
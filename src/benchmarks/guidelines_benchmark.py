@@ -0,0 +1,135 @@
+"""Benchmark: local guidelines section index vs. hosted file search per issue
+
+Usage (from src/):
+    uv run python -m benchmarks.guidelines_benchmark [--iterations 10000] [--agent-runs 3]
+
+The local index always runs: the time to build it, a lookup (including the
+stat call that checks the file for changes) and a lookup right after the file
+changed. With --agent-runs > 0 the GitHubAgent lookup step of labs 7 and 8 is
+run as an agent turn, once with HostedFileSearchTool on VECTOR_STORE_ID and
+once with the local search_guidelines tool, which requires
+AZURE_AI_PROJECT_ENDPOINT, VECTOR_STORE_ID and an Azure CLI login.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from tools.guidelines_tools import GuidelinesTools
+from utils.guidelines_index import DEFAULT_GUIDELINES_FILE, GuidelinesIndex
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+QUERIES = [
+    "bug report template title format mandatory labels",
+    "feature request template",
+    "priority labels",
+    "issue title examples",
+    "example critical bug",
+    "assignment rules",
+]
+ISSUE = "Login fails with a 500 error for Azure AD users since the last deploy. Which template, title and labels apply?"
+
+
+def benchmark_local(iterations: int) -> dict:
+    """Time building, querying and re-indexing the local index on a copy of the guidelines."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / DEFAULT_GUIDELINES_FILE.name
+        shutil.copy(DEFAULT_GUIDELINES_FILE, path)
+        index = GuidelinesIndex(path)
+
+        start = time.perf_counter()
+        index.refresh()
+        build = time.perf_counter() - start
+
+        latencies = []
+        for i in range(iterations):
+            query = QUERIES[i % len(QUERIES)]
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append(time.perf_counter() - start)
+
+        # Touch the file: the next lookup re-indexes it
+        path.write_text(path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        start = time.perf_counter()
+        index.search(QUERIES[0])
+        changed = time.perf_counter() - start
+
+        return {
+            "sections": len(index.sections),
+            "build_seconds": build,
+            "lookup": summarize_latencies(latencies),
+            "lookup_after_change_seconds": changed,
+            "reloads": index.reloads,
+        }
+
+
+async def benchmark_agents(runs: int) -> dict:
+    """Time the guideline lookup turn of the GitHubAgent with the hosted and with the local tool."""
+    from agent_framework import HostedFileSearchTool, HostedVectorStoreContent, ToolMode
+    from agent_framework.azure import AzureAIAgentClient
+    from azure.identity.aio import AzureCliCredential
+
+    instructions = (
+        "Look up the Contoso GitHub issue guidelines with your search tool exactly once, then reply with "
+        "the template, title and labels for the issue."
+    )
+    tools = {
+        "hosted_file_search": HostedFileSearchTool(
+            description="Search for Contoso GitHub issues guidelines and templates in the vector store",
+            inputs=HostedVectorStoreContent(vector_store_id=os.environ["VECTOR_STORE_ID"]),
+        ),
+        "local_index": GuidelinesTools().search_guidelines,
+    }
+    results = {}
+    async with AzureCliCredential() as credential:
+        for name, tool in tools.items():
+            async with AzureAIAgentClient(
+                project_endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+                model_deployment_name=os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
+                credential=credential,
+            ) as client:
+                agent = client.create_agent(
+                    name="GitHubAgent", instructions=instructions, tools=[tool], tool_choice=ToolMode.AUTO
+                )
+                latencies = []
+                input_tokens = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    response = await agent.run(ISSUE)
+                    latencies.append(time.perf_counter() - start)
+                    if response.usage_details and response.usage_details.input_token_count:
+                        input_tokens.append(response.usage_details.input_token_count)
+                results[name] = {
+                    "latency": summarize_latencies(latencies),
+                    "mean_input_tokens": sum(input_tokens) / len(input_tokens) if input_tokens else None,
+                }
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=10_000, help="Local lookups")
+    parser.add_argument("--agent-runs", type=int, default=0, help="Agent turns per tool (needs Azure)")
+    args = parser.parse_args()
+
+    results = {"local": benchmark_local(args.iterations)}
+    if args.agent_runs > 0:
+        results["agent"] = await benchmark_agents(args.agent_runs)
+        agent = results["agent"]
+        results["agent_speedup_p50"] = agent["hosted_file_search"]["latency"]["p50"] / max(
+            agent["local_index"]["latency"]["p50"], 1e-9
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""Benchmark: tail latency of agent runs and workflows with and without hedged requests
+
+Usage (from src/):
+    uv run python -m benchmarks.hedging_benchmark [--calls 400] [--concurrency 8] [--tail-rate 0.03]
+
+The stub backend (benchmarks.stub_client.StubChatClient) answers in --latency
+seconds plus jitter, but --tail-rate of its calls hang for --tail-latency
+seconds or more (Pareto distributed), like the occasional model call that
+takes a minute. "agent" sends --calls runs of one agent, --concurrency at a
+time, both non-streaming and streaming; "workflow" runs the impairment
+workflow --runs times. Every round first sends --warmup calls so the
+HedgingPolicy can learn the latency percentiles, then compares the plain
+agents against HedgedAgents sharing one policy.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+from benchmarks.stub_client import StubChatClient
+from models.workflow_schemas import RiskAttributes
+from pipeline import build_workflow
+from utils.hedging import HedgedAgent, HedgingPolicy
+from utils.stats import summarize_latencies
+
+
+def new_client(args) -> StubChatClient:
+    return StubChatClient(
+        latency=args.latency, jitter=args.latency / 2, tail_rate=args.tail_rate, tail_latency=args.tail_latency,
+        seed=args.seed,
+    )
+
+
+def new_policy() -> HedgingPolicy:
+    return HedgingPolicy(backoff_base=0.1, seed=0)
+
+
+async def run_calls(agent, calls: int, concurrency: int, streaming: bool) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(i: int) -> float:
+        async with semaphore:
+            start = time.perf_counter()
+            if streaming:
+                async for _ in agent.run_stream(f"Impairment {i}"):
+                    pass
+            else:
+                await agent.run(f"Impairment {i}")
+            return time.perf_counter() - start
+
+    return await asyncio.gather(*(call(i) for i in range(calls)))
+
+
+async def round_agent(args, streaming: bool, hedged: bool) -> dict:
+    client = new_client(args)
+    agent = client.create_agent(name="RiskAnalyzerAgent", instructions="Analyze.", output_schema=RiskAttributes)
+    policy = new_policy()
+    if hedged:
+        agent = HedgedAgent(agent, policy)
+    await run_calls(agent, args.warmup, args.concurrency, streaming)
+    start = time.perf_counter()
+    latencies = await run_calls(agent, args.calls, args.concurrency, streaming)
+    result = {"wall_seconds": time.perf_counter() - start, "latency": summarize_latencies(latencies)}
+    if hedged:
+        result["hedging"] = policy.stats
+        result["learned"] = policy.latency_summary()
+    return result
+
+
+class HedgedClient:
+    """Creates the workflow agents on a stub client, hedged like AgentClientFactory with a HedgingPolicy"""
+
+    def __init__(self, client: StubChatClient, policy: HedgingPolicy | None):
+        self.client = client
+        self.policy = policy
+
+    def create_agent(self, **kwargs):
+        agent = self.client.create_agent(**kwargs)
+        return HedgedAgent(agent, self.policy) if self.policy is not None else agent
+
+
+async def round_workflow(args, hedged: bool, output_dir: str) -> dict:
+    policy = new_policy() if hedged else None
+    client = HedgedClient(new_client(args), policy)
+
+    async def one(i: int) -> float:
+        start = time.perf_counter()
+        async for _ in build_workflow(client, open_browser=False, output_dir=output_dir).run_stream(f"Impairment {i}"):
+            pass
+        return time.perf_counter() - start
+
+    async def runs(count: int) -> list[float]:
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited(i: int) -> float:
+            async with semaphore:
+                return await one(i)
+
+        return await asyncio.gather(*(limited(i) for i in range(count)))
+
+    # Every workflow run makes nine model calls, so a fraction of the calls is enough to learn
+    await runs(max(1, args.warmup // 4))
+    latencies = await runs(args.runs)
+    result = {"latency": summarize_latencies(latencies)}
+    if policy is not None:
+        result["hedging"] = policy.stats
+    return result
+
+
+def p99_reduction(results: dict) -> float:
+    return round(1 - results["hedged"]["latency"]["p99"] / results["plain"]["latency"]["p99"], 4)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=400, help="Measured agent runs per round")
+    parser.add_argument("--runs", type=int, default=60, help="Measured workflow runs")
+    parser.add_argument("--warmup", type=int, default=80, help="Agent runs before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="Runs at the same time")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds a normal stub call takes, plus up to half of it")
+    parser.add_argument("--tail-rate", type=float, default=0.03, help="Share of stub calls that hang")
+    parser.add_argument("--tail-latency", type=float, default=2.0, help="Minimum seconds a hanging call takes")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    results = {"agent": {}, "agent_streaming": {}, "workflow": {}}
+    for name, streaming in (("agent", False), ("agent_streaming", True)):
+        for hedged in (False, True):
+            results[name]["hedged" if hedged else "plain"] = await round_agent(args, streaming, hedged)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for hedged in (False, True):
+            results["workflow"]["hedged" if hedged else "plain"] = await round_workflow(args, hedged, output_dir)
+    for name in ("agent", "agent_streaming", "workflow"):
+        results[name]["p99_reduction"] = p99_reduction(results[name])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+"""Benchmark: submit latency, throughput, backpressure and restart recovery of the job API
+
+Usage (from src/):
+    uv run python -m benchmarks.job_service_benchmark [--jobs 40] [--workers 4] [--max-queue 16] [--latency 0.05]
+
+Serves job_server.create_app on a local port, with the workflow running
+against benchmarks.stub_client.StubChatClient, and drives it over HTTP like an
+intake system would. Reported:
+
+- throughput: --jobs submissions at once to a service with room for all of
+  them; how long a submission takes to be acknowledged, how long the jobs take
+  to finish and how many progress events a subscriber receives
+- backpressure: the same burst against a queue of --max-queue jobs; how many
+  are accepted and rejected with 429 and the Retry-After they are given
+- priority: queue wait of high priority jobs submitted behind a backlog
+- restart: the service is stopped while jobs run and started again on the
+  same database; every job must still finish exactly once
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from benchmarks.stub_client import StubChatClient
+from job_server import create_app, run_workflow_job
+from pipeline import build_workflow
+from utils.job_service import JobService
+from utils.job_store import FINISHED_STATUSES, SUCCEEDED, JobStore
+from utils.single_flight import CoalescingWorkflow
+from utils.stats import summarize_latencies
+
+
+def make_service(db: Path, latency: float, output_dir: str, workers: int, max_queue: int) -> tuple[JobService, StubChatClient]:
+    client = StubChatClient(latency=latency)
+    workflow = CoalescingWorkflow(lambda: build_workflow(client, open_browser=False, output_dir=output_dir), max_idle=workers)
+
+    async def run_job(impairment_name, report):
+        return await run_workflow_job(workflow, impairment_name, report)
+
+    return JobService(JobStore(db), run_job, workers=workers, max_queue=max_queue), client
+
+
+async def submit(session: aiohttp.ClientSession, name: str, priority: int = 0) -> tuple[int, dict, float, dict]:
+    start = time.perf_counter()
+    async with session.post("/jobs", json={"impairment_name": name, "priority": priority}) as response:
+        return response.status, await response.json(), time.perf_counter() - start, dict(response.headers)
+
+
+async def follow(session: aiohttp.ClientSession, job_id: str) -> list[dict]:
+    """The server-sent events of a job until it finishes."""
+    events = []
+    async with session.get(f"/jobs/{job_id}/events") as response:
+        async for line in response.content:
+            if line.startswith(b"data: "):
+                events.append(json.loads(line[6:]))
+    return events
+
+
+async def wait_finished(session: aiohttp.ClientSession, job_ids: list[str], poll: float = 0.02) -> list[dict]:
+    """Poll until every job has finished and return them."""
+    while True:
+        jobs = []
+        for job_id in job_ids:
+            async with session.get(f"/jobs/{job_id}") as response:
+                jobs.append(await response.json())
+        if all(job["status"] in FINISHED_STATUSES for job in jobs):
+            return jobs
+        await asyncio.sleep(poll)
+
+
+def job_seconds(jobs: list[dict]) -> dict:
+    return {
+        "queue_wait": summarize_latencies([job["started_at"] - job["created_at"] for job in jobs]),
+        "run": summarize_latencies([job["finished_at"] - job["started_at"] for job in jobs]),
+    }
+
+
+async def round_throughput(args, workdir: Path) -> dict:
+    service, client = make_service(workdir / "throughput.db", args.latency, str(workdir), args.workers, args.jobs)
+    async with TestServer(create_app(service)) as server, aiohttp.ClientSession(str(server.make_url(""))) as session:
+        start = time.perf_counter()
+        submitted = await asyncio.gather(*(submit(session, f"Impairment {i}") for i in range(args.jobs)))
+        job_ids = [body["id"] for _, body, _, _ in submitted]
+        streams = await asyncio.gather(*(follow(session, job_id) for job_id in job_ids))
+        elapsed = time.perf_counter() - start
+        jobs = await wait_finished(session, job_ids)
+    return {
+        "jobs": args.jobs,
+        "submit_ack": summarize_latencies([seconds for _, _, seconds, _ in submitted]),
+        "elapsed_seconds": round(elapsed, 3),
+        "jobs_per_second": round(args.jobs / elapsed, 2),
+        "succeeded": sum(job["status"] == SUCCEEDED and bool(job["result"]["decision_tree"]) for job in jobs),
+        "events_per_job": round(sum(map(len, streams)) / len(streams), 1),
+        "model_calls": len(client.calls),
+        **job_seconds(jobs),
+    }
+
+
+async def round_backpressure(args, workdir: Path) -> dict:
+    service, _ = make_service(workdir / "backpressure.db", args.latency, str(workdir), args.workers, args.max_queue)
+    async with TestServer(create_app(service)) as server, aiohttp.ClientSession(str(server.make_url(""))) as session:
+        submitted = await asyncio.gather(*(submit(session, f"Impairment {i}") for i in range(args.jobs)))
+        accepted = [body["id"] for status, body, _, _ in submitted if status == 202]
+        jobs = await wait_finished(session, accepted)
+        async with session.get("/health") as response:
+            health = await response.json()
+    retry_after = [int(headers["Retry-After"]) for status, _, _, headers in submitted if status == 429]
+    return {
+        "submitted": args.jobs,
+        "max_queue": args.max_queue,
+        "accepted": len(accepted),
+        "rejected_429": len(retry_after),
+        "retry_after_seconds": sorted(set(retry_after)),
+        "succeeded": sum(job["status"] == SUCCEEDED for job in jobs),
+        "health": health,
+    }
+
+
+async def round_priority(args, workdir: Path) -> dict:
+    service, _ = make_service(workdir / "priority.db", args.latency, str(workdir), args.workers, args.jobs * 2)
+    async with TestServer(create_app(service)) as server, aiohttp.ClientSession(str(server.make_url(""))) as session:
+        backlog = [(await submit(session, f"Backlog {i}"))[1]["id"] for i in range(args.jobs)]
+        urgent = [(await submit(session, f"Urgent {i}", priority=5))[1]["id"] for i in range(args.workers)]
+        backlog_jobs = await wait_finished(session, backlog)
+        urgent_jobs = await wait_finished(session, urgent)
+    return {
+        "backlog_queue_wait": job_seconds(backlog_jobs)["queue_wait"],
+        "urgent_queue_wait": job_seconds(urgent_jobs)["queue_wait"],
+    }
+
+
+async def round_restart(args, workdir: Path) -> dict:
+    db = workdir / "restart.db"
+    service, _ = make_service(db, args.latency, str(workdir), args.workers, args.jobs)
+    await service.start()
+    job_ids = [(await service.submit(f"Impairment {i}"))["id"] for i in range(args.jobs)]
+    await asyncio.sleep(args.latency * 3)
+    await service.close()
+    service.store.close()
+    interrupted = JobStore(db)
+    before = {status: interrupted.count(status) for status in ("queued", "running", "succeeded")}
+    interrupted.close()
+
+    service, _ = make_service(db, args.latency, str(workdir), args.workers, args.jobs)
+    async with service:
+        start = time.perf_counter()
+        while any(service.store.get(job_id)["status"] not in FINISHED_STATUSES for job_id in job_ids):
+            await asyncio.sleep(0.02)
+        recovery = time.perf_counter() - start
+    jobs = [service.store.get(job_id) for job_id in job_ids]
+    service.store.close()
+    return {
+        "jobs": args.jobs,
+        "at_restart": {**before, "requeued": service.stats["requeued"]},
+        "recovery_seconds": round(recovery, 3),
+        "succeeded": sum(job["status"] == SUCCEEDED for job in jobs),
+        "rerun": sum(job["attempts"] > 1 for job in jobs),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=40, help="Jobs submitted in every round")
+    parser.add_argument("--workers", type=int, default=4, help="Workflows the service runs at the same time")
+    parser.add_argument("--max-queue", type=int, default=16, help="Queue depth of the backpressure round")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every stub model call takes")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        results = {
+            "workers": args.workers,
+            "throughput": await round_throughput(args, workdir),
+            "backpressure": await round_backpressure(args, workdir),
+            "priority": await round_priority(args, workdir),
+            "restart": await round_restart(args, workdir),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+"""Benchmark: throughput of 1, 4 and 16 worker processes sharing one SQLite job queue, and recovery from a killed worker
+
+Usage (from src/):
+    uv run python -m benchmarks.job_worker_benchmark [--jobs 64] [--processes 1 4 16] [--concurrency 1] [--latency 0.2]
+
+Starts --processes worker processes, each running a JobService with
+--concurrency workers against benchmarks.stub_client.StubChatClient, like
+``job_server.py --worker-only`` does against Azure. Once every process is up,
+--jobs jobs are queued in the shared database and the time until all have
+finished is measured. Reported per process count: throughput, its speedup
+over one process and the scaling efficiency (speedup / processes), how the
+jobs spread over the processes and whether any job ran twice.
+
+In the last round one of four processes is killed with SIGKILL while it runs
+jobs; its leases (--lease-seconds) run out, the others requeue and finish
+its jobs, and every job must succeed exactly once.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from utils.job_store import FINISHED_STATUSES, RUNNING, SUCCEEDED, JobStore
+
+
+def worker_process(db: str, index: int, concurrency: int, latency: float, lease_seconds: float, ready) -> None:
+    """Run a JobService on the stub model until SIGTERM."""
+    # Imported here so the parent process stays light
+    from benchmarks.stub_client import StubChatClient
+    from job_server import run_workflow_job
+    from pipeline import build_workflow
+    from utils.job_service import JobService
+    from utils.single_flight import CoalescingWorkflow
+
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    async def run():
+        client = StubChatClient(latency=latency, seed=index)
+        output_dir = tempfile.mkdtemp()
+        workflow = CoalescingWorkflow(
+            lambda: build_workflow(client, open_browser=False, output_dir=output_dir), max_idle=concurrency
+        )
+
+        async def run_job(impairment_name, report):
+            return await run_workflow_job(workflow, impairment_name, report)
+
+        service = JobService(
+            JobStore(db), run_job, workers=concurrency, lease_seconds=lease_seconds, poll_interval=0.05,
+            worker_id=f"worker-{index}",
+        )
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        # Build one workflow up front so the first job does not pay for the imports
+        workflow.template
+        async with service:
+            ready.release()
+            await stop.wait()
+
+    asyncio.run(run())
+
+
+def run_round(db: Path, args, processes: int, kill_after: float | None = None) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready = context.Semaphore(0)
+    workers = [
+        context.Process(target=worker_process, args=(str(db), i, args.concurrency, args.latency, args.lease_seconds, ready))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.acquire()
+
+    store = JobStore(db)
+    job_ids = [store.add(f"Impairment {i}")["id"] for i in range(args.jobs)]
+    start = time.perf_counter()
+    killed = None
+    while True:
+        jobs = [store.get(job_id) for job_id in job_ids]
+        if all(job["status"] in FINISHED_STATUSES for job in jobs):
+            break
+        if kill_after is not None and killed is None and time.perf_counter() - start > kill_after:
+            running = Counter(job["worker_id"] for job in jobs if job["status"] == RUNNING)
+            if running:
+                killed = int(running.most_common(1)[0][0].split("-")[1])
+                os.kill(workers[killed].pid, signal.SIGKILL)
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - start
+
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+        worker.join()
+    store.close()
+    result = {
+        "processes": processes,
+        "elapsed_seconds": round(elapsed, 3),
+        "jobs_per_second": round(args.jobs / elapsed, 2),
+        "succeeded": sum(job["status"] == SUCCEEDED for job in jobs),
+        "jobs_per_process": sorted(Counter(job["worker_id"] for job in jobs).values(), reverse=True),
+        "run_more_than_once": sum(job["attempts"] > 1 for job in jobs),
+    }
+    if kill_after is not None:
+        result["killed_worker"] = f"worker-{killed}"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=64, help="Jobs queued in every round")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4, 16], help="Worker process counts")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs every process runs at the same time")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds every stub model call takes")
+    parser.add_argument("--lease-seconds", type=float, default=1.5, help="Lease of the jobs a worker runs")
+    args = parser.parse_args()
+
+    rounds = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for processes in args.processes:
+            rounds.append(run_round(Path(workdir) / f"jobs-{processes}.db", args, processes))
+        crash = run_round(Path(workdir) / "jobs-crash.db", args, 4, kill_after=args.latency * 4)
+
+    baseline = rounds[0]["jobs_per_second"] / rounds[0]["processes"]
+    for result in rounds:
+        result["speedup"] = round(result["jobs_per_second"] / rounds[0]["jobs_per_second"], 2)
+        result["scaling_efficiency"] = round(result["jobs_per_second"] / (baseline * result["processes"]), 2)
+    print(json.dumps({
+        "jobs": args.jobs,
+        "concurrency_per_process": args.concurrency,
+        "stub_latency_seconds": args.latency,
+        "cpu_count": os.cpu_count(),
+        "scaling": rounds,
+        "killed_worker": crash,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark: latency and cost of per-stage model routing with schema-validated escalation
+
+Usage (from src/):
+    uv run python -m benchmarks.model_routing_benchmark [--runs 5] [--latency 0.4] [--invalid-rate 0.2]
+
+Runs the impairment workflow on two stub deployments
+(benchmarks.stub_client.StubChatClient): "gpt-4o" answers every call in
+--latency seconds, "gpt-4o-mini" four times faster but with --invalid-rate of
+its answers truncated, so they fail schema validation. "single" runs every
+stage on gpt-4o, like one AZURE_AI_MODEL_DEPLOYMENT_NAME for all agents;
+"routed" runs the search prompt, search and risk analysis stages on
+gpt-4o-mini, escalating to gpt-4o when the output does not validate, and
+keeps the decision tree on gpt-4o. The per-stage, per-deployment summaries
+come from a MetricsMiddleware, as they would with the Azure clients.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+from benchmarks.stub_client import StubChatClient
+from pipeline import build_workflow
+from utils.conversation import parse_stage_output
+from utils.metrics import MetricsCollector, MetricsMiddleware, TokenPrices
+from utils.model_routing import EscalatingAgent, ModelRoute, create_routed_agent
+from utils.stats import summarize_latencies
+
+LARGE, SMALL = "gpt-4o", "gpt-4o-mini"
+PRICES = {
+    LARGE: TokenPrices(input_per_million=2.50, output_per_million=10.00, cached_input_per_million=1.25),
+    SMALL: TokenPrices(input_per_million=0.15, output_per_million=0.60, cached_input_per_million=0.075),
+}
+ROUTES = {
+    stage: ModelRoute(deployment=SMALL, escalate_to=(LARGE,))
+    for stage in ("SearchPromptAgent", "SearchAgent", "RiskAnalyzerAgent")
+}
+
+
+class StubDeployments:
+    """Creates agents on the stub client of their routed deployment, like AgentClientFactory.create_agent"""
+
+    def __init__(self, clients: dict[str, StubChatClient], routes: dict[str, ModelRoute], default: str):
+        self.clients = clients
+        self.routes = routes
+        self.default = default
+        self.agents: list = []
+
+    def create_agent(self, **kwargs):
+        agent = create_routed_agent(
+            lambda model: self.clients[model].create_agent(**kwargs),
+            kwargs["name"],
+            kwargs.get("output_schema"),
+            self.routes.get(kwargs["name"]),
+            self.default,
+        )
+        self.agents.append(agent)
+        return agent
+
+
+async def run_config(routes: dict[str, ModelRoute], runs: int, latency: float, invalid_rate: float, output_dir: str):
+    clients = {
+        LARGE: StubChatClient(latency=latency, model_id=LARGE),
+        SMALL: StubChatClient(latency=latency / 4, model_id=SMALL, invalid_rate=invalid_rate, seed=1),
+    }
+    metrics = MetricsCollector(prices=PRICES[LARGE], deployment_prices=PRICES)
+    deployments = StubDeployments(clients, routes, LARGE)
+    latencies, costs, valid = [], [], 0
+    stages: dict[str, dict[str, dict]] = {}
+    for i in range(runs):
+        # Every run builds its agents anew, as a fresh process would
+        workflow = build_workflow(
+            deployments, open_browser=False, middleware=[MetricsMiddleware(metrics)], output_dir=output_dir
+        )
+        impairment = f"Type 2 Diabetes Mellitus #{i}"
+        start = time.perf_counter()
+        result = await workflow.run(impairment)
+        latencies.append(time.perf_counter() - start)
+        conversation = result.get_outputs()[-1]
+        valid += parse_stage_output(conversation, "DecisionTreeAgent") is not None
+        summary = await metrics.finish_run(impairment)
+        costs.append(summary["totals"]["cost_usd"])
+        for stage, stage_summary in summary["stages"].items():
+            for deployment, totals in stage_summary["deployments"].items():
+                merged = stages.setdefault(stage, {}).setdefault(deployment, {})
+                for name, value in totals.items():
+                    merged[name] = round(merged.get(name, 0) + value, 6)
+
+    escalating = [agent for agent in deployments.agents if isinstance(agent, EscalatingAgent)]
+    return {
+        "latency": summarize_latencies(latencies),
+        "cost_usd_per_run": round(sum(costs) / len(costs), 6),
+        "valid_decision_trees": valid,
+        "escalations": sum(agent.stats["escalations"] for agent in escalating),
+        "stages": stages,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Workflow runs per configuration")
+    parser.add_argument("--latency", type=float, default=0.4, help="Seconds every gpt-4o stub call takes")
+    parser.add_argument("--invalid-rate", type=float, default=0.2, help="Share of gpt-4o-mini answers that fail validation")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances and the escalation warnings
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+    logging.getLogger("utils.model_routing").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = {
+            "runs": args.runs,
+            "single": await run_config({}, args.runs, args.latency, args.invalid_rate, output_dir),
+            "routed": await run_config(ROUTES, args.runs, args.latency, args.invalid_rate, output_dir),
+        }
+    single, routed = results["single"], results["routed"]
+    results["latency_reduction"] = round(1 - routed["latency"]["mean"] / single["latency"]["mean"], 4)
+    results["cost_reduction"] = round(1 - routed["cost_usd_per_run"] / single["cost_usd_per_run"], 4)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""Benchmark: throughput and 429s of concurrent workflows on one deployment quota, with and without the scheduler
+
+Usage (from src/):
+    uv run python -m benchmarks.quota_benchmark [--workflows 16] [--concurrency 8] [--tpm 120000]
+
+Runs --workflows impairment workflows, --concurrency at a time, against one
+stub deployment (benchmarks.stub_client.StubChatClient) whose StubQuota
+admits --tpm tokens and --rpm requests per minute and answers the rest with
+a 429, which the client waits out and retries like the Azure SDK. The
+workflows are spread over --processes "processes", each with a client and
+QuotaScheduler of its own on one shared state file, as separate worker
+processes would be. "unscheduled" sends every call straight away;
+"learned" starts the schedulers from quotas --guess times too high, to be
+lowered by the 429s and remaining-quota headers; "configured" gives them
+the real quota, as a MODEL_QUOTA_FILE would.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stub_client import StubChatClient, StubQuota
+from pipeline import build_workflow
+from utils.quota import QuotaLimits, QuotaMiddleware, QuotaScheduler
+from utils.stats import summarize_latencies
+
+DEPLOYMENT = "gpt-4o"
+
+
+async def run_round(args, limits: QuotaLimits | None, output_dir: str) -> dict:
+    quota = StubQuota(args.tpm, args.rpm)
+    clients, schedulers = [], []
+    state_file = Path(output_dir) / f"quota-{time.time_ns()}.db"
+    for _ in range(args.processes):
+        client = StubChatClient(latency=args.latency, jitter=args.latency / 2, model_id=DEPLOYMENT, quota=quota)
+        if limits is not None:
+            scheduler = QuotaScheduler(state_file, default_limits=limits)
+            client.on_response = scheduler.observe_response
+            client.middleware = [QuotaMiddleware(scheduler, DEPLOYMENT)]
+            schedulers.append(scheduler)
+        clients.append(client)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    failed = 0
+
+    async def one(i: int) -> float | None:
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            workflow = build_workflow(clients[i % len(clients)], open_browser=False, output_dir=output_dir)
+            try:
+                await workflow.run(f"Impairment {i}")
+            except Exception:
+                failed += 1
+                return None
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = [latency for latency in await asyncio.gather(*(one(i) for i in range(args.workflows))) if latency]
+    wall = time.perf_counter() - start
+    result = {
+        "wall_seconds": round(wall, 2),
+        "workflows_per_minute": round(len(latencies) * 60 / wall, 2),
+        "tokens_per_minute": round(quota.stats["admitted_tokens"] * 60 / wall),
+        "failed_workflows": failed,
+        "calls": quota.stats["admitted"],
+        "http_429": quota.stats["throttled"],
+        "latency": summarize_latencies(latencies),
+    }
+    if schedulers:
+        result["scheduler"] = {
+            name: round(sum(scheduler.stats[name] for scheduler in schedulers), 2) for name in schedulers[0].stats
+        }
+        state = schedulers[0].state(DEPLOYMENT)
+        result["learned"] = {name: round(state[name]) for name in ("tokens_per_minute", "requests_per_minute")}
+        for scheduler in schedulers:
+            scheduler.close()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflows", type=int, default=16, help="Workflow runs per round")
+    parser.add_argument("--concurrency", type=int, default=8, help="Workflow runs at the same time")
+    parser.add_argument("--processes", type=int, default=2, help="Schedulers sharing the state file")
+    parser.add_argument("--tpm", type=float, default=120_000, help="Tokens per minute of the deployment")
+    parser.add_argument("--rpm", type=float, default=720, help="Requests per minute of the deployment")
+    parser.add_argument("--guess", type=float, default=2.0, help="How much too high the learned round starts")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds a stub call takes, plus up to half of it")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances and the rate limit warnings
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+    logging.getLogger("utils.quota").setLevel(logging.ERROR)
+
+    real = QuotaLimits(tokens_per_minute=args.tpm, requests_per_minute=args.rpm)
+    guess = QuotaLimits(tokens_per_minute=args.tpm * args.guess, requests_per_minute=args.rpm * args.guess)
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = {
+            "unscheduled": await run_round(args, None, output_dir),
+            "learned": await run_round(args, guess, output_dir),
+            "configured": await run_round(args, real, output_dir),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
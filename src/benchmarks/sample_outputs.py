@@ -0,0 +1,152 @@
+"""Canned, schema-valid stage outputs used by the benchmarks"""
+
+SAMPLE_SEARCH_QUERIES = {
+    "impairment_name": "Type 2 Diabetes Mellitus",
+    "primary_search_query": "type 2 diabetes mellitus clinical guidelines risk assessment",
+    "alternative_queries": [
+        "type 2 diabetes HbA1c control mortality risk",
+        "diabetes mellitus complications life expectancy",
+    ],
+    "risk_focused_query": "type 2 diabetes risk factors smoking nephropathy retinopathy",
+    "clinical_decision_query": "type 2 diabetes diagnostic criteria HbA1c thresholds",
+}
+
+SAMPLE_RETRIEVED_DOCUMENTS = {
+    "impairment_name": "Type 2 Diabetes Mellitus",
+    "documents": [
+        {
+            "url": "https://diabetesjournals.org/care/issue/47/Supplement_1",
+            "title": "ADA Standards of Care in Diabetes",
+            "summary": "Annual clinical practice recommendations covering glycemic targets, HbA1c goals, "
+            "cardiovascular risk management and screening for microvascular complications.",
+        },
+        {
+            "url": "https://www.who.int/news-room/fact-sheets/detail/diabetes",
+            "title": "WHO Diabetes Fact Sheet",
+            "summary": "Global prevalence, mortality and key complications of diabetes, including kidney "
+            "failure, vision loss, heart attack and stroke, and the role of tobacco use.",
+        },
+        {
+            "url": "https://www.nice.org.uk/guidance/ng28",
+            "title": "NICE NG28: Type 2 diabetes in adults",
+            "summary": "Guideline on HbA1c measurement and targets, drug treatment and managing "
+            "complications such as nephropathy, retinopathy and neuropathy in adults.",
+        },
+        {
+            "url": "https://www.cdc.gov/diabetes/risk-factors/index.html",
+            "title": "CDC: Diabetes risk factors",
+            "summary": "Risk factors for developing type 2 diabetes and its complications, including "
+            "smoking, physical inactivity, obesity and high blood pressure.",
+        },
+    ],
+    "total_documents_found": 4,
+}
+
+SAMPLE_RISK_ATTRIBUTES = {
+    "impairment_name": "Type 2 Diabetes Mellitus",
+    "risk_factors": ["Poor glycemic control (HbA1c > 9%)", "Current smoking", "Hypertension", "Obesity"],
+    "severity_indicators": ["HbA1c level", "Insulin dependence", "Duration since diagnosis"],
+    "complications": ["Nephropathy", "Retinopathy", "Neuropathy", "Cardiovascular disease"],
+    "diagnostic_criteria": ["HbA1c >= 6.5%", "Fasting plasma glucose >= 126 mg/dL"],
+    "decision_points": ["Most recent HbA1c", "Presence of complications", "Smoking status"],
+}
+
+SAMPLE_DECISION_TREE = {
+    "impairment_name": "Type 2 Diabetes Mellitus",
+    "risk_levels": ["Low", "Medium", "High", "Critical"],
+    "root_node": {
+        "id": 1,
+        "decision": None,
+        "question": "What is the most recent HbA1c value?",
+        "decisions": ["< 7%", "7% - 9%", "> 9%"],
+        "risk_level": None,
+        "sources": [
+            {
+                "source_name": "ADA Standards of Care in Diabetes",
+                "source_url": "https://diabetesjournals.org/care/issue/47/Supplement_1",
+                "source_snippets": ["An HbA1c goal of <7% is appropriate for many nonpregnant adults."],
+            }
+        ],
+        "level": 0,
+        "children": [
+            {
+                "id": 2,
+                "decision": "< 7%",
+                "question": "Are there any diabetic complications?",
+                "decisions": ["Yes", "No"],
+                "risk_level": None,
+                "sources": [],
+                "level": 1,
+                "children": [
+                    {
+                        "id": 4,
+                        "decision": "Yes",
+                        "question": "Complications present with good control",
+                        "decisions": [],
+                        "risk_level": "Medium",
+                        "sources": [],
+                        "level": 2,
+                        "children": [],
+                    },
+                    {
+                        "id": 5,
+                        "decision": "No",
+                        "question": "Well controlled without complications",
+                        "decisions": [],
+                        "risk_level": "Low",
+                        "sources": [],
+                        "level": 2,
+                        "children": [],
+                    },
+                ],
+            },
+            {
+                "id": 3,
+                "decision": "7% - 9%",
+                "question": "Is the applicant a current smoker?",
+                "decisions": ["Yes", "No"],
+                "risk_level": None,
+                "sources": [
+                    {
+                        "source_name": "CDC - Smoking and Diabetes",
+                        "source_url": "https://www.cdc.gov/tobacco/campaign/tips/diseases/diabetes.html",
+                        "source_snippets": ["Smokers are 30-40% more likely to develop type 2 diabetes."],
+                    }
+                ],
+                "level": 1,
+                "children": [
+                    {
+                        "id": 6,
+                        "decision": "Yes",
+                        "question": "Moderate control and smoking",
+                        "decisions": [],
+                        "risk_level": "High",
+                        "sources": [],
+                        "level": 2,
+                        "children": [],
+                    },
+                    {
+                        "id": 7,
+                        "decision": "No",
+                        "question": "Moderate control, non-smoker",
+                        "decisions": [],
+                        "risk_level": "Medium",
+                        "sources": [],
+                        "level": 2,
+                        "children": [],
+                    },
+                ],
+            },
+            {
+                "id": 8,
+                "decision": "> 9%",
+                "question": "Poorly controlled diabetes",
+                "decisions": [],
+                "risk_level": "Critical",
+                "sources": [],
+                "level": 1,
+                "children": [],
+            },
+        ],
+    },
+}
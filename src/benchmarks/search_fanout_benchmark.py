@@ -0,0 +1,84 @@
+"""Benchmark: one SearchAgent call for all queries vs. the concurrent search fan-out
+
+Usage (from src/):
+    uv run python -m benchmarks.search_fanout_benchmark [--runs 3] [--workers 4]
+
+Both approaches get the same SearchQueries output. The serial approach sends it
+to a single SearchAgent call; the fan-out runs one SearchAgent call per query
+with at most --workers in flight and merges the results. Requires
+AZURE_AI_PROJECT_ENDPOINT and an Azure CLI login.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from agent_framework import ChatMessage, Role, SequentialBuilder
+from azure.identity.aio import AzureCliCredential
+from dotenv import load_dotenv
+
+from agents.search_agent import create_search_agent
+from benchmarks.sample_outputs import SAMPLE_SEARCH_QUERIES
+from executors.search_fanout_executor import create_search_fanout_executor
+from pipeline import get_settings
+from utils.client_factory import AgentClientFactory
+from utils.conversation import extract_json, parse_stage_output
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+
+async def benchmark_serial(agent, conversation: list[ChatMessage], runs: int) -> dict:
+    """Time a single SearchAgent call that receives every query at once."""
+    latencies = []
+    documents = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = await agent.run(conversation)
+        latencies.append(time.perf_counter() - start)
+        documents.append(len(extract_json(response.text).get("documents") or []))
+    return {"latency": summarize_latencies(latencies), "documents": documents}
+
+
+async def benchmark_fanout(agent, conversation: list[ChatMessage], runs: int, workers: int) -> dict:
+    """Time the fan-out executor, one SearchAgent call per query."""
+    latencies = []
+    documents = []
+    for _ in range(runs):
+        workflow = SequentialBuilder().participants([create_search_fanout_executor(agent, workers)]).build()
+        start = time.perf_counter()
+        result = await workflow.run(conversation)
+        latencies.append(time.perf_counter() - start)
+        payload = parse_stage_output(result.get_outputs()[-1], "SearchAgent")
+        documents.append(len((payload or {}).get("documents") or []))
+    return {"latency": summarize_latencies(latencies), "documents": documents}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Runs per approach")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent retrieval branches of the fan-out")
+    args = parser.parse_args()
+
+    conversation = [
+        ChatMessage(role=Role.USER, text=SAMPLE_SEARCH_QUERIES["impairment_name"]),
+        ChatMessage(role=Role.ASSISTANT, text=json.dumps(SAMPLE_SEARCH_QUERIES), author_name="SearchPromptAgent"),
+    ]
+    async with (
+        AzureCliCredential() as credential,
+        AgentClientFactory(**get_settings(credential)) as client_factory,
+    ):
+        agent = create_search_agent(client_factory.create_client())
+        serial = await benchmark_serial(agent, conversation, args.runs)
+        fanout = await benchmark_fanout(agent, conversation, args.runs, args.workers)
+
+    results = {
+        "serial_single_call": serial,
+        "fanout": {"workers": args.workers, **fanout},
+        "speedup_p50": serial["latency"]["p50"] / max(fanout["latency"]["p50"], 1e-9),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
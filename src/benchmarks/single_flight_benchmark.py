@@ -0,0 +1,120 @@
+"""Benchmark: model calls and latency of concurrent identical requests, with and without single-flight coalescing
+
+Usage (from src/):
+    uv run python -m benchmarks.single_flight_benchmark [--requests 32] [--impairments 4] [--latency 0.05]
+
+Simulates --requests underwriters sending requests at the same time for
+--impairments different impairments (in varying spellings) against
+benchmarks.stub_client.StubChatClient. "independent" runs every request on a
+workflow of its own, the only way one DevUI entity can serve concurrent
+requests without coalescing; "coalesced" sends them all through one
+CoalescingWorkflow keyed on the canonical impairment name. In a last round a
+quarter of the coalesced callers are cancelled halfway; the others must still
+receive the full result.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+import time
+
+from benchmarks.stub_client import StubChatClient
+from pipeline import build_workflow
+from utils.impairment_names import ImpairmentCanonicalizer
+from utils.single_flight import CoalescingWorkflow
+from utils.stats import summarize_latencies
+
+SPELLINGS = [
+    ["Type 2 Diabetes Mellitus", "T2DM", "type II diabetes", "Diabetes mellitus type 2"],
+    ["Hypertension", "HTN", "high blood pressure", "hypertention"],
+    ["Atrial Fibrillation", "AFib", "atrial fibrilation", "A-fib"],
+    ["Chronic Kidney Disease", "CKD", "chronic renal failure", "chronic kidney diseas"],
+    ["Obstructive Sleep Apnea", "OSA", "sleep apnoea", "obstructive sleep apnoea"],
+    ["Asthma", "bronchial asthma", "asthma", "ASTHMA"],
+]
+
+
+def requests_for(count: int, impairments: int) -> list[str]:
+    """``count`` requests spread over ``impairments`` impairments, each in changing spellings."""
+    return [SPELLINGS[i % impairments][i // impairments % 4] for i in range(count)]
+
+
+async def consume(workflow, message: str) -> tuple[float, bool]:
+    """Run one request like the DevUI does and return its latency and whether it produced output."""
+    start = time.perf_counter()
+    outputs = 0
+    async for event in workflow.run_stream(message):
+        outputs += type(event).__name__ == "WorkflowOutputEvent"
+    return time.perf_counter() - start, outputs > 0
+
+
+async def round_independent(messages: list[str], latency: float, output_dir: str) -> dict:
+    client = StubChatClient(latency=latency)
+
+    async def request(message: str):
+        return await consume(build_workflow(client, open_browser=False, output_dir=output_dir), message)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(request(message) for message in messages))
+    return {
+        "wall_seconds": time.perf_counter() - start,
+        "model_calls": len(client.calls),
+        "latency": summarize_latencies([latency for latency, _ in results]),
+        "completed": sum(ok for _, ok in results),
+    }
+
+
+async def round_coalesced(messages: list[str], latency: float, output_dir: str, cancel_share: float = 0.0) -> dict:
+    client = StubChatClient(latency=latency)
+    canonicalizer = ImpairmentCanonicalizer()
+    workflow = CoalescingWorkflow(
+        lambda: build_workflow(client, open_browser=False, output_dir=output_dir),
+        key=lambda message: canonicalizer.canonicalize(str(message)).name,
+    )
+    tasks = [asyncio.create_task(consume(workflow, message)) for message in messages]
+    cancelled = tasks[: int(len(tasks) * cancel_share)]
+    start = time.perf_counter()
+    if cancelled:
+        await asyncio.sleep(latency * 2)
+        for task in cancelled:
+            task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    finished = [result for result in results if not isinstance(result, BaseException)]
+    return {
+        "wall_seconds": time.perf_counter() - start,
+        "model_calls": len(client.calls),
+        "latency": summarize_latencies([latency for latency, _ in finished]),
+        "completed": sum(ok for _, ok in finished),
+        "cancelled": len(results) - len(finished),
+        "single_flight": workflow.flights.stats,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=32, help="Concurrent requests")
+    parser.add_argument("--impairments", type=int, default=4, choices=range(1, len(SPELLINGS) + 1),
+                        help="Distinct impairments among the requests")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every stub model call takes")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    messages = requests_for(args.requests, args.impairments)
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = {
+            "requests": len(messages),
+            "impairments": args.impairments,
+            "independent": await round_independent(messages, args.latency, output_dir),
+            "coalesced": await round_coalesced(messages, args.latency, output_dir),
+            "coalesced_with_cancellations": await round_coalesced(messages, args.latency, output_dir, 0.25),
+        }
+    results["model_call_reduction"] = round(
+        1 - results["coalesced"]["model_calls"] / max(results["independent"]["model_calls"], 1), 4
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
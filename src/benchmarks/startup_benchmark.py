@@ -0,0 +1,118 @@
+"""Benchmark: import time and time to ready of the entry points, with lazy and eager agents
+
+Usage (from src/):
+    uv run python -m benchmarks.startup_benchmark [--runs 5]
+
+Every measurement runs in a fresh interpreter, so module caches do not carry
+over. "import" is the time to import main, batch and pipeline. "ready" repeats
+what main.py does before it starts the DevUI: create the credential, the
+client factory and the middleware, build the workflow and import the DevUI. In
+lazy mode (the default of main.py) the agents and their Azure client are only
+created when the first request runs, which "first_agent" then measures; eager
+mode creates the client and every agent up front like before. No Azure access is
+needed: nothing is sent before the first request.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_TARGETS = ["main", "batch", "pipeline"]
+
+
+def child_import(module: str) -> dict:
+    start = time.perf_counter()
+    __import__(module)
+    return {"seconds": time.perf_counter() - start}
+
+
+def child_ready(mode: str) -> dict:
+    """Build the main.py workflow without serving it."""
+    start = time.perf_counter()
+    import logging
+
+    from azure.identity.aio import AzureCliCredential
+
+    from executors.dag_executor import DagExecutor
+    from pipeline import build_workflow
+    from utils.client_factory import AgentClientFactory
+    from utils.context_pruning import ContextPruningMiddleware
+    from utils.metrics import MetricsCollector, MetricsMiddleware
+
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+    client_factory = AgentClientFactory(
+        project_endpoint="https://example.services.ai.azure.com/api/projects/startup-benchmark",
+        model_deployment_name="gpt-4o",
+        credential=AzureCliCredential(),
+    )
+    metrics = MetricsCollector()
+    middleware = [MetricsMiddleware(metrics), ContextPruningMiddleware()]
+    client = client_factory.create_client if mode == "lazy" else client_factory.create_client()
+    workflow = build_workflow(client, middleware=middleware, metrics=metrics)
+    # The stages run inside the DagExecutor; streaming executors keep their agent in _agent,
+    # the search fan-out in agent
+    executors = [
+        stage
+        for executor in workflow.executors.values()
+        for stage in ([node.executor for node in executor.nodes] if isinstance(executor, DagExecutor) else [executor])
+    ]
+    agents = [getattr(executor, "_agent", None) or getattr(executor, "agent", None) for executor in executors]
+    agents = [agent for agent in agents if agent is not None]
+    if mode == "eager":
+        for agent in agents:
+            agent.agent
+    import agent_framework_devui  # noqa: F401
+
+    ready = time.perf_counter() - start
+    azure_imported = "agent_framework_azure_ai" in sys.modules
+    agents_built = sum(agent.built for agent in agents)
+
+    start = time.perf_counter()
+    agents[0].agent
+    first_agent = time.perf_counter() - start
+    return {
+        "seconds": ready,
+        "azure_client_imported": azure_imported,
+        "agents_built": agents_built,
+        "first_agent_seconds": first_agent,
+    }
+
+
+def measure(call: str, runs: int) -> dict:
+    """Run ``call`` (a child_* call of this module) in ``runs`` fresh interpreters."""
+    results = []
+    for _ in range(runs):
+        code = f"import json; from benchmarks.startup_benchmark import *; print(json.dumps({call}))"
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        process = time.perf_counter() - start
+        results.append({**json.loads(output.strip().splitlines()[-1]), "process_seconds": process})
+    # The median run by in-process time, so one slow cold start does not skew the result
+    results.sort(key=lambda result: result["seconds"])
+    summary = dict(results[len(results) // 2])
+    summary["min_seconds"] = results[0]["seconds"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    args = parser.parse_args()
+
+    results = {
+        "import": {module: measure(f"child_import({module!r})", args.runs) for module in IMPORT_TARGETS},
+        "ready": {mode: measure(f"child_ready({mode!r})", args.runs) for mode in ("lazy", "eager")},
+    }
+    results["ready_speedup"] = results["ready"]["eager"]["seconds"] / max(results["ready"]["lazy"]["seconds"], 1e-9)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
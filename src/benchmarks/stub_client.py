@@ -0,0 +1,281 @@
+"""Local stand-in for the Azure chat client that answers every stage with canned, schema-valid output"""
+import asyncio
+import random
+import time
+from collections.abc import AsyncIterable, Awaitable, Callable, Mapping, MutableSequence
+from dataclasses import dataclass
+from typing import Any
+
+from agent_framework import (
+    BaseChatClient,
+    ChatAgent,
+    ChatMessage,
+    ChatOptions,
+    ChatResponse,
+    ChatResponseUpdate,
+    Role,
+    TextContent,
+    UsageContent,
+    UsageDetails,
+    use_chat_middleware,
+    use_function_invocation,
+)
+from pydantic import BaseModel
+
+from benchmarks.sample_outputs import (
+    SAMPLE_DECISION_TREE,
+    SAMPLE_RETRIEVED_DOCUMENTS,
+    SAMPLE_RISK_ATTRIBUTES,
+    SAMPLE_SEARCH_QUERIES,
+)
+from models.workflow_schemas import (
+    DecisionTree,
+    HTMLVisualization,
+    RetrievedDocuments,
+    RiskAttributes,
+    SearchQueries,
+)
+from utils.conversation import estimate_tokens
+from utils.diagram_renderer import render_decision_tree_html
+
+# Chat option the stub uses to find the output schema of the calling agent
+STUB_SCHEMA_OPTION = "stub_output_schema"
+
+
+def sample_responses() -> dict[type[BaseModel], BaseModel]:
+    """The canned output of every stage schema, validated against its model."""
+    return {
+        SearchQueries: SearchQueries.model_validate(SAMPLE_SEARCH_QUERIES),
+        RetrievedDocuments: RetrievedDocuments.model_validate(SAMPLE_RETRIEVED_DOCUMENTS),
+        RiskAttributes: RiskAttributes.model_validate(SAMPLE_RISK_ATTRIBUTES),
+        DecisionTree: DecisionTree.model_validate(SAMPLE_DECISION_TREE),
+        HTMLVisualization: HTMLVisualization(
+            impairment_name=SAMPLE_DECISION_TREE["impairment_name"],
+            html_content=render_decision_tree_html(SAMPLE_DECISION_TREE),
+        ),
+    }
+
+
+class StubRateLimitError(Exception):
+    """A call the stub quota still rejected after the retries of the Azure SDK"""
+
+    status_code = 429
+
+
+class StubQuota:
+    """
+    Tokens- and requests-per-minute quota of a stub deployment, enforced like the service does.
+
+    Both buckets hold ``window_seconds`` of quota and refill continuously.
+    A call is admitted if both hold enough for its prompt and answer;
+    otherwise it gets a 429 with the seconds until they will.
+    """
+
+    def __init__(self, tokens_per_minute: float, requests_per_minute: float, window_seconds: float = 10.0):
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self._tokens = tokens_per_minute * window_seconds / 60
+        self._requests = requests_per_minute * window_seconds / 60
+        self._updated_at = time.monotonic()
+        # admitted_tokens: prompt and answer tokens of the admitted calls
+        self.stats = {"admitted": 0, "throttled": 0, "admitted_tokens": 0}
+
+    def take(self, tokens: int) -> tuple[int, dict[str, str]]:
+        """Admit a call or not; its HTTP status and rate limit headers."""
+        now = time.monotonic()
+        elapsed, self._updated_at = now - self._updated_at, now
+        token_capacity = self.tokens_per_minute * self.window_seconds / 60
+        self._tokens = min(token_capacity, self._tokens + elapsed * self.tokens_per_minute / 60)
+        request_capacity = self.requests_per_minute * self.window_seconds / 60
+        self._requests = min(request_capacity, self._requests + elapsed * self.requests_per_minute / 60)
+        # A call larger than the bucket is admitted once the bucket is full
+        cost = min(tokens, token_capacity)
+        wait = max(
+            (cost - self._tokens) * 60 / self.tokens_per_minute, (1 - self._requests) * 60 / self.requests_per_minute
+        )
+        if wait > 0:
+            self.stats["throttled"] += 1
+            return 429, {"retry-after-ms": str(max(1, round(wait * 1000)))}
+        self._tokens -= tokens
+        self._requests -= 1
+        self.stats["admitted"] += 1
+        self.stats["admitted_tokens"] += tokens
+        return 200, {
+            "x-ratelimit-remaining-tokens": str(max(0, int(self._tokens))),
+            "x-ratelimit-remaining-requests": str(max(0, int(self._requests))),
+        }
+
+
+@dataclass
+class StubCall:
+    """One model call answered by the stub, in time.perf_counter() seconds"""
+
+    schema: str
+    started_at: float
+    finished_at: float
+    streaming: bool
+
+
+@use_function_invocation
+@use_chat_middleware
+class StubChatClient(BaseChatClient):
+    """
+    Chat client that answers without a network call, for offline benchmarks.
+
+    Agents created with ``create_agent(..., output_schema=Model)`` get the
+    canned response of that schema as JSON. Every call takes ``latency``
+    seconds (plus up to ``jitter`` seconds); streaming calls send the first
+    chunk after ``first_token_latency`` and spread the rest over the
+    remaining time. Usage is estimated from the text so a MetricsMiddleware
+    sees plausible token counts. With ``invalid_rate``, that share of calls
+    answers with truncated JSON, like a small model failing the schema.
+    With ``tail_rate``, that share of calls hangs for ``tail_latency``
+    seconds or more (Pareto distributed) before it starts to answer, for
+    heavy-tailed latency. With a ``quota``, calls it rejects wait for the
+    retry-after of the 429 and try again, like the retry policy of the Azure
+    SDK; ``on_response`` sees the status and headers of every attempt, as an
+    aiohttp trace config of the Azure clients would.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        first_token_latency: float | None = None,
+        jitter: float = 0.0,
+        chunk_chars: int = 256,
+        responses: dict[type[BaseModel], BaseModel] | None = None,
+        seed: int = 0,
+        model_id: str | None = None,
+        invalid_rate: float = 0.0,
+        tail_rate: float = 0.0,
+        tail_latency: float = 0.0,
+        quota: StubQuota | None = None,
+        on_response: Callable[[str, int, Mapping[str, str]], Awaitable[None]] | None = None,
+        max_throttle_retries: int = 10,
+    ):
+        """
+        Args:
+            latency: Seconds every call takes
+            first_token_latency: Seconds until the first streamed chunk; defaults to a quarter of ``latency``
+            jitter: Random extra seconds added to every call, uniform in [0, jitter]
+            chunk_chars: Characters per streamed chunk
+            responses: Canned output per schema; defaults to sample_responses()
+            seed: Seed of the jitter and of the invalid answers
+            model_id: Deployment name the client reports, e.g. to a MetricsMiddleware
+            invalid_rate: Share of calls that answer with output that does not validate
+            tail_rate: Share of calls that hang
+            tail_latency: Minimum extra seconds of a hanging call
+            quota: Quota of the deployment, possibly shared with other stub clients
+            on_response: Awaited with the deployment, status and headers of every attempt
+            max_throttle_retries: Rejected attempts after which a call fails with StubRateLimitError
+        """
+        super().__init__()
+        self.latency = latency
+        self.first_token_latency = latency / 4 if first_token_latency is None else min(first_token_latency, latency)
+        self.jitter = jitter
+        self.chunk_chars = chunk_chars
+        self.model_id = model_id
+        self.invalid_rate = invalid_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.quota = quota
+        self.on_response = on_response
+        self.max_throttle_retries = max_throttle_retries
+        responses = sample_responses() if responses is None else responses
+        self._texts = {schema.__name__: response.model_dump_json() for schema, response in responses.items()}
+        self._random = random.Random(seed)
+        self.calls: list[StubCall] = []
+
+    def create_agent(self, *, output_schema: type[BaseModel] | None = None, **kwargs: Any) -> ChatAgent:
+        """Create an agent like the Azure client, remembering its output schema for the canned response."""
+        if output_schema is not None:
+            options = dict(kwargs.pop("additional_chat_options", None) or {})
+            options[STUB_SCHEMA_OPTION] = output_schema.__name__
+            kwargs["additional_chat_options"] = options
+            kwargs["output_schema"] = output_schema
+        return super().create_agent(**kwargs)
+
+    def _response_text(self, messages: MutableSequence[ChatMessage], chat_options: ChatOptions) -> tuple[str, str]:
+        schema = chat_options.additional_properties.get(STUB_SCHEMA_OPTION)
+        if schema is None and chat_options.response_format is not None:
+            schema = chat_options.response_format.__name__
+        if schema not in self._texts:
+            raise ValueError(f"StubChatClient has no canned response for output schema {schema!r}")
+        text = self._texts[schema]
+        if self.invalid_rate and self._random.random() < self.invalid_rate:
+            text = text[: len(text) // 2]
+        return schema, text
+
+    def _usage(self, messages: MutableSequence[ChatMessage], chat_options: ChatOptions, text: str) -> UsageDetails:
+        prompt = sum(estimate_tokens(m.text or "") for m in messages) + estimate_tokens(chat_options.instructions or "")
+        return UsageDetails(input_token_count=prompt, output_token_count=estimate_tokens(text))
+
+    def _call_latency(self) -> float:
+        return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def _hang(self) -> float:
+        """Extra seconds before a hanging call starts to answer, 0 for most calls."""
+        if self.tail_rate and self._random.random() < self.tail_rate:
+            return self.tail_latency * self._random.paretovariate(1.5)
+        return 0.0
+
+    async def _admit(self, usage: UsageDetails) -> None:
+        """Wait until the quota admits a call, retrying after every 429 like the Azure SDK."""
+        if self.quota is None:
+            return
+        for attempt in range(self.max_throttle_retries + 1):
+            status, headers = self.quota.take(usage.input_token_count + usage.output_token_count)
+            if self.on_response is not None:
+                await self.on_response(self.model_id or "", status, headers)
+            if status != 429:
+                return
+            if attempt < self.max_throttle_retries:
+                await asyncio.sleep(int(headers["retry-after-ms"]) / 1000)
+        seconds = int(headers["retry-after-ms"]) / 1000
+        raise StubRateLimitError(f"Rate limit is exceeded. Try again in {seconds:g} seconds.")
+
+    async def _inner_get_response(
+        self, *, messages: MutableSequence[ChatMessage], chat_options: ChatOptions, **kwargs: Any
+    ) -> ChatResponse:
+        started_at = time.perf_counter()
+        schema, text = self._response_text(messages, chat_options)
+        usage = self._usage(messages, chat_options, text)
+        await self._admit(usage)
+        await asyncio.sleep(self._call_latency() + self._hang())
+        self.calls.append(StubCall(schema, started_at, time.perf_counter(), streaming=False))
+        return ChatResponse(
+            messages=[ChatMessage(role=Role.ASSISTANT, text=text)],
+            usage_details=usage,
+        )
+
+    async def _inner_get_streaming_response(
+        self, *, messages: MutableSequence[ChatMessage], chat_options: ChatOptions, **kwargs: Any
+    ) -> AsyncIterable[ChatResponseUpdate]:
+        started_at = time.perf_counter()
+        schema, text = self._response_text(messages, chat_options)
+        usage = self._usage(messages, chat_options, text)
+        await self._admit(usage)
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        total = self._call_latency()
+        await asyncio.sleep(min(self.first_token_latency, total) + self._hang())
+        # The remaining time is spread over the chunks after the first
+        interval = max(0.0, total - self.first_token_latency) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield ChatResponseUpdate(role=Role.ASSISTANT, contents=[TextContent(chunk)])
+        yield ChatResponseUpdate(
+            role=Role.ASSISTANT, contents=[UsageContent(usage)]
+        )
+        self.calls.append(StubCall(schema, started_at, time.perf_counter(), streaming=True))
+
+    def model_time(self, since: float = 0.0) -> float:
+        """Seconds during which at least one call started after ``since`` was in flight."""
+        intervals = sorted((c.started_at, c.finished_at) for c in self.calls if c.started_at >= since)
+        busy, end = 0.0, float("-inf")
+        for start, finish in intervals:
+            if finish > end:
+                busy += finish - max(start, end)
+                end = finish
+        return busy
@@ -0,0 +1,105 @@
+"""Benchmark: JSON dicts vs. TreeIndex for storing and loading many decision trees
+
+Usage (from src/):
+    uv run python -m benchmarks.tree_index_benchmark [--tree tree.json | --depth 4 --fanout 3] [--trees 10000]
+
+Serializes the same tree --trees times as JSON and as TreeIndex binary, then
+reports the payload size, the time to load every tree back (JSON is loaded both
+as plain dicts and as validated DecisionTree models) and the memory held by the
+loaded trees, measured with tracemalloc. TreeIndex columns are views into the
+payload, so its payload bytes are counted as retained too.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.sample_outputs import SAMPLE_DECISION_TREE
+from models.workflow_schemas import DecisionTree
+from utils.tree_index import TreeIndex
+
+
+def build_synthetic_tree(depth: int, fanout: int) -> dict:
+    """Build a complete tree with ``fanout`` children per node and leaves at ``depth``."""
+    next_id = 0
+
+    def build(level: int, decision: str | None) -> dict:
+        nonlocal next_id
+        next_id += 1
+        decisions = [f"Option {i + 1}" for i in range(fanout)] if level < depth else []
+        return {
+            "id": next_id,
+            "decision": decision,
+            "question": f"Risk factor {level}.{next_id % fanout}?" if decisions else f"Outcome {next_id}",
+            "decisions": decisions,
+            "risk_level": None if decisions else SAMPLE_DECISION_TREE["risk_levels"][next_id % 4],
+            "sources": SAMPLE_DECISION_TREE["root_node"]["sources"],
+            "level": level,
+            "children": [build(level + 1, option) for option in decisions],
+        }
+
+    return {
+        "impairment_name": f"Synthetic tree (depth {depth}, fanout {fanout})",
+        "risk_levels": SAMPLE_DECISION_TREE["risk_levels"],
+        "root_node": build(0, None),
+    }
+
+
+def measure_load(payloads: list, load, pins_payload: bool = False) -> dict:
+    """Load every payload, returning the elapsed time and the memory retained by the results."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    loaded = [load(payload) for payload in payloads]
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if pins_payload:
+        retained += sum(map(len, payloads))
+    del loaded
+    return {
+        "load_seconds": round(elapsed, 4),
+        "trees_per_second": round(len(payloads) / elapsed),
+        "retained_bytes": retained,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tree", help="Path to a DecisionTree JSON file (defaults to a sample tree)")
+    parser.add_argument("--depth", type=int, help="Benchmark a synthetic tree of this depth instead")
+    parser.add_argument("--fanout", type=int, default=3, help="Children per node of the synthetic tree")
+    parser.add_argument("--trees", type=int, default=10_000, help="Number of stored trees")
+    args = parser.parse_args()
+
+    tree = SAMPLE_DECISION_TREE
+    if args.depth:
+        tree = build_synthetic_tree(args.depth, args.fanout)
+    elif args.tree:
+        with open(args.tree, encoding="utf-8") as f:
+            tree = json.load(f)
+
+    index = TreeIndex.from_tree(tree)
+    json_payloads = [json.dumps(index.to_dict()) for _ in range(args.trees)]
+    binary_payloads = [index.to_bytes() for _ in range(args.trees)]
+    assert TreeIndex.from_bytes(binary_payloads[0]).to_dict() == index.to_dict()
+
+    json_bytes = sum(map(len, json_payloads))
+    binary_bytes = sum(map(len, binary_payloads))
+    json_results = measure_load(json_payloads, json.loads)
+    model_results = measure_load(json_payloads, DecisionTree.model_validate_json)
+    binary_results = measure_load(binary_payloads, TreeIndex.from_bytes, pins_payload=True)
+    results = {
+        "trees": args.trees,
+        "nodes_per_tree": len(index),
+        "json_dicts": {"payload_bytes": json_bytes, **json_results},
+        "json_models": {"payload_bytes": json_bytes, **model_results},
+        "tree_index": {"payload_bytes": binary_bytes, **binary_results},
+        "size_ratio": round(binary_bytes / json_bytes, 3),
+        "memory_ratio_vs_dicts": round(binary_results["retained_bytes"] / json_results["retained_bytes"], 3),
+        "load_speedup_vs_models": round(model_results["load_seconds"] / binary_results["load_seconds"], 2),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
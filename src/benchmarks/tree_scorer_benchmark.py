@@ -0,0 +1,105 @@
+"""Benchmark: vectorized tree scorer vs. the Python-loop reference implementation
+
+Usage (from src/):
+    uv run python -m benchmarks.tree_scorer_benchmark [--tree tree.json] [--sizes 1000 100000 10000000]
+
+Generates random applicant records for the columns used by the tree, scores
+them with score_batch and reports records per second per batch size; a tenth
+of the numeric values lie exactly on a branch bound. The
+reference implementation is only timed up to --reference-limit records (it is
+far too slow for 10M rows) and its results are compared with the vectorized scorer.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.sample_outputs import SAMPLE_DECISION_TREE
+from utils.tree_scorer import CompiledTree, compile_tree, encode_columns, score_batch, score_record
+
+
+def generate_columns(compiled: CompiledTree, rows: int, seed: int = 0) -> dict[str, np.ndarray]:
+    """Generate random columns covering every branch of the compiled tree."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for column, numeric, vocabulary in zip(compiled.features, compiled.feature_numeric, compiled.categories):
+        if numeric:
+            bounds = compiled.node_bounds[np.isin(compiled.node_feature, compiled.features.index(column))]
+            finite = bounds[np.isfinite(bounds)]
+            low, high = (finite.min(), finite.max()) if finite.size else (0.0, 1.0)
+            spread = max(high - low, 1.0)
+            values = rng.uniform(low - spread, high + spread, rows).round(1)
+            # Every tenth record sits exactly on a bound, where "> 9" and "7 - 9" must not both match
+            if finite.size:
+                values[::10] = rng.choice(finite, len(values[::10]))
+            columns[column] = values
+        elif set(vocabulary) == {"yes", "no"}:
+            columns[column] = rng.random(rows) < 0.5
+        else:
+            columns[column] = rng.choice(list(vocabulary), rows)
+    return columns
+
+
+def benchmark_size(tree: dict, compiled: CompiledTree, rows: int, reference_limit: int) -> dict:
+    """Time encoding + scoring (and the reference loop if small enough) for one batch size."""
+    columns = generate_columns(compiled, rows)
+
+    start = time.perf_counter()
+    matrix = encode_columns(compiled, columns)
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = score_batch(compiled, matrix)
+    score_seconds = time.perf_counter() - start
+
+    result = {
+        "rows": rows,
+        "encode_seconds": round(encode_seconds, 4),
+        "score_seconds": round(score_seconds, 4),
+        "vectorized_records_per_second": round(rows / (encode_seconds + score_seconds)),
+    }
+
+    if rows <= reference_limit:
+        records = [{column: values[i].item() for column, values in columns.items()} for i in range(rows)]
+        start = time.perf_counter()
+        expected = [score_record(tree, record) for record in records]
+        reference_seconds = time.perf_counter() - start
+
+        names = compiled.risk_levels + [None]
+        mismatches = sum(names[index] != level for index, level in zip(scores.tolist(), expected))
+        result["reference_records_per_second"] = round(rows / reference_seconds)
+        result["speedup"] = round(reference_seconds / (encode_seconds + score_seconds), 1)
+        result["mismatches"] = mismatches
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tree", help="Path to a DecisionTree JSON file (defaults to a sample tree)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 10_000_000], help="Batch sizes")
+    parser.add_argument("--reference-limit", type=int, default=100_000, help="Largest batch timed with the reference loop")
+    args = parser.parse_args()
+
+    tree = SAMPLE_DECISION_TREE
+    if args.tree:
+        with open(args.tree, encoding="utf-8") as f:
+            tree = json.load(f)
+
+    start = time.perf_counter()
+    compiled = compile_tree(tree)
+    compile_seconds = time.perf_counter() - start
+
+    results = {
+        "impairment_name": tree.get("impairment_name"),
+        "nodes": compiled.num_nodes - 1,
+        "features": compiled.features,
+        "compile_seconds": round(compile_seconds, 6),
+        "sizes": [benchmark_size(tree, compiled, rows, args.reference_limit) for rows in args.sizes],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Benchmark: full vs. incremental vector store ingestion against a local stand-in
+
+Usage (from src/):
+    uv run python -m benchmarks.vector_store_ingest_benchmark [--files 500] [--changed 10] [--concurrency 8]
+
+Writes a synthetic corpus to a temporary directory and syncs it into
+LocalAgentsClient, an in-memory stand-in for the files / vector_stores
+operations of the Azure AI agents client with a simulated latency per call.
+Four runs are reported: the initial ingestion with concurrency 1 and with
+--concurrency, a re-run without changes, and a re-run after --changed files
+were modified, one added and one removed. The stand-in state is checked
+against the directory after every run.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from utils.vector_store_ingest import ingest_directory
+
+
+class _LocalFiles:
+    def __init__(self, client: "LocalAgentsClient"):
+        self.client = client
+
+    async def upload_and_poll(self, file_path: str, purpose: str):
+        await asyncio.sleep(self.client.upload_latency)
+        self.client.calls["upload"] += 1
+        file_id = f"file-{self.client.calls['upload']}"
+        self.client.uploaded[file_id] = Path(file_path).read_bytes()
+        return SimpleNamespace(id=file_id)
+
+    async def delete(self, file_id: str):
+        await asyncio.sleep(self.client.call_latency)
+        self.client.calls["delete_file"] += 1
+        del self.client.uploaded[file_id]
+
+
+class _LocalVectorStores:
+    def __init__(self, client: "LocalAgentsClient"):
+        self.client = client
+
+    async def create_and_poll(self, name: str, file_ids: list[str] | None = None):
+        await asyncio.sleep(self.client.call_latency)
+        vector_store_id = f"vs-{len(self.client.stores) + 1}"
+        self.client.stores[vector_store_id] = set(file_ids or [])
+        return SimpleNamespace(id=vector_store_id)
+
+
+class _LocalFileBatches:
+    def __init__(self, client: "LocalAgentsClient"):
+        self.client = client
+
+    async def create_and_poll(self, vector_store_id: str, file_ids: list[str]):
+        # Indexing a batch costs one round trip plus a little per file
+        await asyncio.sleep(self.client.call_latency + 0.001 * len(file_ids))
+        self.client.calls["file_batch"] += 1
+        self.client.stores[vector_store_id].update(file_ids)
+        return SimpleNamespace(id=f"batch-{self.client.calls['file_batch']}", status="completed")
+
+
+class _LocalVectorStoreFiles:
+    def __init__(self, client: "LocalAgentsClient"):
+        self.client = client
+
+    async def delete(self, vector_store_id: str, file_id: str):
+        await asyncio.sleep(self.client.call_latency)
+        self.client.calls["delete_store_file"] += 1
+        self.client.stores[vector_store_id].discard(file_id)
+
+
+class LocalAgentsClient:
+    """In-memory stand-in for the file and vector store operations of ``AgentsClient``"""
+
+    def __init__(self, upload_latency: float = 0.02, call_latency: float = 0.01):
+        self.upload_latency = upload_latency
+        self.call_latency = call_latency
+        self.uploaded: dict[str, bytes] = {}
+        self.stores: dict[str, set[str]] = {}
+        self.calls = {"upload": 0, "file_batch": 0, "delete_file": 0, "delete_store_file": 0}
+        self.files = _LocalFiles(self)
+        self.vector_stores = _LocalVectorStores(self)
+        self.vector_store_file_batches = _LocalFileBatches(self)
+        self.vector_store_files = _LocalVectorStoreFiles(self)
+
+
+def write_corpus(directory: Path, num_files: int) -> None:
+    for i in range(num_files):
+        path = directory / f"section_{i // 100:02d}" / f"guideline_{i:05d}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"# Guideline {i}\n\n" + f"Risk factor paragraph {i}. " * 200, encoding="utf-8")
+
+
+def check_in_sync(client: LocalAgentsClient, vector_store_id: str, directory: Path) -> None:
+    stored = sorted(client.uploaded[file_id] for file_id in client.stores[vector_store_id])
+    on_disk = sorted(path.read_bytes() for path in directory.rglob("*.md"))
+    assert stored == on_disk, "vector store out of sync with the directory"
+    assert set(client.uploaded) == client.stores[vector_store_id], "orphaned uploaded files"
+
+
+async def run(client: LocalAgentsClient, directory: Path, manifest: Path, concurrency: int, **kwargs) -> dict:
+    calls_before = dict(client.calls)
+    summary = await ingest_directory(client, directory, manifest, concurrency=concurrency, **kwargs)
+    check_in_sync(client, summary["vector_store_id"], directory)
+    summary["api_calls"] = {name: client.calls[name] - calls_before[name] for name in client.calls}
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500, help="Files in the synthetic corpus")
+    parser.add_argument("--changed", type=int, default=10, help="Files modified before the incremental run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--upload-latency", type=float, default=0.02, help="Simulated seconds per upload")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(tmp) / "corpus"
+        write_corpus(corpus, args.files)
+
+        serial = LocalAgentsClient(upload_latency=args.upload_latency)
+        results["initial_serial"] = await run(serial, corpus, Path(tmp) / "serial.json", 1)
+
+        client = LocalAgentsClient(upload_latency=args.upload_latency)
+        manifest = Path(tmp) / "manifest.json"
+        results["initial_concurrent"] = await run(client, corpus, manifest, args.concurrency)
+        results["unchanged"] = await run(client, corpus, manifest, args.concurrency)
+
+        paths = sorted(corpus.rglob("*.md"))
+        for path in paths[: args.changed]:
+            path.write_text(path.read_text(encoding="utf-8") + "\nUpdated.", encoding="utf-8")
+        paths[-1].unlink()
+        (corpus / "new_guideline.md").write_text("# New guideline\n\nNew content.", encoding="utf-8")
+        results["incremental"] = await run(client, corpus, manifest, args.concurrency)
+
+    results["concurrency_speedup"] = round(
+        results["initial_serial"]["elapsed_seconds"] / results["initial_concurrent"]["elapsed_seconds"], 2
+    )
+    results["incremental_vs_full"] = round(
+        results["incremental"]["elapsed_seconds"] / results["initial_concurrent"]["elapsed_seconds"], 3
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""Benchmark: VisualizerAgent model call vs. native VisualizerExecutor rendering
+
+Usage (from src/):
+    uv run python -m benchmarks.visualizer_benchmark [--tree tree.json] [--iterations 100] [--agent-runs 3]
+
+The native renderer always runs locally. The VisualizerAgent is only called when
+--agent-runs > 0, which requires AZURE_AI_PROJECT_ENDPOINT and an Azure CLI login.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from agent_framework import ChatMessage, Role
+from dotenv import load_dotenv
+
+from benchmarks.sample_outputs import SAMPLE_DECISION_TREE
+from utils.diagram_renderer import render_decision_tree_html
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+
+def benchmark_native(tree: dict, iterations: int) -> dict:
+    """Time the native template renderer."""
+    latencies = []
+    html_content = ""
+    for _ in range(iterations):
+        start = time.perf_counter()
+        html_content = render_decision_tree_html(tree)
+        latencies.append(time.perf_counter() - start)
+    return {"latency": summarize_latencies(latencies), "html_chars": len(html_content)}
+
+
+async def benchmark_agent(tree: dict, runs: int) -> dict:
+    """Time the VisualizerAgent model round trip on the same tree."""
+    from agent_framework.azure import AzureAIAgentClient
+    from azure.identity.aio import AzureCliCredential
+
+    from agents.visualizer_agent import create_visualizer_agent
+
+    latencies = []
+    output_tokens = []
+    async with (
+        AzureCliCredential() as credential,
+        AzureAIAgentClient(
+            project_endpoint=os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+            model_deployment_name=os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
+            credential=credential,
+        ) as client,
+    ):
+        agent = create_visualizer_agent(client)
+        message = ChatMessage(role=Role.ASSISTANT, text=json.dumps(tree), author_name="DecisionTreeAgent")
+        for _ in range(runs):
+            start = time.perf_counter()
+            response = await agent.run([message])
+            latencies.append(time.perf_counter() - start)
+            if response.usage_details and response.usage_details.output_token_count:
+                output_tokens.append(response.usage_details.output_token_count)
+    return {
+        "latency": summarize_latencies(latencies),
+        "mean_output_tokens": sum(output_tokens) / len(output_tokens) if output_tokens else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tree", help="Path to a DecisionTree JSON file (defaults to a built-in sample)")
+    parser.add_argument("--iterations", type=int, default=100, help="Native render iterations")
+    parser.add_argument("--agent-runs", type=int, default=0, help="VisualizerAgent runs (needs Azure)")
+    args = parser.parse_args()
+
+    tree = SAMPLE_DECISION_TREE
+    if args.tree:
+        with open(args.tree, encoding="utf-8") as f:
+            tree = json.load(f)
+
+    results = {"native": benchmark_native(tree, args.iterations)}
+    if args.agent_runs > 0:
+        results["agent"] = await benchmark_agent(tree, args.agent_runs)
+        results["speedup_p50"] = results["agent"]["latency"]["p50"] / max(results["native"]["latency"]["p50"], 1e-9)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,241 @@
+"""Benchmark: workflow orchestration overhead, validation cost, memory and throughput against a stub model
+
+Usage (from src/):
+    uv run python -m benchmarks.workflow_benchmark [--latency 0.05] [--runs 20]
+        [--concurrency 1 2 4 8 16 32] [--output results.json] [--baseline previous.json]
+
+Runs the workflow of main.py (headless, with the metrics and context pruning
+middleware unless --bare) against benchmarks.stub_client.StubChatClient, which
+answers every stage with the canned outputs of benchmarks.sample_outputs after
+--latency seconds. No Azure access is needed. Reported:
+
+- overhead: wall time per run minus the time a stub call was in flight,
+  i.e. what the workflow itself costs on top of the model
+- validation: pydantic parse and dump time of every stage schema
+- memory: tracemalloc peak per run and what stays allocated after runs
+- throughput: runs per second with 1, 2, 4, ... workflows in flight
+
+--output stores the results (with the git commit) as JSON; --baseline compares
+the headline numbers with an earlier result file and lists the ones that got
+worse by more than --tolerance, exiting with status 1 if there are any.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from benchmarks.stub_client import StubChatClient, sample_responses
+from pipeline import build_workflow
+from utils.context_pruning import ContextPruningMiddleware
+from utils.metrics import MetricsCollector, MetricsMiddleware
+from utils.stats import summarize_latencies
+
+load_dotenv()
+
+DEFAULT_CONCURRENCY = [1, 2, 4, 8, 16, 32]
+
+
+class Runner:
+    """Builds and runs one workflow per impairment on a shared stub client"""
+
+    def __init__(self, client: StubChatClient, output_dir: str, bare: bool):
+        self.client = client
+        self.output_dir = output_dir
+        self.metrics = None if bare else MetricsCollector()
+        self.middleware = None if bare else [MetricsMiddleware(self.metrics), ContextPruningMiddleware()]
+        self._count = 0
+
+    async def run(self) -> float:
+        """Run the workflow once, consuming its events like the DevUI does, and return the wall time."""
+        # Distinct impairments keep concurrent runs apart in the metrics collector
+        self._count += 1
+        impairment = f"Impairment {self._count}"
+        workflow = build_workflow(
+            self.client, middleware=self.middleware, headless=True, metrics=self.metrics, output_dir=self.output_dir
+        )
+        start = time.perf_counter()
+        async for _ in workflow.run_stream(impairment):
+            pass
+        return time.perf_counter() - start
+
+
+async def benchmark_overhead(runner: Runner, runs: int) -> dict:
+    """Time sequential runs and subtract the time the stub model was busy."""
+    walls, overheads = [], []
+    for _ in range(runs):
+        since = time.perf_counter()
+        wall = await runner.run()
+        walls.append(wall)
+        overheads.append(max(0.0, wall - runner.client.model_time(since)))
+    return {
+        "model_calls_per_run": len(runner.client.calls) // max(1, runs),
+        "wall": summarize_latencies(walls),
+        "overhead": summarize_latencies(overheads),
+    }
+
+
+def benchmark_validation(iterations: int) -> dict:
+    """Time parsing and serializing the canned output of every stage schema."""
+    results = {}
+    for schema, response in sample_responses().items():
+        text = response.model_dump_json()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            schema.model_validate_json(text)
+        parse = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(iterations):
+            response.model_dump_json()
+        dump = time.perf_counter() - start
+        results[schema.__name__] = {
+            "bytes": len(text.encode("utf-8")),
+            "parse_us": round(parse / iterations * 1e6, 2),
+            "dump_us": round(dump / iterations * 1e6, 2),
+        }
+    return results
+
+
+async def benchmark_memory(runner: Runner, runs: int) -> dict:
+    """Measure the allocation peak of single runs and the memory retained after all of them."""
+    await runner.run()  # warm up imports and caches outside the measurement
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        peaks = []
+        for _ in range(runs):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            await runner.run()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return {
+        "peak_bytes_per_run": round(sum(peaks) / len(peaks)),
+        "max_peak_bytes": max(peaks),
+        "retained_bytes_per_run": round(retained / runs),
+    }
+
+
+async def benchmark_throughput(runner: Runner, levels: list[int], runs: int) -> dict:
+    """Run at least ``runs`` workflows per level with ``level`` of them in flight at any time."""
+    results = {}
+    for level in levels:
+        total = max(runs, level * 2)
+        semaphore = asyncio.Semaphore(level)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                latencies.append(await runner.run())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+        results[str(level)] = {
+            "runs": total,
+            "runs_per_second": round(total / elapsed, 2),
+            "latency": summarize_latencies(latencies),
+        }
+    return results
+
+
+def headline_metrics(results: dict) -> dict[str, tuple[float, bool]]:
+    """The numbers compared against a baseline, each with whether higher is better."""
+    metrics = {
+        "overhead.p50": (results["overhead"]["overhead"]["p50"], False),
+        "overhead.p95": (results["overhead"]["overhead"]["p95"], False),
+        "memory.peak_bytes_per_run": (results["memory"]["peak_bytes_per_run"], False),
+        "memory.retained_bytes_per_run": (results["memory"]["retained_bytes_per_run"], False),
+    }
+    for schema, timing in results["validation"].items():
+        metrics[f"validation.{schema}.parse_us"] = (timing["parse_us"], False)
+    for level, throughput in results["throughput"].items():
+        metrics[f"throughput.{level}.runs_per_second"] = (throughput["runs_per_second"], True)
+    return metrics
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """List the headline metrics that got worse than the baseline by more than ``tolerance``."""
+    previous = headline_metrics(baseline)
+    regressions = []
+    for name, (value, higher_is_better) in headline_metrics(results).items():
+        if name not in previous or not previous[name][0]:
+            continue
+        before = previous[name][0]
+        change = (value - before) / before
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({"metric": name, "baseline": before, "current": value, "change": round(change, 3)})
+    return regressions
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds every stub model call takes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds per stub call")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per measurement")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY, help="Throughput levels")
+    parser.add_argument("--validation-iterations", type=int, default=2000, help="Parses per schema")
+    parser.add_argument("--bare", action="store_true", help="Run without the metrics and context pruning middleware")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change reported as a regression")
+    args = parser.parse_args()
+    # Silence the builder warning about reusing executor instances
+    logging.getLogger("agent_framework").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        # Overhead and memory run without injected latency so the workflow dominates
+        instant = Runner(StubChatClient(), output_dir, args.bare)
+        delayed = Runner(StubChatClient(latency=args.latency, jitter=args.jitter), output_dir, args.bare)
+        results = {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "settings": {
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "runs": args.runs,
+                "middleware": not args.bare,
+            },
+            "overhead": await benchmark_overhead(instant, args.runs),
+            "overhead_with_latency": await benchmark_overhead(delayed, args.runs),
+            "validation": benchmark_validation(args.validation_iterations),
+            "memory": await benchmark_memory(instant, args.runs),
+            "throughput": await benchmark_throughput(delayed, args.concurrency, args.runs),
+        }
+
+    regressions = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.tolerance)
+        results["baseline"] = {"commit": baseline.get("commit"), "regressions": regressions}
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(json.dumps(results, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
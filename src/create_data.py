@@ -1,7 +1,24 @@
+"""Create the vector store used by file search, or sync it with a document directory
+
+Usage (from src/):
+    uv run python create_data.py
+    uv run python create_data.py --directory guidelines/ [--vector-store-id ID] [--concurrency 8]
+
+Without --directory a new vector store is created from the sample guideline
+file. With --directory every supported file below it is hashed; only new and
+changed files are uploaded (concurrently) and added to the existing vector
+store (VECTOR_STORE_ID, or the one recorded in the manifest), and files that
+were removed from the directory are removed from the store.
+"""
 from azure.identity.aio import AzureCliCredential
 from dotenv import load_dotenv
+import argparse
 import asyncio
+import json
+import logging
+import os
 from agent_framework.azure import AzureAIAgentClient
+from utils.vector_store_ingest import ingest_directory
 
 load_dotenv()
 
@@ -23,12 +40,36 @@ async def create_vector_store(
 
 
 async def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directory", help="Sync this document directory instead of uploading the sample file")
+    parser.add_argument("--vector-store-id", default=os.environ.get("VECTOR_STORE_ID"), help="Vector store to sync")
+    parser.add_argument("--manifest", help="Ingestion manifest (defaults to <directory>/.vector_store_manifest.json)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of concurrent uploads")
+    parser.add_argument("--batch-size", type=int, default=100, help="Files per vector store file batch")
+    parser.add_argument("--keep-removed", action="store_true", help="Keep files that left the directory")
+    args = parser.parse_args()
+
     async with (
         AzureCliCredential() as credential,
         AzureAIAgentClient(credential=credential) as chat_client,
     ):
-        vector_store_id = await create_vector_store(chat_client)
-        print(f"Vector store created with ID: {vector_store_id}")
+        if not args.directory:
+            vector_store_id = await create_vector_store(chat_client)
+            print(f"Vector store created with ID: {vector_store_id}")
+            return
+
+        summary = await ingest_directory(
+            chat_client.agents_client,
+            args.directory,
+            args.manifest or os.path.join(args.directory, ".vector_store_manifest.json"),
+            vector_store_id=args.vector_store_id,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            delete_removed=not args.keep_removed,
+        )
+        print(json.dumps(summary, indent=2))
 
 
 if __name__ == "__main__":
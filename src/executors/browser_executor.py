@@ -0,0 +1,111 @@
+"""Browser Executor - Step 6: Save the HTML visualization and open it without a model call"""
+import asyncio
+import logging
+import time
+import webbrowser
+from pathlib import Path
+
+from agent_framework import ChatMessage, Executor, Role, WorkflowContext, handler
+
+from executors.streaming_agent_executor import StageTimingEvent
+from models.workflow_schemas import BrowserAction
+from utils.browser_helper import is_headless, save_html
+from utils.conversation import estimate_tokens, parse_stage_output
+from utils.metrics import MetricsCollector, run_key
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserExecutor(Executor):
+    """
+    Writes the VisualizerAgent output to disk and opens it, replacing the BrowserAgent.
+
+    The BrowserAgent needed a full model turn to call save_and_open_html,
+    reading the whole conversation and echoing the HTML back as a tool
+    argument. This executor writes the file directly: asynchronously,
+    atomically, named by content hash (an identical render is not written
+    again) and, in headless mode, without ever calling ``webbrowser.open``.
+    """
+
+    def __init__(
+        self,
+        output_dir: str = "output",
+        headless: bool | None = None,
+        metrics: MetricsCollector | None = None,
+        source_agent: str = "VisualizerAgent",
+        id: str = "BrowserAgent",
+    ):
+        """
+        Args:
+            output_dir: Directory the HTML files are written to
+            headless: Never open a browser; None detects it with is_headless()
+            metrics: Collector whose summary of this run is written next to the HTML
+            source_agent: Name of the stage that produced the HTMLVisualization
+            id: Executor id, also used as author name of the BrowserAction
+        """
+        super().__init__(id=id)
+        self.output_dir = output_dir
+        self.headless = is_headless() if headless is None else headless
+        self.metrics = metrics
+        self.source_agent = source_agent
+
+    @handler
+    async def save(self, conversation: list[ChatMessage], ctx: WorkflowContext[list[ChatMessage]]) -> None:
+        start = time.perf_counter()
+        summary = None
+        try:
+            action, html_content, written = await self._save(conversation)
+        finally:
+            # Also when the HTML could not be saved, or the collector would keep the run forever
+            if self.metrics is not None:
+                summary = await self.metrics.finish_run(run_key(conversation))
+        if summary is not None and action.success:
+            metrics_path = Path(action.html_file_path).with_suffix(".metrics.json")
+            await asyncio.to_thread(MetricsCollector.write_summary, metrics_path, summary)
+
+        # The BrowserAgent read the whole conversation and wrote the HTML back as tool arguments
+        input_tokens = sum(estimate_tokens(message.text or "") for message in conversation)
+        await ctx.add_event(StageTimingEvent(self.id, {
+            "stage": self.id,
+            "time_to_output_seconds": round(time.perf_counter() - start, 4),
+            "written": action.success and written,
+            "html_bytes": len(html_content.encode("utf-8")),
+            "estimated_input_tokens_saved": input_tokens,
+            "estimated_output_tokens_saved": estimate_tokens(html_content),
+        }))
+
+        message = ChatMessage(role=Role.ASSISTANT, text=action.model_dump_json(), author_name=self.id)
+        await ctx.send_message([*conversation, message])
+
+    async def _save(self, conversation: list[ChatMessage]) -> tuple[BrowserAction, str, bool]:
+        """Save and open the HTML; the BrowserAction, the HTML and whether it was written."""
+        visualization = parse_stage_output(conversation, self.source_agent)
+        if visualization is None or not visualization.get("html_content"):
+            raise ValueError(f"No HTML visualization found in the output of {self.source_agent}")
+
+        html_content = str(visualization["html_content"])
+        try:
+            file_path, written = await save_html(
+                html_content, str(visualization.get("impairment_name", "")), self.output_dir
+            )
+        except OSError as e:
+            logger.warning("%s: could not save the visualization: %s", self.id, e)
+            return BrowserAction(html_file_path="", success=False, message=f"Error: {e}"), html_content, False
+
+        opened = False
+        if not self.headless:
+            opened = await asyncio.to_thread(webbrowser.open, file_path.absolute().as_uri())
+        action = BrowserAction(
+            html_file_path=str(file_path),
+            success=True,
+            message=f"HTML {'saved to' if written else 'already at'} {file_path}"
+            + (" and opened in browser" if opened else ""),
+        )
+        return action, html_content, written
+
+
+def create_browser_executor(
+    output_dir: str = "output", headless: bool | None = None, metrics: MetricsCollector | None = None
+):
+    """Create the Browser Executor"""
+    return BrowserExecutor(output_dir=output_dir, headless=headless, metrics=metrics)
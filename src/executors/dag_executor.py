@@ -0,0 +1,316 @@
+"""DAG Executor - Run workflow stages as soon as the stages they depend on are done"""
+import asyncio
+import inspect
+import logging
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any
+
+from agent_framework import (
+    AgentExecutor,
+    AgentExecutorResponse,
+    AgentProtocol,
+    ChatMessage,
+    Executor,
+    ExecutorEvent,
+    Role,
+    Workflow,
+    WorkflowBuilder,
+    WorkflowContext,
+    WorkflowOutputEvent,
+    handler,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CriticalPathEvent(ExecutorEvent):
+    """Per-stage timings of a DAG run and the chain of stages that bounded its latency"""
+
+
+@dataclass
+class DagNode:
+    """A stage of the graph: the executor that runs it and the stages whose output it consumes"""
+
+    executor: Executor
+    after: tuple[str, ...] = ()
+    ancestors: tuple[str, ...] = field(default=())
+
+    @property
+    def id(self) -> str:
+        return self.executor.id
+
+
+# Releases of agent-framework-core the stage adapter below was checked against
+STAGE_ADAPTER_VERSIONS = ("1.0.0b251209",)
+
+
+def _check_stage_adapter() -> None:
+    """Fail if Executor.execute no longer takes a runner context, and warn on an unchecked framework release."""
+    if "runner_context" not in inspect.signature(Executor.execute).parameters:
+        raise RuntimeError("This agent_framework release changed Executor.execute; update _StageRunnerContext")
+    try:
+        installed = version("agent-framework-core")
+    except PackageNotFoundError:
+        return
+    if installed not in STAGE_ADAPTER_VERSIONS:
+        logger.warning("DagExecutor stage adapter was checked against agent-framework-core %s, not %s",
+                       ", ".join(STAGE_ADAPTER_VERSIONS), installed)
+
+
+class _StageRunnerContext:
+    """
+    Adapter that lets the DagExecutor run a stage executor itself.
+
+    agent_framework has no public way for an executor to run another one, so
+    this is the only place the DagExecutor relies on a framework internal:
+    ``Executor.execute``, which the workflow runner calls with a
+    RunnerContext. This class implements the part of that protocol a
+    WorkflowContext uses inside a handler, on top of the public
+    WorkflowContext of the DagExecutor: events of the stage (invocation,
+    streaming updates, progress) go to the workflow through ``add_event``,
+    the messages it sends are kept as its output instead of being routed
+    along edges, and outputs it yields itself are dropped, as the DAG yields
+    the merged conversation. ``_check_stage_adapter`` verifies the framework
+    release when a DagExecutor is created.
+    """
+
+    def __init__(self, ctx: WorkflowContext):
+        self._ctx = ctx
+        self.sent: list[Any] = []
+
+    async def send_message(self, message: Any) -> None:
+        self.sent.append(message.data)
+
+    async def add_event(self, event: Any) -> None:
+        if not isinstance(event, WorkflowOutputEvent):
+            await self._ctx.add_event(event)
+
+    def is_streaming(self) -> bool:
+        return self._ctx.is_streaming()
+
+    async def add_request_info_event(self, event: Any) -> None:
+        raise RuntimeError(f"Stage {event.source_executor_id!r} asked for user input, which a DagExecutor does not route")
+
+    async def run(self, executor: Executor, conversation: list[ChatMessage], source_ids: list[str]) -> list[Any]:
+        """Run ``executor`` on ``conversation`` and return the messages it sent."""
+        await executor.execute(conversation, source_ids, self._ctx.shared_state, self)
+        return self.sent
+
+
+def _new_messages(sent: list[Any], conversation: list[ChatMessage]) -> list[ChatMessage]:
+    """The messages a stage added to the conversation it was given."""
+    for message in reversed(sent):
+        if isinstance(message, AgentExecutorResponse):
+            return list(message.agent_run_response.messages)
+        if isinstance(message, list):
+            # Like in a sequential workflow, executors send the conversation with their output appended
+            return message[len(conversation):]
+    raise RuntimeError("Stage sent no conversation")
+
+
+def critical_path(nodes: Sequence[DagNode], timings: dict[str, dict[str, float]]) -> dict[str, Any]:
+    """
+    The chain of stages that determined when a DAG run finished.
+
+    Starting from the stage that finished last, every step goes to the
+    dependency that finished last, as that one made the stage ready. The
+    slack of a stage is how much longer it could have taken without delaying
+    the run, given the measured durations of the others.
+
+    Args:
+        nodes: The stages in topological order
+        timings: Per stage id, "started_at" and "finished_at" in seconds since the start of the run
+
+    Returns:
+        The critical path, its total seconds and the duration and slack of every stage
+    """
+    end = max(timing["finished_at"] for timing in timings.values())
+    by_id = {node.id: node for node in nodes}
+    path = [max(timings, key=lambda node_id: timings[node_id]["finished_at"])]
+    while by_id[path[-1]].after:
+        path.append(max(by_id[path[-1]].after, key=lambda node_id: timings[node_id]["finished_at"]))
+    path.reverse()
+
+    latest_finish = {node.id: end for node in nodes}
+    for node in reversed(nodes):
+        duration = timings[node.id]["finished_at"] - timings[node.id]["started_at"]
+        for dependency in node.after:
+            latest_finish[dependency] = min(latest_finish[dependency], latest_finish[node.id] - duration)
+    return {
+        "critical_path": path,
+        "total_seconds": round(end, 3),
+        "stages": {
+            node.id: {
+                "started_at": round(timings[node.id]["started_at"], 3),
+                "seconds": round(timings[node.id]["finished_at"] - timings[node.id]["started_at"], 3),
+                "slack_seconds": round(max(0.0, latest_finish[node.id] - timings[node.id]["finished_at"]), 3),
+            }
+            for node in nodes
+        },
+    }
+
+
+class _DagInput(Executor):
+    """Turns the workflow input into the request conversation, as in a sequential workflow"""
+
+    @handler
+    async def from_str(self, prompt: str, ctx: WorkflowContext[list[ChatMessage]]) -> None:
+        await ctx.send_message([ChatMessage(role=Role.USER, text=prompt)])
+
+    @handler
+    async def from_message(self, message: ChatMessage, ctx: WorkflowContext[list[ChatMessage]]) -> None:
+        await ctx.send_message([message])
+
+    @handler
+    async def from_messages(self, messages: list[str | ChatMessage], ctx: WorkflowContext[list[ChatMessage]]) -> None:
+        await ctx.send_message(
+            [m if isinstance(m, ChatMessage) else ChatMessage(role=Role.USER, text=m) for m in messages]
+        )
+
+
+class DagExecutor(Executor):
+    """
+    Runs a dependency graph of stages, each as soon as the stages it depends on are done.
+
+    A workflow superstep waits for every executor in it, so in a graph of
+    plain edges a stage still waits for unrelated, slower stages of the same
+    step. This executor schedules the stages itself: every stage starts the
+    moment its last dependency finishes. A stage gets the request followed by
+    the outputs of all stages it depends on, directly or indirectly, in graph
+    order, so a chain sees exactly the conversation a sequential workflow
+    would pass on. The stages emit their usual events (invoked, streaming
+    updates, progress, completed); at the end a CriticalPathEvent reports
+    their timings and which chain of stages bounded the latency, and the
+    conversation of the request and every stage output is yielded.
+
+    Stages that ask for user input (``ctx.request_info``) are not supported,
+    as the responses are routed to executors of the workflow itself.
+    """
+
+    def __init__(self, nodes: Sequence[DagNode], id: str = "dag"):
+        """
+        Args:
+            nodes: The stages in topological order, with their dependencies and ancestors
+            id: Executor id
+        """
+        _check_stage_adapter()
+        super().__init__(id=id)
+        self._nodes = tuple(nodes)
+        self.last_run: dict[str, Any] | None = None
+
+    @property
+    def nodes(self) -> tuple[DagNode, ...]:
+        """The stages in topological order; their executors are not part of the workflow itself."""
+        return self._nodes
+
+    async def _run_node(
+        self, node: DagNode, conversation: list[ChatMessage], ctx: WorkflowContext
+    ) -> list[ChatMessage]:
+        sent = await _StageRunnerContext(ctx).run(node.executor, list(conversation), list(node.after) or [self.id])
+        return _new_messages(sent, conversation)
+
+    @handler
+    async def run(self, conversation: list[ChatMessage], ctx: WorkflowContext[Any, list[ChatMessage]]) -> None:
+        start = time.perf_counter()
+        outputs: dict[str, list[ChatMessage]] = {}
+        timings: dict[str, dict[str, float]] = {}
+        tasks: dict[asyncio.Task, DagNode] = {}
+        pending = list(self.nodes)
+
+        def start_ready() -> None:
+            for node in [node for node in pending if all(dependency in outputs for dependency in node.after)]:
+                pending.remove(node)
+                context = [*conversation, *(m for ancestor in node.ancestors for m in outputs[ancestor])]
+                timings[node.id] = {"started_at": time.perf_counter() - start}
+                tasks[asyncio.create_task(self._run_node(node, context, ctx))] = node
+
+        try:
+            start_ready()
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    node = tasks.pop(task)
+                    outputs[node.id] = task.result()
+                    timings[node.id]["finished_at"] = time.perf_counter() - start
+                start_ready()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.last_run = critical_path(self.nodes, timings)
+        logger.info("%s: critical path %s (%.2fs)", self.id, " -> ".join(self.last_run["critical_path"]),
+                    self.last_run["total_seconds"])
+        await ctx.add_event(CriticalPathEvent(self.id, self.last_run))
+        await ctx.yield_output([*conversation, *(m for node in self.nodes for m in outputs[node.id])])
+
+
+class DagBuilder:
+    """
+    Builds a workflow of stages that declare which earlier stages they consume.
+
+    Like SequentialBuilder, participants are agents (run in an AgentExecutor)
+    or executors that take and send on a ``list[ChatMessage]``, and the
+    workflow yields the conversation of the request and every stage output.
+    Unlike it, stages that do not depend on each other run at the same time.
+    Stages must be added after the stages they depend on, which rules out
+    cycles. A chain of stages behaves like the sequential workflow, in two
+    supersteps instead of two per stage.
+
+    Usage:
+
+    .. code-block:: python
+
+        workflow = (
+            DagBuilder()
+            .add(docs_agent)
+            .add(issue_agent)
+            .add(summary_agent, after=["DocsAgent", "IssueAgent"])
+            .build()
+        )
+    """
+
+    def __init__(self, id: str = "dag"):
+        """
+        Args:
+            id: Id of the executor running the graph, the source of its CriticalPathEvent
+        """
+        self.id = id
+        self._nodes: list[DagNode] = []
+
+    def add(self, participant: AgentProtocol | Executor, after: Sequence[str] = (), id: str | None = None) -> "DagBuilder":
+        """
+        Add a stage.
+
+        Args:
+            participant: An agent, or an executor handling ``list[ChatMessage]``
+            after: Ids of the stages whose output this one consumes; empty to start with the request
+            id: Stage id of an agent; defaults to its name. Executors keep their own id.
+        """
+        executor = participant if isinstance(participant, Executor) else AgentExecutor(
+            participant, id=id or getattr(participant, "name", None) or type(participant).__name__
+        )
+        known = {node.id: node for node in self._nodes}
+        if executor.id in known or executor.id in (self.id, "input-conversation"):
+            raise ValueError(f"Duplicate stage id {executor.id!r}")
+        unknown = [dependency for dependency in after if dependency not in known]
+        if unknown:
+            raise ValueError(f"Stage {executor.id!r} depends on {unknown}, which must be added before it")
+        closure = set(after)
+        for dependency in after:
+            closure.update(known[dependency].ancestors)
+        ancestors = tuple(node.id for node in self._nodes if node.id in closure)
+        self._nodes.append(DagNode(executor, tuple(dict.fromkeys(after)), ancestors))
+        return self
+
+    def build(self) -> Workflow:
+        if not self._nodes:
+            raise ValueError("No stages added. Call .add(...) first.")
+        # The DAG runs in a superstep of its own rather than as the start executor, whose events
+        # are only streamed once it is done
+        entry, dag = _DagInput(id="input-conversation"), DagExecutor(self._nodes, id=self.id)
+        return WorkflowBuilder().set_start_executor(entry).add_edge(entry, dag).build()
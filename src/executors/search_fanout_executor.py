@@ -0,0 +1,177 @@
+"""Search Fan-Out Executor - Step 2: Run retrieval for every search query concurrently"""
+import asyncio
+import logging
+import time
+
+from agent_framework import AgentProtocol, ChatMessage, Executor, Role, WorkflowContext, handler
+
+from executors.streaming_agent_executor import StageProgressEvent, StageTimingEvent
+from models.workflow_schemas import RetrievedDocuments
+from utils.conversation import extract_json, parse_stage_output
+
+logger = logging.getLogger(__name__)
+
+
+def collect_queries(search_queries: dict) -> list[str]:
+    """Return the distinct queries of a SearchQueries output, primary query first."""
+    queries = [
+        search_queries.get("primary_search_query"),
+        *(search_queries.get("alternative_queries") or []),
+        search_queries.get("risk_focused_query"),
+        search_queries.get("clinical_decision_query"),
+    ]
+    seen = set()
+    distinct = []
+    for query in queries:
+        if isinstance(query, str) and query.strip() and query.strip().lower() not in seen:
+            seen.add(query.strip().lower())
+            distinct.append(query.strip())
+    return distinct
+
+
+def _document_key(document: dict) -> str:
+    url = str(document.get("url") or "").strip().lower().rstrip("/")
+    for prefix in ("https://", "http://", "www."):
+        url = url.removeprefix(prefix)
+    return url or str(document.get("title") or "").strip().lower()
+
+
+def merge_documents(impairment_name: str, results: list[list[dict]]) -> RetrievedDocuments:
+    """
+    Merge the documents of several retrieval branches into one RetrievedDocuments.
+
+    Documents are deduplicated by URL (or title when there is no URL) and
+    ranked by the number of branches that returned them; ties keep the order
+    in which they were first seen, so the primary query wins.
+
+    Args:
+        impairment_name: The impairment being researched
+        results: The documents returned per branch, in query order
+
+    Returns:
+        The merged, ranked documents
+    """
+    documents: dict[str, dict[str, str]] = {}
+    hits: dict[str, int] = {}
+    for branch_documents in results:
+        branch_keys = set()
+        for document in branch_documents:
+            key = _document_key(document)
+            if not key:
+                continue
+            if key not in documents:
+                documents[key] = {name: str(value) for name, value in document.items() if value is not None}
+            branch_keys.add(key)
+        for key in branch_keys:
+            hits[key] = hits.get(key, 0) + 1
+
+    ranked = sorted(documents, key=lambda key: -hits[key])
+    return RetrievedDocuments(
+        impairment_name=impairment_name,
+        documents=[documents[key] for key in ranked],
+        total_documents_found=len(ranked),
+    )
+
+
+class SearchFanOutExecutor(Executor):
+    """
+    Runs the SearchAgent once per search query with bounded concurrency.
+
+    The SearchQueries output of the previous stage is split into its
+    independent queries; every query is sent to the retrieval agent in its
+    own branch and the results are merged into a single RetrievedDocuments
+    message, so downstream stages see the same shape as with one SearchAgent call.
+    """
+
+    def __init__(
+        self,
+        agent: AgentProtocol,
+        max_workers: int = 4,
+        source_agent: str = "SearchPromptAgent",
+        id: str = "SearchAgent",
+    ):
+        """
+        Args:
+            agent: The retrieval agent run for every query
+            max_workers: Maximum number of branches running at the same time
+            source_agent: Name of the stage that produced the SearchQueries
+            id: Executor id, also used as author name of the merged output
+        """
+        super().__init__(id=id)
+        self.agent = agent
+        self.max_workers = max(1, max_workers)
+        self.source_agent = source_agent
+
+    async def _retrieve(
+        self, request: list[ChatMessage], impairment_name: str, query: str, semaphore: asyncio.Semaphore
+    ) -> list[dict]:
+        prompt = ChatMessage(role=Role.USER, text=f"Impairment: {impairment_name}\nSearch query: {query}")
+        async with semaphore:
+            # The original request comes first, so per-run metrics group the branches with their workflow run
+            response = await self.agent.run([*request, prompt])
+        payload = extract_json(response.text)
+        documents = payload.get("documents") if isinstance(payload, dict) else None
+        if not isinstance(documents, list):
+            raise ValueError("Retrieval branch returned no documents list")
+        return [document for document in documents if isinstance(document, dict)]
+
+    @handler
+    async def retrieve(self, conversation: list[ChatMessage], ctx: WorkflowContext[list[ChatMessage]]) -> None:
+        search_queries = parse_stage_output(conversation, self.source_agent)
+        queries = collect_queries(search_queries) if search_queries else []
+        if not queries:
+            # Nothing to fan out: fall back to a single call on the whole conversation
+            logger.warning("%s: no SearchQueries found, running a single retrieval call", self.id)
+            response = await self.agent.run(conversation)
+            message = ChatMessage(role=Role.ASSISTANT, text=response.text, author_name=self.id)
+            await ctx.send_message([*conversation, message])
+            return
+
+        impairment_name = str(search_queries.get("impairment_name", ""))
+        request = [message for message in conversation if message.role == Role.USER][:1]
+        semaphore = asyncio.Semaphore(self.max_workers)
+        start = time.perf_counter()
+
+        async def branch(query: str) -> tuple[list[dict] | Exception, float]:
+            try:
+                documents = await self._retrieve(request, impairment_name, query, semaphore)
+            except Exception as e:
+                return e, time.perf_counter() - start
+            latency = time.perf_counter() - start
+            await ctx.add_event(StageProgressEvent(self.id, {
+                "stage": self.id,
+                "kind": "search_branch",
+                "query": query,
+                "documents": len(documents),
+                "elapsed_seconds": round(latency, 3),
+            }))
+            return documents, latency
+
+        outcomes = await asyncio.gather(*(branch(query) for query in queries))
+
+        results = []
+        for query, (outcome, _) in zip(queries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning("%s: retrieval for %r failed: %s", self.id, query, outcome)
+            else:
+                results.append(outcome)
+        if not results:
+            raise RuntimeError(f"All {len(queries)} retrieval branches failed for {impairment_name!r}")
+
+        merged = merge_documents(impairment_name, results)
+        await ctx.add_event(StageTimingEvent(self.id, {
+            "stage": self.id,
+            "branches": len(queries),
+            "failed_branches": len(queries) - len(results),
+            "max_workers": self.max_workers,
+            "branch_latency_seconds": [round(latency, 3) for _, latency in outcomes],
+            "time_to_output_seconds": round(time.perf_counter() - start, 3),
+        }))
+
+        message = ChatMessage(role=Role.ASSISTANT, text=merged.model_dump_json(), author_name=self.id)
+        await ctx.send_message([*conversation, message])
+
+
+def create_search_fanout_executor(agent: AgentProtocol, max_workers: int = 4):
+    """Create the Search Fan-Out Executor around a SearchAgent"""
+    return SearchFanOutExecutor(agent, max_workers=max_workers)
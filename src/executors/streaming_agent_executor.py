@@ -0,0 +1,222 @@
+"""Streaming Agent Executor - Parse structured stage output while it is being generated"""
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from functools import cache
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any
+
+from agent_framework import (
+    AgentExecutor,
+    AgentProtocol,
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    AgentRunUpdateEvent,
+    ChatAgent,
+    ExecutorEvent,
+    FunctionApprovalRequestContent,
+    FunctionApprovalResponseContent,
+    WorkflowContext,
+)
+
+from utils.incremental_json import IncrementalJsonParser, JsonPath, format_path, path_matches
+from utils.lazy_agent import LazyAgent
+
+logger = logging.getLogger(__name__)
+
+# agent_framework releases whose AgentExecutor._run_agent_streaming StreamingAgentExecutor was checked against
+STREAMING_OVERRIDE_VERSIONS = ("1.0.0b251209",)
+# Private AgentExecutor state the override reads and writes
+AGENT_EXECUTOR_STATE = ("_agent", "_agent_thread", "_cache", "_pending_agent_requests")
+
+# (kind, predicate on the JSON path of a completed value)
+ProgressRule = tuple[str, Callable[[JsonPath], bool]]
+
+
+def _pattern(*pattern: str | int) -> Callable[[JsonPath], bool]:
+    return lambda path: path_matches(path, pattern)
+
+
+def _is_tree_node(path: JsonPath) -> bool:
+    """root_node, root_node.children[i], root_node.children[i].children[j], ..."""
+    return (
+        len(path) % 2 == 1
+        and path[0] == "root_node"
+        and all(path[i] == "children" and isinstance(path[i + 1], int) for i in range(1, len(path), 2))
+    )
+
+
+STAGE_PROGRESS: dict[str, list[ProgressRule]] = {
+    "SearchPromptAgent": [
+        ("query", _pattern("primary_search_query")),
+        ("query", _pattern("alternative_queries", "*")),
+        ("query", _pattern("risk_focused_query")),
+        ("query", _pattern("clinical_decision_query")),
+    ],
+    "SearchAgent": [
+        ("document", _pattern("documents", "*")),
+    ],
+    "RiskAnalyzerAgent": [
+        (field, _pattern(field, "*"))
+        for field in ("risk_factors", "severity_indicators", "complications", "diagnostic_criteria", "decision_points")
+    ],
+    "DecisionTreeAgent": [
+        ("tree_node", _is_tree_node),
+    ],
+}
+
+
+@cache
+def _streaming_override_supported() -> bool:
+    """
+    Whether StreamingAgentExecutor may replace AgentExecutor._run_agent_streaming.
+
+    The override is a private method of AgentExecutor and uses its private
+    state (AGENT_EXECUTOR_STATE), so it is only used on the releases in
+    STREAMING_OVERRIDE_VERSIONS. On others the executor streams like a plain
+    AgentExecutor, without progress events or early hand-off.
+    """
+    try:
+        installed = version("agent-framework-core")
+    except PackageNotFoundError:
+        installed = None
+    if installed not in STREAMING_OVERRIDE_VERSIONS:
+        logger.warning("StreamingAgentExecutor does not parse stage output with agent-framework-core %s "
+                       "(checked against %s)", installed, ", ".join(STREAMING_OVERRIDE_VERSIONS))
+        return False
+    return True
+
+
+class StageProgressEvent(ExecutorEvent):
+    """A finished sub-object of a stage output, e.g. one query, document or tree node"""
+
+
+class StageTimingEvent(ExecutorEvent):
+    """Per-stage latencies: first token, first progress event and complete output"""
+
+
+def _summarize(kind: str, value: Any) -> Any:
+    """Strip nested children from tree nodes so progress events stay small."""
+    if kind == "tree_node" and isinstance(value, dict):
+        return {**{k: v for k, v in value.items() if k != "children"}, "children_count": len(value.get("children") or [])}
+    return value
+
+
+class StreamingAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that parses the structured output of its agent while it streams.
+
+    When the workflow runs in streaming mode (``workflow.run_stream``, which
+    is what devui uses), every update is fed to an IncrementalJsonParser:
+
+    - each completed sub-object matching one of the progress rules is sent to
+      the client as a StageProgressEvent (queries generated, documents selected,
+      tree nodes produced, ...)
+    - as soon as the top-level JSON object is complete, the response is handed
+      to the next stage; the rest of the stream (closing code fence, run
+      completion and usage updates) is drained in the background
+    - a StageTimingEvent reports time to first token, to first progress event
+      and to the complete output
+
+    In non-streaming mode, and on agent_framework releases it was not checked
+    against (see ``_streaming_override_supported``), it behaves exactly like
+    AgentExecutor.
+    """
+
+    def __init__(self, agent: AgentProtocol, progress_rules: list[ProgressRule] | None = None, **kwargs):
+        super().__init__(agent, **kwargs)
+        self.progress_rules = STAGE_PROGRESS.get(self.id, []) if progress_rules is None else progress_rules
+        self._drain_task: asyncio.Task | None = None
+        self._parse_stream = _streaming_override_supported() and all(
+            hasattr(self, name) for name in AGENT_EXECUTOR_STATE
+        )
+
+    def _watch(self, path: JsonPath) -> bool:
+        return any(matches(path) for _, matches in self.progress_rules)
+
+    def _kind(self, path: JsonPath) -> str:
+        return next(kind for kind, matches in self.progress_rules if matches(path))
+
+    def _build_response(self, updates: list[AgentRunResponseUpdate]) -> AgentRunResponse:
+        agent = self._agent.agent if isinstance(self._agent, LazyAgent) else self._agent
+        if isinstance(agent, ChatAgent):
+            return AgentRunResponse.from_agent_run_response_updates(
+                updates, output_format_type=agent.chat_options.response_format
+            )
+        return AgentRunResponse.from_agent_run_response_updates(updates)
+
+    async def _drain(self, stream, start: float) -> None:
+        """Consume the remainder of a stream that was handed off early."""
+        try:
+            async for _ in stream:
+                pass
+        except Exception as e:
+            logger.warning("%s: error after the output was handed off: %s", self.id, e)
+        logger.debug("%s: stream finished after %.2fs", self.id, time.perf_counter() - start)
+
+    async def _run_agent_streaming(self, ctx: WorkflowContext) -> AgentRunResponse | None:
+        if not self._parse_stream:
+            return await super()._run_agent_streaming(ctx)
+
+        # The agent thread must not be used while the previous run is still draining
+        if self._drain_task is not None:
+            await self._drain_task
+            self._drain_task = None
+
+        start = time.perf_counter()
+        timings: dict[str, float] = {}
+        parser = IncrementalJsonParser(watch=self._watch)
+        updates: list[AgentRunResponseUpdate] = []
+        user_input_requests: list[FunctionApprovalRequestContent] = []
+        stream = self._agent.run_stream(self._cache, thread=self._agent_thread).__aiter__()
+
+        async for update in stream:
+            updates.append(update)
+            await ctx.add_event(AgentRunUpdateEvent(self.id, update))
+            if update.user_input_requests:
+                user_input_requests.extend(update.user_input_requests)
+
+            if not update.text or parser.done:
+                continue
+            timings.setdefault("time_to_first_token_seconds", time.perf_counter() - start)
+            try:
+                completed = parser.feed(update.text)
+            except (ValueError, IndexError) as e:
+                # Not JSON after all: keep streaming, just without progress events
+                logger.debug("%s: output is not incrementally parseable: %s", self.id, e)
+                parser.done = True
+                continue
+
+            for path, value in completed:
+                timings.setdefault("time_to_first_progress_seconds", time.perf_counter() - start)
+                kind = self._kind(path)
+                await ctx.add_event(StageProgressEvent(self.id, {
+                    "stage": self.id,
+                    "kind": kind,
+                    "path": format_path(path),
+                    "value": _summarize(kind, value),
+                    "elapsed_seconds": round(time.perf_counter() - start, 3),
+                }))
+
+            if parser.result is not None and not user_input_requests:
+                self._drain_task = asyncio.create_task(self._drain(stream, start))
+                break
+
+        timings["time_to_output_seconds"] = time.perf_counter() - start
+        timings = {name: round(value, 3) for name, value in timings.items()}
+        logger.info("%s: %s", self.id, timings)
+        await ctx.add_event(StageTimingEvent(self.id, {"stage": self.id, **timings}))
+
+        if user_input_requests:
+            for user_input_request in user_input_requests:
+                self._pending_agent_requests[user_input_request.id] = user_input_request
+                await ctx.request_info(user_input_request, FunctionApprovalResponseContent)
+            return None
+
+        return self._build_response(updates)
+
+
+def create_streaming_executor(agent: AgentProtocol) -> StreamingAgentExecutor:
+    """Wrap a structured-output agent in a StreamingAgentExecutor"""
+    return StreamingAgentExecutor(agent)
@@ -0,0 +1,32 @@
+"""Visualizer Executor - Step 5: Render the decision tree into HTML without a model call"""
+from agent_framework import ChatMessage, Executor, Role, WorkflowContext, handler
+
+from models.workflow_schemas import HTMLVisualization
+from utils.conversation import parse_stage_output
+from utils.diagram_renderer import render_decision_tree_html
+
+
+class VisualizerExecutor(Executor):
+    """Fills the rmv-diagram template from the DecisionTreeAgent output"""
+
+    def __init__(self, source_agent: str = "DecisionTreeAgent", id: str = "VisualizerAgent"):
+        super().__init__(id=id)
+        self.source_agent = source_agent
+
+    @handler
+    async def render(self, conversation: list[ChatMessage], ctx: WorkflowContext[list[ChatMessage]]) -> None:
+        tree = parse_stage_output(conversation, self.source_agent)
+        if tree is None or "root_node" not in tree:
+            raise ValueError(f"No decision tree found in the output of {self.source_agent}")
+
+        visualization = HTMLVisualization(
+            impairment_name=str(tree.get("impairment_name", "")),
+            html_content=render_decision_tree_html(tree),
+        )
+        message = ChatMessage(role=Role.ASSISTANT, text=visualization.model_dump_json(), author_name=self.id)
+        await ctx.send_message([*conversation, message])
+
+
+def create_visualizer_executor():
+    """Create the Visualizer Executor"""
+    return VisualizerExecutor()
@@ -0,0 +1,57 @@
+"""Build and maintain the local BM25 index searched by the SearchAgent
+
+Usage (from src/):
+    uv run python index_documents.py add corpus/ [--index index/medical]
+    uv run python index_documents.py delete https://example.org/guideline.html
+    uv run python index_documents.py compact
+    uv run python index_documents.py search "type 2 diabetes mortality risk"
+
+``add`` indexes every .md/.txt/.json/.jsonl document below a directory into a
+new segment (documents whose url is already indexed are replaced). Point
+SEARCH_INDEX_DIR (or batch.py --search-index) at the index to use it.
+"""
+import argparse
+import json
+import time
+
+from utils.bm25_index import BM25Index, read_documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", default="index/medical", help="Index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Index the documents below a directory")
+    add.add_argument("corpus", help="Directory of .md/.txt/.json/.jsonl documents")
+    add.add_argument("--compact", action="store_true", help="Merge all segments after adding")
+    delete = commands.add_parser("delete", help="Remove documents by url")
+    delete.add_argument("urls", nargs="+")
+    commands.add_parser("compact", help="Merge all segments and drop deleted documents")
+    search = commands.add_parser("search", help="Run a query against the index")
+    search.add_argument("query")
+    search.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with BM25Index(args.index) as index:
+        if args.command == "add":
+            result = {"added": index.add_documents(read_documents(args.corpus))}
+            if args.compact:
+                index.compact()
+        elif args.command == "delete":
+            result = {"deleted": index.delete_documents(args.urls)}
+        elif args.command == "compact":
+            index.compact()
+            result = {}
+        else:
+            result = {"results": index.search(args.query, args.top_k)}
+        result.update({
+            "documents": len(index),
+            "segments": len(index.segments),
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+        })
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
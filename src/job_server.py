@@ -0,0 +1,311 @@
+"""Job API: submit impairments over HTTP and collect the decision trees when they are ready
+
+Usage (from src/):
+    uv run python job_server.py [--port 8091] [--workers 4] [--max-queue 100] [--db jobs/jobs.db]
+
+To use more than one core, serve the API without workers and run the jobs
+in worker processes, on this host or any other that shares the database:
+
+    uv run python job_server.py --workers 0
+    uv run python job_server.py --worker-only --processes 4 --workers 4
+
+Unlike the DevUI of main.py, which keeps a request open for the whole
+multi-minute workflow, every request returns at once:
+
+    POST   /jobs               {"impairment_name": "...", "priority": 0}
+                               -> 202 with the job, or 429 with Retry-After when the queue is full
+    GET    /jobs?status=queued -> the most recent jobs
+    GET    /jobs/{id}          -> status, queue position, per-stage progress and, once done, the result
+    GET    /jobs/{id}/events   -> server-sent events: the progress so far, then live until the job finishes
+    DELETE /jobs/{id}          -> cancels a queued or running job
+    GET    /health             -> queue depth, busy workers and job counts
+
+Jobs are kept in a SQLite database, so queued jobs and results survive a
+restart. Workers lease the jobs they run; the jobs of a worker that dies are
+run again by the others once its leases run out (--lease-seconds). Metrics
+are served on JOB_METRICS_PORT (9474), worker processes use the ports after it.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import signal
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from agent_framework import ExecutorCompletedEvent, ExecutorInvokedEvent, WorkflowFailedEvent, WorkflowOutputEvent
+from aiohttp import web
+from dotenv import load_dotenv
+
+from executors.dag_executor import CriticalPathEvent
+from executors.streaming_agent_executor import StageProgressEvent, StageTimingEvent
+from utils.conversation import parse_stage_output
+from utils.job_service import JobService, QueueFullError
+from utils.job_store import JobStore
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAX_PRIORITY = 10
+
+
+async def run_workflow_job(
+    workflow, impairment_name: str, report: Callable[[dict[str, Any]], Awaitable[None]]
+) -> dict:
+    """
+    Run the workflow for one job, reporting the start, progress and end of every stage and the critical path.
+
+    Args:
+        workflow: A workflow, or a CoalescingWorkflow so jobs for the same impairment share a run
+        impairment_name: The impairment to assess
+        report: Awaited with every progress event
+
+    Returns:
+        Dict with the DecisionTree and the rendered HTML, like batch.run_impairment
+    """
+    conversation = None
+    async for event in workflow.run_stream(impairment_name):
+        if isinstance(event, (StageProgressEvent, StageTimingEvent)):
+            kind = "stage_progress" if isinstance(event, StageProgressEvent) else "stage_timing"
+            await report({"event": kind, "stage": event.executor_id, "data": event.data})
+        elif isinstance(event, CriticalPathEvent):
+            await report({"event": "critical_path", "data": event.data})
+        elif isinstance(event, ExecutorInvokedEvent):
+            await report({"event": "stage_started", "stage": event.executor_id})
+        elif isinstance(event, ExecutorCompletedEvent):
+            await report({"event": "stage_completed", "stage": event.executor_id})
+        elif isinstance(event, WorkflowOutputEvent):
+            conversation = event.data
+        elif isinstance(event, WorkflowFailedEvent):
+            raise RuntimeError(f"{event.details.error_type}: {event.details.message}")
+    if conversation is None:
+        raise RuntimeError("Workflow finished without output")
+
+    visualization = parse_stage_output(conversation, "VisualizerAgent") or {}
+    return {
+        "decision_tree": parse_stage_output(conversation, "DecisionTreeAgent"),
+        "html_content": visualization.get("html_content"),
+    }
+
+
+def create_app(service: JobService) -> web.Application:
+    """The HTTP API of a JobService; the service is started and stopped with the app."""
+    routes = web.RouteTableDef()
+
+    def not_found(job_id: str) -> web.Response:
+        return web.json_response({"error": f"No job {job_id}"}, status=404)
+
+    @routes.post("/jobs")
+    async def submit(request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+            impairment_name = " ".join(str(body["impairment_name"]).split())
+            priority = int(body.get("priority", 0))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return web.json_response({"error": 'Expected {"impairment_name": "...", "priority": 0}'}, status=400)
+        if not impairment_name or not -MAX_PRIORITY <= priority <= MAX_PRIORITY:
+            return web.json_response(
+                {"error": f"impairment_name must not be empty and priority within ±{MAX_PRIORITY}"}, status=400
+            )
+        try:
+            job = await service.submit(impairment_name, priority)
+        except QueueFullError as e:
+            return web.json_response(
+                {"error": str(e), "queued": e.depth},
+                status=429,
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
+        job = await service.get(job["id"])
+        return web.json_response(job, status=202, headers={"Location": f"/jobs/{job['id']}"})
+
+    @routes.get("/jobs")
+    async def list_jobs(request: web.Request) -> web.Response:
+        try:
+            limit = min(int(request.query.get("limit", "100")), 1000)
+        except ValueError:
+            return web.json_response({"error": "limit must be a number"}, status=400)
+        return web.json_response(await asyncio.to_thread(service.store.list, request.query.get("status"), limit))
+
+    @routes.get("/jobs/{job_id}")
+    async def get_job(request: web.Request) -> web.Response:
+        job = await service.get(request.match_info["job_id"])
+        return web.json_response(job) if job else not_found(request.match_info["job_id"])
+
+    @routes.get("/jobs/{job_id}/events")
+    async def job_events(request: web.Request) -> web.StreamResponse:
+        job_id = request.match_info["job_id"]
+        if await asyncio.to_thread(service.store.get, job_id) is None:
+            return not_found(job_id)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        async for event in service.events(job_id):
+            lines = f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n"
+            if "seq" in event:
+                lines = f"id: {event['seq']}\n" + lines
+            await response.write((lines + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    @routes.delete("/jobs/{job_id}")
+    async def cancel_job(request: web.Request) -> web.Response:
+        job_id = request.match_info["job_id"]
+        if await service.cancel(job_id):
+            return web.json_response({"id": job_id, "cancelled": True}, status=202)
+        job = await asyncio.to_thread(service.store.get, job_id)
+        if job is None:
+            return not_found(job_id)
+        return web.json_response({"error": f"Job {job_id} already {job['status']}"}, status=409)
+
+    @routes.get("/health")
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(await service.status())
+
+    async def lifecycle(app: web.Application):
+        await service.start()
+        yield
+        await service.close()
+
+    app = web.Application()
+    app.add_routes(routes)
+    app.cleanup_ctx.append(lifecycle)
+    return app
+
+
+def build_job_runner(workers: int, metrics_port: int | None) -> tuple[Callable, Callable]:
+    """
+    The Azure-backed workflow of main.py, wrapped as a job runner.
+
+    Returns:
+        ``run_job(impairment_name, report)`` for a JobService, whose results include the per-stage
+        metrics of the run, and an async function closing its clients
+    """
+    from azure.identity.aio import AzureCliCredential
+    from pipeline import build_workflow, get_settings, stage_setup_from_env
+    from utils.client_factory import AgentClientFactory
+    from utils.metrics import MetricsCollector
+    from utils.single_flight import CoalescingWorkflow
+
+    settings = get_settings(AzureCliCredential())
+    metrics = MetricsCollector()
+    if metrics_port:
+        metrics.serve(metrics_port)
+    client_factory = AgentClientFactory(**settings, trace_configs=[metrics.trace_config()])
+    # The same middleware and retrieval tools as main.py
+    setup = stage_setup_from_env(metrics)
+
+    # Jobs for the same impairment that run at the same time in this process share one workflow run
+    workflow = CoalescingWorkflow(
+        lambda: build_workflow(
+            client_factory, open_browser=False, middleware=setup.middleware, search_tools=setup.search_tools,
+            metrics=metrics,
+        ),
+        key=setup.request_key,
+        max_idle=workers,
+    )
+
+    async def run_job(impairment_name: str, report: Callable[[dict[str, Any]], Awaitable[None]]) -> dict:
+        # Metrics key workflow runs on the name as submitted; without the BrowserAgent step nothing
+        # else finishes them, so they are popped here like in batch.py
+        try:
+            result = await run_workflow_job(workflow, impairment_name, report)
+        except BaseException:
+            metrics.pop_run(impairment_name)
+            raise
+        result["metrics"] = await metrics.finish_run(impairment_name)
+        return result
+
+    async def close() -> None:
+        await client_factory.close()
+        metrics.close()
+
+    return run_job, close
+
+
+def metrics_port_from_env() -> int:
+    """Metrics port of the API process; worker processes serve theirs on the following ports."""
+    # Not METRICS_PORT: the job server runs next to the DevUI of main.py, which serves its metrics there
+    return int(os.environ.get("JOB_METRICS_PORT", "9474"))
+
+
+def open_store(args: argparse.Namespace) -> JobStore:
+    return JobStore(args.db, journal_mode=args.journal_mode)
+
+
+async def run_worker(args: argparse.Namespace, index: int) -> None:
+    """Run jobs from the shared database until SIGINT or SIGTERM, without serving the API."""
+    metrics_port = metrics_port_from_env() + 1 + index
+    run_job, close = build_job_runner(args.workers, metrics_port)
+    service = JobService(open_store(args), run_job, workers=args.workers, lease_seconds=args.lease_seconds)
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+    logger.info("Worker %s running %d jobs at a time from %s", service.worker_id, args.workers, args.db)
+    try:
+        async with service:
+            await stop.wait()
+    finally:
+        await close()
+        service.store.close()
+
+
+def worker_process(args: argparse.Namespace, index: int) -> None:
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(message)s")
+    asyncio.run(run_worker(args, index))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("JOB_SERVER_PORT", "8091")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("JOB_WORKERS", "4")),
+                        help="Number of workflows every process runs at the same time; 0 only serves the API")
+    parser.add_argument("--max-queue", type=int, default=int(os.environ.get("JOB_MAX_QUEUE", "100")),
+                        help="Maximum number of queued jobs before submissions are rejected with 429")
+    parser.add_argument("--db", default=os.environ.get("JOB_DB_FILE", "jobs/jobs.db"), help="SQLite job database")
+    parser.add_argument("--journal-mode", default=os.environ.get("JOB_DB_JOURNAL_MODE", "WAL"),
+                        help="SQLite journal mode: WAL when all processes run on one host, DELETE across hosts")
+    parser.add_argument("--lease-seconds", type=float, default=float(os.environ.get("JOB_LEASE_SECONDS", "30")),
+                        help="How long the jobs of a worker that stopped renewing its leases wait before they are requeued")
+    parser.add_argument("--worker-only", action="store_true", help="Only run jobs from --db, without the API")
+    parser.add_argument("--processes", type=int, default=int(os.environ.get("JOB_PROCESSES", "1")),
+                        help="Number of worker processes started with --worker-only")
+    args = parser.parse_args()
+
+    if args.worker_only:
+        # Every process has its own event loop, clients and workflows; they only share the database
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=worker_process, args=(args, i), name=f"job-worker-{i}")
+                     for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            # The workers got the SIGINT too and requeue their running jobs
+            for process in processes:
+                process.join()
+        return
+
+    run_job, close = build_job_runner(args.workers, metrics_port_from_env()) if args.workers else (None, None)
+    service = JobService(
+        open_store(args), run_job, workers=args.workers, max_queue=args.max_queue, lease_seconds=args.lease_seconds
+    )
+    app = create_app(service)
+
+    async def close_clients(app: web.Application):
+        if close:
+            await close()
+
+    app.on_cleanup.append(close_clients)
+    web.run_app(app, host=args.host, port=args.port, print=lambda message: logger.info(message))
+
+
+if __name__ == "__main__":
+    main()
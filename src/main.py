@@ -1,55 +1,57 @@
-import os
-from agent_framework.azure import AzureAIAgentClient
-from azure.identity.aio import AzureCliCredential
 from dotenv import load_dotenv
-from agent_framework.devui import serve
-from agent_framework import SequentialBuilder
-from agents.search_prompt_agent import create_search_prompt_agent
-from agents.search_agent import create_search_agent
-from agents.risk_analyzer_agent import create_risk_analyzer_agent
-from agents.decision_tree_agent import create_decision_tree_agent
-from agents.visualizer_agent import create_visualizer_agent
-from agents.browser_agent import create_browser_agent
 import logging
+import os
 
 load_dotenv()
 
 
 def main():
+    # Imported here so that importing this module stays cheap; the Azure agent
+    # client itself is only imported when the first request builds an agent
+    from azure.identity.aio import AzureCliCredential
+    from agent_framework_devui import register_cleanup, serve
+    from pipeline import build_workflow, get_settings, stage_setup_from_env
+    from utils.client_factory import AgentClientFactory
+    from utils.metrics import MetricsCollector
+    from utils.single_flight import CoalescingWorkflow
+
     logging.basicConfig(level=logging.INFO, format="%(message)s")
-    
-    settings = {
-        "project_endpoint": os.environ["AZURE_AI_PROJECT_ENDPOINT"],
-        "model_deployment_name": os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
-        "credential": AzureCliCredential(),
-    }
-    
-    client = AzureAIAgentClient(**settings)
-    
-    # Create all agents
-    search_prompt_agent = create_search_prompt_agent(client)
-    search_agent = create_search_agent(client)
-    risk_analyzer_agent = create_risk_analyzer_agent(client)
-    decision_tree_agent = create_decision_tree_agent(client)
-    visualizer_agent = create_visualizer_agent(client)
-    browser_agent = create_browser_agent(client)
-    
-    # Create Sequential Workflow
-    workflow = (
-        SequentialBuilder()
-        .participants([
-            search_prompt_agent,
-            search_agent,
-            risk_analyzer_agent,
-            decision_tree_agent,
-            visualizer_agent,
-            browser_agent,
-        ])
-        .build()
-    )
-    
+
+    settings = get_settings(AzureCliCredential())
+
+    # Per-stage tokens, latency, retries and cost on http://127.0.0.1:METRICS_PORT/metrics
+    metrics = MetricsCollector()
+    metrics.serve(int(os.environ.get("METRICS_PORT", "9464")))
+
+    # Agents run on the deployment MODEL_ROUTING_FILE routes them to, escalating to stronger ones when
+    # their output does not validate; MODEL_PRICES_FILE prices each deployment in the metrics.
+    # AGENT_HEDGING=1 sends a second request for runs slower than their recent p95 (see utils.hedging).
+    # With MODEL_QUOTA_STATE_FILE, model calls wait for the quota of their deployment (MODEL_QUOTA_FILE,
+    # then learned from the responses), shared with every process using the same file (see utils.quota)
+    client_factory = AgentClientFactory(**settings, trace_configs=[metrics.trace_config()])
+
+    # Metrics, canonical impairment names ("T2DM", "type II diabetes", ... share cached stage outputs),
+    # context pruning, the stage cache and the local search index, configured from the environment
+    # (see pipeline.stage_setup_from_env)
+    setup = stage_setup_from_env(metrics)
+
+    # Create Sequential Workflow; every agent gets its own pooled client on the first request,
+    # reusing its server-side agent from AGENT_REGISTRY_FILE when one is configured
+    def build():
+        return build_workflow(
+            client_factory, middleware=setup.middleware, search_tools=setup.search_tools, metrics=metrics
+        )
+
+    # Concurrent requests for the same impairment share one run, and different impairments run side
+    # by side on workflows of their own (COALESCE_REQUESTS=0 serves a single workflow instead)
+    if os.environ.get("COALESCE_REQUESTS", "1") != "0":
+        workflow = CoalescingWorkflow(build, key=setup.request_key)
+    else:
+        workflow = build()
+
+    register_cleanup(workflow, client_factory.close)
     serve(entities=[workflow], port=8090, auto_open=True, tracing_enabled=True)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
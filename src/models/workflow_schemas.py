@@ -34,12 +34,23 @@ class RiskAttributes(BaseModel):
 
 
 # Step 4 Output: Decision Tree Structure
+class SourceReference(BaseModel):
+    """A source that corroborates a decision tree node"""
+    source_name: str = Field(description="Short and descriptive name or title of the source")
+    source_url: str = Field(description="URL of the source")
+    source_snippets: list[str] = Field(default_factory=list, description="Relevant quoted short snippets from the source")
+
+
 class DecisionTreeNode(BaseModel):
     """A node in the decision tree"""
+    id: int = Field(description="Unique integer identifier, the root node is 1")
+    decision: str | None = Field(default=None, description="Decision value on the parent's question (null for the root)")
     question: str = Field(description="The question or condition to evaluate")
-    true_branch: str | dict = Field(description="Next step if condition is true")
-    false_branch: str | dict = Field(description="Next step if condition is false")
+    decisions: list[str] = Field(default_factory=list, description="Possible decisions for the child nodes")
     risk_level: str | None = Field(default=None, description="Risk level if this is a leaf node")
+    sources: list[SourceReference] = Field(default_factory=list, description="Sources that corroborate this node")
+    level: int = Field(description="Depth level, 0 for the root node")
+    children: list["DecisionTreeNode"] = Field(default_factory=list, description="Child nodes, empty for leaves")
 
 
 class DecisionTree(BaseModel):
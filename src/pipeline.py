@@ -0,0 +1,207 @@
+"""Construction of the impairment risk assessment workflow"""
+import os
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+from agent_framework import Workflow
+
+from agents.search_prompt_agent import create_search_prompt_agent
+from agents.search_agent import create_search_agent
+from agents.risk_analyzer_agent import create_risk_analyzer_agent
+from agents.decision_tree_agent import create_decision_tree_agent
+from executors.browser_executor import create_browser_executor
+from executors.dag_executor import DagBuilder
+from executors.search_fanout_executor import create_search_fanout_executor
+from executors.streaming_agent_executor import create_streaming_executor
+from executors.visualizer_executor import create_visualizer_executor
+from utils.lazy_agent import LazyAgent
+from utils.metrics import MetricsCollector
+
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
+    from utils.client_factory import AgentClientFactory
+    from utils.context_pruning import ContextPruningMiddleware
+    from utils.impairment_names import ImpairmentCanonicalizer
+    from utils.stage_cache import StageCache
+
+
+def get_settings(credential) -> dict:
+    """Return the AzureAIAgentClient settings from the environment."""
+    return {
+        "project_endpoint": os.environ["AZURE_AI_PROJECT_ENDPOINT"],
+        "model_deployment_name": os.environ["AZURE_AI_MODEL_DEPLOYMENT_NAME"],
+        "credential": credential,
+    }
+
+
+@dataclass
+class StageSetup:
+    """The agent middleware and SearchAgent tools of the workflow, built by ``build_stage_setup``"""
+
+    middleware: list
+    search_tools: list | None = None
+    canonicalizer: "ImpairmentCanonicalizer | None" = None
+    pruning: "ContextPruningMiddleware | None" = None
+    stage_cache: "StageCache | None" = None
+
+    def request_key(self, message: Any) -> str:
+        """Key of a workflow request for a CoalescingWorkflow: its canonical impairment name, if canonicalized."""
+        from utils.single_flight import request_key
+
+        key = request_key(message)
+        return self.canonicalizer.canonicalize(key).name if self.canonicalizer else key
+
+    def summary(self) -> dict[str, Any]:
+        """Statistics of the stage cache, context pruning and canonicalization, for those in use."""
+        summary = {}
+        if self.stage_cache:
+            summary["stage_cache"] = dict(self.stage_cache.stats)
+        if self.pruning:
+            summary["context_pruning"] = dict(self.pruning.stats)
+        if self.canonicalizer:
+            summary["canonicalization"] = self.canonicalizer.stats
+        return summary
+
+
+def build_stage_setup(
+    metrics: MetricsCollector,
+    canonicalization: bool = True,
+    synonyms_file: str | None = None,
+    context_pruning: bool = True,
+    context_policy_file: str | None = None,
+    stage_cache_dir: str | None = None,
+    search_index_dir: str | None = None,
+) -> StageSetup:
+    """
+    Build the agent middleware and retrieval tools that main.py, batch.py and job_server.py run the workflow with.
+
+    Metrics come first, so they see the full conversation and key runs on
+    the names as typed; canonicalization and pruning come before the stage
+    cache, so it keys on the canonical, pruned input.
+
+    Args:
+        metrics: Collector of the MetricsMiddleware
+        canonicalization: Map "T2DM", "type II diabetes", ... to one impairment name
+        synonyms_file: Synonym table of the canonicalization; defaults to files/impairment_synonyms.json
+        context_pruning: Only pass every stage the earlier outputs it needs
+        context_policy_file: JSON file with per-stage context policies; defaults to the built-in ones
+        stage_cache_dir: Directory of the stage output cache; None disables it
+        search_index_dir: Directory of a local BM25 index (built with index_documents.py) for the SearchAgent
+    """
+    # Imported here so that importing this module stays cheap
+    from utils.context_pruning import ContextPruningMiddleware, load_context_policies
+    from utils.impairment_names import CanonicalNameMiddleware, ImpairmentCanonicalizer
+    from utils.metrics import MetricsMiddleware
+
+    setup = StageSetup(middleware=[MetricsMiddleware(metrics)])
+    if canonicalization:
+        setup.canonicalizer = ImpairmentCanonicalizer(synonyms_file) if synonyms_file else ImpairmentCanonicalizer()
+        setup.middleware.append(CanonicalNameMiddleware(setup.canonicalizer))
+    if context_pruning:
+        policies = load_context_policies(context_policy_file) if context_policy_file else None
+        setup.pruning = ContextPruningMiddleware(policies)
+        setup.middleware.append(setup.pruning)
+    if stage_cache_dir:
+        from utils.stage_cache import StageCache, StageCacheMiddleware
+
+        setup.stage_cache = StageCache(stage_cache_dir)
+        setup.middleware.append(StageCacheMiddleware(setup.stage_cache))
+    if search_index_dir:
+        from tools.search_tools import SearchTools
+
+        setup.search_tools = [SearchTools(search_index_dir).search_documents]
+    return setup
+
+
+def stage_setup_from_env(metrics: MetricsCollector) -> StageSetup:
+    """
+    ``build_stage_setup`` configured from the environment, as main.py and job_server.py use it.
+
+    IMPAIRMENT_CANONICALIZATION=0 and CONTEXT_PRUNING=0 disable those steps,
+    IMPAIRMENT_SYNONYMS_FILE and CONTEXT_POLICY_FILE replace their tables, and
+    STAGE_CACHE_DIR and SEARCH_INDEX_DIR enable the stage cache and the local search index.
+    """
+    return build_stage_setup(
+        metrics,
+        canonicalization=os.environ.get("IMPAIRMENT_CANONICALIZATION", "1") != "0",
+        synonyms_file=os.environ.get("IMPAIRMENT_SYNONYMS_FILE") or None,
+        context_pruning=os.environ.get("CONTEXT_PRUNING", "1") != "0",
+        context_policy_file=os.environ.get("CONTEXT_POLICY_FILE") or None,
+        stage_cache_dir=os.environ.get("STAGE_CACHE_DIR") or None,
+        search_index_dir=os.environ.get("SEARCH_INDEX_DIR") or None,
+    )
+
+
+def build_workflow(
+    client: "AzureAIAgentClient | Callable[[], AzureAIAgentClient] | AgentClientFactory",
+    open_browser: bool = True,
+    middleware: list | None = None,
+    search_workers: int = 4,
+    search_tools: list | None = None,
+    headless: bool | None = None,
+    metrics: MetricsCollector | None = None,
+    output_dir: str = "output",
+) -> Workflow:
+    """
+    Build the impairment workflow.
+
+    Every stage declares the earlier stages whose output it reads (matching
+    utils.context_pruning.DEFAULT_CONTEXT_POLICIES) and starts as soon as
+    they are done, in a DagBuilder workflow that reports the critical path of
+    each run. The stages of this workflow happen to form a chain.
+
+    Args:
+        client: The chat client shared by all agents, or a function that creates
+            it, e.g. ``client_factory.create_client``, called when the first agent runs.
+            An AgentClientFactory gives every agent a client of its own and reuses
+            the agents in its registry (see utils.agent_registry).
+        open_browser: Whether to end with the BrowserAgent step that saves the
+            HTML to output/. Batch jobs read the HTML from the conversation instead.
+        middleware: Agent middleware applied to the structured-output agents,
+            e.g. a StageCacheMiddleware
+        search_workers: Number of search queries retrieved concurrently by the
+            fan-out search stage; 0 sends all queries to one SearchAgent call
+        search_tools: Retrieval tools for the SearchAgent, e.g.
+            ``[SearchTools(index_dir).search_documents]`` to search a local BM25 index
+        headless: Save the HTML without opening a browser; None detects
+            servers without a display (see utils.browser_helper.is_headless)
+        metrics: Collector fed by a MetricsMiddleware in ``middleware``; the
+            BrowserAgent step writes its per-run summary next to the HTML
+        output_dir: Directory the BrowserAgent step saves the HTML to
+
+    Returns:
+        The built workflow. A workflow can only run once at a time, so
+        concurrent callers must build one workflow per run. With
+        ``workflow.run_stream`` the structured-output stages report progress
+        events and hand their output on as soon as it is complete. The agents
+        are only created when their stage first runs (see utils.lazy_agent).
+    """
+    get_client = cache(client) if callable(client) else lambda: client
+
+    search_agent = LazyAgent(lambda: create_search_agent(get_client(), middleware, search_tools), "SearchAgent")
+    builder = (
+        DagBuilder()
+        .add(create_streaming_executor(
+            LazyAgent(lambda: create_search_prompt_agent(get_client(), middleware), "SearchPromptAgent")
+        ))
+        .add(
+            create_search_fanout_executor(search_agent, search_workers)
+            if search_workers > 0
+            else create_streaming_executor(search_agent),
+            after=["SearchPromptAgent"],
+        )
+        .add(create_streaming_executor(
+            LazyAgent(lambda: create_risk_analyzer_agent(get_client(), middleware), "RiskAnalyzerAgent")
+        ), after=["SearchAgent"])
+        .add(create_streaming_executor(
+            LazyAgent(lambda: create_decision_tree_agent(get_client(), middleware), "DecisionTreeAgent")
+        ), after=["RiskAnalyzerAgent", "SearchAgent"])
+        .add(create_visualizer_executor(), after=["DecisionTreeAgent"])
+    )
+    if open_browser:
+        builder.add(create_browser_executor(output_dir, headless=headless, metrics=metrics), after=["VisualizerAgent"])
+
+    return builder.build()
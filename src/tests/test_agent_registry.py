@@ -0,0 +1,37 @@
+"""Agent definitions the registry reads from and preloads into agent clients"""
+from types import SimpleNamespace
+
+import pytest
+from azure.ai.agents.models import Agent
+
+from utils import agent_registry
+from utils.agent_registry import cached_definition, preload_definition
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    """Set the checked releases of agent-framework-azure-ai for one test."""
+
+    def set_versions(*checked: str) -> None:
+        monkeypatch.setattr(agent_registry, "DEFINITION_CACHE_VERSIONS", checked)
+        agent_registry._definition_cache_supported.cache_clear()
+
+    yield set_versions
+    agent_registry._definition_cache_supported.cache_clear()
+
+
+def test_checked_release_preloads_the_definition(versions):
+    versions(agent_registry.version("agent-framework-azure-ai"))
+    client = SimpleNamespace(_agent_definition=None)
+    definition = Agent({"id": "asst_1", "name": "SearchAgent"})
+    preload_definition(client, definition)
+    assert cached_definition(client) is definition
+
+
+def test_other_release_leaves_the_client_alone(versions):
+    versions("0.0.0")
+    client = SimpleNamespace(_agent_definition=None)
+    preload_definition(client, Agent({"id": "asst_1"}))
+    assert client._agent_definition is None
+    client._agent_definition = Agent({"id": "asst_2"})
+    assert cached_definition(client) is None
@@ -0,0 +1,59 @@
+"""Saving the visualization and finishing the metrics of the run in the BrowserExecutor"""
+import asyncio
+
+import pytest
+from agent_framework import ChatMessage, Role, SequentialBuilder
+
+from benchmarks.sample_outputs import SAMPLE_DECISION_TREE
+from executors.browser_executor import BrowserExecutor
+from models.workflow_schemas import HTMLVisualization
+from utils.diagram_renderer import render_decision_tree_html
+from utils.metrics import MetricsCollector, StageRun
+
+REQUEST = "Asthma"
+
+
+def conversation(html: bool = True) -> list[ChatMessage]:
+    visualization = HTMLVisualization(
+        impairment_name=REQUEST, html_content=render_decision_tree_html(SAMPLE_DECISION_TREE) if html else ""
+    )
+    return [
+        ChatMessage(role=Role.USER, text=REQUEST),
+        ChatMessage(role=Role.ASSISTANT, text=visualization.model_dump_json(), author_name="VisualizerAgent"),
+    ]
+
+
+def collector() -> MetricsCollector:
+    """A collector with one finished agent run of the request."""
+    metrics = MetricsCollector()
+    metrics.begin(REQUEST)
+    metrics.record(REQUEST, StageRun("SearchAgent"))
+    return metrics
+
+
+def run(executor: BrowserExecutor, messages: list[ChatMessage]):
+    return asyncio.run(SequentialBuilder().participants([executor]).build().run(messages))
+
+
+def test_saved_run_writes_its_metrics(tmp_path):
+    metrics = collector()
+    run(BrowserExecutor(output_dir=str(tmp_path), headless=True, metrics=metrics), conversation())
+    assert len(list(tmp_path.glob("*.metrics.json"))) == 1
+    assert metrics.pop_run(REQUEST)["stages"] == {}
+
+
+def test_unsaved_run_is_finished_without_metrics_file(tmp_path):
+    metrics = collector()
+    # A file where the output directory should be
+    output_dir = tmp_path / "output"
+    output_dir.write_text("")
+    run(BrowserExecutor(output_dir=str(output_dir), headless=True, metrics=metrics), conversation())
+    assert list(tmp_path.glob("**/*.metrics.json")) == []
+    assert metrics.pop_run(REQUEST)["stages"] == {}
+
+
+def test_run_without_html_is_finished(tmp_path):
+    metrics = collector()
+    with pytest.raises(Exception):
+        run(BrowserExecutor(output_dir=str(tmp_path), headless=True, metrics=metrics), conversation(html=False))
+    assert metrics.pop_run(REQUEST)["stages"] == {}
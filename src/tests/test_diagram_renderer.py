@@ -0,0 +1,28 @@
+"""Filling the rmv-diagram template with a decision tree"""
+from utils.diagram_renderer import decision_tree_to_diagram, render_decision_tree_html
+
+
+def tree(impairment_name: str = "Asthma", question: str = "Severity") -> dict:
+    return {
+        "impairment_name": impairment_name,
+        "risk_levels": ["Low", "High"],
+        "root_node": {
+            "question": question,
+            "children": [{"decision": "Mild", "risk_level": "Low"}, {"decision": "Severe", "risk_level": "High"}],
+        },
+    }
+
+
+def test_diagram_numbers_nodes_in_walk_order():
+    diagram = decision_tree_to_diagram(tree())
+    assert [node["id"] for node in diagram["nodes"]] == [1, 2, 3]
+    assert [(c["source"], c["target"], c["label"]) for c in diagram["connections"]] == [(1, 2, "Mild"), (1, 3, "Severe")]
+
+
+def test_placeholders_in_model_text_are_not_filled_in():
+    page = render_decision_tree_html(tree("X {{DIAGRAM_JSON}} {{SOURCE_LINKS}}", "<img src=x onerror=alert(1)>"))
+    assert "<title>X {{DIAGRAM_JSON}} {{SOURCE_LINKS}} Risk Assessment</title>" in page
+    assert "<h1>X {{DIAGRAM_JSON}} {{SOURCE_LINKS}} Risk Assessment Decision Tree</h1>" in page
+    # The question only appears in the diagram JSON of the script
+    assert page.count("<img src=x onerror=alert(1)>") == 1
+    assert page.count("No sources provided.") == 1
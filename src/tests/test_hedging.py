@@ -0,0 +1,48 @@
+"""Latency samples a HedgedAgent records for runs that were hedged or timed out"""
+import asyncio
+
+import pytest
+
+from utils.hedging import HedgedAgent, HedgingPolicy
+
+
+class SleepyAgent:
+    """An agent whose runs take the given seconds, one after another, and then answer at once."""
+
+    name = "SleepyAgent"
+
+    def __init__(self, *seconds: float):
+        self.seconds = list(seconds)
+
+    def get_new_thread(self):
+        return None
+
+    async def run(self, messages=None, *, thread=None, **kwargs):
+        await asyncio.sleep(self.seconds.pop(0) if self.seconds else 0.0)
+        return "answer"
+
+
+def test_hedge_win_records_the_first_attempt():
+    policy = HedgingPolicy(min_samples=1, timeout_factor=0)
+    policy.record("SleepyAgent", 0.05)
+    agent = HedgedAgent(SleepyAgent(1.0), policy)
+
+    assert asyncio.run(agent.run("request")) == "answer"
+    assert policy.stats["hedge_wins"] == 1
+    summary = policy.latency_summary()["SleepyAgent"]
+    # The hedge answered at once, but the run had been waiting since before it was sent
+    assert summary["samples"] == 2
+    assert summary["p50"] >= 0.05
+
+
+def test_timeout_records_the_elapsed_time():
+    policy = HedgingPolicy(min_samples=1, timeout_factor=1.0, budget_ratio=0, budget_burst=0, max_retries=0)
+    policy.record("SleepyAgent", 0.05)
+    agent = HedgedAgent(SleepyAgent(1.0), policy)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(agent.run("request"))
+    summary = policy.latency_summary()["SleepyAgent"]
+    assert policy.stats["timeouts"] == 1
+    assert summary["samples"] == 2
+    assert summary["p50"] >= 0.05
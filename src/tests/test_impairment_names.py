@@ -0,0 +1,83 @@
+"""Fuzzy matching of the impairment canonicalizer on the default synonym table"""
+import pytest
+
+from utils.impairment_names import ImpairmentCanonicalizer, typo_of, within_one_edit
+
+
+@pytest.fixture(scope="module")
+def canonicalizer() -> ImpairmentCanonicalizer:
+    return ImpairmentCanonicalizer()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("hypertention", "Hypertension"),
+        ("heart failur", "Heart Failure"),
+        ("hyperthyroidsm", "Hyperthyroidism"),
+        ("parkinson diseese", "Parkinson's Disease"),
+        ("chronic kidny disease", "Chronic Kidney Disease"),
+        ("diabtes mellitus type 2", "Type 2 Diabetes Mellitus"),
+        ("type 1 diabetis", "Type 1 Diabetes Mellitus"),
+    ],
+)
+def test_typos_match(canonicalizer, text, expected):
+    match = canonicalizer.canonicalize(text)
+    assert match.method == "fuzzy"
+    assert match.name == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Hepatitis A",
+        "Hepatitis D",
+        "portal hypertension",
+        "pulmonary hypertension",
+        "renal failure",
+        "chronic kidney failure",
+        "hypotension",
+        "type 3 diabetes",
+        "acute hepatitis B",
+    ],
+)
+def test_other_impairments_do_not_match(canonicalizer, text):
+    match = canonicalizer.canonicalize(text)
+    assert match.method == "none"
+    assert match.name == text
+
+
+def test_within_one_edit():
+    assert within_one_edit("disease", "diesase")
+    assert within_one_edit("failure", "failur")
+    assert within_one_edit("parkinson", "parkinsons")
+    assert within_one_edit("asthma", "asthme")
+    assert not within_one_edit("hypertension", "hypotension")
+    assert not within_one_edit("disease", "dissease s")
+
+
+def test_typo_of_needs_every_word():
+    assert typo_of(["chronic", "kidny", "disease"], ("chronic", "kidney", "disease"))
+    assert typo_of(["diabetes", "type", "2"], ("type", "2", "diabetes"))
+    assert not typo_of(["portal", "hypertension"], ("hypertension",))
+    assert not typo_of(["hypertension"], ("portal", "hypertension"))
+    assert not typo_of(["hepatitis", "c"], ("hepatitis", "b"))
+    assert not typo_of(["chronc", "hepatitis"], ("acute", "hepatitis"))
+    assert not typo_of(["acute", "bronchitis"], ("chronic", "bronchitis"))
+
+
+def test_single_letters_tell_names_apart():
+    canonicalizer = ImpairmentCanonicalizer()
+    assert canonicalizer.canonicalize("Hepatitis A").name == "Hepatitis A"
+    match = canonicalizer.canonicalize("hepatitis")
+    assert match.method == "none"
+    assert match.name == "hepatitis"
+    assert canonicalizer.canonicalize("Vitamin A deficiency").name == "Vitamin A deficiency"
+    assert canonicalizer.canonicalize("vitamin deficiency").name == "vitamin deficiency"
+
+
+def test_unmatched_inputs_are_kept_as_typed():
+    canonicalizer = ImpairmentCanonicalizer()
+    assert canonicalizer.canonicalize("Carcinoid  syndrome").name == "Carcinoid syndrome"
+    # Same normalized key, different spelling
+    assert canonicalizer.canonicalize("carcinoid-syndrome").name == "carcinoid-syndrome"
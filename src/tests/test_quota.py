@@ -0,0 +1,85 @@
+"""Back-off of the QuotaScheduler after rate limit errors and its waits for the state file"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from benchmarks.stub_client import StubChatClient, StubQuota, StubRateLimitError
+from models.workflow_schemas import SearchQueries
+from utils.quota import QuotaLimits, QuotaMiddleware, QuotaScheduler
+
+DEPLOYMENT = "gpt-4o"
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    scheduler = QuotaScheduler(
+        tmp_path / "quota.db", default_limits=QuotaLimits(tokens_per_minute=600_000, requests_per_minute=6000)
+    )
+    yield scheduler
+    scheduler.close()
+
+
+def rates(scheduler: QuotaScheduler) -> tuple[float, float]:
+    state = scheduler.state(DEPLOYMENT)
+    return state["tokens_per_minute"], state["requests_per_minute"]
+
+
+def test_refund_keeps_the_lowered_rates(scheduler):
+    scheduler.throttle(DEPLOYMENT, 1.0)
+    lowered = rates(scheduler)
+    tokens = scheduler.state(DEPLOYMENT)["tokens"]
+
+    scheduler.refund(DEPLOYMENT, 1000)
+    assert rates(scheduler) == lowered
+    assert scheduler.state(DEPLOYMENT)["tokens"] >= tokens + 1000
+
+    scheduler.settle(DEPLOYMENT, 1000, 0)
+    assert rates(scheduler) > lowered
+
+
+def test_rejected_call_is_counted_once(scheduler):
+    # One request per 10 second window: the second call is rejected
+    client = StubChatClient(
+        latency=0.0, model_id=DEPLOYMENT, quota=StubQuota(600_000, 6), on_response=scheduler.observe_response,
+        max_throttle_retries=0,
+    )
+    client.middleware = [QuotaMiddleware(scheduler, DEPLOYMENT)]
+
+    async def main():
+        await client.get_response("first", response_format=SearchQueries)
+        with pytest.raises(StubRateLimitError):
+            await client.get_response("second", response_format=SearchQueries)
+
+    asyncio.run(main())
+    assert client.quota.stats["throttled"] == 1
+    assert scheduler.stats["throttled"] == 1
+    assert rates(scheduler) == (600_000 * scheduler.decrease, 6000 * scheduler.decrease)
+
+
+def test_database_lock_does_not_block_the_event_loop(scheduler):
+    # Another process holds the write lock of the state file for a while
+    other = sqlite3.connect(scheduler.path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        acquire = asyncio.create_task(scheduler.acquire(DEPLOYMENT, 100))
+        await asyncio.sleep(0.2)
+        assert not acquire.done()
+        other.execute("COMMIT")
+        await acquire
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+    other.close()
+    assert scheduler.stats["granted"] == 1
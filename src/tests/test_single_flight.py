@@ -0,0 +1,51 @@
+"""Coalescing of concurrent calls by SingleFlight"""
+import asyncio
+
+from utils.single_flight import SingleFlight
+
+
+def counting_source(started: list[int], items: int = 3, delay: float = 0.01):
+    """A source that records each execution it starts and yields ``items`` numbers, one per ``delay``."""
+
+    async def source():
+        started.append(len(started))
+        for i in range(items):
+            await asyncio.sleep(delay)
+            yield i
+
+    return source
+
+
+async def collect(flights: SingleFlight, key: str, source) -> list[int]:
+    return [item async for item in flights.stream(key, source)]
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights, started = SingleFlight(), []
+        source = counting_source(started)
+        return await asyncio.gather(*(collect(flights, "key", source) for _ in range(3))), started, flights
+
+    results, started, flights = asyncio.run(main())
+    assert results == [[0, 1, 2]] * 3
+    assert started == [0]
+    assert flights.stats["coalesced"] == 2
+    assert not flights.in_flight("key")
+
+
+def test_rejoining_an_abandoned_flight_starts_a_new_execution():
+    async def main():
+        flights, started = SingleFlight(), []
+        source = counting_source(started)
+        stream = flights.stream("key", source)
+        assert await anext(stream) == 0
+        # The last caller leaves: the execution is cancelled but has not unwound yet
+        await stream.aclose()
+        assert not flights.in_flight("key")
+        return await collect(flights, "key", source), started, flights
+
+    result, started, flights = asyncio.run(main())
+    assert result == [0, 1, 2]
+    assert started == [0, 1]
+    assert flights.stats["abandoned"] == 1
+    assert flights.stats["executions"] == 2
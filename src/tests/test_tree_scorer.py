@@ -0,0 +1,60 @@
+"""Branch boundaries of the vectorized tree scorer and its reference implementation"""
+import numpy as np
+import pytest
+
+from utils.tree_scorer import branch_bounds, compile_tree, risk_level_names, score_batch, score_record
+
+
+def numeric_tree(*labels: str) -> dict:
+    """A one-question tree whose branches, in order, lead to risk levels Low, Medium, High, ..."""
+    levels = ["Low", "Medium", "High", "Critical"]
+    return {
+        "risk_levels": levels,
+        "root_node": {
+            "question": "HbA1c",
+            "children": [{"decision": label, "risk_level": level} for label, level in zip(labels, levels)],
+        },
+    }
+
+
+def scores(tree: dict, values: list[float]) -> tuple[list[str], list[str | None]]:
+    """The risk levels of records with these values, from score_batch and from score_record."""
+    compiled = compile_tree(tree)
+    batch = risk_level_names(compiled, score_batch(compiled, {"hba1c": np.array(values, dtype=float)})).tolist()
+    reference = [score_record(tree, {"hba1c": value}) for value in values]
+    return batch, reference
+
+
+def test_branch_bounds_marks_strict_bounds():
+    assert branch_bounds(["< 7", "7 - 9", "> 9"]) == [(-np.inf, False), (7.0, False), (9.0, True)]
+    assert branch_bounds(["<= 7", "> 7"]) == [(-np.inf, False), (7.0, True)]
+    assert branch_bounds(["≤ 7", "7 - 9", "≥ 9"]) == [(-np.inf, False), (7.0, True), (9.0, False)]
+    assert branch_bounds(["< 7", "other"]) is None
+
+
+@pytest.mark.parametrize(
+    "labels, values, expected",
+    [
+        (("< 7", "7 - 9", "> 9"), [6.9, 7, 8, 9, 9.1], ["Low", "Medium", "Medium", "Medium", "High"]),
+        (("<= 7", "> 7"), [7, 7.1], ["Low", "Medium"]),
+        (("≤ 7", "7 - 9", "> 9"), [7, 7.5, 9, 9.5], ["Low", "Medium", "Medium", "High"]),
+        (("< 7", ">= 7"), [6.99, 7], ["Low", "Medium"]),
+        (("< 7", "≥ 7"), [7], ["Medium"]),
+    ],
+)
+def test_boundary_values(labels, values, expected):
+    batch, reference = scores(numeric_tree(*labels), values)
+    assert batch == expected
+    assert reference == expected
+
+
+def test_branch_order_does_not_matter():
+    batch, reference = scores(numeric_tree("> 9", "< 7", "7 - 9"), [9, 9.5, 6])
+    assert batch == reference == ["High", "Low", "Medium"]
+
+
+def test_leaf_root_scores_every_record():
+    tree = {"risk_levels": ["Low", "High"], "root_node": {"risk_level": "High"}}
+    compiled = compile_tree(tree)
+    assert risk_level_names(compiled, score_batch(compiled, {"x": [1, 2, 3]})).tolist() == ["High"] * 3
+    assert score_record(tree, {"x": 1}) == "High"
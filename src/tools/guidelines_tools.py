@@ -0,0 +1,30 @@
+"""Native tools for looking up the Contoso GitHub issue guidelines"""
+from pathlib import Path
+
+from utils.guidelines_index import DEFAULT_GUIDELINES_FILE, GuidelinesIndex
+
+
+class GuidelinesTools:
+    """Tools for retrieving sections of the local GitHub issue guidelines"""
+
+    def __init__(self, path: str | Path = DEFAULT_GUIDELINES_FILE):
+        """
+        Args:
+            path: The markdown guidelines document, files/contoso-github-issues-guidelines.md by default
+        """
+        self.index = GuidelinesIndex(path)
+
+    def search_guidelines(self, query: str, top_k: int = 3) -> list[dict]:
+        """
+        Search the Contoso GitHub issue guidelines: issue templates, title format, labels, assignment rules,
+        examples and best practices.
+
+        Args:
+            query: What to look up, e.g. "bug report template title format mandatory labels"
+            top_k: Maximum number of sections to return (1-10)
+
+        Returns:
+            List of dicts with the section title and its markdown text, best match first
+        """
+        results = self.index.search(query, top_k=max(1, min(int(top_k), 10)))
+        return [{"section": " > ".join(r["path"]), "text": r["text"]} for r in results]
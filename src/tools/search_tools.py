@@ -0,0 +1,53 @@
+"""Native tools for searching the local medical document index"""
+import json
+import logging
+from pathlib import Path
+
+from utils.bm25_index import MANIFEST, BM25Index
+
+logger = logging.getLogger(__name__)
+
+
+class SearchTools:
+    """Tools for retrieving medical documents from a local BM25 index"""
+
+    def __init__(self, index_dir: str = "index/medical"):
+        """
+        Args:
+            index_dir: Directory of the index built with index_documents.py
+
+        Raises:
+            FileNotFoundError: If the directory holds no index, or an empty one; the
+                SearchAgent only returns documents the tool found, so it would find none
+        """
+        manifest = Path(index_dir) / MANIFEST
+        if not manifest.exists() or not json.loads(manifest.read_text(encoding="utf-8")).get("segments"):
+            raise FileNotFoundError(
+                f"No documents indexed in {index_dir}; build the index with index_documents.py "
+                "or leave SEARCH_INDEX_DIR (batch.py --search-index) empty to run the SearchAgent without it"
+            )
+        self.index_dir = index_dir
+        self._index: BM25Index | None = None
+
+    @property
+    def index(self) -> BM25Index:
+        # Opened on first use; the index files are memory-mapped, not loaded
+        if self._index is None:
+            self._index = BM25Index(self.index_dir)
+            if not len(self._index):
+                logger.error("The index in %s has no documents left; searches return nothing", self.index_dir)
+        return self._index
+
+    def search_documents(self, query: str, top_k: int = 5) -> list[dict]:
+        """
+        Search the local medical document corpus.
+
+        Args:
+            query: Free-text search query, e.g. "type 2 diabetes HbA1c mortality risk"
+            top_k: Maximum number of documents to return (1-20)
+
+        Returns:
+            List of dicts with url, title and summary, best match first
+        """
+        results = self.index.search(query, top_k=max(1, min(int(top_k), 20)))
+        return [{"url": r["url"], "title": r["title"], "summary": r["summary"]} for r in results]
@@ -0,0 +1,332 @@
+"""Reuse of server-side agents across restarts and a warm pool of pre-created threads"""
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterable, Awaitable, Callable
+from contextlib import contextmanager
+from functools import cache
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any
+
+from agent_framework import ChatContext, ChatMiddleware, ChatResponseUpdate
+from azure.ai.agents.models import Agent
+from azure.core.exceptions import ResourceNotFoundError
+
+try:
+    import fcntl
+except ImportError:  # Windows: registry updates are not locked across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_VERSION = 1
+# Pre-created threads older than this are not handed out after a restart
+DEFAULT_THREAD_MAX_AGE = 24 * 3600.0
+# Releases of agent-framework-azure-ai whose AzureAIAgentClient was checked to cache its
+# agent definition in _agent_definition (see _definition_cache_supported)
+DEFINITION_CACHE_VERSIONS = ("1.0.0b251209",)
+
+
+@cache
+def _definition_cache_supported() -> bool:
+    """
+    Whether the registry may read and preload the agent definition cached by AzureAIAgentClient.
+
+    The client has no public accessor for the definition it gets from
+    create_agent, or fetches with get_agent before the first run of an
+    existing agent, so ``cached_definition`` and ``preload_definition`` are
+    the only places that use its private ``_agent_definition`` attribute,
+    and only on the releases in DEFINITION_CACHE_VERSIONS. On others, agents
+    are still reused by id and the client fetches their definition itself.
+    """
+    try:
+        installed = version("agent-framework-azure-ai")
+    except PackageNotFoundError:
+        installed = None
+    if installed not in DEFINITION_CACHE_VERSIONS:
+        logger.warning("Agent registry does not store agent definitions with agent-framework-azure-ai %s "
+                       "(checked against %s)", installed, ", ".join(DEFINITION_CACHE_VERSIONS))
+        return False
+    return True
+
+
+def cached_definition(client) -> Agent | None:
+    """The definition of the agent an AzureAIAgentClient created or fetched, if known."""
+    return getattr(client, "_agent_definition", None) if _definition_cache_supported() else None
+
+
+def preload_definition(client, definition: Agent | None) -> None:
+    """Set the definition an AzureAIAgentClient would otherwise fetch before its first run; None drops it."""
+    if _definition_cache_supported() and hasattr(client, "_agent_definition"):
+        client._agent_definition = definition
+
+
+def _tool_identity(tool: Any) -> str:
+    """A stable description of a tool: function tools by name and signature, hosted tools by type and name."""
+    if inspect.ismethod(tool) or inspect.isfunction(tool):
+        return f"{tool.__qualname__}{inspect.signature(tool)}"
+    name = getattr(tool, "name", None) or getattr(tool, "__name__", None)
+    return f"{type(tool).__name__}:{name}:{getattr(tool, 'description', '')}"
+
+
+def agent_key(endpoint: str, model: str, spec: dict[str, Any]) -> str:
+    """
+    Hash everything that defines a server-side agent.
+
+    Args:
+        endpoint: The project endpoint the agent lives in
+        model: The model deployment name
+        spec: The create_agent arguments: name, instructions, tools and
+            output_schema or response_format are used
+
+    Returns:
+        A hex digest; any change to the instructions, tools or schema gives a new key
+    """
+    tools = spec.get("tools") or []
+    schema = spec.get("output_schema") or spec.get("response_format")
+    identity = {
+        "endpoint": endpoint,
+        "model": model,
+        "name": spec.get("name"),
+        "instructions": spec.get("instructions"),
+        "tools": sorted(_tool_identity(tool) for tool in (tools if isinstance(tools, list) else [tools])),
+        "schema": schema.model_json_schema() if schema is not None else None,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class AgentRegistry:
+    """
+    Local record of the server-side agents (and spare threads) of a project.
+
+    Agents are stored under their agent_key together with their definition,
+    so a restarted process neither creates nor fetches them before its first
+    run. Unused pre-created threads are handed over to the next process in the
+    same file. Every update re-reads the file under a lock, so several
+    processes can share one registry.
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        Args:
+            path: Path of the JSON registry
+        """
+        self.path = Path(path)
+        self.agents: dict[str, dict[str, Any]] = {}
+        self.threads: dict[str, list[dict[str, Any]]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable agent registry %s: %s", self.path, e)
+            return
+        if state.get("version") != REGISTRY_VERSION:
+            logger.warning("Ignoring agent registry %s with unsupported version %s", self.path, state.get("version"))
+            return
+        self.agents = state.get("agents", {})
+        self.threads = state.get("threads", {})
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"version": REGISTRY_VERSION, "agents": self.agents, "threads": self.threads}
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @contextmanager
+    def _update(self):
+        """Re-read the registry, let the caller change it and write it back, under a lock."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._load()
+            yield
+            self._save()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return the entry of an agent: agent_id, name, model and definition."""
+        return self.agents.get(key)
+
+    def definition(self, key: str) -> Agent | None:
+        """The stored definition of an agent, as returned by the service when it was created."""
+        entry = self.agents.get(key)
+        return Agent(entry["definition"]) if entry and entry.get("definition") else None
+
+    def put(self, key: str, agent_id: str, name: str | None, model: str, definition: Agent | None = None) -> None:
+        with self._update():
+            self.agents[key] = {
+                "agent_id": agent_id,
+                "name": name,
+                "model": model,
+                "definition": definition.as_dict() if definition is not None else None,
+                "registered_at": time.time(),
+            }
+
+    def forget(self, key: str) -> None:
+        """Drop an agent, e.g. because it was deleted on the service."""
+        with self._update():
+            self.agents.pop(key, None)
+
+    def take_threads(self, endpoint: str, max_age: float = DEFAULT_THREAD_MAX_AGE) -> list[str]:
+        """Claim the spare threads left by earlier processes; they are removed from the registry."""
+        with self._update():
+            threads = self.threads.pop(endpoint, [])
+        cutoff = time.time() - max_age
+        return [thread["id"] for thread in threads if thread.get("created_at", 0) >= cutoff]
+
+    def give_threads(self, endpoint: str, threads: list[tuple[str, float]]) -> None:
+        """Hand spare (thread id, created_at) pairs over to the next process."""
+        if not threads:
+            return
+        with self._update():
+            self.threads.setdefault(endpoint, []).extend(
+                {"id": thread_id, "created_at": created_at} for thread_id, created_at in threads
+            )
+
+
+class WarmThreadPool:
+    """
+    Empty threads created ahead of the runs that need them.
+
+    Without a thread id the Azure AI agent client creates a thread and then
+    adds every input message to it, one request each, before the run can
+    start. A run on a pre-created thread sends its messages with the run
+    instead. Every thread is handed out once; the pool refills itself in
+    the background after each ``acquire``.
+    """
+
+    def __init__(self, agents_client, size: int = 2, thread_ids: list[str] | None = None):
+        """
+        Args:
+            agents_client: The AgentsClient threads are created with
+            size: Number of threads kept ready
+            thread_ids: Threads created earlier, e.g. by AgentRegistry.take_threads
+        """
+        self.agents_client = agents_client
+        self.size = size
+        now = time.time()
+        self._threads: list[tuple[str, float]] = [(thread_id, now) for thread_id in thread_ids or []]
+        self._refill_task: asyncio.Task | None = None
+        self.created = 0
+        self.misses = 0
+
+    async def acquire(self) -> str | None:
+        """Return a fresh thread id, or None if none is ready (the run then creates its own)."""
+        thread_id = self._threads.pop(0)[0] if self._threads else None
+        if thread_id is None:
+            self.misses += 1
+        self.refill()
+        return thread_id
+
+    def refill(self) -> None:
+        """Start topping the pool up in the background unless that is already running."""
+        if len(self._threads) < self.size and (self._refill_task is None or self._refill_task.done()):
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        try:
+            while len(self._threads) < self.size:
+                thread = await self.agents_client.threads.create()
+                self._threads.append((thread.id, time.time()))
+                self.created += 1
+        except Exception as e:
+            logger.warning("Could not pre-create an agent thread: %s", e)
+
+    async def close(self) -> list[tuple[str, float]]:
+        """Stop refilling and return the unused (thread id, created_at) pairs."""
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+        threads, self._threads = self._threads, []
+        return threads
+
+
+class WarmThreadMiddleware(ChatMiddleware):
+    """Chat middleware that runs every new conversation on a thread from a WarmThreadPool"""
+
+    def __init__(self, pool: WarmThreadPool):
+        self.pool = pool
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        if context.chat_options.conversation_id is None:
+            thread_id = await self.pool.acquire()
+            if thread_id is not None:
+                context.chat_options.conversation_id = thread_id
+        await next(context)
+
+
+class RegisteredAgentMiddleware(ChatMiddleware):
+    """
+    Chat middleware that records the server-side agent of a client in an AgentRegistry.
+
+    The client creates its agent during its first run; the id is registered
+    as soon as that run is over. If a registered agent no longer exists on
+    the service, the entry is dropped and the client creates a new agent on
+    its next run.
+    """
+
+    def __init__(self, registry: AgentRegistry, key: str, client, model: str):
+        """
+        Args:
+            registry: The registry to record the agent in
+            key: agent_key of the agent
+            client: The AzureAIAgentClient the agent runs on
+            model: The model deployment name of the agent
+        """
+        self.registry = registry
+        self.key = key
+        self.client = client
+        self.model = model
+
+    def _record(self) -> None:
+        agent_id = self.client.agent_id
+        entry = self.registry.get(self.key)
+        if agent_id is not None and (entry is None or entry["agent_id"] != agent_id):
+            definition = cached_definition(self.client)
+            self.registry.put(self.key, agent_id, getattr(definition, "name", None), self.model, definition)
+            logger.info("Registered agent %s as %s", getattr(definition, "name", self.key[:12]), agent_id)
+
+    def _forget(self) -> None:
+        logger.warning("Registered agent %s no longer exists; it is recreated on the next run", self.client.agent_id)
+        self.registry.forget(self.key)
+        self.client.agent_id = None
+        preload_definition(self.client, None)
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        try:
+            await next(context)
+        except ResourceNotFoundError:
+            self._forget()
+            raise
+        if context.is_streaming and context.result is not None:
+            context.result = self._watch_stream(context.result)
+        else:
+            self._record()
+
+    async def _watch_stream(self, stream: AsyncIterable[ChatResponseUpdate]) -> AsyncIterable[ChatResponseUpdate]:
+        try:
+            async for update in stream:
+                yield update
+        except ResourceNotFoundError:
+            self._forget()
+            raise
+        self._record()
@@ -0,0 +1,465 @@
+"""Memory-mapped BM25 index over a local corpus of medical documents"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the their this to was were what when "
+    "which who will with".split()
+)
+# BM25F-style field weights: a term in the title counts three times as much as one in the body
+FIELD_WEIGHTS = {"title": 3.0, "summary": 2.0, "text": 1.0}
+DOCUMENT_SUFFIXES = {".md", ".txt", ".json", ".jsonl"}
+
+MANIFEST = "manifest.json"
+VERSION = 1
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase a text and split it into index terms, dropping stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _text_document(path: Path) -> dict:
+    """Turn a markdown/text file into a document; an optional front matter block sets url/title/summary."""
+    text = path.read_text(encoding="utf-8", errors="replace")
+    document = {"url": path.resolve().as_uri()}
+    if text.startswith("---\n") and "\n---" in text[4:]:
+        front_matter, text = text[4:].split("\n---", 1)
+        for line in front_matter.splitlines():
+            key, _, value = line.partition(":")
+            if key.strip() in ("url", "title", "summary") and value.strip():
+                document[key.strip()] = value.strip()
+
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    if "title" not in document:
+        document["title"] = paragraphs[0].lstrip("#").strip().splitlines()[0] if paragraphs else path.stem
+    if "summary" not in document:
+        body = [p for p in paragraphs if not p.startswith("#")]
+        document["summary"] = " ".join(body[0].split())[:300] if body else ""
+    document["text"] = text
+    return document
+
+
+def read_documents(directory: str | Path) -> Iterator[dict]:
+    """
+    Read every document below a directory.
+
+    Supported files:
+    - .json / .jsonl: objects (or lists of objects) with url, title, summary
+      and optionally text
+    - .md / .txt: one document per file, see ``_text_document``
+
+    Args:
+        directory: The corpus directory
+
+    Yields:
+        Dicts with at least url, title and summary
+    """
+    for path in sorted(Path(directory).rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in DOCUMENT_SUFFIXES:
+            continue
+        suffix = path.suffix.lower()
+        if suffix == ".jsonl":
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+        elif suffix == ".json":
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            records = payload if isinstance(payload, list) else [payload]
+        else:
+            records = [_text_document(path)]
+        for record in records:
+            if isinstance(record, dict) and record.get("url"):
+                yield record
+
+
+def _load_array(path: Path) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Empty arrays cannot be memory-mapped
+        return np.load(path)
+
+
+def _map_file(path: Path) -> mmap.mmap | bytes:
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _offsets(sizes) -> np.ndarray:
+    """Start offsets of consecutive items plus the total size."""
+    return np.concatenate([[0], np.cumsum(np.fromiter(sizes, dtype=np.int64))]).astype(np.int64)
+
+
+def url_hash(url: str) -> int:
+    """64-bit hash of a document url, used to find documents without loading every record."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def write_segment(
+    directory: Path,
+    vocabulary: list[str],
+    term_ids: np.ndarray,
+    doc_ids: np.ndarray,
+    term_frequencies: np.ndarray,
+    doc_lengths: np.ndarray,
+    records: list[bytes],
+    urls: list[str],
+) -> None:
+    """
+    Write an immutable index segment.
+
+    Args:
+        directory: Segment directory (created)
+        vocabulary: Sorted segment vocabulary
+        term_ids: Vocabulary index of every posting
+        doc_ids: Segment-local document of every posting
+        term_frequencies: Field-weighted term frequency of every posting
+        doc_lengths: Field-weighted length of every document
+        records: Stored fields of every document as one JSON line (without newline)
+        urls: Url of every document
+    """
+    directory.mkdir(parents=True)
+    order = np.lexsort((doc_ids, term_ids))
+    counts = np.bincount(term_ids, minlength=len(vocabulary))
+
+    encoded_terms = [term.encode("utf-8") for term in vocabulary]
+    (directory / "terms.bin").write_bytes(b"".join(encoded_terms))
+    np.save(directory / "term_offsets.npy", _offsets(map(len, encoded_terms)))
+    np.save(directory / "postings_offsets.npy", _offsets(counts))
+    np.save(directory / "postings_docs.npy", np.asarray(doc_ids, dtype=np.int32)[order])
+    np.save(directory / "postings_tf.npy", np.asarray(term_frequencies, dtype=np.float32)[order])
+    np.save(directory / "doc_lengths.npy", np.asarray(doc_lengths, dtype=np.float32))
+    (directory / "docs.bin").write_bytes(b"".join(records))
+    np.save(directory / "doc_offsets.npy", _offsets(map(len, records)))
+    hashes = np.fromiter(map(url_hash, urls), dtype=np.uint64, count=len(urls))
+    key_order = np.argsort(hashes, kind="stable")
+    np.save(directory / "key_hashes.npy", hashes[key_order])
+    np.save(directory / "key_docs.npy", key_order.astype(np.int32))
+    np.save(directory / "live.npy", np.ones(len(records), dtype=bool))
+
+
+class Segment:
+    """A read-only, memory-mapped index segment plus its mutable deletion mask"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.terms = _map_file(directory / "terms.bin")
+        self.term_offsets = _load_array(directory / "term_offsets.npy")
+        self.postings_offsets = _load_array(directory / "postings_offsets.npy")
+        self.postings_docs = _load_array(directory / "postings_docs.npy")
+        self.postings_tf = _load_array(directory / "postings_tf.npy")
+        self.doc_lengths = _load_array(directory / "doc_lengths.npy")
+        self.docs = _map_file(directory / "docs.bin")
+        self.doc_offsets = _load_array(directory / "doc_offsets.npy")
+        self.key_hashes = _load_array(directory / "key_hashes.npy")
+        self.key_docs = _load_array(directory / "key_docs.npy")
+        self.live = np.load(directory / "live.npy")
+
+    @property
+    def num_terms(self) -> int:
+        return len(self.term_offsets) - 1
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    def term(self, index: int) -> bytes:
+        return self.terms[int(self.term_offsets[index]) : int(self.term_offsets[index + 1])]
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        """Binary search the sorted vocabulary and return the (docs, tfs) postings of a term."""
+        key = term.encode("utf-8")
+        low, high = 0, self.num_terms
+        while low < high:
+            middle = (low + high) // 2
+            if self.term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.num_terms or self.term(low) != key:
+            return None
+        start, end = int(self.postings_offsets[low]), int(self.postings_offsets[low + 1])
+        return self.postings_docs[start:end], self.postings_tf[start:end]
+
+    def record(self, doc: int) -> bytes:
+        return self.docs[int(self.doc_offsets[doc]) : int(self.doc_offsets[doc + 1])]
+
+    def document(self, doc: int) -> dict:
+        return json.loads(self.record(doc))
+
+    def find(self, url: str) -> int | None:
+        """Return the live document with this url, if any."""
+        key = np.uint64(url_hash(url))
+        position = int(np.searchsorted(self.key_hashes, key))
+        while position < len(self.key_hashes) and self.key_hashes[position] == key:
+            doc = int(self.key_docs[position])
+            if self.live[doc] and self.document(doc)["url"] == url:
+                return doc
+            position += 1
+        return None
+
+    def vocabulary(self) -> list[str]:
+        return [self.term(i).decode("utf-8") for i in range(self.num_terms)]
+
+    def save_live(self) -> None:
+        tmp_path = self.directory / "live.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.live)
+        os.replace(tmp_path, self.directory / "live.npy")
+
+    def close(self) -> None:
+        for mapped in (self.terms, self.docs):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        # Drop the numpy memory maps so the files can be removed (required on Windows)
+        self.term_offsets = self.postings_offsets = self.postings_docs = self.postings_tf = None
+        self.doc_lengths = self.doc_offsets = self.key_hashes = self.key_docs = None
+
+
+class BM25Index:
+    """
+    Segmented BM25 index stored as memory-mapped files.
+
+    Each ``add_documents`` call writes a new immutable segment; deletes only
+    flip a per-segment live mask, and ``compact`` merges all segments into
+    one without the deleted documents. Document frequencies include deleted
+    documents until the next compaction, like most segmented engines.
+    Documents are identified by their url; adding a url that is already
+    indexed replaces the old document.
+    """
+
+    def __init__(self, directory: str | Path, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            directory: Index directory, created on first write
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.directory = Path(directory)
+        self.k1 = k1
+        self.b = b
+        self.segments: list[Segment] = []
+        self._next_segment = 0
+        manifest = self.directory / MANIFEST
+        if manifest.exists():
+            state = json.loads(manifest.read_text(encoding="utf-8"))
+            if state.get("version") != VERSION:
+                raise ValueError(f"Unsupported BM25 index version {state.get('version')} in {self.directory}")
+            self._next_segment = state["next_segment"]
+            self.segments = [Segment(self.directory / name) for name in state["segments"]]
+        self._update_statistics()
+
+    def _update_statistics(self) -> None:
+        self.num_docs = sum(int(segment.live.sum()) for segment in self.segments)
+        total_length = sum(float(segment.doc_lengths[segment.live].sum()) for segment in self.segments)
+        self.average_length = total_length / self.num_docs if self.num_docs else 0.0
+
+    def _write_manifest(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state = {
+            "version": VERSION,
+            "next_segment": self._next_segment,
+            "segments": [segment.directory.name for segment in self.segments],
+        }
+        tmp_path = self.directory / f"{MANIFEST}.tmp"
+        tmp_path.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.directory / MANIFEST)
+
+    def _new_segment_directory(self) -> Path:
+        self._next_segment += 1
+        return self.directory / f"segment_{self._next_segment:06d}"
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def add_documents(self, documents: Iterable[dict]) -> int:
+        """
+        Index documents into a new segment.
+
+        Args:
+            documents: Dicts with url, title, summary and optionally text
+
+        Returns:
+            Number of documents added
+        """
+        vocabulary: dict[str, int] = {}
+        term_ids, doc_ids, frequencies, lengths, records, urls = [], [], [], [], [], []
+        for document in {str(d["url"]): d for d in documents if d.get("url")}.values():
+            weights: dict[str, float] = {}
+            length = 0.0
+            for field, weight in FIELD_WEIGHTS.items():
+                tokens = tokenize(str(document.get(field) or ""))
+                length += weight * len(tokens)
+                for token in tokens:
+                    weights[token] = weights.get(token, 0.0) + weight
+            for token, frequency in weights.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(len(records))
+                frequencies.append(frequency)
+            lengths.append(length)
+            urls.append(str(document["url"]))
+            stored = {
+                "url": urls[-1],
+                "title": str(document.get("title") or ""),
+                "summary": str(document.get("summary") or ""),
+            }
+            records.append(json.dumps(stored, ensure_ascii=False).encode("utf-8"))
+        if not records:
+            return 0
+
+        # Re-number terms so the segment vocabulary is sorted
+        terms = sorted(vocabulary)
+        remap = np.empty(len(terms), dtype=np.int64)
+        remap[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+
+        self.delete_documents(urls)
+        directory = self._new_segment_directory()
+        write_segment(
+            directory,
+            terms,
+            remap[np.asarray(term_ids, dtype=np.int64)],
+            np.asarray(doc_ids, dtype=np.int32),
+            np.asarray(frequencies, dtype=np.float32),
+            np.asarray(lengths, dtype=np.float32),
+            records,
+            urls,
+        )
+        self.segments.append(Segment(directory))
+        self._write_manifest()
+        self._update_statistics()
+        return len(records)
+
+    def delete_documents(self, urls: Iterable[str]) -> int:
+        """
+        Delete documents by url.
+
+        Returns:
+            Number of documents deleted
+        """
+        changed = set()
+        deleted = 0
+        for url in dict.fromkeys(map(str, urls)):
+            for segment in self.segments:
+                doc = segment.find(url)
+                if doc is not None:
+                    segment.live[doc] = False
+                    changed.add(segment)
+                    deleted += 1
+                    break
+        for segment in changed:
+            segment.save_live()
+        if changed:
+            self._update_statistics()
+        return deleted
+
+    def compact(self) -> None:
+        """Merge all segments into one, dropping deleted documents."""
+        if len(self.segments) <= 1 and all(segment.live.all() for segment in self.segments):
+            return
+
+        vocabulary = sorted(set().union(*(segment.vocabulary() for segment in self.segments)))
+        term_index = {term: index for index, term in enumerate(vocabulary)}
+        term_ids, doc_ids, frequencies, lengths, records, urls = [], [], [], [], [], []
+        base = 0
+        for segment in self.segments:
+            new_doc = np.cumsum(segment.live) - 1 + base
+            segment_terms = np.array([term_index[term] for term in segment.vocabulary()], dtype=np.int64)
+            posting_terms = np.repeat(segment_terms, np.diff(segment.postings_offsets))
+            keep = segment.live[segment.postings_docs]
+            term_ids.append(posting_terms[keep])
+            doc_ids.append(new_doc[segment.postings_docs[keep]])
+            frequencies.append(np.asarray(segment.postings_tf[keep]))
+            lengths.append(np.asarray(segment.doc_lengths[segment.live]))
+            for doc in np.flatnonzero(segment.live):
+                records.append(segment.record(doc))
+                urls.append(json.loads(records[-1])["url"])
+            base += int(segment.live.sum())
+
+        directory = self._new_segment_directory()
+        write_segment(
+            directory,
+            vocabulary,
+            np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64),
+            np.concatenate(doc_ids) if doc_ids else np.empty(0, dtype=np.int32),
+            np.concatenate(frequencies) if frequencies else np.empty(0, dtype=np.float32),
+            np.concatenate(lengths) if lengths else np.empty(0, dtype=np.float32),
+            records,
+            urls,
+        )
+        old_segments = self.segments
+        self.segments = [Segment(directory)]
+        self._write_manifest()
+        for segment in old_segments:
+            segment.close()
+            shutil.rmtree(segment.directory, ignore_errors=True)
+        self._update_statistics()
+
+    def search(self, query: str, top_k: int = 5) -> list[dict]:
+        """
+        Return the top-k documents for a free-text query.
+
+        Args:
+            query: The search query
+            top_k: Maximum number of results
+
+        Returns:
+            Dicts with url, title, summary and score, best match first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.num_docs:
+            return []
+
+        postings = [[segment.postings(term) for term in terms] for segment in self.segments]
+        document_frequency = [
+            sum(len(segment_postings[i][0]) for segment_postings in postings if segment_postings[i] is not None)
+            for i in range(len(terms))
+        ]
+        idf = [math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5)) for df in document_frequency]
+
+        candidates: list[tuple[float, int, int]] = []
+        for segment_index, (segment, segment_postings) in enumerate(zip(self.segments, postings)):
+            scores = None
+            for term_idf, entry in zip(idf, segment_postings):
+                if entry is None:
+                    continue
+                docs, tfs = entry
+                norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths[docs] / self.average_length)
+                contribution = term_idf * tfs * (self.k1 + 1) / (tfs + norm)
+                term_scores = np.bincount(docs, weights=contribution, minlength=segment.num_docs)
+                scores = term_scores if scores is None else scores + term_scores
+            if scores is None:
+                continue
+            scores[~segment.live] = 0
+            matches = np.flatnonzero(scores > 0)
+            if len(matches) > top_k:
+                matches = matches[np.argpartition(-scores[matches], top_k - 1)[:top_k]]
+            candidates.extend((float(scores[doc]), segment_index, int(doc)) for doc in matches)
+
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [
+            {**self.segments[segment_index].document(doc), "score": round(score, 4)}
+            for score, segment_index, doc in candidates[:top_k]
+        ]
+
+    def close(self) -> None:
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def __enter__(self) -> "BM25Index":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -1,5 +1,10 @@
 """Helper functions to save and open HTML in browser"""
+import asyncio
+import hashlib
 import os
+import re
+import sys
+import tempfile
 import webbrowser
 from pathlib import Path
 
@@ -44,3 +49,62 @@ def save_and_open_html(html_content: str, impairment_name: str) -> dict:
             "success": False,
             "message": f"Error: {str(e)}"
         }
+
+
+def is_headless() -> bool:
+    """
+    Return whether there is no browser to open, e.g. on a server.
+
+    BROWSER_HEADLESS=1 forces headless mode, BROWSER_HEADLESS=0 disables the
+    detection; otherwise Linux without a DISPLAY or WAYLAND_DISPLAY is headless.
+    """
+    setting = os.environ.get("BROWSER_HEADLESS", "").strip().lower()
+    if setting:
+        return setting not in ("0", "false", "no")
+    return sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def html_file_path(html_content: str, impairment_name: str, output_dir: str | Path = "output") -> Path:
+    """
+    Return the content-addressed path of a visualization.
+
+    The file name ends with a hash of the HTML, so identical renders map to
+    the same file and a changed tree never overwrites an open page.
+    """
+    safe_name = re.sub(r"[^\w.-]+", "_", impairment_name).strip("_") or "impairment"
+    digest = hashlib.sha256(html_content.encode("utf-8")).hexdigest()[:12]
+    return Path(output_dir) / f"decision_tree_{safe_name}_{digest}.html"
+
+
+def write_html_atomic(file_path: Path, html_content: str) -> bool:
+    """
+    Write HTML via a temporary file and rename, so readers never see a partial file.
+
+    Returns:
+        False if the file already existed (same name, so same content), True if it was written
+    """
+    data = html_content.encode("utf-8")
+    if file_path.exists() and file_path.stat().st_size == len(data):
+        return False
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return True
+
+
+async def save_html(html_content: str, impairment_name: str, output_dir: str | Path = "output") -> tuple[Path, bool]:
+    """
+    Save a visualization without blocking the event loop.
+
+    Returns:
+        The file path and whether it was written (False when it already existed)
+    """
+    file_path = html_file_path(html_content, impairment_name, output_dir)
+    written = await asyncio.to_thread(write_html_atomic, file_path, html_content)
+    return file_path, written
@@ -0,0 +1,303 @@
+"""Factory for AzureAIAgentClients that share one keep-alive HTTP connection pool"""
+import logging
+import os
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+import aiohttp
+from agent_framework import AGENT_FRAMEWORK_USER_AGENT
+from azure.ai.agents.aio import AgentsClient
+from azure.core.pipeline.transport import AioHttpTransport
+
+from utils.agent_registry import (
+    AgentRegistry,
+    RegisteredAgentMiddleware,
+    WarmThreadMiddleware,
+    WarmThreadPool,
+    agent_key,
+    preload_definition,
+)
+from utils.hedging import HedgedAgent, HedgingPolicy
+from utils.model_routing import ModelRoute, create_routed_agent, load_model_routes
+from utils.quota import QuotaMiddleware, QuotaScheduler, load_quota_limits
+
+if TYPE_CHECKING:
+    from agent_framework.azure import AzureAIAgentClient
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """A lazily created aiohttp session whose connector keeps connections alive"""
+
+    def __init__(
+        self,
+        size: int = 20,
+        keepalive_timeout: float = 60.0,
+        trace_configs: list[aiohttp.TraceConfig] | None = None,
+    ):
+        """
+        Args:
+            size: Maximum number of open connections in the pool
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            trace_configs: Optional aiohttp trace configs, e.g. to time connection setup
+        """
+        self.size = size
+        self.keepalive_timeout = keepalive_timeout
+        self.trace_configs = trace_configs or []
+        self._session: aiohttp.ClientSession | None = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use inside the running event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.size,
+                limit_per_host=self.size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                auto_decompress=False,
+                trust_env=True,
+                trace_configs=self.trace_configs,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the session and every pooled connection."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class PooledTransport(AioHttpTransport):
+    """Azure SDK transport that sends requests through a shared ConnectionPool"""
+
+    def __init__(self, pool: ConnectionPool, **kwargs):
+        super().__init__(**kwargs)
+        self._pool = pool
+
+    # The pool owns the session: clients neither create nor close it
+    async def open(self):
+        self.session = self._pool.get_session()
+        self._has_been_opened = True
+
+    async def close(self):
+        self.session = None
+
+
+class AgentClientFactory:
+    """
+    Hands out AzureAIAgentClients backed by one keep-alive connection pool.
+
+    Every agent still gets its own AzureAIAgentClient (and therefore its own
+    server-side agent), but all clients for the same project endpoint share a
+    single AgentsClient and all HTTP traffic goes through one connection pool,
+    so TLS handshakes are paid once per pooled connection instead of once per agent.
+
+    With a registry, agents created through ``create_agent`` are looked up
+    by name, instructions, tools and schema, reused across restarts and not
+    deleted on close. With ``warm_threads``, every client starts its runs on
+    threads created ahead of time. With ``model_routes``, every agent runs on
+    the deployment routed to its name, escalating to the deployments after it
+    when its output does not validate (see utils.model_routing). With
+    ``hedging``, slow agent runs get a hedged second request and failed ones
+    are retried (see utils.hedging). With ``quota``, every model call waits
+    for its deployment's tokens- and requests-per-minute quota, shared with
+    the other processes using the same state file (see utils.quota).
+    """
+
+    def __init__(
+        self,
+        project_endpoint: str,
+        model_deployment_name: str,
+        credential,
+        pool_size: int | None = None,
+        keepalive_timeout: float = 60.0,
+        trace_configs: list[aiohttp.TraceConfig] | None = None,
+        registry: AgentRegistry | str | None = None,
+        warm_threads: int | None = None,
+        model_routes: Mapping[str, ModelRoute] | str | None = None,
+        hedging: HedgingPolicy | None = None,
+        quota: QuotaScheduler | str | None = None,
+    ):
+        """
+        Args:
+            project_endpoint: The default Azure AI project endpoint
+            model_deployment_name: The default model deployment for new agents
+            credential: Async Azure credential shared by all clients
+            pool_size: Maximum number of pooled connections (defaults to AZURE_AI_POOL_SIZE or 20)
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            trace_configs: aiohttp trace configs of the pool, e.g. MetricsCollector.trace_config()
+            registry: AgentRegistry or path of one (defaults to AGENT_REGISTRY_FILE, none if unset)
+            warm_threads: Threads kept ready per endpoint (defaults to AZURE_AI_WARM_THREADS or 0)
+            model_routes: Deployments per agent name, or the path of a JSON file of them
+                (defaults to MODEL_ROUTING_FILE; unrouted agents use ``model_deployment_name``)
+            hedging: Policy, and shared budget, of hedged agent runs (defaults to a
+                HedgingPolicy() if AGENT_HEDGING is 1, no hedging otherwise)
+            quota: QuotaScheduler or the path of its state file (defaults to MODEL_QUOTA_STATE_FILE,
+                none if unset); a new scheduler reads the quotas of MODEL_QUOTA_FILE, if set
+        """
+        self.project_endpoint = project_endpoint
+        self.model_deployment_name = model_deployment_name
+        self.credential = credential
+        quota = quota or os.environ.get("MODEL_QUOTA_STATE_FILE")
+        if isinstance(quota, (str, os.PathLike)):
+            limits_file = os.environ.get("MODEL_QUOTA_FILE")
+            quota = QuotaScheduler(quota, limits=load_quota_limits(limits_file) if limits_file else None)
+        self.quota = quota
+        if quota is not None:
+            # Learns the quotas from the rate limit headers of the responses
+            trace_configs = [*(trace_configs or []), quota.trace_config()]
+        self.pool = ConnectionPool(
+            size=pool_size or int(os.environ.get("AZURE_AI_POOL_SIZE", "20")),
+            keepalive_timeout=keepalive_timeout,
+            trace_configs=trace_configs,
+        )
+        registry = registry or os.environ.get("AGENT_REGISTRY_FILE")
+        self.registry = AgentRegistry(registry) if isinstance(registry, (str, os.PathLike)) else registry
+        if warm_threads is None:
+            warm_threads = int(os.environ.get("AZURE_AI_WARM_THREADS", "0"))
+        self.warm_threads = warm_threads
+        model_routes = model_routes or os.environ.get("MODEL_ROUTING_FILE")
+        if isinstance(model_routes, (str, os.PathLike)):
+            model_routes = load_model_routes(model_routes)
+        self.model_routes: Mapping[str, ModelRoute] = model_routes or {}
+        if hedging is None and os.environ.get("AGENT_HEDGING", "0") == "1":
+            hedging = HedgingPolicy()
+        self.hedging = hedging
+        self._agents_clients: dict[str, AgentsClient] = {}
+        self._thread_pools: dict[str, WarmThreadPool] = {}
+        self._clients: list["AzureAIAgentClient"] = []
+
+    def get_agents_client(self, project_endpoint: str | None = None) -> AgentsClient:
+        """Return the shared AgentsClient for an endpoint, creating it on first use."""
+        endpoint = project_endpoint or self.project_endpoint
+        if endpoint not in self._agents_clients:
+            self._agents_clients[endpoint] = AgentsClient(
+                endpoint=endpoint,
+                credential=self.credential,
+                user_agent=AGENT_FRAMEWORK_USER_AGENT,
+                transport=PooledTransport(self.pool),
+            )
+        return self._agents_clients[endpoint]
+
+    def get_thread_pool(self, project_endpoint: str | None = None) -> WarmThreadPool:
+        """Return the warm thread pool of an endpoint, seeded with the spare threads in the registry."""
+        endpoint = project_endpoint or self.project_endpoint
+        if endpoint not in self._thread_pools:
+            thread_ids = self.registry.take_threads(endpoint) if self.registry is not None else []
+            self._thread_pools[endpoint] = WarmThreadPool(
+                self.get_agents_client(endpoint), size=self.warm_threads, thread_ids=thread_ids
+            )
+        return self._thread_pools[endpoint]
+
+    def create_client(
+        self,
+        model_deployment_name: str | None = None,
+        project_endpoint: str | None = None,
+        **kwargs,
+    ) -> "AzureAIAgentClient":
+        """Create an AzureAIAgentClient that uses the shared connection pool."""
+        # Imported here: agent_framework.azure takes about a second to import,
+        # which processes that build their agents lazily only pay on first use
+        from agent_framework.azure import AzureAIAgentClient
+
+        model_deployment_name = model_deployment_name or self.model_deployment_name
+        if self.quota is not None:
+            quota_middleware = QuotaMiddleware(self.quota, model_deployment_name)
+            kwargs["middleware"] = [quota_middleware, *(kwargs.get("middleware") or [])]
+        if self.warm_threads > 0:
+            pool_middleware = WarmThreadMiddleware(self.get_thread_pool(project_endpoint))
+            kwargs["middleware"] = [*(kwargs.get("middleware") or []), pool_middleware]
+        client = AzureAIAgentClient(
+            agents_client=self.get_agents_client(project_endpoint),
+            model_deployment_name=model_deployment_name,
+            credential=self.credential,
+            **kwargs,
+        )
+        self._clients.append(client)
+        return client
+
+    def create_agent(self, model_deployment_name: str | None = None, hedge: bool = True, **kwargs):
+        """
+        Create an agent on a new pooled client; accepts the same arguments as create_agent.
+
+        Without an explicit deployment, the agent runs on the one routed to its
+        name. A route with deployments to escalate to gives an EscalatingAgent,
+        whose agents on the stronger deployments are only created when first needed.
+        With hedging, the agent on every deployment is a HedgedAgent, unless
+        ``hedge`` is False, e.g. for a group chat manager, which GroupChatBuilder
+        needs to see as a ChatAgent.
+
+        With a registry, the client runs the server-side agent registered for
+        the same definition, without fetching it first; otherwise the agent
+        is created on the first run and registered.
+        """
+        # An explicit deployment overrides the route
+        route = self.model_routes.get(kwargs.get("name")) if model_deployment_name is None else None
+        name = kwargs.get("name") or "agent"
+
+        def create(model: str):
+            agent = self._create_agent(model, kwargs)
+            if self.hedging is None or not hedge:
+                return agent
+            # Latencies are learned per agent and deployment
+            return HedgedAgent(agent, self.hedging, key=f"{name}@{model}")
+
+        return create_routed_agent(
+            create,
+            name,
+            kwargs.get("output_schema"),
+            route,
+            model_deployment_name or self.model_deployment_name,
+        )
+
+    def _create_agent(self, model: str, kwargs: dict):
+        if self.registry is None:
+            return self.create_client(model).create_agent(**kwargs)
+
+        key = agent_key(self.project_endpoint, model, kwargs)
+        entry = self.registry.get(key)
+        client = self.create_client(model, agent_id=entry["agent_id"] if entry else None, should_cleanup_agent=False)
+        # The middleware needs the client, so it is added after construction
+        client.middleware = [RegisteredAgentMiddleware(self.registry, key, client, model), *(client.middleware or [])]
+        if entry:
+            # Skips the get_agent round trip the client makes before its first run
+            preload_definition(client, self.registry.definition(key))
+        return client.create_agent(**kwargs)
+
+    async def close(self) -> None:
+        """
+        Delete the agents created by the clients (except registered ones), then close the
+        shared clients and the pool. Unused warm threads are left to the next process via the registry.
+        """
+        for endpoint, thread_pool in self._thread_pools.items():
+            threads = await thread_pool.close()
+            if self.registry is not None:
+                self.registry.give_threads(endpoint, threads)
+            else:
+                for thread_id, _ in threads:
+                    try:
+                        await self._agents_clients[endpoint].threads.delete(thread_id)
+                    except Exception as e:
+                        logger.warning("Failed to delete warm thread %s: %s", thread_id, e)
+        for client in self._clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning("Failed to clean up agent client: %s", e)
+        for agents_client in self._agents_clients.values():
+            await agents_client.close()
+        await self.pool.close()
+        self._clients.clear()
+        self._agents_clients.clear()
+        self._thread_pools.clear()
+
+    async def __aenter__(self) -> "AgentClientFactory":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
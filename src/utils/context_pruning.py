@@ -0,0 +1,152 @@
+"""Per-stage context policies that prune the conversation each agent receives"""
+import json
+import logging
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from agent_framework import AgentMiddleware, AgentRunContext, ChatMessage, Role
+
+from utils.conversation import estimate_tokens, extract_json
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    """
+    Which part of the shared conversation a stage gets to see.
+
+    Attributes:
+        stages: Earlier stages whose output is kept, mapped to the top-level
+            fields to keep (None keeps the whole output). None keeps every message.
+        previous_only: Keep only the output of the stage right before this one
+        include_user: Keep the user messages (the impairment name)
+    """
+
+    stages: Mapping[str, tuple[str, ...] | None] | None = None
+    previous_only: bool = False
+    include_user: bool = True
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "ContextPolicy":
+        """Build a policy from its JSON form, e.g. {"stages": {"SearchAgent": ["documents"]}}."""
+        stages = spec.get("stages")
+        if stages is not None:
+            stages = {name: tuple(fields) if fields is not None else None for name, fields in stages.items()}
+        return cls(
+            stages=stages,
+            previous_only=bool(spec.get("previous_only", False)),
+            include_user=bool(spec.get("include_user", True)),
+        )
+
+
+# What each model stage actually reads: the DecisionTreeAgent still needs the document
+# urls and titles for its node sources, but no longer the search queries. The
+# VisualizerAgent and BrowserAgent stages are native executors that call no model.
+DEFAULT_CONTEXT_POLICIES: dict[str, ContextPolicy] = {
+    "SearchAgent": ContextPolicy(stages={"SearchPromptAgent": None}),
+    "RiskAnalyzerAgent": ContextPolicy(stages={"SearchAgent": ("impairment_name", "documents")}),
+    "DecisionTreeAgent": ContextPolicy(stages={"RiskAnalyzerAgent": None, "SearchAgent": ("documents",)}),
+}
+
+
+def load_context_policies(path: str | Path) -> dict[str, ContextPolicy]:
+    """
+    Read per-stage policies from a JSON file, on top of the defaults.
+
+    The file maps stage names to policies, e.g.
+    ``{"DecisionTreeAgent": {"previous_only": true}, "SearchAgent": null}``;
+    null removes the default policy of a stage so it sees the full conversation.
+    """
+    policies = dict(DEFAULT_CONTEXT_POLICIES)
+    for stage, spec in json.loads(Path(path).read_text(encoding="utf-8")).items():
+        if spec is None:
+            policies.pop(stage, None)
+        else:
+            policies[stage] = ContextPolicy.from_dict(spec)
+    return policies
+
+
+def _project(message: ChatMessage, fields: tuple[str, ...]) -> ChatMessage:
+    """Keep only some top-level fields of a structured stage output."""
+    try:
+        payload = extract_json(message.text)
+    except ValueError:
+        return message
+    if not isinstance(payload, dict):
+        return message
+    projected = {field: payload[field] for field in fields if field in payload}
+    text = json.dumps(projected, ensure_ascii=False)
+    return ChatMessage(role=message.role, text=text, author_name=message.author_name)
+
+
+def prune_conversation(messages: list[ChatMessage], policy: ContextPolicy) -> list[ChatMessage]:
+    """
+    Apply a context policy to the conversation a stage receives.
+
+    Args:
+        messages: The full conversation (user prompt plus earlier stage outputs)
+        policy: The policy of the receiving stage
+
+    Returns:
+        The pruned conversation, in the original order
+    """
+    if policy.stages is None and not policy.previous_only:
+        return messages if policy.include_user else [m for m in messages if m.role != Role.USER]
+
+    previous = None
+    if policy.previous_only:
+        previous = next((m for m in reversed(messages) if m.role == Role.ASSISTANT and m.author_name and m.text), None)
+
+    pruned = []
+    for message in messages:
+        if message.role == Role.USER:
+            if policy.include_user:
+                pruned.append(message)
+        elif message is previous:
+            pruned.append(message)
+        elif policy.stages is not None and message.author_name in policy.stages and message.text:
+            # Tool calls and results of earlier stages have no text and are always dropped
+            fields = policy.stages[message.author_name]
+            pruned.append(message if fields is None else _project(message, fields))
+    # Never hand a stage an empty conversation, e.g. when it runs outside the workflow
+    return pruned or messages
+
+
+class ContextPruningMiddleware(AgentMiddleware):
+    """
+    Agent middleware that applies the context policy of the running stage.
+
+    Place it before a StageCacheMiddleware so cache keys are computed on
+    the pruned input, which also makes them independent of unused stages.
+    """
+
+    def __init__(self, policies: Mapping[str, ContextPolicy] | None = None):
+        """
+        Args:
+            policies: Policy per agent name; agents without one see the full conversation
+        """
+        self.policies = DEFAULT_CONTEXT_POLICIES if policies is None else policies
+        self.stats: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"runs": 0, "estimated_tokens_before": 0, "estimated_tokens_after": 0}
+        )
+
+    async def process(
+        self,
+        context: AgentRunContext,
+        next: Callable[[AgentRunContext], Awaitable[None]],
+    ) -> None:
+        stage = context.agent.name
+        policy = self.policies.get(stage)
+        if policy is not None:
+            before = sum(estimate_tokens(m.text or "") for m in context.messages)
+            context.messages = prune_conversation(context.messages, policy)
+            after = sum(estimate_tokens(m.text or "") for m in context.messages)
+            stats = self.stats[stage]
+            stats["runs"] += 1
+            stats["estimated_tokens_before"] += before
+            stats["estimated_tokens_after"] += after
+            logger.debug("%s: pruned input from ~%d to ~%d tokens", stage, before, after)
+        await next(context)
@@ -0,0 +1,81 @@
+"""Helper functions to read and validate structured stage outputs from a workflow conversation"""
+import json
+from typing import Any
+
+from agent_framework import ChatMessage
+from pydantic import BaseModel
+
+# Rough size of a token for English text and JSON, used to report token savings
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of model tokens of a text."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse the JSON payload of an agent message.
+
+    Agents sometimes wrap their structured output in a markdown code fence,
+    so the fence is stripped before parsing.
+
+    Args:
+        text: The raw message text
+
+    Returns:
+        The parsed JSON value
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    return json.loads(text)
+
+
+def validate_output(output: Any, schema: type[BaseModel] | None) -> str | None:
+    """
+    Why an agent output does not match a schema, or None if it does (or there is no schema).
+
+    Args:
+        output: The text of the output, or its already parsed JSON
+        schema: The output schema of the stage
+    """
+    if schema is None:
+        return None
+    try:
+        schema.model_validate(extract_json(output) if isinstance(output, str) else output)
+    except ValueError as e:
+        # Also covers json.JSONDecodeError and pydantic's ValidationError
+        return str(e).splitlines()[0]
+    return None
+
+
+def find_stage_message(conversation: list[ChatMessage], author_name: str) -> ChatMessage | None:
+    """Return the last message written by the given agent, if any."""
+    for message in reversed(conversation):
+        if message.author_name == author_name and message.text:
+            return message
+    return None
+
+
+def parse_stage_output(conversation: list[ChatMessage], author_name: str) -> dict | None:
+    """
+    Parse the structured output of a workflow stage from the conversation.
+
+    Args:
+        conversation: The shared conversation passed down the workflow
+        author_name: Name of the agent whose output should be parsed
+
+    Returns:
+        The parsed JSON object, or None if the stage has no (valid) output
+    """
+    message = find_stage_message(conversation, author_name)
+    if message is None:
+        return None
+    try:
+        payload = extract_json(message.text)
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
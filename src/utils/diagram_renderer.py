@@ -0,0 +1,115 @@
+"""Helper functions to render a decision tree into the rmv-diagram HTML template"""
+import html
+import json
+import re
+from functools import cache
+from pathlib import Path
+
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "files" / "decision_tree_template.html"
+
+RULE_TITLE = "Rule / Decision Point"
+ASSIGNMENT_TITLE = "Assignment"
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+@cache
+def load_template() -> str:
+    """Load the rmv-diagram HTML template (read once per process)."""
+    return TEMPLATE_PATH.read_text(encoding="utf-8")
+
+
+def child_edges(node: dict) -> list[tuple[str, dict]]:
+    """Return the (label, child) pairs of a node; children without a decision are labelled True and False."""
+    return [
+        (str(child.get("decision") or ("True" if index == 0 else "False")), child)
+        for index, child in enumerate(node.get("children") or [])
+    ]
+
+
+def decision_tree_to_diagram(tree: dict) -> dict:
+    """
+    Walk a decision tree and convert it into the rmv-diagram JSON format.
+
+    Node ids are assigned in walk order, so ids produced by the model are
+    never trusted to be unique.
+
+    Args:
+        tree: The DecisionTree output as a dict
+
+    Returns:
+        Dict with "nodes" and "connections" lists
+    """
+    nodes: list[dict] = []
+    connections: list[dict] = []
+    stack: list[tuple[dict, int | None, str | None]] = [(tree["root_node"], None, None)]
+
+    while stack:
+        node, parent_id, label = stack.pop()
+        node_id = len(nodes) + 1
+
+        edges = child_edges(node)
+        if edges:
+            nodes.append({"id": node_id, "title": RULE_TITLE, "content": str(node.get("question", ""))})
+        else:
+            risk_level = node.get("risk_level")
+            nodes.append({
+                "id": node_id,
+                "title": ASSIGNMENT_TITLE,
+                "content": f'risk_level = "{risk_level or "Unknown"}"',
+                "type": "code",
+            })
+
+        if parent_id is not None:
+            connections.append({"source": parent_id, "target": node_id, "label": label})
+
+        # Push in reverse so children are numbered left to right
+        for child_label, child in reversed(edges):
+            stack.append((child, node_id, child_label))
+
+    return {"nodes": nodes, "connections": connections}
+
+
+def collect_sources(tree: dict) -> list[dict]:
+    """Collect the unique sources referenced anywhere in the tree, in walk order."""
+    sources: dict[str, dict] = {}
+
+    def add(name: str | None, url: str | None) -> None:
+        if url and url not in sources:
+            sources[url] = {"name": name or url, "url": url}
+
+    for document in tree.get("source_documents") or []:
+        if isinstance(document, dict):
+            add(document.get("title") or document.get("source_name"), document.get("url") or document.get("source_url"))
+
+    stack = [tree["root_node"]]
+    while stack:
+        node = stack.pop()
+        for source in node.get("sources") or []:
+            if isinstance(source, dict):
+                add(source.get("source_name"), source.get("source_url"))
+        stack.extend(child for _, child in reversed(child_edges(node)))
+
+    return list(sources.values())
+
+
+def render_decision_tree_html(tree: dict) -> str:
+    """
+    Fill the rmv-diagram template with a decision tree.
+
+    Args:
+        tree: The DecisionTree output as a dict
+
+    Returns:
+        The complete HTML page
+    """
+    impairment_name = html.escape(str(tree.get("impairment_name", "")))
+    source_links = "\n      ".join(
+        f'<a href="{html.escape(source["url"])}" target="_blank">{html.escape(source["name"])}</a>'
+        for source in collect_sources(tree)
+    ) or "<p>No sources provided.</p>"
+    # "</" would terminate the surrounding <script> element early
+    diagram_json = json.dumps(decision_tree_to_diagram(tree), ensure_ascii=False).replace("</", "<\\/")
+
+    # One pass, so placeholders inside the model's text are not filled in as well
+    values = {"IMPAIRMENT_NAME": impairment_name, "SOURCE_LINKS": source_links, "DIAGRAM_JSON": diagram_json}
+    return PLACEHOLDER.sub(lambda match: values.get(match.group(1), match.group(0)), load_template())
@@ -0,0 +1,155 @@
+"""In-memory section index of a markdown guidelines document"""
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+from utils.bm25_index import tokenize
+
+DEFAULT_GUIDELINES_FILE = Path(__file__).resolve().parent.parent / "files" / "contoso-github-issues-guidelines.md"
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*$")
+# A term in a section title (or the title of its parent) counts three times as much as one in the body
+TITLE_WEIGHT = 3.0
+# Sections that only point to other sections
+SKIPPED_SECTIONS = frozenset({"table of contents"})
+
+
+def _terms(text: str) -> list[str]:
+    """Tokenize like the BM25 index and fold plurals, so "labels" finds "Mandatory Labels"."""
+    return [token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+            for token in tokenize(text)]
+
+
+def _clean_title(title: str) -> str:
+    """Drop the emoji and punctuation that decorate the headings."""
+    return re.sub(r"^[^\w\[`]+", "", title).strip()
+
+
+def parse_sections(text: str) -> list[dict]:
+    """
+    Split a markdown document into sections.
+
+    Every second and third level heading outside a code block starts a
+    section; deeper headings stay in the section they belong to, and headings
+    inside code blocks (the issue templates) are section content. A second
+    level section with subsections only keeps its own introduction.
+
+    Args:
+        text: The markdown document
+
+    Returns:
+        Dicts with id, title, path (the parent title and the title) and text
+    """
+    sections: list[dict] = []
+    parent = None
+    in_code = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        heading = None if in_code else HEADING_PATTERN.match(line)
+        if heading and len(heading.group(1)) in (2, 3):
+            title = _clean_title(heading.group(2))
+            if len(heading.group(1)) == 2:
+                parent = title
+                path = [title]
+            else:
+                path = [parent, title] if parent else [title]
+            sections.append({"title": title, "path": path, "lines": [line]})
+        elif sections:
+            sections[-1]["lines"].append(line)
+
+    result = []
+    for section in sections:
+        body = "\n".join(section.pop("lines")).strip()
+        if section["title"].lower() in SKIPPED_SECTIONS or body.count("\n") == 0:
+            continue
+        section_id = re.sub(r"[^a-z0-9]+", "-", " ".join(section["path"]).lower()).strip("-")
+        result.append({"id": section_id, **section, "text": body})
+    return result
+
+
+class GuidelinesIndex:
+    """
+    BM25 index over the sections of a guidelines document, kept in memory.
+
+    The sections are parsed and their terms counted once; a lookup only scores
+    the query terms against the precomputed postings. The file is checked with
+    one stat call per lookup and re-indexed only when it has changed.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_GUIDELINES_FILE, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            path: The markdown guidelines document
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.sections: list[dict] = []
+        self.reloads = 0
+        self._signature: tuple[int, int] | None = None
+        self._postings: dict[str, list[tuple[int, float]]] = {}
+        self._idf: dict[str, float] = {}
+        self._lengths: list[float] = []
+        self._average_length = 0.0
+
+    def _build(self) -> None:
+        self.sections = parse_sections(self.path.read_text(encoding="utf-8"))
+        postings: dict[str, list[tuple[int, float]]] = {}
+        self._lengths = []
+        for number, section in enumerate(self.sections):
+            frequencies = Counter(_terms(section["text"]))
+            for term in _terms(" ".join(section["path"])):
+                frequencies[term] += TITLE_WEIGHT
+            for term, frequency in frequencies.items():
+                postings.setdefault(term, []).append((number, frequency))
+            self._lengths.append(sum(frequencies.values()))
+        count = len(self.sections)
+        self._postings = postings
+        self._idf = {
+            term: math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5)) for term, entries in postings.items()
+        }
+        self._average_length = sum(self._lengths) / count if count else 0.0
+        self.reloads += 1
+
+    def refresh(self) -> bool:
+        """Re-index the document if it changed since it was last read; returns whether it did."""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+        self._build()
+        self._signature = signature
+        return True
+
+    def section(self, section_id: str) -> dict | None:
+        """Return a section by its id."""
+        self.refresh()
+        return next((section for section in self.sections if section["id"] == section_id), None)
+
+    def search(self, query: str, top_k: int = 3) -> list[dict]:
+        """
+        Find the sections that best match a query.
+
+        Args:
+            query: Free text, e.g. "bug report template" or "priority labels"
+            top_k: Maximum number of sections to return
+
+        Returns:
+            Dicts with id, title, path, text and score, best match first
+        """
+        self.refresh()
+        scores: dict[int, float] = {}
+        for term in set(_terms(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for number, frequency in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[number] / self._average_length)
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [{**self.sections[number], "score": round(score, 4)} for number, score in best]
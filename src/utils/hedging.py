@@ -0,0 +1,293 @@
+"""Hedged agent runs with timeouts learned from recent latencies"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterable, Awaitable, Callable
+from typing import Any, TypeVar
+
+from agent_framework import AgentProtocol, AgentRunResponse, AgentRunResponseUpdate, AgentThread
+
+from utils.stats import percentile
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RollingLatency:
+    """The last ``window`` latencies of an agent, for percentiles that follow changes in load"""
+
+    def __init__(self, window: int = 200):
+        self._values: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        return percentile(list(self._values), q)
+
+
+class HedgingPolicy:
+    """
+    Settings, latency histories and the shared budget of hedged agents.
+
+    Once an agent has ``min_samples`` latencies, a run that is still going
+    at their ``hedge_percentile`` gets a second, hedged run, and one that is
+    still going at ``timeout_factor`` times their 99th percentile is
+    abandoned and retried. Hedges are capped at ``budget_ratio`` of all runs
+    (plus ``budget_burst``) across every agent using the policy, so a slow
+    backend does not get twice the load. Failed runs are retried up to
+    ``max_retries`` times after a jittered exponential backoff.
+
+    Every run records how long its first attempt had been going when the run
+    ended, also when a hedge answered first or the run timed out. For those
+    runs this is a lower bound of the latency, but recording only answers that
+    arrived in time would leave out the slow tail and let the percentiles, and
+    with them the hedge delay and timeout, drift down.
+    """
+
+    def __init__(
+        self,
+        hedge_percentile: float = 95.0,
+        window: int = 200,
+        min_samples: int = 20,
+        timeout_factor: float = 3.0,
+        budget_ratio: float = 0.1,
+        budget_burst: int = 5,
+        max_retries: int = 2,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        seed: int | None = None,
+    ):
+        """
+        Args:
+            hedge_percentile: Latency percentile after which a run is hedged
+            window: Number of recent latencies kept per agent
+            min_samples: Latencies needed before runs are hedged or timed out
+            timeout_factor: Runs are abandoned at this multiple of the 99th percentile; 0 never abandons them
+            budget_ratio: Maximum share of runs that are hedged
+            budget_burst: Hedges allowed on top of the ratio, e.g. right after the start
+            max_retries: Retries of a failed or abandoned run
+            backoff_base: Seconds of the first backoff; every retry doubles it
+            backoff_max: Upper bound of a backoff in seconds
+            seed: Seed of the backoff jitter
+        """
+        self.hedge_percentile = hedge_percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.timeout_factor = timeout_factor
+        self.budget_ratio = budget_ratio
+        self.budget_burst = budget_burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._random = random.Random(seed)
+        self._latencies: dict[str, RollingLatency] = {}
+        self._lock = threading.Lock()
+        self.stats = {"runs": 0, "hedged": 0, "hedge_wins": 0, "over_budget": 0, "timeouts": 0, "retries": 0}
+
+    def record(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, RollingLatency(self.window)).add(seconds)
+
+    def _learned(self, key: str, q: float) -> float | None:
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            return latencies.percentile(q)
+
+    def hedge_after(self, key: str) -> float | None:
+        """Seconds after which a run is hedged, or None while too few latencies are known."""
+        return self._learned(key, self.hedge_percentile)
+
+    def timeout(self, key: str) -> float | None:
+        """Seconds after which a run is abandoned, or None while too few latencies are known."""
+        p99 = self._learned(key, 99.0)
+        return p99 * self.timeout_factor if p99 is not None and self.timeout_factor > 0 else None
+
+    def try_hedge(self) -> bool:
+        """Take a hedge from the budget; False if the budget is used up."""
+        with self._lock:
+            if self.stats["hedged"] < self.budget_burst + self.budget_ratio * self.stats["runs"]:
+                self.stats["hedged"] += 1
+                return True
+            self.stats["over_budget"] += 1
+            return False
+
+    def backoff(self, retry: int) -> float:
+        """Seconds to wait before a retry: "full jitter", uniform up to the exponential backoff."""
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+
+    def latency_summary(self) -> dict[str, dict[str, float]]:
+        """Per agent, the number of recent latencies, their p50, p95 and p99, and the current timeouts."""
+        with self._lock:
+            keys = list(self._latencies)
+        summary = {}
+        for key in keys:
+            latencies = self._latencies[key]
+            summary[key] = {
+                "samples": len(latencies),
+                **{f"p{q}": round(latencies.percentile(q), 3) for q in (50, 95, 99)},
+                "hedge_after": self.hedge_after(key),
+                "timeout": self.timeout(key),
+            }
+        return summary
+
+
+class HedgedAgent(AgentProtocol):
+    """
+    Runs an agent with hedged requests, adaptive timeouts and retries (see HedgingPolicy).
+
+    The first attempt runs on the caller's thread; hedges and retries run on
+    new threads, since an abandoned run may still be busy on the old one.
+    Whichever attempt finishes first wins and the others are cancelled. In
+    streaming mode the race is for the first update with contents, measured
+    and timed out separately; from then on the winning stream is passed on
+    as it is, so a stream that stalls halfway is not hedged.
+
+    Other attributes are read from the agent, but the wrapper is no ChatAgent:
+    code that checks for one, like GroupChatBuilder.set_manager, needs the agent itself.
+    """
+
+    def __init__(self, agent: AgentProtocol, policy: HedgingPolicy, key: str | None = None):
+        """
+        Args:
+            agent: The agent to run
+            policy: The hedging policy, shared by all agents that share a budget
+            key: Key of the agent's latency history; defaults to its name
+        """
+        self.agent = agent
+        self.policy = policy
+        self.key = key or agent.name or "agent"
+
+    @property
+    def id(self) -> str:
+        return self.agent.id
+
+    @property
+    def name(self) -> str | None:
+        return self.agent.name
+
+    @property
+    def display_name(self) -> str:
+        return self.agent.display_name
+
+    @property
+    def description(self) -> str | None:
+        return self.agent.description
+
+    def get_new_thread(self, **kwargs: Any) -> AgentThread:
+        return self.agent.get_new_thread(**kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes HedgedAgent does not define itself, e.g. chat_options
+        if name.startswith("__") or name in ("agent", "policy", "key"):
+            raise AttributeError(name)
+        return getattr(self.agent, name)
+
+    async def _race(
+        self, key: str, attempt: Callable[[AgentThread | None], Awaitable[T]], thread: AgentThread | None,
+        discard: Callable[[T], Awaitable[None]] | None = None,
+    ) -> T:
+        """Run an attempt, hedge it once it passes the learned percentile and return the first result."""
+        policy = self.policy
+        hedge_after, timeout = policy.hedge_after(key), policy.timeout(key)
+        start = time.perf_counter()
+        tasks: dict[asyncio.Task, bool] = {asyncio.create_task(attempt(thread)): False}
+        hedged = False
+        error: BaseException | None = None
+        try:
+            while tasks:
+                deadlines = [start + timeout] if timeout is not None else []
+                if not hedged and hedge_after is not None:
+                    deadlines.append(start + hedge_after)
+                wait = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+                done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                now = time.perf_counter()
+                winner = next((task for task in done if task.exception() is None), None)
+                for task in done:
+                    is_hedge = tasks.pop(task)
+                    if task is winner:
+                        # The first attempt's time, even if a hedge won: the hedge started late
+                        policy.record(key, now - start)
+                        if is_hedge:
+                            policy.stats["hedge_wins"] += 1
+                    elif task.exception() is not None:
+                        error = task.exception()
+                        logger.debug("%s: attempt failed: %s", self.key, error)
+                    elif discard is not None:
+                        # Finished together with the winner
+                        await discard(task.result())
+                if winner is not None:
+                    return winner.result()
+                if timeout is not None and now - start >= timeout and tasks:
+                    policy.stats["timeouts"] += 1
+                    policy.record(key, now - start)
+                    raise TimeoutError(f"{self.key} did not answer within {timeout:.1f}s")
+                if not hedged and hedge_after is not None and now - start >= hedge_after and tasks:
+                    hedged = True
+                    if policy.try_hedge():
+                        logger.info("%s: no answer after %.1fs, sending a hedged request", self.key, hedge_after)
+                        tasks[asyncio.create_task(attempt(self.agent.get_new_thread()))] = True
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _with_retries(
+        self, key: str, attempt: Callable[[AgentThread | None], Awaitable[T]], thread: AgentThread | None,
+        discard: Callable[[T], Awaitable[None]] | None = None,
+    ) -> T:
+        self.policy.stats["runs"] += 1
+        retry = 0
+        while True:
+            try:
+                return await self._race(key, attempt, thread, discard)
+            except Exception as e:
+                retry += 1
+                if retry > self.policy.max_retries:
+                    raise
+                delay = self.policy.backoff(retry)
+                self.policy.stats["retries"] += 1
+                logger.warning("%s: %s, retry %d in %.1fs", self.key, e or type(e).__name__, retry, delay)
+                await asyncio.sleep(delay)
+                thread = self.agent.get_new_thread()
+
+    async def run(self, messages=None, *, thread: AgentThread | None = None, **kwargs: Any) -> AgentRunResponse:
+        async def attempt(attempt_thread: AgentThread | None) -> AgentRunResponse:
+            return await self.agent.run(messages, thread=attempt_thread, **kwargs)
+
+        return await self._with_retries(self.key, attempt, thread)
+
+    async def run_stream(
+        self, messages=None, *, thread: AgentThread | None = None, **kwargs: Any
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        async def attempt(attempt_thread: AgentThread | None):
+            # Updates without contents, like the creation of the run, do not show the model answering
+            stream = self.agent.run_stream(messages, thread=attempt_thread, **kwargs).__aiter__()
+            received: list[AgentRunResponseUpdate] = []
+            async for update in stream:
+                received.append(update)
+                if update.contents:
+                    break
+            return stream, received
+
+        async def discard(opened) -> None:
+            stream, _ = opened
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+
+        stream, received = await self._with_retries(f"{self.key}:first_update", attempt, thread, discard)
+        for update in received:
+            yield update
+        async for update in stream:
+            yield update
@@ -0,0 +1,256 @@
+"""Canonicalization of impairment names with a synonym table and a trigram index"""
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from agent_framework import AgentMiddleware, AgentRunContext, ChatMessage, Role
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNONYMS_FILE = Path(__file__).resolve().parent.parent / "files" / "impairment_synonyms.json"
+SYNONYMS_VERSION = 1
+
+ROMAN_NUMERALS = {"i": "1", "ii": "2", "iii": "3", "iv": "4"}
+# Words dropped from names; single letters are kept, as they tell names apart ("hepatitis a")
+FILLER_WORDS = frozenset({"an", "the", "of"})
+# Shorter inputs (mostly abbreviations such as "MS" or "PE") are only matched exactly
+MIN_FUZZY_LENGTH = 4
+# Words that tell otherwise equal names apart, so a fuzzy match must spell them exactly
+QUALIFIER_WORDS = frozenset({
+    "acute", "chronic", "primary", "secondary", "type", "juvenile", "adult", "congenital", "acquired",
+    "malignant", "benign", "mild", "moderate", "severe", "left", "right", "upper", "lower", "non",
+})
+# Inputs that look like a request rather than a name are left alone
+MAX_NAME_LENGTH = 120
+
+
+def normalize(name: str) -> str:
+    """Lowercase, strip accents and punctuation, spell roman numerals as digits and drop filler words."""
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    text = re.sub(r"'s\b", "", text)
+    tokens = re.findall(r"[a-z]+|[0-9]+", text)
+    return " ".join(ROMAN_NUMERALS.get(token, token) for token in tokens if token not in FILLER_WORDS)
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """Whether ``b`` is ``a`` with at most one letter inserted, deleted, replaced or swapped with its neighbour."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    swapped = a[i + 1:i + 2] == b[i:i + 1] and a[i:i + 1] == b[i + 1:i + 2] and a[i + 2:] == b[i + 2:]
+    return swapped or a[i + 1:] == b[i + 1:]
+
+
+def typo_of(tokens: list[str], alias_tokens: tuple[str, ...]) -> bool:
+    """
+    Whether the words of an input are the words of an alias with at most a typo in each.
+
+    Every word must pair with a word of the alias and neither may have words
+    left over. Numbers, single letters, words shorter than MIN_FUZZY_LENGTH
+    and QUALIFIER_WORDS only pair with the same word, so "hepatitis c" is not
+    "hepatitis b" and "acute renal failure" is not "chronic renal failure".
+    """
+    if len(tokens) != len(alias_tokens):
+        return False
+    unused = list(alias_tokens)
+    for token in tokens:
+        if token in unused:
+            unused.remove(token)
+            continue
+        if len(token) < MIN_FUZZY_LENGTH or token.isdigit() or token in QUALIFIER_WORDS:
+            return False
+        for other in unused:
+            if len(other) >= MIN_FUZZY_LENGTH and other not in QUALIFIER_WORDS and within_one_edit(token, other):
+                unused.remove(other)
+                break
+        else:
+            return False
+    return True
+
+
+def trigrams(text: str) -> Counter:
+    """Character trigrams of a normalized name, padded so word starts and ends count."""
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@dataclass(frozen=True)
+class CanonicalMatch:
+    """The canonical name an input was mapped to"""
+
+    input: str
+    name: str
+    method: str  # "exact", "reordered", "fuzzy" or "none" when the input is kept as it is
+    score: float = 1.0
+    alias: str | None = None
+
+    @property
+    def matched(self) -> bool:
+        return self.method != "none"
+
+
+class ImpairmentCanonicalizer:
+    """
+    Maps spellings, abbreviations and typos of an impairment to one canonical name.
+
+    The synonym table is a JSON file of ``{"name": ..., "synonyms": [...]}``
+    entries. Every name and synonym is indexed three ways: by its normalized
+    form, by its sorted words (so "diabetes mellitus type 2" finds "type 2
+    diabetes mellitus") and by its character trigrams. A lookup tries the two
+    exact indexes first and only then scores the aliases that share a trigram
+    with the input, accepting the best one above ``threshold`` whose words
+    are the input's words up to a typo in each (see ``typo_of``: "type 1"
+    never becomes "type 2", nor "portal hypertension" "hypertension").
+    Inputs without a match are returned with their whitespace collapsed.
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_SYNONYMS_FILE, threshold: float = 0.7, memo_size: int = 4096):
+        """
+        Args:
+            path: The synonym table
+            threshold: Minimum Dice similarity of the trigrams of a fuzzy match
+            memo_size: Number of recent lookups remembered
+        """
+        self.path = Path(path)
+        self.threshold = threshold
+        self.memo_size = memo_size
+        self._aliases: list[tuple[str, str, Counter, int, tuple[str, ...]]] = []
+        self._exact: dict[str, int] = {}
+        self._reordered: dict[str, int] = {}
+        self._postings: dict[str, list[int]] = {}
+        self._memo: OrderedDict[str, CanonicalMatch] = OrderedDict()
+        self.counts: Counter = Counter()
+        self.lookup_seconds = 0.0
+        self._load()
+
+    def _load(self) -> None:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("version") != SYNONYMS_VERSION:
+            raise ValueError(f"Unsupported synonym table version {data.get('version')} in {self.path}")
+        for entry in data["impairments"]:
+            for alias in [entry["name"], *entry.get("synonyms", [])]:
+                self._add(entry["name"], alias)
+
+    def _add(self, name: str, alias: str) -> None:
+        key = normalize(alias)
+        if not key:
+            return
+        previous = self._exact.get(key)
+        if previous is not None and self._aliases[previous][0] != name:
+            logger.warning("Synonym %r is listed for both %r and %r", alias, self._aliases[previous][0], name)
+        number = len(self._aliases)
+        grams = trigrams(key)
+        self._aliases.append((name, alias, grams, sum(grams.values()), tuple(key.split())))
+        self._exact.setdefault(key, number)
+        self._reordered.setdefault(" ".join(sorted(key.split())), number)
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(number)
+
+    def _match(self, name: str, key: str) -> CanonicalMatch:
+        number = self._exact.get(key)
+        if number is not None:
+            return CanonicalMatch(name, self._aliases[number][0], "exact", alias=self._aliases[number][1])
+        number = self._reordered.get(" ".join(sorted(key.split())))
+        if number is not None:
+            return CanonicalMatch(name, self._aliases[number][0], "reordered", alias=self._aliases[number][1])
+
+        if len(key) >= MIN_FUZZY_LENGTH:
+            grams = trigrams(key)
+            size = sum(grams.values())
+            tokens = key.split()
+            shared: Counter = Counter()
+            for gram, count in grams.items():
+                for candidate in self._postings.get(gram, ()):
+                    shared[candidate] += min(count, self._aliases[candidate][2][gram])
+            best, best_score = None, self.threshold
+            for candidate, overlap in shared.items():
+                score = 2 * overlap / (size + self._aliases[candidate][3])
+                if score >= best_score and typo_of(tokens, self._aliases[candidate][4]):
+                    best, best_score = candidate, score
+            if best is not None:
+                return CanonicalMatch(
+                    name, self._aliases[best][0], "fuzzy", round(best_score, 4), alias=self._aliases[best][1]
+                )
+        return CanonicalMatch(name, " ".join(name.split()), "none", 0.0)
+
+    def canonicalize(self, name: str) -> CanonicalMatch:
+        """Return the canonical name of an impairment, or the input itself if none matches."""
+        start = time.perf_counter()
+        key = normalize(name)
+        match = self._memo.get(key)
+        if match is None:
+            match = self._match(name, key)
+            self._memo[key] = match
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(key)
+            # Inputs without a match are kept as they are, not as the spelling that was memoized
+            match = replace(match, input=name, name=" ".join(name.split()) if match.method == "none" else match.name)
+        self.counts[match.method] += 1
+        self.lookup_seconds += time.perf_counter() - start
+        return match
+
+    @property
+    def stats(self) -> dict:
+        """Lookups, matches per method, hit rate and mean lookup latency in microseconds."""
+        lookups = sum(self.counts.values())
+        hits = lookups - self.counts["none"]
+        return {
+            "lookups": lookups,
+            **{method: self.counts[method] for method in ("exact", "reordered", "fuzzy", "none")},
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "mean_lookup_us": round(self.lookup_seconds / lookups * 1e6, 2) if lookups else 0.0,
+        }
+
+
+class CanonicalNameMiddleware(AgentMiddleware):
+    """
+    Agent middleware that replaces the impairment name typed by the user with its canonical name.
+
+    Place it after a MetricsMiddleware, which keys workflow runs on the text
+    the user typed, and before a StageCacheMiddleware, so every spelling of
+    an impairment shares the same cached stage outputs.
+    """
+
+    def __init__(self, canonicalizer: ImpairmentCanonicalizer | None = None):
+        """
+        Args:
+            canonicalizer: The canonicalizer to use (defaults to one on files/impairment_synonyms.json)
+        """
+        self.canonicalizer = canonicalizer or ImpairmentCanonicalizer()
+
+    async def process(
+        self,
+        context: AgentRunContext,
+        next: Callable[[AgentRunContext], Awaitable[None]],
+    ) -> None:
+        # The first user message is the request of the workflow run; later ones (e.g. the
+        # queries of the search fan-out) already use the name of the SearchQueries stage
+        for i, message in enumerate(context.messages):
+            if message.role != Role.USER or not message.text:
+                continue
+            if len(message.text) <= MAX_NAME_LENGTH:
+                match = self.canonicalizer.canonicalize(message.text)
+                if match.name != message.text:
+                    logger.debug(
+                        "%s: canonicalized %r to %r (%s)", context.agent.name, message.text, match.name, match.method
+                    )
+                    canonical = ChatMessage(role=Role.USER, text=match.name, author_name=message.author_name)
+                    context.messages = [*context.messages[:i], canonical, *context.messages[i + 1:]]
+            break
+        await next(context)
@@ -0,0 +1,169 @@
+"""Incremental JSON parser that reports nested values as soon as they are complete"""
+import json
+from bisect import bisect_right
+from collections.abc import Callable
+from typing import Any
+
+JsonPath = tuple[str | int, ...]
+
+_WHITESPACE = " \t\r\n"
+
+
+def format_path(path: JsonPath) -> str:
+    """Format a path for display, e.g. ("documents", 0, "url") -> "documents[0].url"."""
+    text = ""
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text
+
+
+def path_matches(path: JsonPath, pattern: JsonPath) -> bool:
+    """Match a path against a pattern in which "*" matches any single key or index."""
+    return len(path) == len(pattern) and all(p == "*" or p == part for part, p in zip(path, pattern))
+
+
+class _Frame:
+    __slots__ = ("is_object", "start", "key", "expecting_key", "key_start")
+
+    def __init__(self, is_object: bool, start: int):
+        self.is_object = is_object
+        self.start = start
+        self.key: str | int | None = None if is_object else 0
+        self.expecting_key = is_object
+        self.key_start = -1
+
+
+class IncrementalJsonParser:
+    """
+    Parses a single JSON document fed in arbitrary chunks (e.g. model tokens).
+
+    Text before the first "{" or "[" (such as a markdown code fence) and
+    after the end of the document is ignored. Every value whose path is
+    accepted by ``watch`` is parsed and returned by ``feed`` as soon as its
+    last character arrives, so callers can act on finished sub-objects while
+    the rest of the document is still being generated.
+
+    Chunks are kept as they arrive and only scanned once, so feeding a long
+    stream in small chunks stays linear in its length.
+    """
+
+    def __init__(self, watch: Callable[[JsonPath], bool] | None = None):
+        """
+        Args:
+            watch: Predicate selecting the paths to report; the root value is
+                always available through ``result`` once ``done`` is True
+        """
+        self.watch = watch or (lambda path: False)
+        self.done = False
+        self.result: Any = None
+        self._chunks: list[str] = []
+        # Offset of every chunk in the whole text
+        self._offsets: list[int] = []
+        self._position = 0
+        self._started = False
+        self._stack: list[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._scalar_start = -1
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return "".join(self._chunks)
+
+    def _slice(self, start: int, end: int) -> str:
+        """text[start:end], joining only the chunks it spans."""
+        first = bisect_right(self._offsets, start) - 1
+        last = bisect_right(self._offsets, end - 1)
+        base = self._offsets[first]
+        return "".join(self._chunks[first:last])[start - base : end - base]
+
+    def _path(self) -> JsonPath:
+        return tuple(frame.key for frame in self._stack)
+
+    def _complete(self, start: int, end: int, completed: list[tuple[JsonPath, Any]]) -> None:
+        """Handle a value spanning text[start:end] that just finished."""
+        if not self._stack:
+            self.result = json.loads(self._slice(start, end))
+            self.done = True
+            return
+        path = self._path()
+        if self.watch(path):
+            completed.append((path, json.loads(self._slice(start, end))))
+
+    def feed(self, chunk: str) -> list[tuple[JsonPath, Any]]:
+        """
+        Add text and return the watched values completed by it, in document order.
+
+        Raises:
+            ValueError: If the text is not valid JSON
+        """
+        completed: list[tuple[JsonPath, Any]] = []
+        if self.done or not chunk:
+            return completed
+
+        offset = self._position
+        self._chunks.append(chunk)
+        self._offsets.append(offset)
+        position = offset
+        end = offset + len(chunk)
+
+        while position < end and not self.done:
+            char = chunk[position - offset]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    frame = self._stack[-1] if self._stack else None
+                    if frame is not None and frame.expecting_key:
+                        frame.key = json.loads(self._slice(self._string_start, position + 1))
+                        frame.expecting_key = False
+                    else:
+                        self._complete(self._string_start, position + 1, completed)
+                position += 1
+                continue
+
+            if not self._started:
+                if char in "{[":
+                    self._started = True
+                else:
+                    position += 1
+                    continue
+
+            if self._scalar_start >= 0:
+                if char not in _WHITESPACE and char not in ",}]":
+                    position += 1
+                    continue
+                self._complete(self._scalar_start, position, completed)
+                self._scalar_start = -1
+                if self.done:
+                    break
+
+            if char in _WHITESPACE or char == ":":
+                pass
+            elif char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char in "{[":
+                self._stack.append(_Frame(char == "{", position))
+            elif char in "}]":
+                frame = self._stack.pop()
+                self._complete(frame.start, position + 1, completed)
+            elif char == ",":
+                frame = self._stack[-1]
+                if frame.is_object:
+                    frame.expecting_key = True
+                else:
+                    frame.key += 1
+            else:
+                self._scalar_start = position
+            position += 1
+
+        # Text after the end of the document is never scanned
+        self._position = end
+        return completed
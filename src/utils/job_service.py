@@ -0,0 +1,315 @@
+"""Asynchronous workflow jobs: a bounded queue, a pool of workers and progress subscriptions"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from utils.job_store import CANCELLED, FAILED, FINISHED_STATUSES, QUEUED, RUNNING, SUCCEEDED, JobStore
+
+logger = logging.getLogger(__name__)
+
+# Runs one job: (impairment name, await report(progress event)) -> JSON-serializable result
+JobRunner = Callable[[str, Callable[[dict[str, Any]], Awaitable[None]]], Awaitable[Any]]
+
+
+def default_worker_id() -> str:
+    """Host, process and a random suffix, unique among all workers sharing a job database."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class QueueFullError(Exception):
+    """Raised by JobService.submit when the queue is at its maximum depth"""
+
+    def __init__(self, depth: int, retry_after: float):
+        super().__init__(f"Job queue is full ({depth} jobs queued), retry in {retry_after:.0f}s")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class JobService:
+    """
+    Runs workflow jobs in the background on a bounded pool of asyncio workers.
+
+    ``submit`` queues a job in the JobStore and returns at once; idle workers
+    claim queued jobs by priority and run them with ``run_job``, which reports
+    per-stage progress. Every progress event is stored with the job, so a
+    client can poll it or subscribe with ``events`` and receive the events so
+    far followed by the live ones. Beyond ``max_queue`` queued jobs, ``submit``
+    raises QueueFullError with an estimate of when to retry.
+
+    Several services, in processes of their own and on any host that shares
+    the database, can work off the same queue; a service with ``workers=0``
+    only accepts and reports jobs. A worker holds the jobs it runs with a
+    lease it renews every ``lease_seconds / 3``. When a worker dies its leases
+    run out and any service queues its jobs again; a job that keeps getting
+    interrupted is failed after ``max_attempts`` runs.
+
+    The store is only used in threads: its writes can wait for those of
+    other processes, which must not hold up the event loop.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        run_job: JobRunner | None,
+        workers: int = 4,
+        max_queue: int = 100,
+        max_attempts: int = 3,
+        lease_seconds: float = 30.0,
+        poll_interval: float = 0.5,
+        worker_id: str | None = None,
+    ):
+        """
+        Args:
+            store: Where jobs and their progress are persisted
+            run_job: Runs the workflow for an impairment name and returns the job result
+            workers: Number of jobs this service runs at the same time; 0 only serves the queue
+            max_queue: Maximum number of queued (not yet running) jobs
+            max_attempts: Runs of a job before one that keeps getting interrupted is failed
+            lease_seconds: How long a job stays with a worker that stopped renewing its lease
+            poll_interval: Seconds between looks at the queue and the progress of jobs run
+                by other processes
+            worker_id: Identifies this service in the leases; defaults to host, process id and a random suffix
+        """
+        self.store = store
+        self.run_job = run_job
+        self.workers = workers if run_job is not None else 0
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or default_worker_id()
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._running: dict[str, asyncio.Task] = {}
+        self._lost: set[str] = set()
+        self._subscribers: dict[str, set[asyncio.Event]] = {}
+        self._progress_counts: dict[str, int] = {}
+        self.stats = {
+            "submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "requeued": 0, "lost": 0,
+        }
+
+    async def start(self) -> None:
+        """Start the workers and the lease upkeep; queued jobs, also from an earlier process, are picked up."""
+        self.stats["requeued"] += self.store.requeued
+        if self.store.requeued:
+            logger.info("Requeued %d jobs whose worker stopped", self.store.requeued)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._upkeep(), name="job-lease-upkeep"))
+        self._wakeup.set()
+
+    async def close(self) -> None:
+        """Stop the workers; running jobs are queued again to be resumed by any worker."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self) -> "JobService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def retry_after(self) -> float:
+        """Seconds until the workers will have made room in the queue, from recent job durations (blocking)."""
+        mean = self.store.mean_run_seconds() or 60.0
+        # The jobs running in all processes tell how many workers there are
+        workers = max(self.store.count(RUNNING), self.workers, 1)
+        return max(1.0, mean * max(1, self.store.count(QUEUED) - self.max_queue + 1) / workers)
+
+    async def submit(self, impairment_name: str, priority: int = 0) -> dict[str, Any]:
+        """
+        Queue a job for an impairment.
+
+        Args:
+            impairment_name: The impairment to assess
+            priority: Jobs with a higher priority are run first
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFullError: If ``max_queue`` jobs are already queued
+        """
+        job = await asyncio.to_thread(self.store.add, impairment_name, priority, self.max_queue)
+        if job is None:
+            self.stats["rejected"] += 1
+            depth = await asyncio.to_thread(self.store.count, QUEUED)
+            raise QueueFullError(depth, await asyncio.to_thread(self.retry_after))
+        self.stats["submitted"] += 1
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> dict[str, Any] | None:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _get(self, job_id: str) -> dict[str, Any] | None:
+        job = self.store.get(job_id)
+        if job is not None:
+            job["queue_position"] = self.store.queue_position(job_id)
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it does not exist or already finished."""
+        if await asyncio.to_thread(self.store.cancel_queued, job_id):
+            self.stats["cancelled"] += 1
+            await self._publish(job_id, {"event": "status", "status": CANCELLED})
+            return True
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            return True
+        # Run by another process, which cancels it at its next heartbeat
+        return await asyncio.to_thread(self.store.request_cancel, job_id)
+
+    async def _publish(self, job_id: str, event: dict[str, Any]) -> None:
+        """Store a progress event of a job and wake up its subscribers."""
+        # Jobs this service runs have a progress count; their events are only stored while the lease is held
+        owner = self.worker_id if job_id in self._progress_counts else None
+        seq = self._progress_counts.get(job_id, 0)
+        event = {"seq": seq, "at": round(time.time(), 3), **event}
+        self._progress_counts[job_id] = seq + 1
+        await asyncio.to_thread(self.store.add_progress, job_id, event, owner)
+        for wakeup in self._subscribers.get(job_id, ()):
+            wakeup.set()
+        if event.get("status") in FINISHED_STATUSES:
+            self._progress_counts.pop(job_id, None)
+
+    async def events(self, job_id: str) -> AsyncIterator[dict[str, Any]]:
+        """
+        The progress events of a job: those recorded so far, then live ones until it finishes.
+
+        Events are read from the store, so a job run by another process is
+        followed too, within ``poll_interval``. When an interrupted job is
+        run again its events start over, with a "running" status event.
+
+        Raises:
+            KeyError: If there is no such job
+        """
+        if await asyncio.to_thread(self.store.get, job_id) is None:
+            raise KeyError(job_id)
+        wakeup = asyncio.Event()
+        self._subscribers.setdefault(job_id, set()).add(wakeup)
+        attempt, seen = None, 0
+        try:
+            while True:
+                # Cleared before reading, so an event published while we yield wakes up the next wait
+                wakeup.clear()
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job["attempts"] != attempt:
+                    attempt, seen = job["attempts"], 0
+                for event in job["progress"][seen:]:
+                    seen += 1
+                    yield event
+                    if event.get("status") in FINISHED_STATUSES:
+                        return
+                if job["status"] in FINISHED_STATUSES:
+                    yield {"event": "status", "status": job["status"]}
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(wakeup)
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.worker_id, self.lease_seconds)
+            if job is None:
+                # Jobs submitted to this service wake the workers at once, others are found by polling
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _upkeep(self) -> None:
+        """Renew the leases of the running jobs, cancel the ones asked to, and requeue those of dead workers."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            held = {}
+            if self._running:
+                held = await asyncio.to_thread(self.store.heartbeat, self.worker_id, self.lease_seconds)
+            for job_id, task in list(self._running.items()):
+                if job_id not in held:
+                    logger.warning("Lost the lease of job %s, abandoning it", job_id)
+                    self._lost.add(job_id)
+                    task.cancel()
+                elif held[job_id]:
+                    task.cancel()
+            requeued = await asyncio.to_thread(self.store.requeue_expired)
+            if requeued:
+                self.stats["requeued"] += requeued
+                logger.info("Requeued %d jobs whose worker stopped renewing their lease", requeued)
+                self._wakeup.set()
+
+    async def _run(self, job: dict[str, Any]) -> None:
+        job_id = job["id"]
+        self._progress_counts[job_id] = 0
+        if job["attempts"] > self.max_attempts:
+            await self._finish(job_id, FAILED, error=f"Interrupted {job['attempts'] - 1} times, giving up")
+            return
+        await self._publish(
+            job_id, {"event": "status", "status": RUNNING, "attempt": job["attempts"], "worker": self.worker_id}
+        )
+
+        start = time.perf_counter()
+        task = asyncio.create_task(self.run_job(job["impairment_name"], lambda event: self._publish(job_id, event)))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The service is stopping: leave the job to the other workers or the next start
+                task.cancel()
+                await asyncio.to_thread(self.store.requeue, job_id, self.worker_id)
+                raise
+            if job_id in self._lost:
+                self.stats["lost"] += 1
+            else:
+                await self._finish(job_id, CANCELLED)
+        except Exception as e:
+            logger.warning("Job %s (%r) failed: %s", job_id, job["impairment_name"], e)
+            await self._finish(job_id, FAILED, error=str(e) or type(e).__name__)
+        else:
+            await self._finish(job_id, SUCCEEDED, result=result)
+            logger.info("Job %s (%r) finished in %.1fs", job_id, job["impairment_name"], time.perf_counter() - start)
+        finally:
+            self._running.pop(job_id, None)
+            self._lost.discard(job_id)
+            self._progress_counts.pop(job_id, None)
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: str | None = None) -> None:
+        event = {"event": "status", "status": status, **({"error": error} if error else {})}
+        # The terminal event goes in first, while the lease still allows writing progress
+        await self._publish(job_id, event)
+        if await asyncio.to_thread(self.store.finish, job_id, self.worker_id, status, result, error):
+            self.stats[status] += 1
+        else:
+            self.stats["lost"] += 1
+            logger.warning("Job %s was taken over by another worker, dropping its %s result", job_id, status)
+
+    async def status(self) -> dict[str, Any]:
+        """Queue depth, running jobs (in total and here) and job counts since the start."""
+        return {
+            "worker_id": self.worker_id,
+            "queued": await asyncio.to_thread(self.store.count, QUEUED),
+            "running": await asyncio.to_thread(self.store.count, RUNNING),
+            "running_here": len(self._running),
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            **self.stats,
+        }
@@ -0,0 +1,232 @@
+"""SQLite persistence of workflow jobs, shared by the worker processes"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = frozenset({SUCCEEDED, FAILED, CANCELLED})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    impairment_name TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    progress TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+"""
+
+# Columns added after the first version of the schema, with their definitions
+LEASE_COLUMNS = {
+    "worker_id": "TEXT",
+    "lease_expires_at": "REAL",
+    "cancel_requested": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class JobStore:
+    """
+    Jobs and their progress in one SQLite file, so they survive a restart.
+
+    A job is queued, then running, then succeeded, failed or cancelled.
+    Queued jobs are claimed by priority (highest first), then by age. Any
+    number of processes, on one or more hosts, can share the file: a worker
+    claims a job with a lease that it renews while the job runs, and every
+    write about a running job checks that the worker still holds it. Jobs
+    whose lease ran out, because their worker died or hung, are queued again
+    by ``requeue_expired``.
+
+    WAL mode lets readers and the writer work at the same time, but needs
+    shared memory and therefore one host; for processes on several hosts on
+    a network filesystem, use ``journal_mode="DELETE"``.
+
+    Every method blocks while other processes write, up to ``busy_timeout``;
+    async code calls them in a thread (see utils.job_service.JobService).
+    """
+
+    def __init__(self, path: str | Path = "jobs/jobs.db", journal_mode: str = "WAL", busy_timeout: float = 30.0):
+        """
+        Args:
+            path: The SQLite database, created if it does not exist
+            journal_mode: SQLite journal mode; "WAL" on one host, "DELETE" across hosts
+            busy_timeout: Seconds a write waits for the writes of other processes
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, definition in LEASE_COLUMNS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self.requeued = self.requeue_expired()
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, parameters)
+
+    @staticmethod
+    def _job(row: sqlite3.Row | None) -> dict[str, Any] | None:
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def add(self, impairment_name: str, priority: int = 0, max_queued: int | None = None) -> dict[str, Any] | None:
+        """Queue a new job and return it; with ``max_queued``, only if fewer jobs are queued, else return None."""
+        job_id = uuid.uuid4().hex
+        sql = "INSERT INTO jobs (id, impairment_name, priority, status, created_at) SELECT ?, ?, ?, ?, ?"
+        parameters = (job_id, impairment_name, priority, QUEUED, time.time())
+        if max_queued is not None:
+            # Checked in the same statement, so submissions of other processes cannot slip in between
+            sql += " WHERE (SELECT COUNT(*) FROM jobs WHERE status = ?) < ?"
+            parameters = (*parameters, QUEUED, max_queued)
+        if self._execute(sql, parameters).rowcount == 0:
+            return None
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        return self._job(self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status: str | None = None, limit: int = 100) -> list[dict[str, Any]]:
+        """The most recent jobs, optionally only those with one status; without their progress and result."""
+        columns = "id, impairment_name, priority, status, attempts, created_at, started_at, finished_at, worker_id, error"
+        if status:
+            sql, parameters = f"SELECT {columns} FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+        else:
+            sql, parameters = f"SELECT {columns} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        return [dict(row) for row in self._execute(sql, parameters).fetchall()]
+
+    def count(self, status: str) -> int:
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def mean_run_seconds(self, last: int = 50) -> float | None:
+        """Mean run time of the last succeeded jobs, or None before the first one."""
+        return self._execute(
+            "SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM jobs WHERE status = ?"
+            " ORDER BY finished_at DESC LIMIT ?)",
+            (SUCCEEDED, last),
+        ).fetchone()[0]
+
+    def queue_position(self, job_id: str) -> int | None:
+        """Number of queued jobs that are claimed before this one, or None if it is not queued."""
+        job = self.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return None
+        return self._execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority > ? OR (priority = ? AND created_at < ?))",
+            (QUEUED, job["priority"], job["priority"], job["created_at"]),
+        ).fetchone()[0]
+
+    def claim(self, worker_id: str, lease_seconds: float) -> dict[str, Any] | None:
+        """
+        Lease the next queued job to a worker and return it, or None if the queue is empty.
+
+        Progress of an earlier, interrupted attempt is dropped.
+        """
+        # Idle workers poll; only take the write lock when there is something to claim
+        if self._execute("SELECT 1 FROM jobs WHERE status = ? LIMIT 1", (QUEUED,)).fetchone() is None:
+            return None
+        now = time.time()
+        # fetchall() completes the statement, ending its write transaction at once
+        rows = self._execute(
+            "UPDATE jobs SET status = ?, worker_id = ?, lease_expires_at = ?, started_at = ?,"
+            " attempts = attempts + 1, progress = '[]', cancel_requested = 0 WHERE id = ("
+            "SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1) RETURNING *",
+            (RUNNING, worker_id, now + lease_seconds, now, QUEUED),
+        ).fetchall()
+        return self._job(rows[0]) if rows else None
+
+    def heartbeat(self, worker_id: str, lease_seconds: float) -> dict[str, bool]:
+        """
+        Renew the leases of all jobs a worker runs.
+
+        Returns:
+            The ids of the jobs the worker still holds, with whether their cancellation was requested
+        """
+        rows = self._execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE worker_id = ? AND status = ? RETURNING id, cancel_requested",
+            (time.time() + lease_seconds, worker_id, RUNNING),
+        ).fetchall()
+        return {row["id"]: bool(row["cancel_requested"]) for row in rows}
+
+    def requeue_expired(self) -> int:
+        """Queue running jobs whose lease ran out again; returns their number."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, worker_id = NULL, lease_expires_at = NULL, started_at = NULL"
+            " WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+            (QUEUED, RUNNING, time.time()),
+        ).rowcount
+
+    def requeue(self, job_id: str, worker_id: str) -> None:
+        """Put a job back in the queue, e.g. when its worker stops while it runs."""
+        self._execute(
+            "UPDATE jobs SET status = ?, worker_id = NULL, lease_expires_at = NULL, started_at = NULL"
+            " WHERE id = ? AND status = ? AND worker_id = ?",
+            (QUEUED, job_id, RUNNING, worker_id),
+        )
+
+    def add_progress(self, job_id: str, event: dict[str, Any], worker_id: str | None = None) -> bool:
+        """Append a progress event to a job; with ``worker_id``, only while that worker holds it."""
+        sql = "UPDATE jobs SET progress = json_insert(progress, '$[#]', json(?)) WHERE id = ?"
+        parameters = (json.dumps(event, ensure_ascii=False, default=str), job_id)
+        if worker_id is not None:
+            sql, parameters = sql + " AND status = ? AND worker_id = ?", (*parameters, RUNNING, worker_id)
+        return self._execute(sql, parameters).rowcount > 0
+
+    def finish(
+        self, job_id: str, worker_id: str, status: str, result: Any = None, error: str | None = None
+    ) -> bool:
+        """Record the outcome of a job; returns False if the worker no longer holds it."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ?, lease_expires_at = NULL"
+            " WHERE id = ? AND status = ? AND worker_id = ?",
+            (
+                status,
+                time.time(),
+                json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                error,
+                job_id,
+                RUNNING,
+                worker_id,
+            ),
+        ).rowcount > 0
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Cancel a job that has not started; returns whether it was queued."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, QUEUED),
+        ).rowcount > 0
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Ask the worker of a running job to cancel it at its next heartbeat; returns whether it runs."""
+        return self._execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+        ).rowcount > 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
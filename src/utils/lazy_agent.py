@@ -0,0 +1,83 @@
+"""Agents that are only constructed when they are first used"""
+import threading
+from collections.abc import AsyncIterable, Callable
+from typing import Any
+
+from agent_framework import AgentProtocol, AgentRunResponse, AgentRunResponseUpdate, AgentThread
+
+
+class LazyAgent(AgentProtocol):
+    """
+    Stands in for an agent and builds it on the first run.
+
+    Building the workflow then costs nothing per agent, and a process that
+    only runs some stages (or only serves the DevUI until the first request)
+    never constructs the others or imports their chat client. Attributes other
+    than the identity below, e.g. ``chat_options``, are read from the real
+    agent and build it.
+    """
+
+    def __init__(self, factory: Callable[[], AgentProtocol], name: str, description: str | None = None):
+        """
+        Args:
+            factory: Creates the agent, e.g. ``lambda: create_risk_analyzer_agent(client)``
+            name: Name of the agent the factory creates, used as executor id before it exists
+            description: Description of the agent
+        """
+        self._factory = factory
+        self._name = name
+        self._description = description
+        self._agent: AgentProtocol | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def agent(self) -> AgentProtocol:
+        """The real agent, created on first access."""
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._factory()
+        return self._agent
+
+    @property
+    def built(self) -> bool:
+        """Whether the agent has been created yet."""
+        return self._agent is not None
+
+    @property
+    def id(self) -> str:
+        return self._name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def display_name(self) -> str:
+        return self._name
+
+    @property
+    def description(self) -> str | None:
+        return self._description
+
+    def get_new_thread(self, **kwargs: Any) -> AgentThread:
+        # Executors ask for their thread when the workflow is built; the workflow
+        # agents keep no service thread or message store, so a plain thread is
+        # what their get_new_thread would return as well
+        if self._agent is None:
+            return AgentThread(**kwargs)
+        return self._agent.get_new_thread(**kwargs)
+
+    async def run(self, messages=None, *, thread: AgentThread | None = None, **kwargs: Any) -> AgentRunResponse:
+        return await self.agent.run(messages, thread=thread, **kwargs)
+
+    def run_stream(
+        self, messages=None, *, thread: AgentThread | None = None, **kwargs: Any
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        return self.agent.run_stream(messages, thread=thread, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes LazyAgent does not define itself
+        if name.startswith("__") or name in ("_factory", "_name", "_description", "_agent", "_lock"):
+            raise AttributeError(name)
+        return getattr(self.agent, name)
@@ -0,0 +1,414 @@
+"""Per-stage token, latency, retry and cost metrics with a Prometheus text endpoint"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import AsyncIterable, Awaitable, Callable, Mapping
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import aiohttp
+from agent_framework import (
+    AgentMiddleware,
+    AgentRunContext,
+    AgentRunResponseUpdate,
+    ChatMessage,
+    Role,
+    UsageContent,
+    UsageDetails,
+)
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Responses the Azure SDK retry policy retries
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class TokenPrices:
+    """Model prices in USD per million tokens, used to estimate the cost of a run"""
+
+    input_per_million: float = 2.50
+    output_per_million: float = 10.00
+    cached_input_per_million: float = 1.25
+
+    @classmethod
+    def from_env(cls) -> "TokenPrices":
+        """Read MODEL_PRICE_INPUT / MODEL_PRICE_OUTPUT / MODEL_PRICE_CACHED_INPUT (USD per 1M tokens)."""
+        defaults = cls()
+        return cls(
+            input_per_million=float(os.environ.get("MODEL_PRICE_INPUT", defaults.input_per_million)),
+            output_per_million=float(os.environ.get("MODEL_PRICE_OUTPUT", defaults.output_per_million)),
+            cached_input_per_million=float(
+                os.environ.get("MODEL_PRICE_CACHED_INPUT", defaults.cached_input_per_million)
+            ),
+        )
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "TokenPrices":
+        return cls(**{name: float(value) for name, value in spec.items()})
+
+    def cost(self, input_tokens: int, output_tokens: int, cached_tokens: int) -> float:
+        uncached = max(0, input_tokens - cached_tokens)
+        return (
+            uncached * self.input_per_million
+            + cached_tokens * self.cached_input_per_million
+            + output_tokens * self.output_per_million
+        ) / 1_000_000
+
+
+def load_deployment_prices(path: str | Path) -> dict[str, TokenPrices]:
+    """
+    Read the prices of model deployments from a JSON file.
+
+    The file maps deployment names to prices, e.g.
+    ``{"gpt-4o-mini": {"input_per_million": 0.15, "output_per_million": 0.60, "cached_input_per_million": 0.075}}``.
+    """
+    spec = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {deployment: TokenPrices.from_dict(prices) for deployment, prices in spec.items()}
+
+
+def deployment_name(agent) -> str:
+    """The model deployment an agent runs on, or "" if it does not tell."""
+    chat_options = getattr(agent, "chat_options", None)
+    return (
+        getattr(chat_options, "model_id", None) or getattr(getattr(agent, "chat_client", None), "model_id", None) or ""
+    )
+
+
+@dataclass
+class StageRun:
+    """Measurements of one agent run"""
+
+    stage: str
+    deployment: str = ""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    time_to_first_token_seconds: float | None = None
+    latency_seconds: float = 0.0
+    retries: int = 0
+    cost_usd: float = 0.0
+    error: str | None = None
+    started_at: float = field(default_factory=time.time)
+
+    def add_usage(self, usage: UsageDetails | None) -> None:
+        if usage is None:
+            return
+        self.input_tokens += usage.input_token_count or 0
+        self.output_tokens += usage.output_token_count or 0
+        self.cached_tokens += sum(count or 0 for name, count in usage.additional_counts.items() if "cached" in name)
+
+
+# The agent run the current task is working for, so HTTP retries can be attributed to it
+_current_run: ContextVar[StageRun | None] = ContextVar("current_stage_run", default=None)
+
+
+def _label_text(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Counter:
+    """A Prometheus counter with labels"""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...], amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(self.labels, key)} {value:g}" for key, value in self.values.items()]
+        return lines
+
+
+class Histogram:
+    """A Prometheus histogram with labels and fixed buckets"""
+
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> (bucket counts, sum, count)
+        self.values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        counts, total, count = self.values.get(labels, ([0] * len(self.buckets), 0.0, 0))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.values[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.values.items():
+            names = (*self.labels, "le")
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_label_text(names, (*key, f'{bound:g}'))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_label_text(names, (*key, '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total:g}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class MetricsCollector:
+    """
+    Collects per-stage agent metrics, both aggregated and per workflow run.
+
+    Aggregates, per stage and model deployment, are exposed in the Prometheus
+    text format (``render`` or the ``serve`` endpoint), so per-stage model
+    routes can be compared; the individual agent runs of one workflow run are
+    grouped by its run key (the user prompt, i.e. the impairment name) until
+    ``pop_run`` hands them out as a JSON-ready summary.
+    """
+
+    def __init__(self, prices: TokenPrices | None = None, deployment_prices: Mapping[str, TokenPrices] | None = None):
+        """
+        Args:
+            prices: Token prices for the cost estimate; defaults to TokenPrices.from_env()
+            deployment_prices: Prices of deployments that differ from ``prices``; defaults to
+                the MODEL_PRICES_FILE (see load_deployment_prices), if set
+        """
+        self.prices = prices or TokenPrices.from_env()
+        if deployment_prices is None and os.environ.get("MODEL_PRICES_FILE"):
+            deployment_prices = load_deployment_prices(os.environ["MODEL_PRICES_FILE"])
+        self.deployment_prices = dict(deployment_prices or {})
+        labels = ("stage", "deployment")
+        self.runs_total = Counter("agent_runs_total", "Agent runs", ("stage", "deployment", "status"))
+        self.input_tokens = Counter("agent_input_tokens_total", "Input tokens", labels)
+        self.output_tokens = Counter("agent_output_tokens_total", "Output tokens", labels)
+        self.cached_tokens = Counter("agent_cached_input_tokens_total", "Cached input tokens", labels)
+        self.retries = Counter("agent_retries_total", "Retryable HTTP responses and connection errors", labels)
+        self.cost = Counter("agent_estimated_cost_usd_total", "Estimated model cost in USD", labels)
+        self.latency = Histogram("agent_latency_seconds", "Agent run latency", labels)
+        self.time_to_first_token = Histogram("agent_time_to_first_token_seconds", "Time to first token", labels)
+        self._metrics = [
+            self.runs_total, self.input_tokens, self.output_tokens, self.cached_tokens,
+            self.retries, self.cost, self.latency, self.time_to_first_token,
+        ]
+        self._runs: dict[str, list[StageRun]] = {}
+        self._in_flight: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+
+    def begin(self, run_key: str) -> None:
+        """Note that an agent run of a workflow run started."""
+        with self._lock:
+            self._in_flight[run_key] = self._in_flight.get(run_key, 0) + 1
+
+    def record(self, run_key: str, run: StageRun) -> None:
+        """Add a finished agent run (started with ``begin``) to the aggregates and to its workflow run."""
+        prices = self.deployment_prices.get(run.deployment, self.prices)
+        run.cost_usd = prices.cost(run.input_tokens, run.output_tokens, run.cached_tokens)
+        labels = (run.stage, run.deployment)
+        with self._lock:
+            self.runs_total.inc((*labels, "error" if run.error else "ok"))
+            self.input_tokens.inc(labels, run.input_tokens)
+            self.output_tokens.inc(labels, run.output_tokens)
+            self.cached_tokens.inc(labels, run.cached_tokens)
+            self.retries.inc(labels, run.retries)
+            self.cost.inc(labels, run.cost_usd)
+            self.latency.observe(labels, run.latency_seconds)
+            if run.time_to_first_token_seconds is not None:
+                self.time_to_first_token.observe(labels, run.time_to_first_token_seconds)
+            self._runs.setdefault(run_key, []).append(run)
+            self._in_flight[run_key] = self._in_flight.get(run_key, 1) - 1
+            if self._in_flight[run_key] <= 0:
+                del self._in_flight[run_key]
+
+    async def finish_run(self, run_key: str, timeout: float = 30.0) -> dict:
+        """
+        Wait until no agent run of a workflow run is in flight, then ``pop_run`` it.
+
+        Streaming stages hand their output on before their stream (and its
+        usage report) has ended, so the last stages may still be finishing.
+        """
+        deadline = time.monotonic() + timeout
+        while run_key in self._in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return self.pop_run(run_key)
+
+    def pop_run(self, run_key: str) -> dict:
+        """Return and forget the summary of one workflow run."""
+        with self._lock:
+            runs = self._runs.pop(run_key, [])
+        stages: dict[str, dict] = {}
+        for run in runs:
+            stage = stages.setdefault(run.stage, {"runs": []})
+            stage["runs"].append({k: v for k, v in asdict(run).items() if k not in ("stage", "started_at")})
+        for stage in stages.values():
+            for name in ("input_tokens", "output_tokens", "cached_tokens", "retries", "cost_usd", "latency_seconds"):
+                stage[name] = sum(run[name] for run in stage["runs"])
+            deployments: dict[str, list[dict]] = {}
+            for run in stage["runs"]:
+                deployments.setdefault(run["deployment"], []).append(run)
+            stage["deployments"] = {
+                deployment: {
+                    "runs": len(runs),
+                    "errors": sum(run["error"] is not None for run in runs),
+                    **{
+                        name: sum(run[name] for run in runs)
+                        for name in ("input_tokens", "output_tokens", "cost_usd", "latency_seconds")
+                    },
+                }
+                for deployment, runs in deployments.items()
+            }
+        totals = {
+            name: sum(stage[name] for stage in stages.values())
+            for name in ("input_tokens", "output_tokens", "cached_tokens", "retries", "cost_usd")
+        }
+        if runs:
+            end = max(run.started_at + run.latency_seconds for run in runs)
+            totals["wall_seconds"] = end - min(run.started_at for run in runs)
+        return {"run": run_key, "stages": stages, "totals": totals}
+
+    def render(self) -> str:
+        """Return all aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            lines = [line for metric in self._metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> None:
+        """Serve ``render()`` on http://host:port/metrics from a daemon thread."""
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = collector.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, self._server.server_address[1])
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """An aiohttp trace config that counts retried requests against the agent run making them."""
+
+        async def on_request_end(session, trace_context, params: aiohttp.TraceRequestEndParams) -> None:
+            run = _current_run.get()
+            if run is not None and params.response.status in RETRYABLE_STATUSES:
+                run.retries += 1
+
+        async def on_request_exception(session, trace_context, params) -> None:
+            run = _current_run.get()
+            if run is not None:
+                run.retries += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    @staticmethod
+    def write_summary(path: Path, summary: dict) -> None:
+        """Write a run summary atomically; concurrent runs of one impairment each use their own temporary file."""
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+
+def run_key(messages: list[ChatMessage]) -> str:
+    """The key of the workflow run a conversation belongs to: its first user message."""
+    return next((m.text for m in messages if m.role == Role.USER and m.text), "")
+
+
+class MetricsMiddleware(AgentMiddleware):
+    """
+    Agent middleware that records tokens, latency, time to first token, retries and cost.
+
+    Runs are labelled with their stage (the agent name) and model deployment.
+
+    Place it first so it sees the full conversation (for the run key) and
+    measures everything the other middleware add, e.g. stage cache hits
+    show up as runs without tokens.
+    """
+
+    def __init__(self, collector: MetricsCollector):
+        self.collector = collector
+
+    async def process(
+        self,
+        context: AgentRunContext,
+        next: Callable[[AgentRunContext], Awaitable[None]],
+    ) -> None:
+        key = run_key(context.messages)
+        run = StageRun(stage=context.agent.name or "agent", deployment=deployment_name(context.agent))
+        self.collector.begin(key)
+        start = time.perf_counter()
+        token = _current_run.set(run)
+        try:
+            await next(context)
+        except BaseException as e:
+            # Also runs cancelled by the caller, e.g. the loser of a hedged request
+            run.error = str(e) or type(e).__name__
+            run.latency_seconds = time.perf_counter() - start
+            self.collector.record(key, run)
+            raise
+        finally:
+            _current_run.reset(token)
+
+        if context.is_streaming and context.result is not None:
+            context.result = self._measure_stream(key, run, start, context.result)
+            return
+        if context.result is not None:
+            run.add_usage(context.result.usage_details)
+        run.latency_seconds = time.perf_counter() - start
+        self.collector.record(key, run)
+
+    async def _measure_stream(
+        self, key: str, run: StageRun, start: float, updates: AsyncIterable[AgentRunResponseUpdate]
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        # Requests are made while the stream is consumed, so attribute them to this run until it ends
+        _current_run.set(run)
+        try:
+            async for update in updates:
+                if run.time_to_first_token_seconds is None and update.text:
+                    run.time_to_first_token_seconds = time.perf_counter() - start
+                for content in update.contents:
+                    if isinstance(content, UsageContent):
+                        run.add_usage(content.details)
+                yield update
+        except Exception as e:
+            run.error = str(e)
+            raise
+        finally:
+            _current_run.set(None)
+            run.latency_seconds = time.perf_counter() - start
+            self.collector.record(key, run)
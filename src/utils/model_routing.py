@@ -0,0 +1,202 @@
+"""Per-stage model deployments, with escalation to stronger models when the output does not validate"""
+import json
+import logging
+from collections.abc import AsyncIterable, Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from agent_framework import AgentProtocol, AgentRunResponse, AgentRunResponseUpdate, AgentThread
+from pydantic import BaseModel
+
+from utils.conversation import validate_output
+from utils.incremental_json import IncrementalJsonParser
+from utils.lazy_agent import LazyAgent
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """
+    Which model deployments a stage runs on.
+
+    Attributes:
+        deployment: The deployment tried first; None uses the default deployment
+        escalate_to: Deployments tried in turn when a run fails or its output
+            does not validate against the output schema of the stage
+    """
+
+    deployment: str | None = None
+    escalate_to: tuple[str, ...] = ()
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "ModelRoute":
+        """Build a route from its JSON form, e.g. {"deployment": "gpt-4o-mini", "escalate_to": ["gpt-4o"]}."""
+        return cls(deployment=spec.get("deployment"), escalate_to=tuple(spec.get("escalate_to") or ()))
+
+    def deployments(self, default: str) -> list[str]:
+        """The deployments to try, in order and without repeats."""
+        return list(dict.fromkeys([self.deployment or default, *self.escalate_to]))
+
+
+def load_model_routes(path: str | Path) -> dict[str, ModelRoute]:
+    """
+    Read per-stage routes from a JSON file.
+
+    The file maps stage names to routes, e.g.
+    ``{"SearchPromptAgent": {"deployment": "gpt-4o-mini", "escalate_to": ["gpt-4o"]}}``;
+    stages that are not listed run on the default deployment.
+    """
+    spec = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {stage: ModelRoute.from_dict(route) for stage, route in spec.items()}
+
+
+class EscalatingAgent(AgentProtocol):
+    """
+    Runs a stage on a cheap deployment first and escalates to stronger ones when needed.
+
+    The candidates, e.g. the same agent on gpt-4o-mini and on gpt-4o, are
+    tried in order; the next one gets the same messages (on a thread of its
+    own) when a run raises or its output does not validate against
+    ``output_schema``. The last candidate's answer is returned as it is.
+
+    In streaming mode the updates of a candidate that may still be escalated
+    are held back until its JSON output is complete and valid; the rest of
+    its stream, and the whole stream of the last candidate, is passed on live.
+    """
+
+    def __init__(
+        self, candidates: Sequence[AgentProtocol], output_schema: type[BaseModel] | None, name: str | None = None
+    ):
+        """
+        Args:
+            candidates: The agent on every deployment to try, cheapest first
+            output_schema: The schema outputs must validate against; None only escalates failed runs
+            name: Name of the stage; defaults to that of the first candidate
+        """
+        if not candidates:
+            raise ValueError("EscalatingAgent needs at least one candidate")
+        self.candidates = list(candidates)
+        self.output_schema = output_schema
+        self._name = name or self.candidates[0].name
+        # answered_by: runs answered by each candidate, in order
+        self.stats = {"runs": 0, "escalations": 0, "answered_by": [0] * len(self.candidates)}
+
+    @property
+    def id(self) -> str:
+        return self._name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def display_name(self) -> str:
+        return self._name
+
+    @property
+    def description(self) -> str | None:
+        return self.candidates[0].description
+
+    def get_new_thread(self, **kwargs: Any) -> AgentThread:
+        return self.candidates[0].get_new_thread(**kwargs)
+
+    def _escalate(self, index: int, reason: str) -> None:
+        self.stats["escalations"] += 1
+        logger.warning("%s: escalating from candidate %d to %d: %s", self._name, index, index + 1, reason)
+
+    def _answered(self, index: int) -> None:
+        self.stats["runs"] += 1
+        self.stats["answered_by"][index] += 1
+
+    async def run(self, messages=None, *, thread: AgentThread | None = None, **kwargs: Any) -> AgentRunResponse:
+        last = len(self.candidates) - 1
+        for index, candidate in enumerate(self.candidates):
+            # Later candidates must not see the rejected answer on the thread
+            candidate_thread = thread if index == 0 else candidate.get_new_thread()
+            if index == last:
+                response = await candidate.run(messages, thread=candidate_thread, **kwargs)
+                self._answered(index)
+                return response
+            try:
+                response = await candidate.run(messages, thread=candidate_thread, **kwargs)
+            except Exception as e:
+                self._escalate(index, f"{type(e).__name__}: {e}")
+                continue
+            problem = validate_output(response.text, self.output_schema)
+            if problem is None:
+                self._answered(index)
+                return response
+            self._escalate(index, problem)
+
+    async def run_stream(
+        self, messages=None, *, thread: AgentThread | None = None, **kwargs: Any
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        last = len(self.candidates) - 1
+        for index, candidate in enumerate(self.candidates):
+            candidate_thread = thread if index == 0 else candidate.get_new_thread()
+            stream = candidate.run_stream(messages, thread=candidate_thread, **kwargs).__aiter__()
+            if index == last:
+                self._answered(index)
+                async for update in stream:
+                    yield update
+                return
+
+            held: list[AgentRunResponseUpdate] = []
+            parser = IncrementalJsonParser()
+            problem = "stream ended before the output was complete"
+            try:
+                async for update in stream:
+                    held.append(update)
+                    if update.text:
+                        parser.feed(update.text)
+                    if parser.done or (self.output_schema is None and update.text):
+                        break
+                if parser.done:
+                    problem = validate_output(parser.result, self.output_schema)
+                elif self.output_schema is None and held:
+                    problem = None
+            except Exception as e:
+                problem = f"{type(e).__name__}: {e}"
+            if problem is not None:
+                if hasattr(stream, "aclose"):
+                    await stream.aclose()
+                self._escalate(index, problem)
+                continue
+
+            self._answered(index)
+            for update in held:
+                yield update
+            async for update in stream:
+                yield update
+            return
+
+
+def create_routed_agent(
+    create: Callable[[str], AgentProtocol],
+    name: str,
+    output_schema: type[BaseModel] | None,
+    route: ModelRoute | None,
+    default_deployment: str,
+) -> AgentProtocol:
+    """
+    Create an agent on the deployments of its route.
+
+    Args:
+        create: Creates the agent on a deployment
+        name: Name of the agent
+        output_schema: Its output schema, against which escalation validates
+        route: The route of the agent; None runs it on the default deployment
+        default_deployment: The deployment of agents without a route
+
+    Returns:
+        The agent on its deployment, or an EscalatingAgent whose agents on the
+        deployments to escalate to are only created when first needed
+    """
+    deployments = (route or ModelRoute()).deployments(default_deployment)
+    agent = create(deployments[0])
+    if len(deployments) == 1:
+        return agent
+    escalations = [LazyAgent(lambda deployment=deployment: create(deployment), name) for deployment in deployments[1:]]
+    return EscalatingAgent([agent, *escalations], output_schema, name)
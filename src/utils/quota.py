@@ -0,0 +1,527 @@
+"""Token-bucket scheduling of model calls under tokens- and requests-per-minute quotas, shared across processes"""
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterable, Awaitable, Callable, Mapping, MutableSequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import aiohttp
+from agent_framework import ChatContext, ChatMessage, ChatMiddleware, ChatOptions, ChatResponseUpdate, UsageContent
+
+from utils.conversation import estimate_tokens
+from utils.metrics import run_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait after a 429 that does not say how long
+DEFAULT_RETRY_AFTER = 1.0
+# Output tokens expected of an agent before its first answer
+DEFAULT_OUTPUT_TOKENS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    deployment TEXT PRIMARY KEY,
+    tokens_per_minute REAL NOT NULL,
+    requests_per_minute REAL NOT NULL,
+    max_tokens_per_minute REAL NOT NULL,
+    max_requests_per_minute REAL NOT NULL,
+    tokens REAL NOT NULL,
+    requests REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    paused_until REAL NOT NULL DEFAULT 0,
+    learned_from TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id TEXT PRIMARY KEY,
+    deployment TEXT NOT NULL,
+    flow TEXT NOT NULL,
+    tokens REAL NOT NULL,
+    enqueued_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS waiters_queue ON waiters (deployment, flow, enqueued_at);
+"""
+
+# The next waiter of a deployment: the oldest waiter of every flow takes its turn before the second ones
+HEAD_SQL = """
+SELECT id FROM (
+    SELECT id, enqueued_at, ROW_NUMBER() OVER (PARTITION BY flow ORDER BY enqueued_at, id) AS turn
+    FROM waiters WHERE deployment = ?
+) ORDER BY turn, enqueued_at, id LIMIT 1
+"""
+
+# The deployment a model call is for, so the HTTP responses it gets can be attributed to it
+_current_deployment: ContextVar[str | None] = ContextVar("current_quota_deployment", default=None)
+# Whether a 429 response of the current model call was already observed, so its error is not counted again
+_observed_throttle: ContextVar[bool] = ContextVar("observed_quota_throttle", default=False)
+
+
+@dataclass(frozen=True)
+class QuotaLimits:
+    """The quota of a model deployment; Azure gives standard deployments 6 requests per minute per 1000 tokens"""
+
+    tokens_per_minute: float = 30_000
+    requests_per_minute: float = 180
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "QuotaLimits":
+        return cls(**{name: float(value) for name, value in spec.items()})
+
+
+def load_quota_limits(path: str | Path) -> dict[str, QuotaLimits]:
+    """
+    Read the quotas of model deployments from a JSON file.
+
+    The file maps deployment names to limits, e.g.
+    ``{"gpt-4o": {"tokens_per_minute": 150000, "requests_per_minute": 900}}``.
+    """
+    spec = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {deployment: QuotaLimits.from_dict(limits) for deployment, limits in spec.items()}
+
+
+def estimate_request_tokens(
+    messages: MutableSequence[ChatMessage], chat_options: ChatOptions, output_tokens: int
+) -> int:
+    """
+    Estimate the tokens a model call counts against the quota: its prompt and its answer.
+
+    Like the service, the prompt includes the instructions and the JSON
+    schema of the response format; ``output_tokens`` is the expected length
+    of the answer (the service itself counts ``max_tokens`` when it is set).
+    """
+    prompt = sum(estimate_tokens(message.text or "") for message in messages)
+    prompt += estimate_tokens(chat_options.instructions or "")
+    schema = chat_options.response_format
+    if schema is not None:
+        prompt += estimate_tokens(json.dumps(schema.model_json_schema()))
+    return prompt + output_tokens
+
+
+def _header(headers: Mapping[str, str], name: str) -> float | None:
+    value = next((value for key, value in headers.items() if key.lower() == name), None)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def retry_after(headers: Mapping[str, str]) -> float | None:
+    """Seconds a response asks to wait, from its retry-after-ms or retry-after header."""
+    milliseconds = _header(headers, "retry-after-ms")
+    return milliseconds / 1000 if milliseconds is not None else _header(headers, "retry-after")
+
+
+def rate_limit_retry_after(error: BaseException) -> float | None:
+    """
+    Seconds to wait if an error is a rate limit (HTTP 429 or a run failed with
+    rate_limit_exceeded), None for any other error.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    text = str(error)
+    if status != 429 and "rate_limit" not in text and "rate limit" not in text.lower():
+        return None
+    seconds = retry_after(getattr(response, "headers", None) or {})
+    if seconds is None:
+        # e.g. "Rate limit is exceeded. Try again in 20 seconds."
+        match = re.search(r"(?:try again|retry) in (\d+(?:\.\d+)?) ?s", text, re.IGNORECASE)
+        seconds = float(match.group(1)) if match else DEFAULT_RETRY_AFTER
+    return seconds
+
+
+class QuotaScheduler:
+    """
+    Token buckets of model deployments, shared by every process that uses the same state file.
+
+    Every deployment has two buckets, one for tokens and one for requests,
+    refilled at its per-minute limits and holding ``window_seconds`` of them,
+    like the service, which enforces the quota over short windows. A model
+    call waits in a queue until it is at the front and both buckets hold
+    enough for it; the queue takes the first call of every flow (a workflow
+    run) before the second one of any, so one long workflow does not starve
+    the others. Calls settle the difference between their estimate and the
+    tokens they actually used.
+
+    The limits start from the configured quotas and are then learned:
+    x-ratelimit-limit-* headers replace them, x-ratelimit-remaining-* headers
+    drain the buckets to what the service says is left, and a 429 pauses the
+    deployment for its retry-after and lowers the rates by ``decrease``;
+    they grow back by ``increase`` of the quota with every successful call.
+
+    The state lives in SQLite (see utils.job_store.JobStore for the journal
+    modes). Waiters renew their place every poll, backing off from
+    ``poll_interval`` to a second while they are not at the front; those of
+    a process that died are dropped after ``waiter_timeout`` seconds. A
+    transaction can wait up to ``busy_timeout`` for other processes, so the
+    async methods and the middleware run them in a thread, never on the
+    event loop; the other methods block.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "cache/quota.db",
+        limits: Mapping[str, QuotaLimits] | None = None,
+        default_limits: QuotaLimits | None = None,
+        window_seconds: float = 10.0,
+        decrease: float = 0.8,
+        increase: float = 0.01,
+        poll_interval: float = 0.05,
+        waiter_timeout: float = 30.0,
+        journal_mode: str = "WAL",
+        busy_timeout: float = 30.0,
+    ):
+        """
+        Args:
+            path: The SQLite state file, created if it does not exist
+            limits: Quotas per deployment; they replace those in the state file
+            default_limits: Quota of deployments without limits; defaults to QuotaLimits()
+            window_seconds: Seconds of quota a full bucket holds, i.e. the largest burst
+            decrease: Factor the rates are multiplied with after a 429
+            increase: Share of the quota the rates grow by after a successful call
+            poll_interval: Seconds between the first checks of a waiting call
+            waiter_timeout: Seconds after which the waiters of a dead process are dropped
+            journal_mode: SQLite journal mode; "WAL" on one host, "DELETE" across hosts
+            busy_timeout: Seconds a write waits for the writes of other processes
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.default_limits = default_limits or QuotaLimits()
+        self.window_seconds = window_seconds
+        self.decrease = decrease
+        self.increase = increase
+        self.poll_interval = poll_interval
+        self.waiter_timeout = waiter_timeout
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(f"PRAGMA journal_mode={journal_mode}")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        for deployment, quota in (limits or {}).items():
+            self.set_limits(deployment, quota)
+        # waited_seconds: time calls spent in the queue; throttled: 429s seen
+        self.stats = {"granted": 0, "waited_seconds": 0.0, "throttled": 0, "estimated_tokens": 0, "used_tokens": 0}
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> None:
+        with self._lock:
+            self._db.execute(sql, parameters)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _bucket(self, db: sqlite3.Connection, deployment: str, now: float) -> dict[str, Any]:
+        """The buckets of a deployment, refilled up to now (inside a transaction)."""
+        row = db.execute("SELECT * FROM buckets WHERE deployment = ?", (deployment,)).fetchone()
+        if row is None:
+            quota = self.default_limits
+            bucket = {
+                "deployment": deployment,
+                "tokens_per_minute": quota.tokens_per_minute,
+                "requests_per_minute": quota.requests_per_minute,
+                "max_tokens_per_minute": quota.tokens_per_minute,
+                "max_requests_per_minute": quota.requests_per_minute,
+                "tokens": quota.tokens_per_minute * self.window_seconds / 60,
+                "requests": quota.requests_per_minute * self.window_seconds / 60,
+                "updated_at": now,
+                "paused_until": 0.0,
+                "learned_from": "default",
+            }
+        else:
+            bucket = dict(row)
+            elapsed = max(0.0, now - bucket["updated_at"])
+            for name in ("tokens", "requests"):
+                rate = bucket[f"{name}_per_minute"]
+                bucket[name] = min(rate * self.window_seconds / 60, bucket[name] + elapsed * rate / 60)
+            bucket["updated_at"] = now
+        return bucket
+
+    @staticmethod
+    def _save(db: sqlite3.Connection, bucket: dict[str, Any]) -> None:
+        columns = ", ".join(bucket)
+        db.execute(
+            f"INSERT OR REPLACE INTO buckets ({columns}) VALUES ({', '.join('?' * len(bucket))})",
+            tuple(bucket.values()),
+        )
+
+    def set_limits(self, deployment: str, quota: QuotaLimits, learned_from: str = "config") -> None:
+        """Set the quota of a deployment, e.g. from its x-ratelimit-limit-* headers."""
+        with self._transaction() as db:
+            bucket = self._bucket(db, deployment, time.time())
+            bucket["tokens_per_minute"] = bucket["max_tokens_per_minute"] = quota.tokens_per_minute
+            bucket["requests_per_minute"] = bucket["max_requests_per_minute"] = quota.requests_per_minute
+            bucket["learned_from"] = learned_from
+            self._save(db, bucket)
+
+    def _try_grant(self, waiter: str, deployment: str, tokens: float) -> float | None:
+        """Take the tokens if the waiter is at the front and they are there; otherwise the seconds to wait."""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM waiters WHERE expires_at < ?", (now,))
+            db.execute(
+                "UPDATE waiters SET expires_at = ? WHERE id = ?", (now + self.waiter_timeout, waiter)
+            )
+            bucket = self._bucket(db, deployment, now)
+            head = db.execute(HEAD_SQL, (deployment,)).fetchone()
+            # A call larger than the bucket runs once the bucket is full
+            cost = min(tokens, bucket["tokens_per_minute"] * self.window_seconds / 60)
+            wait = max(
+                bucket["paused_until"] - now,
+                (cost - bucket["tokens"]) * 60 / bucket["tokens_per_minute"],
+                (1 - bucket["requests"]) * 60 / bucket["requests_per_minute"],
+                0.0,
+            )
+            granted = head is not None and head["id"] == waiter and wait <= 0
+            if granted:
+                bucket["tokens"] -= tokens
+                bucket["requests"] -= 1
+                db.execute("DELETE FROM waiters WHERE id = ?", (waiter,))
+            self._save(db, bucket)
+        if granted:
+            return None
+        # The calls behind the front wait at least as long as it does
+        return wait if head is not None and head["id"] == waiter else max(self.poll_interval, wait)
+
+    async def acquire(self, deployment: str, tokens: float, flow: str = "") -> float:
+        """
+        Wait until a model call of ``tokens`` estimated tokens may be sent to a deployment.
+
+        Args:
+            deployment: The model deployment of the call
+            tokens: Its estimated tokens, prompt and answer
+            flow: The workflow run it belongs to, for fair queueing
+
+        Returns:
+            The seconds the call waited
+        """
+        start = time.time()
+        waiter = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO waiters (id, deployment, flow, tokens, enqueued_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (waiter, deployment, flow, tokens, start, start + self.waiter_timeout),
+        )
+        interval = self.poll_interval
+        try:
+            while (wait := await asyncio.to_thread(self._try_grant, waiter, deployment, tokens)) is not None:
+                # Check back at least every second: other processes may settle tokens or be throttled
+                await asyncio.sleep(min(max(wait, interval), 1.0))
+                interval = min(2 * interval, 1.0)
+        except BaseException:
+            # If this is cut short too, the waiter expires after waiter_timeout
+            await asyncio.to_thread(self._execute, "DELETE FROM waiters WHERE id = ?", (waiter,))
+            raise
+        waited = time.time() - start
+        self.stats["granted"] += 1
+        self.stats["waited_seconds"] += waited
+        self.stats["estimated_tokens"] += tokens
+        return waited
+
+    def settle(self, deployment: str, estimated: float, used: float | None) -> None:
+        """
+        Give back (or take) the difference between a call's estimate and the tokens it used,
+        and let the rates grow back towards the quota. ``used`` is None if the call did not report it.
+        """
+        with self._transaction() as db:
+            bucket = self._bucket(db, deployment, time.time())
+            if used is not None:
+                capacity = bucket["tokens_per_minute"] * self.window_seconds / 60
+                bucket["tokens"] = min(capacity, bucket["tokens"] + estimated - used)
+            for name in ("tokens_per_minute", "requests_per_minute"):
+                bucket[name] = min(bucket[f"max_{name}"], bucket[name] + self.increase * bucket[f"max_{name}"])
+            self._save(db, bucket)
+        if used is not None:
+            self.stats["used_tokens"] += used
+
+    def refund(self, deployment: str, tokens: float) -> None:
+        """Give back the tokens of a call the deployment rejected; unlike settle, the rates do not grow."""
+        with self._transaction() as db:
+            bucket = self._bucket(db, deployment, time.time())
+            capacity = bucket["tokens_per_minute"] * self.window_seconds / 60
+            bucket["tokens"] = min(capacity, bucket["tokens"] + tokens)
+            self._save(db, bucket)
+
+    def throttle(self, deployment: str, seconds: float) -> None:
+        """Pause a deployment after a 429 and lower its rates, once per pause."""
+        now = time.time()
+        self.stats["throttled"] += 1
+        with self._transaction() as db:
+            bucket = self._bucket(db, deployment, now)
+            if bucket["paused_until"] <= now:
+                for name in ("tokens_per_minute", "requests_per_minute"):
+                    bucket[name] = max(0.05 * bucket[f"max_{name}"], bucket[name] * self.decrease)
+            bucket["paused_until"] = max(bucket["paused_until"], now + seconds)
+            bucket["tokens"] = min(bucket["tokens"], 0.0)
+            self._save(db, bucket)
+        logger.warning("%s: rate limited, pausing its calls for %.1fs", deployment, seconds)
+
+    def observe(self, deployment: str, status: int, headers: Mapping[str, str]) -> None:
+        """Learn from the status and rate limit headers of a response of a deployment."""
+        if status == 429:
+            self.throttle(deployment, retry_after(headers) or DEFAULT_RETRY_AFTER)
+            return
+        limit_tokens = _header(headers, "x-ratelimit-limit-tokens")
+        limit_requests = _header(headers, "x-ratelimit-limit-requests")
+        remaining_tokens = _header(headers, "x-ratelimit-remaining-tokens")
+        remaining_requests = _header(headers, "x-ratelimit-remaining-requests")
+        if limit_tokens is None and remaining_tokens is None and remaining_requests is None:
+            return
+        with self._transaction() as db:
+            bucket = self._bucket(db, deployment, time.time())
+            if limit_tokens is not None:
+                bucket["max_tokens_per_minute"] = limit_tokens
+                bucket["tokens_per_minute"] = min(bucket["tokens_per_minute"], limit_tokens)
+                bucket["learned_from"] = "headers"
+            if limit_requests is not None:
+                bucket["max_requests_per_minute"] = limit_requests
+                bucket["requests_per_minute"] = min(bucket["requests_per_minute"], limit_requests)
+            # Other clients of the deployment use its quota too
+            if remaining_tokens is not None:
+                bucket["tokens"] = min(bucket["tokens"], remaining_tokens)
+            if remaining_requests is not None:
+                bucket["requests"] = min(bucket["requests"], remaining_requests)
+            self._save(db, bucket)
+
+    async def observe_response(self, deployment: str, status: int, headers: Mapping[str, str]) -> None:
+        """Like observe, in a thread, and remember a 429 so the model call's error does not throttle again."""
+        # Set here: the thread observe runs in works on a copy of the context
+        if status == 429:
+            _observed_throttle.set(True)
+        await asyncio.to_thread(self.observe, deployment, status, headers)
+
+    def state(self, deployment: str) -> dict[str, Any]:
+        """The current rates, limits and bucket levels of a deployment."""
+        with self._transaction() as db:
+            bucket = self._bucket(db, deployment, time.time())
+            waiting = db.execute("SELECT COUNT(*) FROM waiters WHERE deployment = ?", (deployment,)).fetchone()[0]
+        return {**bucket, "waiting": waiting}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """An aiohttp trace config that learns from the responses to the model calls of this scheduler."""
+
+        async def on_request_end(session, trace_context, params: aiohttp.TraceRequestEndParams) -> None:
+            deployment = _current_deployment.get()
+            if deployment is not None:
+                await self.observe_response(deployment, params.response.status, params.response.headers)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class QuotaMiddleware(ChatMiddleware):
+    """
+    Chat middleware that sends every model call of a client through a QuotaScheduler.
+
+    Calls are estimated with estimate_request_tokens, expecting as many
+    output tokens as the client's earlier calls with the same instructions
+    used on average, and queued per workflow run (the first user message).
+    Rate limit errors pause the deployment for every process sharing the state.
+    """
+
+    def __init__(self, scheduler: QuotaScheduler, deployment: str, smoothing: float = 0.3):
+        """
+        Args:
+            scheduler: The scheduler of the deployment
+            deployment: The model deployment of the client
+            smoothing: Weight of the latest call in the average output tokens
+        """
+        self.scheduler = scheduler
+        self.deployment = deployment
+        self.smoothing = smoothing
+        self._output_tokens: dict[str, float] = {}
+
+    def _expected_output(self, chat_options: ChatOptions) -> int:
+        if chat_options.max_tokens:
+            return chat_options.max_tokens
+        return round(self._output_tokens.get(chat_options.instructions or "", DEFAULT_OUTPUT_TOKENS))
+
+    async def _settle(
+        self, chat_options: ChatOptions, estimated: int, input_tokens: int | None, output_tokens: int | None
+    ) -> None:
+        used = None
+        if input_tokens is not None or output_tokens is not None:
+            used = (input_tokens or 0) + (output_tokens or 0)
+        if output_tokens is not None:
+            key = chat_options.instructions or ""
+            average = self._output_tokens.get(key)
+            self._output_tokens[key] = (
+                output_tokens if average is None else average + self.smoothing * (output_tokens - average)
+            )
+        await asyncio.to_thread(self.scheduler.settle, self.deployment, estimated, used)
+
+    async def _throttled(self, error: BaseException, estimated: int) -> None:
+        seconds = rate_limit_retry_after(error)
+        if seconds is not None:
+            # Unless its response already paused the deployment through observe
+            if not _observed_throttle.get():
+                await asyncio.to_thread(self.scheduler.throttle, self.deployment, seconds)
+            # A rejected call used none of its tokens
+            await asyncio.to_thread(self.scheduler.refund, self.deployment, estimated)
+
+    async def process(self, context: ChatContext, next: Callable[[ChatContext], Awaitable[None]]) -> None:
+        estimated = estimate_request_tokens(
+            context.messages, context.chat_options, self._expected_output(context.chat_options)
+        )
+        await self.scheduler.acquire(self.deployment, estimated, run_key(list(context.messages)))
+        token, observed = _current_deployment.set(self.deployment), _observed_throttle.set(False)
+        try:
+            await next(context)
+        except Exception as e:
+            await self._throttled(e, estimated)
+            raise
+        finally:
+            _current_deployment.reset(token)
+            _observed_throttle.reset(observed)
+
+        if context.is_streaming and context.result is not None:
+            context.result = self._watch_stream(context.chat_options, estimated, context.result)
+            return
+        usage = context.result.usage_details if context.result is not None else None
+        await self._settle(
+            context.chat_options,
+            estimated,
+            usage.input_token_count if usage else None,
+            usage.output_token_count if usage else None,
+        )
+
+    async def _watch_stream(
+        self, chat_options: ChatOptions, estimated: int, stream: AsyncIterable[ChatResponseUpdate]
+    ) -> AsyncIterable[ChatResponseUpdate]:
+        # Requests are made while the stream is consumed, so attribute their responses to the deployment
+        _current_deployment.set(self.deployment)
+        _observed_throttle.set(False)
+        input_tokens = output_tokens = None
+        try:
+            async for update in stream:
+                for content in update.contents:
+                    if isinstance(content, UsageContent):
+                        input_tokens = (input_tokens or 0) + (content.details.input_token_count or 0)
+                        output_tokens = (output_tokens or 0) + (content.details.output_token_count or 0)
+                yield update
+        except Exception as e:
+            await self._throttled(e, estimated)
+            raise
+        finally:
+            _current_deployment.set(None)
+        await self._settle(chat_options, estimated, input_tokens, output_tokens)
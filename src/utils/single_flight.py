@@ -0,0 +1,206 @@
+"""Single-flight coalescing of identical concurrent requests"""
+import asyncio
+import logging
+from collections.abc import AsyncIterable, AsyncIterator, Awaitable, Callable
+from typing import Any
+
+from agent_framework import ChatMessage, Role, Workflow, WorkflowRunResult, WorkflowStartedEvent, WorkflowStatusEvent
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One execution and the items it produced so far"""
+
+    def __init__(self):
+        self.items: list[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+
+class SingleFlight:
+    """
+    Shares one execution among concurrent calls with the same key.
+
+    The first call for a key starts the execution in a task of its own;
+    calls that arrive while it runs subscribe to it and see every item from
+    the start. A caller that is cancelled or stops iterating only leaves the
+    flight. The execution is cancelled when its last caller has left, as
+    nobody would receive its result. Finished flights are forgotten: only
+    concurrent calls are coalesced, reuse of earlier results is left to the
+    stage cache.
+    """
+
+    def __init__(self):
+        self._flights: dict[str, _Flight] = {}
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0, "abandoned": 0}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._flights
+
+    async def _drive(self, key: str, flight: _Flight, source: Callable[[], AsyncIterable[Any]]) -> None:
+        try:
+            async for item in source():
+                flight.items.append(item)
+                async with flight.changed:
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.changed:
+                flight.changed.notify_all()
+
+    async def stream(self, key: str, source: Callable[[], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+        """
+        Iterate over the items of the execution for ``key``, starting ``source()`` if none is running.
+
+        Args:
+            key: Requests with the same key share one execution
+            source: Starts the execution, e.g. ``lambda: workflow.run_stream(message)``
+
+        Yields:
+            Every item the execution produces, from its first one
+        """
+        self.stats["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._drive(key, flight, source))
+            self.stats["executions"] += 1
+        else:
+            self.stats["coalesced"] += 1
+            logger.info("Joining the in-flight run for %r", key)
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(flight.items):
+                    yield flight.items[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: index < len(flight.items) or flight.done)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                logger.info("All callers left the run for %r, cancelling it", key)
+                self.stats["abandoned"] += 1
+                # Forget the flight before it is cancelled, so a call arriving before
+                # _drive has unwound starts a new execution instead of joining this one
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the result of the execution for ``key``, starting ``factory()`` if none is running."""
+
+        async def source():
+            yield await factory()
+
+        async for result in self.stream(key, source):
+            return result
+
+
+def request_key(message: Any) -> str:
+    """The text of a workflow request (or of its first user message), lowercased with whitespace collapsed."""
+    if isinstance(message, list):
+        message = next((m for m in message if not isinstance(m, ChatMessage) or m.role == Role.USER), "")
+    text = message.text if isinstance(message, ChatMessage) else str(message)
+    return " ".join(text.lower().split())
+
+
+class CoalescingWorkflow:
+    """
+    Stands in for a workflow and lets concurrent identical requests share one run.
+
+    A workflow instance only runs one request at a time. This wrapper runs
+    every request on a workflow of its own, taken from a pool of idle ones
+    built by ``build``, and requests with the same key while a run is in flight
+    receive the events of that run instead of starting another. Everything
+    else (executors, graph, input types) is read from a template workflow, so
+    the DevUI serves it like the workflow itself.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], Workflow],
+        key: Callable[[Any], str] = request_key,
+        max_idle: int = 4,
+    ):
+        """
+        Args:
+            build: Builds a new workflow, e.g. ``lambda: build_workflow(client_factory)``
+            key: Maps a request to its coalescing key; defaults to its normalized text
+            max_idle: Number of finished workflows kept for reuse
+        """
+        self._build = build
+        self._key = key
+        self._max_idle = max_idle
+        self._template: Workflow | None = None
+        self._idle: list[Workflow] = []
+        self.flights = SingleFlight()
+
+    @property
+    def template(self) -> Workflow:
+        """The workflow the wrapper describes itself with; it is never run."""
+        if self._template is None:
+            self._template = self._build()
+        return self._template
+
+    def _acquire(self) -> Workflow:
+        return self._idle.pop() if self._idle else self._build()
+
+    async def _execute(self, message: Any, **kwargs: Any) -> AsyncIterable[Any]:
+        workflow = self._acquire()
+        async for event in workflow.run_stream(message, **kwargs):
+            yield event
+        # Only a run that finished is known to leave its workflow reusable
+        if len(self._idle) < self._max_idle:
+            self._idle.append(workflow)
+
+    async def run_stream(self, message: Any | None = None, **kwargs: Any) -> AsyncIterable[Any]:
+        """
+        Stream the events of the run for ``message``, joining an identical run in flight.
+
+        Keyword arguments (e.g. the checkpoint storage of the DevUI session) are
+        applied to the run that is started, not to runs that are joined. Resuming
+        from a checkpoint is never coalesced.
+        """
+        if message is None:
+            async for event in self._execute(message, **kwargs):
+                yield event
+            return
+        async for event in self.flights.stream(self._key(message), lambda: self._execute(message, **kwargs)):
+            yield event
+
+    async def run(self, message: Any | None = None, *, include_status_events: bool = False, **kwargs: Any):
+        """Run to completion like ``Workflow.run``, joining an identical run in flight."""
+        events, status_events = [], []
+        async for event in self.run_stream(message, **kwargs):
+            if isinstance(event, WorkflowStartedEvent):
+                continue
+            if isinstance(event, WorkflowStatusEvent):
+                status_events.append(event)
+                if not include_status_events:
+                    continue
+            events.append(event)
+        return WorkflowRunResult(events, status_events)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes CoalescingWorkflow does not define itself
+        if name.startswith("__") or name in ("_build", "_key", "_max_idle", "_template", "_idle", "flights"):
+            raise AttributeError(name)
+        return getattr(self.template, name)
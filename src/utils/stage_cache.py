@@ -0,0 +1,217 @@
+"""Content-addressed on-disk cache for workflow stage outputs"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterable, Awaitable, Callable
+from pathlib import Path
+
+from agent_framework import (
+    AgentMiddleware,
+    AgentRunContext,
+    AgentRunResponse,
+    AgentRunResponseUpdate,
+    ChatMessage,
+    Role,
+)
+
+from utils.conversation import extract_json, validate_output
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_messages(messages: list[ChatMessage]) -> str:
+    """Hash the role, author and text of every message an agent receives."""
+    payload = [[str(m.role), m.author_name or "", m.text or ""] for m in messages]
+    return _sha256(json.dumps(payload, ensure_ascii=False))
+
+
+def output_schema(agent):
+    """The output schema of an agent, or None if it has none."""
+    return agent.additional_properties.get("output_schema") or agent.chat_options.response_format
+
+
+def hash_agent_definition(agent) -> str:
+    """Hash the instructions and output schema of an agent."""
+    instructions = agent.chat_options.instructions or ""
+    schema = output_schema(agent)
+    schema_json = json.dumps(schema.model_json_schema(), sort_keys=True) if schema is not None else ""
+    return _sha256(instructions + "\n" + schema_json)
+
+
+def stage_cache_key(agent, messages: list[ChatMessage]) -> str:
+    """
+    Build the cache key of an agent run.
+
+    The key covers the agent name, its instructions and output schema, the
+    model deployment and the full input. Since every stage receives the
+    outputs of all earlier stages as input, changing one prompt invalidates
+    that stage and, through their inputs, every stage after it.
+    """
+    model = agent.chat_options.model_id or getattr(agent.chat_client, "model_id", None) or ""
+    parts = [agent.name or "", hash_agent_definition(agent), model, hash_messages(messages)]
+    return _sha256("\n".join(parts))
+
+
+class StageCache:
+    """Persistent stage output cache with size- and age-based eviction"""
+
+    def __init__(
+        self,
+        directory: str | os.PathLike = "cache/stages",
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age_seconds: float = 7 * 24 * 3600,
+    ):
+        """
+        Args:
+            directory: Directory holding one JSON file per cached stage output
+            max_bytes: Total size above which the oldest entries are evicted
+            max_age_seconds: Entries older than this are treated as misses and removed
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.stats: dict[str, dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "stores": 0})
+        self.evictions = 0
+        self._total_bytes = sum(path.stat().st_size for path in self._entries())
+
+    def _entries(self) -> list[Path]:
+        return list(self.directory.glob("*/*.json"))
+
+    def _path(self, stage: str, key: str) -> Path:
+        return self.directory / stage / f"{key}.json"
+
+    def get(self, stage: str, key: str) -> str | None:
+        """Return the cached output of a stage, or None on a miss."""
+        path = self._path(stage, key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.stats[stage]["misses"] += 1
+            return None
+
+        self.stats[stage]["hits"] += 1
+        return entry["text"]
+
+    def set(self, stage: str, key: str, text: str) -> None:
+        """Store the output of a stage, evicting the oldest entries if the cache is full."""
+        path = self._path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"stage": stage, "created_at": time.time(), "text": text}, ensure_ascii=False)
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        try:
+            previous_size = path.stat().st_size
+        except OSError:
+            previous_size = 0
+        os.replace(tmp_path, path)
+
+        self.stats[stage]["stores"] += 1
+        # An overwritten entry no longer takes up its old size
+        self._total_bytes += path.stat().st_size - previous_size
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries, then the oldest ones until the cache is below 90% of max_bytes."""
+        entries = []
+        now = time.time()
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._total_bytes <= self.max_bytes * 0.9:
+                break
+            self._remove(path)
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        self._total_bytes -= size
+        self.evictions += 1
+
+
+class StageCacheMiddleware(AgentMiddleware):
+    """Agent middleware that serves stage outputs from a StageCache"""
+
+    def __init__(self, cache: StageCache):
+        self.cache = cache
+
+    async def process(
+        self,
+        context: AgentRunContext,
+        next: Callable[[AgentRunContext], Awaitable[None]],
+    ) -> None:
+        agent = context.agent
+        key = stage_cache_key(agent, context.messages)
+        cached = self.cache.get(agent.name, key)
+
+        if cached is not None:
+            logger.info("%s: serving output from stage cache", agent.name)
+            if context.is_streaming:
+                context.result = self._replay(agent.name, cached)
+            else:
+                message = ChatMessage(role=Role.ASSISTANT, text=cached, author_name=agent.name)
+                context.result = AgentRunResponse(messages=[message])
+            return
+
+        await next(context)
+
+        if context.result is None:
+            return
+        schema = output_schema(agent)
+        if context.is_streaming:
+            context.result = self._record(agent.name, key, schema, context.result)
+        else:
+            self._store(agent.name, key, schema, context.result.text)
+
+    def _store(self, stage: str, key: str, schema, text: str) -> None:
+        # Only cache output that matches the stage schema, never a failed, partial or malformed answer
+        if schema is not None:
+            problem = validate_output(text, schema)
+        else:
+            try:
+                extract_json(text)
+                problem = None
+            except ValueError as e:
+                problem = str(e)
+        if problem is not None:
+            logger.info("%s: not caching output: %s", stage, problem)
+            return
+        self.cache.set(stage, key, text)
+
+    async def _replay(self, stage: str, text: str) -> AsyncIterable[AgentRunResponseUpdate]:
+        yield AgentRunResponseUpdate(role=Role.ASSISTANT, text=text, author_name=stage)
+
+    async def _record(
+        self, stage: str, key: str, schema, updates: AsyncIterable[AgentRunResponseUpdate]
+    ) -> AsyncIterable[AgentRunResponseUpdate]:
+        chunks = []
+        async for update in updates:
+            chunks.append(update.text)
+            yield update
+        self._store(stage, key, schema, "".join(chunks))
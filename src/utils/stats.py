@@ -0,0 +1,32 @@
+"""Helper functions to summarize latency measurements"""
+import math
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Return the q-th percentile (0-100) of the values using the nearest-rank method.
+
+    Args:
+        values: The measurements
+        q: The percentile to compute, e.g. 95
+
+    Returns:
+        The percentile value, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(values: list[float]) -> dict:
+    """Return count, mean, p50, p95, p99 and max of latency measurements in seconds."""
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values, default=0.0),
+    }
@@ -0,0 +1,417 @@
+"""Flattened, indexed in-memory DecisionTree with a compact binary serialization"""
+import struct
+import sys
+from array import array
+from collections.abc import Iterator
+from itertools import accumulate
+
+from models.workflow_schemas import DecisionTree, DecisionTreeNode
+
+MAGIC = b"DTIX"
+VERSION = 1
+
+# magic, version, strings, string blob bytes, nodes, sources, decision refs, snippet refs, risk levels
+_HEADER = struct.Struct("<4sBIIIIIIH")
+
+# (source_name, source_url, source_snippets)
+Source = tuple[str, str, tuple[str, ...]]
+
+
+class TreeNode:
+    """Read-only view of a single node in a TreeIndex"""
+    __slots__ = ("_index", "_position")
+
+    def __init__(self, index: "TreeIndex", position: int):
+        self._index = index
+        self._position = position
+
+    @property
+    def id(self) -> int:
+        return self._index._ids[self._position]
+
+    @property
+    def decision(self) -> str | None:
+        return self._index._optional(self._index._decision[self._position])
+
+    @property
+    def question(self) -> str:
+        return self._index._strings[self._index._question[self._position]]
+
+    @property
+    def decisions(self) -> list[str]:
+        return self._index._decisions_of(self._position)
+
+    @property
+    def risk_level(self) -> str | None:
+        return self._index._optional(self._index._risk_level[self._position])
+
+    @property
+    def sources(self) -> list[Source]:
+        return self._index._sources_of(self._position)
+
+    @property
+    def level(self) -> int:
+        return self._index._levels[self._position]
+
+    @property
+    def depth(self) -> int:
+        return self._index._depths[self._position]
+
+    @property
+    def is_leaf(self) -> bool:
+        return self._index._child_count[self._position] == 0
+
+    @property
+    def parent(self) -> "TreeNode | None":
+        parent = self._index._parents[self._position]
+        return TreeNode(self._index, parent) if parent >= 0 else None
+
+    @property
+    def children(self) -> list["TreeNode"]:
+        first = self._index._first_child[self._position]
+        return [TreeNode(self._index, first + i) for i in range(self._index._child_count[self._position])]
+
+    def __repr__(self) -> str:
+        return f"TreeNode(id={self.id}, question={self.question!r}, risk_level={self.risk_level!r})"
+
+
+class TreeIndex:
+    """
+    A DecisionTree flattened into per-node columns in breadth-first order.
+
+    Breadth-first order keeps the children of a node contiguous, so the tree
+    is fully described by the parent column. Node ids map to positions through
+    a dict, which makes lookup by id, parent, depth and the leaf list O(1)
+    without walking nested dicts.
+
+    Every string is stored once in a string table and nodes refer to it by
+    position (optional strings as position + 1, with 0 meaning None). Variable
+    length fields (decisions, sources, snippets) are flat reference columns
+    with offset columns, so the in-memory layout matches the binary layout and
+    ``from_bytes`` is mostly array copies.
+    """
+    __slots__ = (
+        "_strings",
+        "_impairment_name",
+        "_risk_levels",
+        "_ids",
+        "_parents",
+        "_levels",
+        "_decision",
+        "_question",
+        "_risk_level",
+        "_decision_offsets",
+        "_decision_refs",
+        "_source_offsets",
+        "_source_refs",
+        "_snippet_offsets",
+        "_snippet_refs",
+        "_first_child",
+        "_child_count",
+        "_depths",
+        "_position",
+        "_leaves",
+    )
+
+    def __init__(self):
+        self._strings: list[str] = []
+        self._impairment_name = 0
+        self._risk_levels = array("I")
+        self._ids = array("q")
+        self._parents = array("i")
+        self._levels = array("i")
+        self._decision = array("I")
+        self._question = array("I")
+        self._risk_level = array("I")
+        self._decision_offsets = array("I", [0])
+        self._decision_refs = array("I")
+        self._source_offsets = array("I", [0])
+        self._source_refs = array("I")
+        self._snippet_offsets = array("I", [0])
+        self._snippet_refs = array("I")
+        self._first_child = array("i")
+        self._child_count = array("H")
+        self._depths = array("H")
+        self._position: dict[int, int] = {}
+        self._leaves: tuple[int, ...] = ()
+
+    @classmethod
+    def from_tree(cls, tree: DecisionTree | dict) -> "TreeIndex":
+        """
+        Build the index from a DecisionTree or its dict form.
+
+        Args:
+            tree: The DecisionTree model or a dict that validates against it
+
+        Returns:
+            The indexed tree
+
+        Raises:
+            ValueError: If two nodes share the same id
+        """
+        if not isinstance(tree, DecisionTree):
+            tree = DecisionTree.model_validate(tree)
+
+        index = cls()
+        table: dict[str, int] = {}
+
+        def ref(value: str) -> int:
+            return table.setdefault(value, len(table))
+
+        def optional_ref(value: str | None) -> int:
+            return 0 if value is None else ref(value) + 1
+
+        index._impairment_name = ref(tree.impairment_name)
+        index._risk_levels.extend(ref(level) for level in tree.risk_levels)
+
+        queue: list[tuple[DecisionTreeNode, int]] = [(tree.root_node, -1)]
+        head = 0
+        while head < len(queue):
+            node, parent = queue[head]
+            head += 1
+            index._ids.append(node.id)
+            index._parents.append(parent)
+            index._levels.append(node.level)
+            index._decision.append(optional_ref(node.decision))
+            index._question.append(ref(node.question))
+            index._risk_level.append(optional_ref(node.risk_level))
+            index._decision_refs.extend(ref(decision) for decision in node.decisions)
+            index._decision_offsets.append(len(index._decision_refs))
+            for source in node.sources:
+                index._source_refs.extend((ref(source.source_name), ref(source.source_url)))
+                index._snippet_refs.extend(ref(snippet) for snippet in source.source_snippets)
+                index._snippet_offsets.append(len(index._snippet_refs))
+            index._source_offsets.append(len(index._source_refs) // 2)
+            queue.extend((child, head - 1) for child in node.children)
+
+        index._strings = list(table)
+        index._link()
+        return index
+
+    def _link(self) -> None:
+        """Derive the child, depth, id and leaf lookups from the parent column."""
+        count = len(self._ids)
+        parents = self._parents
+        first_child = array("i", [0]) * count
+        child_count = array("H", [0]) * count
+        depths = array("H", [0]) * count
+        for position in range(1, count):
+            parent = parents[position]
+            if child_count[parent] == 0:
+                first_child[parent] = position
+            child_count[parent] += 1
+            depths[position] = depths[parent] + 1
+        self._first_child, self._child_count, self._depths = first_child, child_count, depths
+
+        self._position = dict(zip(self._ids, range(count)))
+        if len(self._position) != count:
+            raise ValueError(f"Decision tree for {self.impairment_name!r} contains duplicate node ids")
+        self._leaves = tuple(position for position in range(count) if child_count[position] == 0)
+
+    def _optional(self, reference: int) -> str | None:
+        return self._strings[reference - 1] if reference else None
+
+    def _decisions_of(self, position: int) -> list[str]:
+        start, end = self._decision_offsets[position], self._decision_offsets[position + 1]
+        return [self._strings[reference] for reference in self._decision_refs[start:end]]
+
+    def _sources_of(self, position: int) -> list[Source]:
+        strings = self._strings
+        sources = []
+        for source in range(self._source_offsets[position], self._source_offsets[position + 1]):
+            start, end = self._snippet_offsets[source], self._snippet_offsets[source + 1]
+            sources.append((
+                strings[self._source_refs[2 * source]],
+                strings[self._source_refs[2 * source + 1]],
+                tuple(strings[reference] for reference in self._snippet_refs[start:end]),
+            ))
+        return sources
+
+    @property
+    def impairment_name(self) -> str:
+        return self._strings[self._impairment_name]
+
+    @property
+    def risk_levels(self) -> list[str]:
+        return [self._strings[reference] for reference in self._risk_levels]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self._position
+
+    def __getitem__(self, node_id: int) -> TreeNode:
+        return TreeNode(self, self._position[node_id])
+
+    def __iter__(self) -> Iterator[TreeNode]:
+        return (TreeNode(self, position) for position in range(len(self._ids)))
+
+    @property
+    def root(self) -> TreeNode:
+        return TreeNode(self, 0)
+
+    @property
+    def leaf_ids(self) -> list[int]:
+        return [self._ids[position] for position in self._leaves]
+
+    @property
+    def leaves(self) -> list[TreeNode]:
+        return [TreeNode(self, position) for position in self._leaves]
+
+    def parent_id(self, node_id: int) -> int | None:
+        """Return the id of the parent of a node, None for the root."""
+        parent = self._parents[self._position[node_id]]
+        return self._ids[parent] if parent >= 0 else None
+
+    def depth(self, node_id: int) -> int:
+        """Return the depth of a node, 0 for the root."""
+        return self._depths[self._position[node_id]]
+
+    def child_ids(self, node_id: int) -> list[int]:
+        """Return the ids of the children of a node, in order."""
+        position = self._position[node_id]
+        first = self._first_child[position]
+        return self._ids[first : first + self._child_count[position]].tolist()
+
+    def path(self, node_id: int) -> list[int]:
+        """Return the ids from the root down to a node."""
+        position = self._position[node_id]
+        path = []
+        while position >= 0:
+            path.append(self._ids[position])
+            position = self._parents[position]
+        return path[::-1]
+
+    def to_dict(self) -> dict:
+        """Rebuild the nested DecisionTree dict."""
+        nodes = [
+            {
+                "id": self._ids[position],
+                "decision": self._optional(self._decision[position]),
+                "question": self._strings[self._question[position]],
+                "decisions": self._decisions_of(position),
+                "risk_level": self._optional(self._risk_level[position]),
+                "sources": [
+                    {"source_name": name, "source_url": url, "source_snippets": list(snippets)}
+                    for name, url, snippets in self._sources_of(position)
+                ],
+                "level": self._levels[position],
+                "children": [],
+            }
+            for position in range(len(self._ids))
+        ]
+        for position in range(1, len(nodes)):
+            nodes[self._parents[position]]["children"].append(nodes[position])
+        return {
+            "impairment_name": self.impairment_name,
+            "root_node": nodes[0],
+            "risk_levels": self.risk_levels,
+        }
+
+    def to_model(self) -> DecisionTree:
+        """Rebuild the DecisionTree model."""
+        return DecisionTree.model_validate(self.to_dict())
+
+    def _columns(self) -> tuple[array, ...]:
+        """The serialized columns, in file order."""
+        return (
+            self._risk_levels, self._ids, self._parents, self._levels, self._decision, self._question,
+            self._risk_level, self._decision_offsets, self._decision_refs, self._source_offsets,
+            self._source_refs, self._snippet_offsets, self._snippet_refs,
+        )
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the index into a compact binary form.
+
+        Layout (little endian): header, string table (character lengths
+        followed by one UTF-8 blob), then the reference and offset columns.
+        """
+        lengths = array("I", map(len, self._strings))
+        blob = "".join(self._strings).encode("utf-8")
+        header = _HEADER.pack(
+            MAGIC,
+            VERSION,
+            len(self._strings),
+            len(blob),
+            len(self._ids),
+            len(self._snippet_offsets) - 1,
+            len(self._decision_refs),
+            len(self._snippet_refs),
+            len(self._risk_levels),
+        )
+        return b"".join([
+            header,
+            struct.pack("<I", self._impairment_name),
+            _to_little_endian(lengths),
+            blob,
+            *map(_to_little_endian, self._columns()),
+        ])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TreeIndex":
+        """
+        Load an index written by ``to_bytes``.
+
+        Raises:
+            ValueError: If the data is not a serialized TreeIndex of a supported version
+        """
+        if len(data) < _HEADER.size or data[:4] != MAGIC:
+            raise ValueError("Not a serialized TreeIndex")
+        (
+            _, version, string_count, blob_size, node_count, source_count, decision_count, snippet_count, risk_count,
+        ) = _HEADER.unpack_from(data, 0)
+        if version != VERSION:
+            raise ValueError(f"Unsupported TreeIndex version {version}")
+
+        view = memoryview(data)
+        offset = _HEADER.size
+
+        def read(typecode: str, count: int) -> array | memoryview:
+            nonlocal offset
+            end = offset + struct.calcsize(typecode) * count
+            if end > len(view):
+                raise ValueError("Serialized TreeIndex is truncated")
+            if sys.byteorder == "little":
+                # Zero-copy typed view into the payload
+                column = view[offset:end].cast(typecode)
+            else:
+                column = array(typecode, view[offset:end].tobytes())
+                column.byteswap()
+            offset = end
+            return column
+
+        # Every column is assigned below, so skip allocating the empty ones of __init__
+        index = cls.__new__(cls)
+        (index._impairment_name,) = read("I", 1)
+        ends = list(accumulate(read("I", string_count)))
+        text = str(view[offset : offset + blob_size], "utf-8")
+        offset += blob_size
+        index._strings = [text[start:end] for start, end in zip([0, *ends], ends)]
+
+        index._risk_levels = read("I", risk_count)
+        index._ids = read("q", node_count)
+        index._parents = read("i", node_count)
+        index._levels = read("i", node_count)
+        index._decision = read("I", node_count)
+        index._question = read("I", node_count)
+        index._risk_level = read("I", node_count)
+        index._decision_offsets = read("I", node_count + 1)
+        index._decision_refs = read("I", decision_count)
+        index._source_offsets = read("I", node_count + 1)
+        index._source_refs = read("I", source_count * 2)
+        index._snippet_offsets = read("I", source_count + 1)
+        index._snippet_refs = read("I", snippet_count)
+        if offset != len(data):
+            raise ValueError("Serialized TreeIndex has an unexpected length")
+
+        index._link()
+        return index
+
+
+def _to_little_endian(column: array | memoryview) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode if isinstance(column, array) else column.format, column)
+        column.byteswap()
+    return column.tobytes()
@@ -0,0 +1,346 @@
+"""Compile a DecisionTree into flat arrays and score record batches with NumPy"""
+import math
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from utils.diagram_renderer import child_edges
+
+DEFAULT_RISK_LEVELS = ["Low", "Medium", "High", "Critical"]
+
+_COMPARISON = re.compile(r"^\s*(<=|>=|<|>|≤|≥)\s*(-?\d+(?:\.\d+)?)")
+_RANGE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*[^\d\s-]*\s*(?:-|–|to)\s*(-?\d+(?:\.\d+)?)")
+_BOOLEAN_ALIASES = {"true": "yes", "false": "no", "y": "yes", "n": "no", "1": "yes", "0": "no"}
+
+
+def normalize_category(value) -> str:
+    """Normalize a branch label or record value for case-insensitive category matching."""
+    if isinstance(value, (bool, np.bool_)):
+        return "yes" if value else "no"
+    text = str(value).strip().lower()
+    return _BOOLEAN_ALIASES.get(text, text)
+
+
+def feature_name(question: str) -> str:
+    """Derive a column name from a node question, e.g. "Is the applicant a smoker?" -> "is_the_applicant_a_smoker"."""
+    return re.sub(r"[^a-z0-9]+", "_", question.lower()).strip("_")
+
+
+def _lower_bound(label: str) -> tuple[float, bool] | None:
+    """Return the lower bound of a numeric branch label and whether it is strict, or None if it is not numeric."""
+    if match := _COMPARISON.match(label):
+        operator, number = match.groups()
+        if operator in ("<", "<=", "≤"):
+            return -math.inf, False
+        return float(number), operator == ">"
+    if match := _RANGE.match(label):
+        return float(match.group(1)), False
+    return None
+
+
+def branch_bounds(labels: list[str]) -> list[tuple[float, bool]] | None:
+    """
+    Return the lower bound of every branch label and whether it is strict, or None unless all are numeric.
+
+    A value takes the branch with the highest bound it reaches: "> 9" starts
+    just above 9, so 9 itself stays in "7 - 9", and since "<= 7" includes 7,
+    a branch starting at 7 ("7 - 9" or ">= 7") starts just above it.
+    """
+    bounds = [_lower_bound(label) for label in labels]
+    if any(bound is None for bound in bounds):
+        return None
+    inclusive_upper = {
+        float(match.group(2))
+        for label in labels
+        if (match := _COMPARISON.match(label)) and match.group(1) in ("<=", "≤")
+    }
+    return [(bound, strict or bound in inclusive_upper) for bound, strict in bounds]
+
+
+def _reaches(value: float, bound: float, strict: bool) -> bool:
+    return value > bound if strict else value >= bound
+
+
+@dataclass
+class CompiledTree:
+    """
+    Array-backed form of a decision tree.
+
+    Node 0 is the root. For every node:
+    - node_feature: column index into ``features``, -1 for leaves
+    - node_numeric: whether the node splits on numeric thresholds
+    - node_bounds: sorted lower bound of each branch (padded with +inf)
+    - node_strict: whether each bound excludes the value itself, sorted after an inclusive bound of the same value
+    - node_branch: categorical branch per category code of the feature (padded with -1)
+    - child_index: child node per branch (padded with ``unmatched``)
+    - leaf_risk: index into ``risk_levels`` for leaves, -1 for internal nodes
+
+    The last node is a sentinel leaf (risk -1) that records end up on when
+    they match no branch.
+    """
+    features: list[str]
+    feature_numeric: list[bool]
+    categories: list[dict[str, int]]
+    risk_levels: list[str]
+    node_feature: np.ndarray
+    node_numeric: np.ndarray
+    node_bounds: np.ndarray
+    node_strict: np.ndarray
+    node_branch: np.ndarray
+    child_index: np.ndarray
+    leaf_risk: np.ndarray
+    max_depth: int
+    questions: list[str] = field(default_factory=list)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_feature)
+
+    @property
+    def unmatched(self) -> int:
+        return len(self.node_feature) - 1
+
+
+def compile_tree(tree: dict, feature_names: Mapping[str, str] | None = None) -> CompiledTree:
+    """
+    Compile a DecisionTree into a CompiledTree.
+
+    Internal nodes split on the column named after their question (see
+    ``feature_name``, or ``feature_names[question]`` when given). A node whose
+    branch labels all parse as numeric comparisons or ranges ("< 7%", "7% - 9%",
+    "> 9%") becomes a threshold split; any other node becomes a categorical split
+    on its branch labels.
+
+    Args:
+        tree: The DecisionTree output as a dict
+        feature_names: Optional mapping from node question to record column name
+
+    Returns:
+        The compiled tree
+    """
+    feature_names = feature_names or {}
+    risk_levels = list(tree.get("risk_levels") or DEFAULT_RISK_LEVELS)
+    risk_index = {level.lower(): index for index, level in enumerate(risk_levels)}
+
+    features: list[str] = []
+    feature_numeric: list[bool] = []
+    categories: list[dict[str, int]] = []
+    nodes: list[dict] = []
+
+    # Breadth-first so node ids grow with depth and the root is node 0
+    queue: list[tuple[dict, int]] = [(tree["root_node"], 0)]
+    max_depth = 0
+    while queue:
+        node, depth = queue.pop(0)
+        max_depth = max(max_depth, depth)
+        edges = child_edges(node)
+        if not edges:
+            risk = node.get("risk_level")
+            nodes.append({"leaf_risk": risk_index.get(str(risk or "").strip().lower(), -1)})
+            continue
+
+        question = str(node.get("question", ""))
+        column = feature_names.get(question) or feature_name(question)
+        bounds = branch_bounds([label for label, _ in edges])
+        numeric = bounds is not None
+
+        if column not in features:
+            features.append(column)
+            feature_numeric.append(numeric)
+            categories.append({})
+        feature = features.index(column)
+        if feature_numeric[feature] != numeric:
+            raise ValueError(f"Column {column!r} is used for both numeric and categorical splits")
+
+        first_child = len(nodes) + len(queue) + 1
+        entry = {"feature": feature, "numeric": numeric, "leaf_risk": -1, "question": question}
+        if numeric:
+            order = sorted(range(len(edges)), key=lambda i: bounds[i])
+            entry["bounds"] = [bounds[i][0] for i in order]
+            entry["strict"] = [bounds[i][1] for i in order]
+            entry["children"] = [first_child + i for i in order]
+        else:
+            branches = {}
+            for branch, (label, _) in enumerate(edges):
+                code = categories[feature].setdefault(normalize_category(label), len(categories[feature]))
+                branches[code] = branch
+            entry["branches"] = branches
+            entry["children"] = [first_child + i for i in range(len(edges))]
+        nodes.append(entry)
+        queue.extend((child, depth + 1) for _, child in edges)
+
+    nodes.append({"leaf_risk": -1})
+    num_nodes = len(nodes)
+    max_branches = max((len(n.get("children", [])) for n in nodes), default=1) or 1
+    max_categories = max((len(c) for c in categories), default=1) or 1
+
+    node_feature = np.full(num_nodes, -1, dtype=np.int32)
+    node_numeric = np.zeros(num_nodes, dtype=bool)
+    node_bounds = np.full((num_nodes, max_branches), np.inf)
+    node_strict = np.zeros((num_nodes, max_branches), dtype=bool)
+    node_branch = np.full((num_nodes, max_categories), -1, dtype=np.int32)
+    child_index = np.full((num_nodes, max_branches), num_nodes - 1, dtype=np.int32)
+    leaf_risk = np.full(num_nodes, -1, dtype=np.int32)
+
+    for index, node in enumerate(nodes):
+        leaf_risk[index] = node["leaf_risk"]
+        if "feature" not in node:
+            continue
+        node_feature[index] = node["feature"]
+        node_numeric[index] = node["numeric"]
+        child_index[index, : len(node["children"])] = node["children"]
+        if node["numeric"]:
+            node_bounds[index, : len(node["bounds"])] = node["bounds"]
+            node_strict[index, : len(node["strict"])] = node["strict"]
+        else:
+            for code, branch in node["branches"].items():
+                node_branch[index, code] = branch
+
+    return CompiledTree(
+        features=features,
+        feature_numeric=feature_numeric,
+        categories=categories,
+        risk_levels=risk_levels,
+        node_feature=node_feature,
+        node_numeric=node_numeric,
+        node_bounds=node_bounds,
+        node_strict=node_strict,
+        node_branch=node_branch,
+        child_index=child_index,
+        leaf_risk=leaf_risk,
+        max_depth=max_depth,
+        questions=[n.get("question", "") for n in nodes],
+    )
+
+
+def encode_columns(compiled: CompiledTree, columns: Mapping[str, object]) -> np.ndarray:
+    """
+    Encode a columnar batch into the float matrix consumed by ``score_batch``.
+
+    Numeric columns are used as-is. Categorical columns are mapped to the
+    category codes of the compiled tree; unknown values become -1.
+
+    Args:
+        compiled: The compiled tree
+        columns: Mapping from column name to a 1-D array-like (a dict of
+            NumPy arrays, a pandas DataFrame, ...)
+
+    Returns:
+        Array of shape (num_records, num_features)
+    """
+    encoded = []
+    for column, numeric, vocabulary in zip(compiled.features, compiled.feature_numeric, compiled.categories):
+        values = np.asarray(columns[column])
+        if numeric:
+            encoded.append(values.astype(np.float64, copy=False))
+        elif values.dtype == np.bool_:
+            lookup = np.array([vocabulary.get("no", -1), vocabulary.get("yes", -1)], dtype=np.float64)
+            encoded.append(lookup[values.astype(np.int8)])
+        else:
+            # Encode each distinct value once instead of once per record
+            unique, inverse = np.unique(values.astype(str), return_inverse=True)
+            codes = np.array([vocabulary.get(normalize_category(v), -1) for v in unique], dtype=np.float64)
+            encoded.append(codes[inverse])
+    if not encoded:
+        # A tree whose root is a leaf asks nothing, but still scores every record
+        return np.empty((len(next(iter(columns.values()), ())), 0))
+    return np.column_stack(encoded)
+
+
+def score_batch(compiled: CompiledTree, records: np.ndarray | Mapping[str, object], chunk_size: int = 1_000_000) -> np.ndarray:
+    """
+    Score a batch of records in one vectorized pass per tree level.
+
+    Args:
+        compiled: The compiled tree
+        records: Either the output of ``encode_columns`` or a columnar mapping
+        chunk_size: Records processed at once, bounding temporary memory
+
+    Returns:
+        Array of ``risk_levels`` indices, -1 where a record matched no branch
+    """
+    matrix = records if isinstance(records, np.ndarray) else encode_columns(compiled, records)
+    if not compiled.features:
+        return np.full(len(matrix), compiled.leaf_risk[0], dtype=np.int32)
+    result = np.empty(len(matrix), dtype=np.int32)
+    max_code = compiled.node_branch.shape[1] - 1
+
+    for start in range(0, len(matrix), chunk_size):
+        chunk = matrix[start : start + chunk_size]
+        rows = np.arange(len(chunk))
+        node = np.zeros(len(chunk), dtype=np.int32)
+
+        for _ in range(compiled.max_depth):
+            feature = compiled.node_feature[node]
+            active = feature >= 0
+            if not active.any():
+                break
+            values = chunk[rows, np.maximum(feature, 0)]
+
+            # Bounds are sorted, so the branch is the number of lower bounds reached minus one
+            bounds = compiled.node_bounds[node]
+            reached = np.where(compiled.node_strict[node], values[:, None] > bounds, values[:, None] >= bounds)
+            numeric_branch = reached.sum(axis=1) - 1
+            codes = np.nan_to_num(values, nan=-1).astype(np.int64)
+            categorical_branch = np.where(
+                (codes >= 0) & (codes <= max_code),
+                compiled.node_branch[node, np.clip(codes, 0, max_code)],
+                -1,
+            )
+            branch = np.where(compiled.node_numeric[node], numeric_branch, categorical_branch)
+
+            # Records that match no branch move to the trailing "unmatched" leaf
+            child = np.where(branch >= 0, compiled.child_index[node, np.maximum(branch, 0)], compiled.unmatched)
+            node = np.where(active, child, node)
+
+        result[start : start + len(chunk)] = compiled.leaf_risk[node]
+
+    return result
+
+
+def risk_level_names(compiled: CompiledTree, indices: np.ndarray) -> np.ndarray:
+    """Map ``score_batch`` output to risk level names ("" where no branch matched)."""
+    return np.array(compiled.risk_levels + [""], dtype=object)[indices]
+
+
+def score_record(tree: dict, record: Mapping[str, object], feature_names: Mapping[str, str] | None = None) -> str | None:
+    """
+    Reference implementation: walk the tree for a single record in plain Python.
+
+    Follows the same matching rules as ``compile_tree``/``score_batch`` and is
+    used to check the vectorized scorer.
+
+    Args:
+        tree: The DecisionTree output as a dict
+        record: Mapping from column name to value
+        feature_names: Optional mapping from node question to record column name
+
+    Returns:
+        The risk level of the reached leaf, or None if no branch matched
+    """
+    feature_names = feature_names or {}
+    node = tree["root_node"]
+    while True:
+        edges = child_edges(node)
+        if not edges:
+            return node.get("risk_level")
+
+        question = str(node.get("question", ""))
+        value = record.get(feature_names.get(question) or feature_name(question))
+        bounds = branch_bounds([label for label, _ in edges])
+
+        if bounds is not None:
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                return None
+            # The matching branch is the one with the highest lower bound the value reaches
+            candidates = [(bound, child) for bound, (_, child) in zip(bounds, edges) if _reaches(float(value), *bound)]
+            if not candidates:
+                return None
+            node = max(candidates, key=lambda candidate: candidate[0])[1]
+        else:
+            category = normalize_category(value)
+            node = next((child for label, child in edges if normalize_category(label) == category), None)
+            if node is None:
+                return None
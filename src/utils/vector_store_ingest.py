@@ -0,0 +1,217 @@
+"""Incremental, concurrent ingestion of a document directory into an Azure AI vector store"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SUFFIXES = {".md", ".txt", ".pdf", ".docx", ".html", ".json", ".pptx"}
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_directory(directory: str | Path, suffixes: set[str] = SUPPORTED_SUFFIXES) -> dict[str, Path]:
+    """Return the supported files below a directory by their posix path relative to it."""
+    root = Path(directory)
+    return {
+        path.relative_to(root).as_posix(): path
+        for path in sorted(root.rglob("*"))
+        if path.is_file() and path.suffix.lower() in suffixes and not path.name.startswith(".")
+    }
+
+
+class IngestManifest:
+    """
+    Local record of what has been ingested into one vector store.
+
+    Every file entry holds the content hash, the uploaded file id, whether
+    the file has been added to the vector store yet ("uploaded" or "indexed")
+    and, until then, the file id of the version it replaces. The manifest is
+    rewritten atomically as the run progresses, so an interrupted run resumes
+    without indexing anything twice.
+    """
+
+    def __init__(self, path: str | Path, save_interval: float = 1.0):
+        """
+        Args:
+            path: Path of the JSON manifest
+            save_interval: Minimum seconds between two ``save_soon`` writes
+        """
+
+        self.path = Path(path)
+        self.save_interval = save_interval
+        self._last_save = 0.0
+        self.vector_store_id: str | None = None
+        self.files: dict[str, dict[str, str]] = {}
+        if self.path.exists():
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+            if state.get("version") == MANIFEST_VERSION:
+                self.vector_store_id = state.get("vector_store_id")
+                self.files = state.get("files", {})
+            else:
+                logger.warning("Ignoring manifest %s with unsupported version %s", self.path, state.get("version"))
+
+    def reset(self, vector_store_id: str) -> None:
+        """Start over for another vector store."""
+        self.vector_store_id = vector_store_id
+        self.files = {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"version": MANIFEST_VERSION, "vector_store_id": self.vector_store_id, "files": self.files}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+
+    def save_soon(self) -> None:
+        """Save unless the manifest was saved less than ``save_interval`` seconds ago."""
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+
+async def _delete_file(agents_client: Any, vector_store_id: str, file_id: str) -> None:
+    """Remove a file from the vector store and from the project files; already missing files are fine."""
+    for delete in (
+        lambda: agents_client.vector_store_files.delete(vector_store_id=vector_store_id, file_id=file_id),
+        lambda: agents_client.files.delete(file_id),
+    ):
+        try:
+            await delete()
+        except Exception as e:
+            logger.warning("Could not delete file %s: %s", file_id, e)
+
+
+async def ingest_directory(
+    agents_client: Any,
+    directory: str | Path,
+    manifest_path: str | Path,
+    vector_store_id: str | None = None,
+    vector_store_name: str = "medical-guidelines-vector-store",
+    concurrency: int = 8,
+    batch_size: int = 100,
+    delete_removed: bool = True,
+) -> dict:
+    """
+    Bring a vector store in sync with a directory, touching only what changed.
+
+    Files are hashed concurrently and compared with the manifest. New and
+    changed files are uploaded with bounded parallelism and added to the
+    existing vector store in file batches; the previous version of a changed
+    file is removed once the new one is indexed. Files that disappeared from
+    the directory are removed from the store when ``delete_removed`` is set.
+
+    Args:
+        agents_client: The ``agents_client`` of an AzureAIAgentClient (or a
+            stand-in with the same files / vector_stores /
+            vector_store_file_batches / vector_store_files operations)
+        directory: The document directory
+        manifest_path: Path of the local JSON manifest
+        vector_store_id: Vector store to sync; defaults to the one in the
+            manifest, and a new store is created when there is neither
+        vector_store_name: Name of a newly created vector store
+        concurrency: Maximum number of concurrent hash and upload operations
+        batch_size: Maximum number of files per vector store file batch
+        delete_removed: Whether to remove files that left the directory
+
+    Returns:
+        Summary with the vector store id, file counts and elapsed time
+    """
+    start = time.perf_counter()
+    manifest = IngestManifest(manifest_path)
+    vector_store_id = vector_store_id or manifest.vector_store_id
+    if vector_store_id is None:
+        vector_store = await agents_client.vector_stores.create_and_poll(name=vector_store_name)
+        vector_store_id = vector_store.id
+        logger.info("Created vector store %s", vector_store_id)
+    if manifest.vector_store_id != vector_store_id:
+        manifest.reset(vector_store_id)
+        manifest.save()
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    files = scan_directory(directory)
+
+    async def hash_file(path: Path) -> str:
+        async with semaphore:
+            return await asyncio.to_thread(file_sha256, path)
+
+    hashes = dict(zip(files, await asyncio.gather(*(hash_file(path) for path in files.values()))))
+
+    to_upload: list[str] = []
+    to_index: list[str] = []
+    for name, sha256 in hashes.items():
+        entry = manifest.files.get(name)
+        if entry and entry["sha256"] == sha256:
+            if entry["status"] == "uploaded":
+                to_index.append(name)  # resumed: uploaded by an interrupted run
+            continue
+        to_upload.append(name)
+    resumed = len(to_index)
+
+    async def upload(name: str) -> None:
+        async with semaphore:
+            file = await agents_client.files.upload_and_poll(file_path=str(files[name]), purpose="assistants")
+        entry = {"sha256": hashes[name], "file_id": file.id, "status": "uploaded"}
+        previous = manifest.files.get(name)
+        if previous:
+            # Removed once the new version is indexed
+            replaces = previous.get("replaces") if previous["status"] == "uploaded" else previous["file_id"]
+            if replaces:
+                entry["replaces"] = replaces
+        manifest.files[name] = entry
+        manifest.save_soon()
+
+    results = await asyncio.gather(*(upload(name) for name in to_upload), return_exceptions=True)
+    manifest.save()
+    failed = [(name, result) for name, result in zip(to_upload, results) if isinstance(result, Exception)]
+    for name, error in failed:
+        logger.warning("Upload of %s failed: %s", name, error)
+    uploaded = [name for name, result in zip(to_upload, results) if not isinstance(result, Exception)]
+    to_index.extend(uploaded)
+
+    for first in range(0, len(to_index), max(1, batch_size)):
+        batch = to_index[first : first + batch_size]
+        await agents_client.vector_store_file_batches.create_and_poll(
+            vector_store_id=vector_store_id, file_ids=[manifest.files[name]["file_id"] for name in batch]
+        )
+        for name in batch:
+            manifest.files[name]["status"] = "indexed"
+        manifest.save()
+        logger.info("Indexed %d/%d files", min(first + batch_size, len(to_index)), len(to_index))
+
+    removed = [name for name in manifest.files if name not in hashes] if delete_removed else []
+    stale = [manifest.files[name].pop("replaces") for name in to_index if "replaces" in manifest.files[name]]
+    stale.extend(manifest.files[name]["file_id"] for name in removed)
+
+    async def delete(file_id: str) -> None:
+        async with semaphore:
+            await _delete_file(agents_client, vector_store_id, file_id)
+
+    await asyncio.gather(*(delete(file_id) for file_id in stale))
+    for name in removed:
+        del manifest.files[name]
+    manifest.save()
+
+    return {
+        "vector_store_id": vector_store_id,
+        "files": len(hashes),
+        "unchanged": len(hashes) - len(to_upload) - resumed,
+        "uploaded": len(uploaded),
+        "indexed": len(to_index),
+        "removed": len(removed),
+        "failed": len(failed),
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+    }